@@ -1,13 +1,46 @@
 from aiosqs.client import SQSClient
+from aiosqs.speedups import features
+from aiosqs.attributes import MessageAttributes
+from aiosqs.codecs import PayloadCodec
+from aiosqs.offload import PayloadOffloader
+from aiosqs.retry import RetryPolicy, AdaptiveRateLimiter
+from aiosqs.hedging import HedgingPolicy
+from aiosqs.deadline import deadline
+from aiosqs.instrumentation import HistogramAggregator, RequestMetrics
+from aiosqs.queue_urls import QueueUrlCache
+from aiosqs.acker import Acker, VisibilityChanger
+from aiosqs.consumer import BaseConsumer, Consumer
+from aiosqs.fifo_consumer import FifoConsumer
+from aiosqs.multi_consumer import MultiQueueConsumer, WeightedQueue
+from aiosqs.polling import PollController, PollParams
+from aiosqs.supervisor import Supervisor, WorkerContext
+from aiosqs.dedup import Deduplicator, DedupStore, MemoryDedupStore
+from aiosqs.lease import LeaseManager
+from aiosqs.producer import BatchingProducer
 from aiosqs.exceptions import (
     SQSClientBaseError,
     SQSErrorResponse,
+    DeadlineExceeded,
     ErrorData,
 )
 from aiosqs.types import (
     LoggerType,
     GetQueueUrlResponse,
     SendMessageResponse,
+    ReceiveMessageResponse,
+    Message,
+    MessageAttributeValue,
+    SendMessageBatchRequestEntry,
+    SendMessageBatchResponse,
+    DeleteMessageBatchRequestEntry,
+    DeleteMessageBatchResponse,
+    ChangeMessageVisibilityBatchRequestEntry,
+    ChangeMessageVisibilityBatchResponse,
+    BatchResultErrorEntry,
+    QueueStats,
+    PollStats,
+    SupervisorStats,
+    DedupStats,
 )
 
 VERSION = "1.0.6"
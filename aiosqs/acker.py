@@ -0,0 +1,137 @@
+import asyncio
+import random
+from typing import Dict, List, Optional, Tuple
+
+from aiosqs.batching import Batcher, PendingEntry, batch_entry_error
+from aiosqs.client import SQSClient
+from aiosqs.exceptions import SQSClientBaseError
+from aiosqs.retry import classify_error
+from aiosqs.types import LoggerType, BatchResultErrorEntry, ChangeMessageVisibilityBatchResponse, DeleteMessageBatchResponse
+
+
+class Acker(Batcher):
+    """Coalesces `delete_message` calls of consumers into DeleteMessageBatch requests.
+
+    Entries failed on the service side (`SenderFault` is false) and batches failed with throttling, transient
+    or transport errors are retried up to `max_retries` times, only the failed entries are sent again.
+    The delay before the retry N is a random value between 0 and min(`max_delay_sec`, `base_delay_sec` * 2 ** N),
+    the same as in `RetryPolicy`. Batches failed with other errors, e.g. malformed requests, are not retried.
+
+    A receipt handle can't be used after the visibility timeout of its message has expired, the message is
+    visible in the queue again and will be delivered with a new receipt handle. Such entries are not retried.
+    With `on_expired="ignore"` the delete result is `False` and a warning is logged,
+    with `on_expired="raise"` the delete raises `SQSErrorResponse`.
+    """
+
+    expired_error_codes: Tuple[str, ...] = (
+        "ReceiptHandleIsInvalid",
+        "AWS.SimpleQueueService.ReceiptHandleIsInvalid",
+    )
+    expired_policies = ("ignore", "raise")
+
+    def __init__(
+        self,
+        client: SQSClient,
+        max_batch_size: int = SQSClient.max_batch_size,
+        linger_sec: float = 0.1,
+        max_in_flight: int = 10,
+        max_pending: int = 1000,
+        max_retries: int = 3,
+        base_delay_sec: float = 0.05,
+        max_delay_sec: float = 5,
+        on_expired: str = "ignore",
+        logger: Optional[LoggerType] = None,
+    ):
+        if on_expired not in self.expired_policies:
+            raise ValueError(f"Unsupported expired receipt handle policy {on_expired}, expected one of {self.expired_policies}")
+        super().__init__(
+            client=client,
+            max_batch_size=max_batch_size,
+            linger_sec=linger_sec,
+            max_in_flight=max_in_flight,
+            max_pending=max_pending,
+            logger=logger,
+        )
+        self.max_retries = max_retries
+        self.base_delay_sec = base_delay_sec
+        self.max_delay_sec = max_delay_sec
+        self.on_expired = on_expired
+
+    async def send_batch(self, queue_url: str, entries: List[Dict]) -> DeleteMessageBatchResponse:
+        return await self.client.delete_message_batch(queue_url=queue_url, entries=entries)
+
+    def entry_result(self, result: Dict) -> bool:
+        return True
+
+    def retry_delay(self, attempts: int) -> float:
+        return random.uniform(0, min(self.max_delay_sec, self.base_delay_sec * 2**attempts))
+
+    def entry_failed(self, queue_url: str, pending: PendingEntry, error: BatchResultErrorEntry):
+        if error["Code"] in self.expired_error_codes:
+            if self.on_expired == "ignore":
+                self.logger.warning("Receipt handle has expired for %s: %s", queue_url, error["Message"])
+                pending.future.set_result(False)
+            else:
+                pending.future.set_exception(batch_entry_error(entry=error))
+        elif not error["SenderFault"] and pending.attempts <= self.max_retries:
+            self.requeue(queue_url=queue_url, pending=pending, delay_sec=self.retry_delay(pending.attempts))
+        else:
+            pending.future.set_exception(batch_entry_error(entry=error))
+
+    def batch_failed(self, queue_url: str, batch: List[PendingEntry], error: Exception):
+        # Errors of the request itself, e.g. when the batch is malformed, are not retried
+        retryable = isinstance(error, SQSClientBaseError) and classify_error(error) is not None
+        for pending in batch:
+            if pending.future.done():
+                continue
+            if retryable and pending.attempts <= self.max_retries:
+                self.requeue(queue_url=queue_url, pending=pending, delay_sec=self.retry_delay(pending.attempts))
+            else:
+                pending.future.set_exception(error)
+
+    async def delete_message(self, queue_url: str, receipt_handle: str) -> bool:
+        """Deletes the message in a batch with other messages.
+        Returns `False` if the receipt handle has expired and `on_expired="ignore"`.
+        """
+        future = await self.submit(queue_url=queue_url, entry={"ReceiptHandle": receipt_handle})
+        return await future
+
+    async def ack(self, queue_url: str, receipt_handle: str):
+        """Schedules deletion of the message without waiting for the result, errors are logged.
+        Waits only when too many messages are pending. Use `flush` or `close` to wait for all deletions.
+        """
+        future = await self.submit(queue_url=queue_url, entry={"ReceiptHandle": receipt_handle})
+        future.add_done_callback(self._log_ack_error)
+
+    def _log_ack_error(self, future: asyncio.Future):
+        if not future.cancelled() and (error := future.exception()):
+            self.logger.error("Failed to delete message: %r", error)
+
+
+class VisibilityChanger(Batcher):
+    """Coalesces visibility changes of consumers into ChangeMessageVisibilityBatch requests,
+    e.g. when prefetched messages are returned to the queue.
+
+    Changes are not retried: the message becomes visible again when its current visibility timeout expires anyway.
+    """
+
+    async def send_batch(self, queue_url: str, entries: List[Dict]) -> ChangeMessageVisibilityBatchResponse:
+        return await self.client.change_message_visibility_batch(queue_url=queue_url, entries=entries)
+
+    async def change_message_visibility(self, queue_url: str, receipt_handle: str, visibility_timeout: int):
+        """Changes the visibility timeout of the message in a batch with other messages."""
+        entry = {"ReceiptHandle": receipt_handle, "VisibilityTimeout": visibility_timeout}
+        future = await self.submit(queue_url=queue_url, entry=entry)
+        await future
+
+    async def release(self, queue_url: str, receipt_handle: str, visibility_timeout: int = 0):
+        """Schedules the visibility change without waiting for the result, errors are logged.
+        Waits only when too many changes are pending. Use `flush` or `close` to wait for all changes.
+        """
+        entry = {"ReceiptHandle": receipt_handle, "VisibilityTimeout": visibility_timeout}
+        future = await self.submit(queue_url=queue_url, entry=entry)
+        future.add_done_callback(self._log_release_error)
+
+    def _log_release_error(self, future: asyncio.Future):
+        if not future.cancelled() and (error := future.exception()):
+            self.logger.error("Failed to return a message to the queue: %r", error)
@@ -0,0 +1,55 @@
+import base64
+from decimal import Decimal
+from typing import Dict, Iterator, Mapping, Tuple, Union
+
+AttributeValue = Union[str, int, Decimal, bytes]
+
+
+def decode_attribute_value(data_type: str, value: str) -> AttributeValue:
+    """Custom data types keep the base type as a prefix, e.g. "Number.float" or "Binary.gif".
+    Numbers are decoded as int or as Decimal, so no precision is lost.
+    """
+    base_type = data_type.partition(".")[0]
+    if base_type == "Binary":
+        return base64.b64decode(value)
+    if base_type == "Number":
+        try:
+            return int(value)
+        except ValueError:
+            return Decimal(value)
+    return value
+
+
+class MessageAttributes(Mapping):
+    """Message attributes by name, keeps raw (data type, value) pairs and decodes a value on first access."""
+
+    __slots__ = ("_raw", "_decoded")
+
+    def __init__(self, raw: Dict[str, Tuple[str, str]]):
+        self._raw = raw
+        self._decoded: Dict[str, AttributeValue] = {}
+
+    def __getitem__(self, name: str) -> AttributeValue:
+        try:
+            return self._decoded[name]
+        except KeyError:
+            pass
+        data_type, value = self._raw[name]
+        decoded = self._decoded[name] = decode_attribute_value(data_type=data_type, value=value)
+        return decoded
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._raw)
+
+    def __len__(self) -> int:
+        return len(self._raw)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self._raw!r})"
+
+    def data_type(self, name: str) -> str:
+        return self._raw[name][0]
+
+    def raw(self, name: str) -> Tuple[str, str]:
+        """Data type and the value as it was received, Binary values are base64-encoded."""
+        return self._raw[name]
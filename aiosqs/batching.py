@@ -0,0 +1,226 @@
+import asyncio
+from abc import ABC, abstractmethod
+from logging import getLogger
+from typing import Dict, List, Optional, Set
+
+from aiosqs.client import SQSClient
+from aiosqs.exceptions import ErrorData, SQSErrorResponse
+from aiosqs.types import LoggerType, BatchResultErrorEntry, BatchResponse
+
+default_logger = getLogger(__name__)
+
+
+class PendingEntry:
+    __slots__ = ("entry", "size", "future", "attempts")
+
+    def __init__(self, entry: Dict, size: int, future: asyncio.Future):
+        self.entry = entry
+        self.size = size
+        self.future = future
+        # Number of batches the entry was sent with
+        self.attempts = 0
+
+
+def batch_entry_error(entry: BatchResultErrorEntry) -> SQSErrorResponse:
+    """Converts a failed entry of a batch response to the error of a single request."""
+    return SQSErrorResponse(
+        error=ErrorData(
+            type="Sender" if entry["SenderFault"] else "Receiver",
+            code=entry["Code"],
+            message=entry["Message"],
+        ),
+        request_id=None,
+    )
+
+
+class Batcher(ABC):
+    """Buffers entries per queue URL and sends them with batch requests.
+    A batch is sent when it has `max_batch_size` entries, when it would exceed `max_batch_bytes`
+    or when its first entry has waited for `linger_sec`, whichever comes first.
+    Every submitted entry gets its own future with the result of the entry.
+    """
+
+    def __init__(
+        self,
+        client: SQSClient,
+        max_batch_size: int = SQSClient.max_batch_size,
+        max_batch_bytes: Optional[int] = None,
+        linger_sec: float = 0.005,
+        max_in_flight: int = 10,
+        max_pending: int = 1000,
+        logger: Optional[LoggerType] = None,
+    ):
+        self.client = client
+        self.max_batch_size = min(max_batch_size, client.max_batch_size)
+        self.max_batch_bytes = max_batch_bytes
+        self.linger_sec = linger_sec
+        self.max_in_flight = max_in_flight
+        self.max_pending = max_pending
+        self.logger = logger or default_logger
+
+        self._buffers: Dict[str, List[PendingEntry]] = {}
+        self._buffer_sizes: Dict[str, int] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        # Created in the running loop, before Python 3.10 they are bound to the current loop on creation
+        self._in_flight: Optional[asyncio.Semaphore] = None
+        # Number of entries submitted but not resolved yet, used for backpressure
+        self._pending = 0
+        self._pending_changed: Optional[asyncio.Condition] = None
+        self._closed = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _setup(self):
+        if self._pending_changed is None:
+            self._in_flight = asyncio.Semaphore(self.max_in_flight)
+            self._pending_changed = asyncio.Condition()
+
+    @abstractmethod
+    async def send_batch(self, queue_url: str, entries: List[Dict]) -> BatchResponse:
+        pass
+
+    def entry_result(self, result: Dict):
+        """Result of one successful entry for its future, without the batch Id."""
+        return None
+
+    def entry_failed(self, queue_url: str, pending: PendingEntry, error: BatchResultErrorEntry):
+        pending.future.set_exception(batch_entry_error(entry=error))
+
+    def batch_failed(self, queue_url: str, batch: List[PendingEntry], error: Exception):
+        """The whole batch request has failed, e.g. because of a transport error."""
+        for pending in batch:
+            if not pending.future.done():
+                pending.future.set_exception(error)
+
+    async def submit(self, queue_url: str, entry: Dict, size: int = 0) -> asyncio.Future:
+        """Buffers the entry, waits while too many entries are pending. Returns the future of the entry result."""
+        if self._closed:
+            raise RuntimeError(f"{self.__class__.__name__} is closed")
+
+        self._setup()
+        async with self._pending_changed:
+            await self._pending_changed.wait_for(lambda: self._pending < self.max_pending)
+            self._pending += 1
+
+        future = asyncio.get_running_loop().create_future()
+        self.buffer(queue_url=queue_url, pending=PendingEntry(entry=entry, size=size, future=future))
+        return future
+
+    def requeue(self, queue_url: str, pending: PendingEntry, delay_sec: float = 0):
+        """Buffers the entry of a sent batch again after `delay_sec`, e.g. to retry it. Doesn't wait for free space."""
+        self._pending += 1
+        if delay_sec <= 0:
+            self.buffer(queue_url=queue_url, pending=pending)
+            return
+        # The delay is tracked like a batch in flight, so `flush` waits for the entry
+        task = asyncio.ensure_future(self._buffer_later(queue_url=queue_url, pending=pending, delay_sec=delay_sec))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _buffer_later(self, queue_url: str, pending: PendingEntry, delay_sec: float):
+        try:
+            await asyncio.sleep(delay_sec)
+        except asyncio.CancelledError:
+            async with self._pending_changed:
+                self._pending -= 1
+                self._pending_changed.notify_all()
+            pending.future.cancel()
+            raise
+        self.buffer(queue_url=queue_url, pending=pending)
+
+    def buffer(self, queue_url: str, pending: PendingEntry):
+        # The entry doesn't fit into the current batch by size
+        buffer_size = self._buffer_sizes.get(queue_url, 0)
+        if self.max_batch_bytes and buffer_size and buffer_size + pending.size > self.max_batch_bytes:
+            self.flush_queue(queue_url=queue_url)
+
+        buffer = self._buffers.setdefault(queue_url, [])
+        buffer.append(pending)
+        buffer_size = self._buffer_sizes[queue_url] = self._buffer_sizes.get(queue_url, 0) + pending.size
+
+        if len(buffer) >= self.max_batch_size or (self.max_batch_bytes and buffer_size >= self.max_batch_bytes):
+            self.flush_queue(queue_url=queue_url)
+        elif len(buffer) == 1:
+            loop = asyncio.get_running_loop()
+            self._timers[queue_url] = loop.call_later(self.linger_sec, self.flush_queue, queue_url)
+
+    def flush_queue(self, queue_url: str):
+        """Sends buffered entries of the queue in the background."""
+        if timer := self._timers.pop(queue_url, None):
+            timer.cancel()
+        buffer = self._buffers.pop(queue_url, None)
+        self._buffer_sizes.pop(queue_url, None)
+        if not buffer:
+            return
+
+        task = asyncio.ensure_future(self._send(queue_url=queue_url, batch=buffer))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def flush(self):
+        """Sends all buffered entries and waits for all batches in flight."""
+        # Sent batches may buffer some entries again to retry them
+        while self._buffers or self._tasks:
+            for queue_url in list(self._buffers):
+                self.flush_queue(queue_url=queue_url)
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def close(self):
+        self._closed = True
+        await self.flush()
+
+    async def _send(self, queue_url: str, batch: List[PendingEntry]):
+        self._setup()
+        try:
+            async with self._in_flight:
+                entries = []
+                for index, pending in enumerate(batch):
+                    pending.attempts += 1
+                    entries.append({"Id": str(index), **pending.entry})
+                try:
+                    response = await self.send_batch(queue_url=queue_url, entries=entries)
+                except Exception as e:
+                    self.logger.error("Batch request error for %s: %s", queue_url, e)
+                    self.batch_failed(queue_url=queue_url, batch=batch, error=e)
+                    return
+                self.resolve(queue_url=queue_url, batch=batch, response=response)
+        except BaseException as e:
+            # Cancelled or failed unexpectedly, callers must not wait for their entries forever
+            for pending in batch:
+                if pending.future.done():
+                    continue
+                if isinstance(e, Exception):
+                    pending.future.set_exception(e)
+                else:
+                    pending.future.cancel()
+            raise
+        finally:
+            async with self._pending_changed:
+                self._pending -= len(batch)
+                self._pending_changed.notify_all()
+
+    def resolve(self, queue_url: str, batch: List[PendingEntry], response: BatchResponse):
+        missing = {str(index): pending for index, pending in enumerate(batch)}
+        for result in response["Successful"]:
+            if (pending := missing.pop(result.get("Id"), None)) is None:
+                self.logger.warning("Unexpected entry %r in the batch response for %s", result.get("Id"), queue_url)
+            elif not pending.future.done():
+                pending.future.set_result(self.entry_result(result=result))
+        for error in response["Failed"]:
+            if (pending := missing.pop(error.get("Id"), None)) is None:
+                self.logger.warning("Unexpected entry %r in the batch response for %s", error.get("Id"), queue_url)
+            elif not pending.future.done():
+                self.entry_failed(queue_url=queue_url, pending=pending, error=error)
+        for pending in missing.values():
+            if not pending.future.done():
+                error = ErrorData(type="Receiver", code="MissingEntry", message="Entry is missing in the batch response")
+                pending.future.set_exception(SQSErrorResponse(error=error, request_id=None))
@@ -3,17 +3,43 @@ Basic logic took from official examples:
 https://docs.aws.amazon.com/general/latest/gr/sigv4-signed-request-examples.html
 """
 import asyncio
+import base64
 import datetime
+import time
 import urllib.parse
+from functools import partial
 from logging import getLogger
-from typing import Dict, Optional, List, Union, Callable, NamedTuple
+from typing import Any, AsyncIterator, Dict, Optional, List, Sequence, Union, Callable, NamedTuple, Tuple
 
 import aiohttp
 
-from aiosqs.encryption import get_signature_key, hmac_sha256_hexdigest, sha256_hexdigest
-from aiosqs.exceptions import SQSClientBaseError
-from aiosqs.types import LoggerType, GetQueueUrlResponse, ReceiveMessageResponse, SendMessageResponse
-from aiosqs.parser import parse_xml_result_response
+from aiosqs.codecs import Body, PayloadCodec
+from aiosqs.encryption import get_signature_key, hmac_sha256_hexdigest, sha256_hexdigest, sha256_bytes_hexdigest
+from aiosqs.deadline import remaining_sec
+from aiosqs.exceptions import DeadlineExceeded, SQSClientBaseError, SQSErrorResponse
+from aiosqs.hedging import HedgingPolicy
+from aiosqs.instrumentation import RequestHook, RequestMetrics, emit, pool_trace_config
+from aiosqs.types import (
+    LoggerType,
+    PoolStats,
+    Message,
+    MessageAttributeValue,
+    GetQueueUrlResponse,
+    ReceiveMessageResponse,
+    SendMessageResponse,
+    SendMessageBatchRequestEntry,
+    SendMessageBatchResponse,
+    DeleteMessageBatchRequestEntry,
+    DeleteMessageBatchResponse,
+    ChangeMessageVisibilityBatchRequestEntry,
+    ChangeMessageVisibilityBatchResponse,
+)
+from aiosqs.offload import DEFAULT_CHUNK_SIZE, PayloadOffloader, split_receipt_handle
+from aiosqs.parser import LOGGED_BODY_LIMIT, logged_text, parse_xml_result_response
+from aiosqs.queue_urls import QueueUrlCache, is_queue_url
+from aiosqs.retry import RetryPolicy
+from aiosqs.speedups import encode_query
+from aiosqs import json_protocol
 
 default_logger = getLogger(__name__)
 
@@ -21,11 +47,68 @@ default_logger = getLogger(__name__)
 class SignedRequest(NamedTuple):
     headers: Dict
     querystring: str
+    # Form-encoded parameters for POST requests
+    body: Optional[bytes] = None
+
+
+def flatten_entries(prefix: str, entries: List[Dict]) -> Dict:
+    """Encodes a list of entries as indexed Query API parameters, e.g.
+    [{"Id": "1", "ReceiptHandle": "abc"}] -> {"DeleteMessageBatchRequestEntry.1.Id": "1", ...}
+    """
+    params = {}
+    for index, entry in enumerate(entries, start=1):
+        for key, value in entry.items():
+            if key == "MessageAttributes":
+                params.update(flatten_message_attributes(prefix=f"{prefix}.{index}.MessageAttribute", attributes=value))
+            elif value is not None:
+                params[f"{prefix}.{index}.{key}"] = value
+    return params
+
+
+def flatten_message_attributes(prefix: str, attributes: Dict[str, MessageAttributeValue]) -> Dict:
+    """Encodes message attributes as indexed Query API parameters, binary values are base64-encoded, e.g.
+    {"city": {"DataType": "String", "StringValue": "Any City"}} ->
+    {"MessageAttribute.1.Name": "city", "MessageAttribute.1.Value.DataType": "String", ...}
+    """
+    params = {}
+    for index, (name, value) in enumerate(attributes.items(), start=1):
+        params[f"{prefix}.{index}.Name"] = name
+        params[f"{prefix}.{index}.Value.DataType"] = value["DataType"]
+        if "BinaryValue" in value:
+            params[f"{prefix}.{index}.Value.BinaryValue"] = base64.b64encode(value["BinaryValue"])
+        else:
+            params[f"{prefix}.{index}.Value.StringValue"] = value["StringValue"]
+    return params
+
+
+def message_size(message_body: Body, message_attributes: Optional[Dict[str, MessageAttributeValue]] = None) -> int:
+    """Size of the message in bytes, without encoding ASCII messages.
+    Names, types and values of message attributes count towards the size limit too.
+    """
+    if isinstance(message_body, bytes) or message_body.isascii():
+        size = len(message_body)
+    else:
+        size = len(message_body.encode("utf-8"))
+    for name, value in (message_attributes or {}).items():
+        size += len(name) + len(value["DataType"]) + len(value.get("BinaryValue") or value.get("StringValue") or "")
+    return size
+
+
+def flatten_list(prefix: str, values: List[str]) -> Dict:
+    """Encodes a list of values as indexed Query API parameters, e.g. ["All"] -> {"AttributeName.1": "All"}"""
+    return {f"{prefix}.{index}": value for index, value in enumerate(values, start=1)}
 
 
 class SQSClient:
     algorithm = "AWS4-HMAC-SHA256"
     default_timeout_sec = 10
+    http_methods = ("GET", "POST")
+    protocols = ("query", "json")
+    # Maximum number of entries in one batch request
+    max_batch_size = 10
+
+    # Payload hash for GET requests, the payload is an empty string ("").
+    empty_payload_hash = sha256_hexdigest("")
 
     def __init__(
         self,
@@ -38,7 +121,35 @@ class SQSClient:
         verify_ssl: Optional[bool] = None,
         quote_via: Optional[Callable] = None,
         aws_session_token: Optional[str] = None,
+        http_method: str = "GET",
+        protocol: str = "query",
+        session: Optional[aiohttp.ClientSession] = None,
+        connector: Optional[aiohttp.BaseConnector] = None,
+        connection_limit: int = 100,
+        connection_limit_per_host: int = 0,
+        keepalive_timeout: float = 15,
+        use_dns_cache: bool = True,
+        dns_cache_ttl: Optional[int] = 10,
+        codec: Optional[PayloadCodec] = None,
+        offloader: Optional[PayloadOffloader] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        hedging: Optional[HedgingPolicy] = None,
+        queue_url_cache: Optional[QueueUrlCache] = None,
+        request_hooks: Optional[Sequence[RequestHook]] = None,
+        endpoint_url: Optional[str] = None,
     ):
+        # GET sends parameters in the signed querystring, POST sends them in the signed form-encoded body.
+        # POST has no URL length limit, so it's preferred for large messages when the provider supports it.
+        if http_method not in self.http_methods:
+            raise ValueError(f"Unsupported HTTP method {http_method}, expected one of {self.http_methods}")
+        self.http_method = http_method
+
+        # The Query API with XML responses is supported by all providers, Amazon SQS also supports the JSON protocol
+        # which is cheaper to encode and decode. JSON requests are always sent with POST.
+        if protocol not in self.protocols:
+            raise ValueError(f"Unsupported protocol {protocol}, expected one of {self.protocols}")
+        self.protocol = protocol
+
         self.service_name = "sqs"
         self.region_name = region_name
         self.aws_access_key_id = aws_access_key_id
@@ -46,22 +157,89 @@ class SQSClient:
         self.aws_session_token = aws_session_token
         # It's your host including region (if related), e.g. "sqs.us-west-2.amazonaws.com"
         self.host = host
-        self.endpoint_url = f"https://{host}"
+        # Requests are sent to "https://{host}" by default, another endpoint, e.g. `FakeSQSServer`,
+        # must be reachable with the same "host" header
+        self.endpoint_url = endpoint_url or f"https://{host}"
         self.verify_ssl = verify_ssl
 
         self.logger = logger or default_logger
         self.timeout = aiohttp.ClientTimeout(total=timeout_sec or self.default_timeout_sec)
-        self.session = aiohttp.ClientSession(timeout=self.timeout)
+
+        # The session or the connector can be shared by several clients, e.g. for different regions or credentials.
+        # The client doesn't close the session or the connector passed to it.
+        # Connector options are used only when the client creates the connector itself.
+        # TCP_NODELAY is always set by aiohttp on its connections.
+        self._owns_session = session is None
+        self._owns_connector = session is None and connector is None
+        if session is None:
+            if connector is None:
+                connector = aiohttp.TCPConnector(
+                    limit=connection_limit,
+                    limit_per_host=connection_limit_per_host,
+                    keepalive_timeout=keepalive_timeout,
+                    use_dns_cache=use_dns_cache,
+                    ttl_dns_cache=dns_cache_ttl,
+                )
+            # Waiting for the pool and connecting are measured with aiohttp tracing, only for request hooks
+            trace_configs = [pool_trace_config()] if request_hooks else None
+            session = aiohttp.ClientSession(
+                timeout=self.timeout,
+                connector=connector,
+                connector_owner=self._owns_connector,
+                trace_configs=trace_configs,
+            )
+        self.session = session
 
         # It's possible to have differen quoting logic for different SQS providers.
         # By default Amazon SQS uses `urllib.parse.quote`, so no extra customizations are required.
         # Related issue: https://github.com/d3QUone/aiosqs/issues/13
         self.quote_via = quote_via or urllib.parse.quote
 
+        # Payloads of sent messages are serialized with the codec, received messages get the decoded "Payload".
+        self.codec = codec
+        # Bodies of messages over the size limit are stored in the blob store of the offloader.
+        self.offloader = offloader
+        # Throttling and transient errors are retried with the policy, without it every request is made once.
+        self.retry_policy = retry_policy
+        # Slow requests of idempotent actions are sent again after the observed latency quantile.
+        self.hedging = hedging
+        # Queue names passed instead of queue URLs are resolved with GetQueueUrl once and cached.
+        self.queue_url_cache = QueueUrlCache() if queue_url_cache is None else queue_url_cache
+        # Hooks are called with the metrics of every attempt, without them nothing is measured.
+        self.request_hooks = tuple(request_hooks or ())
+
+        # Parts of the signature that never change for the client are computed once.
+        self._credential_scope_suffix = f"/{self.region_name}/{self.service_name}/aws4_request"
+        self._canonical_headers_prefix = f"host:{self.host}\nx-amz-date:"
+        # The signing key depends only on the secret key and the date stamp, so it's derived once a day.
+        # Stored as (date_stamp, aws_secret_access_key, signing_key).
+        self._signing_key_cache: Optional[Tuple[str, str, bytes]] = None
+
     async def close(self):
+        if self.hedging:
+            await self.hedging.close()
+        if not self._owns_session:
+            return
         await self.session.close()
-        # https://docs.aiohttp.org/en/stable/client_advanced.html#graceful-shutdown
-        await asyncio.sleep(0.25)
+        if self._owns_connector:
+            # https://docs.aiohttp.org/en/stable/client_advanced.html#graceful-shutdown
+            await asyncio.sleep(0.25)
+
+    def pool_stats(self) -> PoolStats:
+        """Connections of the pool, shared with other clients if the connector is shared."""
+        connector = self.session.connector
+        # There is no public API for the state of the pool
+        acquired = len(getattr(connector, "_acquired", ()))
+        idle = sum(len(connections) for connections in getattr(connector, "_conns", {}).values())
+        waiting = sum(len(waiters) for waiters in getattr(connector, "_waiters", {}).values())
+        return {
+            "limit": connector.limit,
+            "limit_per_host": connector.limit_per_host,
+            "open": acquired + idle,
+            "acquired": acquired,
+            "idle": idle,
+            "waiting": waiting,
+        }
 
     async def __aenter__(self):
         return self
@@ -69,38 +247,76 @@ class SQSClient:
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         await self.close()
 
-    def build_signed_request(self, params: Dict) -> SignedRequest:
-        # Create a date for headers and the credential string
-        t = datetime.datetime.utcnow()
-        amz_date = t.strftime("%Y%m%dT%H%M%SZ")
-        date_stamp = t.strftime("%Y%m%d")  # Date w/o time, used in credential scope
+    def get_signing_key(self, date_stamp: str) -> bytes:
+        """Returns the SigV4 signing key for the date stamp, derived at most once per day and per secret key."""
+        cached = self._signing_key_cache
+        if cached and cached[0] == date_stamp and cached[1] == self.aws_secret_access_key:
+            return cached[2]
 
-        # Create canonical URI--the part of the URI from domain to query string (use '/' if no path)
-        canonical_uri = "/"
+        signing_key = get_signature_key(
+            aws_secret_access_key=self.aws_secret_access_key,
+            date_stamp=date_stamp,
+            region_name=self.region_name,
+            service_name=self.service_name,
+        )
+        self._signing_key_cache = (date_stamp, self.aws_secret_access_key, signing_key)
+        return signing_key
 
-        # Create the canonical query string. Important notes:
-        # - Query string values must be URL-encoded (space=%20).
-        # - The parameters must be sorted by name.
-        canonical_querystring = urllib.parse.urlencode(query=list(sorted(params.items())), quote_via=self.quote_via)
+    def build_signed_request(self, params: Dict, metrics: Optional[RequestMetrics] = None) -> SignedRequest:
+        if metrics is not None:
+            started_at = time.perf_counter()
 
-        # Create the canonical headers and signed headers.
-        canonical_headers = f"host:{self.host}\nx-amz-date:{amz_date}\n"
+        # Create a date for headers and the credential string
+        amz_date = datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+        date_stamp = amz_date[:8]  # Date w/o time, used in credential scope
 
-        # Create the list of signed headers.
-        signed_headers = "host;x-amz-date"
+        # Create canonical URI--the part of the URI from domain to query string (use '/' if no path)
+        canonical_uri = "/"
 
-        # Add session token if present
+        if self.protocol == "json":
+            # The action is passed in the header, parameters are the JSON payload.
+            http_method = "POST"
+            canonical_querystring = ""
+            body = json_protocol.encode_json_request(params=params)
+            payload_hash = sha256_bytes_hexdigest(body)
+            content_type = json_protocol.CONTENT_TYPE
+        else:
+            # Create the canonical query string. Important notes:
+            # - Query string values must be URL-encoded (space=%20).
+            # - The parameters must be sorted by name.
+            if self.quote_via is urllib.parse.quote:
+                encoded_params = encode_query(params=params)
+            else:
+                encoded_params = urllib.parse.urlencode(query=sorted(params.items()), quote_via=self.quote_via)
+            http_method = self.http_method
+            content_type = "application/x-www-form-urlencoded"
+
+            # For POST requests the same parameters become the payload and the query string is empty.
+            if http_method == "POST":
+                canonical_querystring = ""
+                body = encoded_params.encode("utf-8")
+                payload_hash = sha256_bytes_hexdigest(body)
+            else:
+                canonical_querystring = encoded_params
+                body = None
+                payload_hash = self.empty_payload_hash
+
+        if metrics is not None:
+            metrics.serialize_sec = time.perf_counter() - started_at
+
+        # Create the canonical headers and the list of signed headers.
+        # Add session token if present.
         if self.aws_session_token:
-            canonical_headers += f"x-amz-security-token:{self.aws_session_token}\n"
-            signed_headers += ";x-amz-security-token"
-
-        # Create payload hash. For GET requests, the payload is an empty string ("").
-        payload_hash = sha256_hexdigest("")
+            canonical_headers = f"{self._canonical_headers_prefix}{amz_date}\nx-amz-security-token:{self.aws_session_token}\n"
+            signed_headers = "host;x-amz-date;x-amz-security-token"
+        else:
+            canonical_headers = f"{self._canonical_headers_prefix}{amz_date}\n"
+            signed_headers = "host;x-amz-date"
 
         # Combine elements to create canonical request.
         canonical_request = "\n".join(
             [
-                "GET",
+                http_method,
                 canonical_uri,
                 canonical_querystring,
                 canonical_headers,
@@ -109,7 +325,7 @@ class SQSClient:
             ]
         )
 
-        credential_scope = f"{date_stamp}/{self.region_name}/{self.service_name}/aws4_request"
+        credential_scope = f"{date_stamp}{self._credential_scope_suffix}"
 
         string_to_sign = "\n".join(
             [
@@ -120,12 +336,7 @@ class SQSClient:
             ]
         )
 
-        signing_key = get_signature_key(
-            aws_secret_access_key=self.aws_secret_access_key,
-            date_stamp=date_stamp,
-            region_name=self.region_name,
-            service_name=self.service_name,
-        )
+        signing_key = self.get_signing_key(date_stamp=date_stamp)
         signature = hmac_sha256_hexdigest(key=signing_key, msg=string_to_sign)
 
         authorization_header = f"{self.algorithm} Credential={self.aws_access_key_id}/{credential_scope}, SignedHeaders={signed_headers}, Signature={signature}"
@@ -136,65 +347,218 @@ class SQSClient:
         headers = {
             "x-amz-date": amz_date,
             "Authorization": authorization_header,
-            "content-type": "application/x-www-form-urlencoded",
+            "content-type": content_type,
         }
 
         if self.aws_session_token:
             headers["x-amz-security-token"] = self.aws_session_token
 
+        if self.protocol == "json":
+            headers["x-amz-target"] = f"{json_protocol.TARGET_PREFIX}{params['Action']}"
+            # Ask for Query API error codes in the "x-amzn-query-error" header
+            headers["x-amzn-query-mode"] = "true"
+
         return SignedRequest(
             headers=headers,
             querystring=canonical_querystring,
+            body=body,
         )
 
     async def request(self, params: Dict) -> Union[Dict, List, None]:
         params["Version"] = "2012-11-05"
-        signed_request = self.build_signed_request(params=params)
-        url = f"{self.endpoint_url}?{signed_request.querystring}"
+        if "QueueUrl" in params and not is_queue_url(params["QueueUrl"]):
+            params["QueueUrl"] = await self.resolve_queue_url(queue=params["QueueUrl"])
+        # Every attempt is signed again, the signature is valid only for a few minutes
+        send = partial(self.send_request, params=params)
+        if self.hedging and self.hedging.can_hedge(params=params):
+            send = partial(self.hedging.call, params["Action"], send)
+        if self.retry_policy is None:
+            return await send()
+        return await self.retry_policy.call(send)
+
+    async def send_request(self, params: Dict) -> Union[Dict, List, None]:
+        if not self.request_hooks:
+            return await self._send_request(params=params, metrics=None)
+
+        metrics = RequestMetrics(action=params["Action"], started_at=time.time())
+        started_at = time.perf_counter()
+        try:
+            return await self._send_request(params=params, metrics=metrics)
+        except SQSErrorResponse as e:
+            metrics.error_code = e.error.code
+            raise
+        except SQSClientBaseError as e:
+            metrics.error_code = type(e.__cause__ or e).__name__
+            raise
+        except BaseException as e:
+            metrics.error_code = type(e).__name__
+            raise
+        finally:
+            metrics.total_sec = time.perf_counter() - started_at
+            emit(hooks=self.request_hooks, metrics=metrics, logger=self.logger)
+
+    async def _send_request(self, params: Dict, metrics: Optional[RequestMetrics]) -> Union[Dict, List, None]:
+        timeout = self.timeout
+        remaining = remaining_sec()
+        if remaining is not None:
+            if remaining <= 0:
+                raise DeadlineExceeded(f"Deadline exceeded before {params['Action']}")
+            if remaining < timeout.total:
+                timeout = aiohttp.ClientTimeout(total=remaining)
+
+        if metrics is None:
+            signed_request = self.build_signed_request(params=params)
+        else:
+            started_at = time.perf_counter()
+            signed_request = self.build_signed_request(params=params, metrics=metrics)
+            metrics.sign_sec = time.perf_counter() - started_at
+            metrics.bytes_sent = len(signed_request.querystring) + len(signed_request.body or b"")
+            started_at = time.perf_counter()
 
         try:
-            response = await self.session.get(
-                url=url,
-                headers=signed_request.headers,
-                verify_ssl=self.verify_ssl,
-            )
+            if signed_request.body is None:
+                response = await self.session.get(
+                    url=f"{self.endpoint_url}?{signed_request.querystring}",
+                    headers=signed_request.headers,
+                    timeout=timeout,
+                    verify_ssl=self.verify_ssl,
+                    trace_request_ctx=metrics,
+                )
+            else:
+                response = await self.session.post(
+                    url=self.endpoint_url,
+                    data=signed_request.body,
+                    headers=signed_request.headers,
+                    timeout=timeout,
+                    verify_ssl=self.verify_ssl,
+                    trace_request_ctx=metrics,
+                )
         except Exception as e:
             self.logger.error("SQS request error: %s", e)
-            raise SQSClientBaseError
+            self.check_deadline(remaining=remaining, action=params["Action"], error=e)
+            raise SQSClientBaseError(f"Request error: {e!r}") from e
+
+        if metrics is not None:
+            metrics.send_sec = time.perf_counter() - started_at
+            metrics.status_code = response.status
+            started_at = time.perf_counter()
 
+        # Raw bytes are parsed without decoding them to a string first
         try:
-            response_body = await response.text()
-        except aiohttp.ContentTypeError as e:
-            self.logger.error("SQS API encoding error: %s", e)
-            raise SQSClientBaseError
+            response_body = await response.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.logger.error("SQS API read error: %s", e)
+            self.check_deadline(remaining=remaining, action=params["Action"], error=e)
+            raise SQSClientBaseError(f"Read error: {e!r}") from e
+
+        if metrics is not None:
+            metrics.read_sec = time.perf_counter() - started_at
+            metrics.bytes_received = len(response_body)
 
         if not response.ok:
             status_code = response.status
-            self.logger.error(f"SQS API error: status_code=%s, body=%s", status_code, response_body)
-
-            if "ErrorResponse" in response_body:
-                return parse_xml_result_response(action=params["Action"], body=response_body, logger=self.logger)
-
-            raise SQSClientBaseError
-
-        return parse_xml_result_response(action=params["Action"], body=response_body, logger=self.logger)
+            if len(response_body) > LOGGED_BODY_LIMIT:
+                self.logger.error(
+                    "SQS API error: status_code=%s, body (%s bytes)=%s...", status_code, len(response_body), logged_text(response_body)
+                )
+            else:
+                self.logger.error("SQS API error: status_code=%s, body=%s", status_code, logged_text(response_body))
+
+            error_marker = b"__type" if self.protocol == "json" else b"ErrorResponse"
+            if error_marker not in response_body:
+                raise SQSClientBaseError(f"Unexpected response with status {status_code}", status_code=status_code)
+
+        if metrics is not None:
+            started_at = time.perf_counter()
+        try:
+            return self.parse_response(action=params["Action"], response=response, body=response_body)
+        except SQSErrorResponse as e:
+            e.status_code = response.status
+            raise
+        finally:
+            if metrics is not None:
+                metrics.parse_sec = time.perf_counter() - started_at
+
+    def check_deadline(self, remaining: Optional[float], action: str, error: Exception):
+        """Timeouts caused by the deadline of the call are raised as DeadlineExceeded, they are not retried."""
+        if remaining is not None and isinstance(error, asyncio.TimeoutError) and remaining_sec() <= 0:
+            raise DeadlineExceeded(f"Deadline exceeded during {action}") from error
+
+    def parse_response(self, action: str, response: aiohttp.ClientResponse, body: bytes) -> Union[Dict, List, None]:
+        if self.protocol == "json":
+            return json_protocol.parse_json_result_response(
+                action=action,
+                body=body,
+                query_error=response.headers.get("x-amzn-query-error"),
+                request_id=response.headers.get("x-amzn-RequestId"),
+                logger=self.logger,
+            )
+        return parse_xml_result_response(action=action, body=body, logger=self.logger)
 
-    async def get_queue_url(self, queue_name: str) -> GetQueueUrlResponse:
+    async def get_queue_url(self, queue_name: str, queue_owner_aws_account_id: Optional[str] = None) -> GetQueueUrlResponse:
         params = {
             "Action": "GetQueueUrl",
             "QueueName": queue_name,
         }
+        if queue_owner_aws_account_id:
+            params["QueueOwnerAWSAccountId"] = queue_owner_aws_account_id
         return await self.request(params=params)
 
+    async def resolve_queue_url(self, queue: str, queue_owner_aws_account_id: Optional[str] = None) -> str:
+        """Returns the URL of the queue by its name, URLs are returned as is.
+        Unlike `get_queue_url` the result is cached, so it can be called for every message.
+        """
+        if is_queue_url(queue):
+            return queue
+
+        async def load() -> str:
+            response = await self.get_queue_url(queue_name=queue, queue_owner_aws_account_id=queue_owner_aws_account_id)
+            return response["QueueUrl"]
+
+        return await self.queue_url_cache.get(queue_name=queue, account_id=queue_owner_aws_account_id, loader=load)
+
+    def encode_message(
+        self,
+        message_body: Any,
+        message_attributes: Optional[Dict[str, MessageAttributeValue]] = None,
+    ) -> Tuple[Body, Optional[Dict[str, MessageAttributeValue]]]:
+        """Serializes the payload with the codec of the client, if any. Returns the message body and attributes."""
+        if self.codec is None:
+            return message_body, message_attributes
+        body, codec_attributes = self.codec.encode(message_body)
+        if message_attributes:
+            codec_attributes = {**message_attributes, **codec_attributes}
+        return body, codec_attributes
+
+    async def prepare_message(
+        self,
+        message_body: Any,
+        message_attributes: Optional[Dict[str, MessageAttributeValue]] = None,
+    ) -> Tuple[Body, Optional[Dict[str, MessageAttributeValue]]]:
+        """Serializes the payload with the codec and offloads the body if the message is too large."""
+        message_body, message_attributes = self.encode_message(message_body=message_body, message_attributes=message_attributes)
+        if self.offloader and message_size(message_body=message_body, message_attributes=message_attributes) > self.offloader.min_bytes:
+            if isinstance(message_body, str):
+                message_body = message_body.encode("utf-8")
+            message_body, message_attributes = await self.offloader.offload(
+                message_body=message_body, message_attributes=message_attributes
+            )
+        return message_body, message_attributes
+
     async def send_message(
         self,
         queue_url: str,
-        message_body: str,
+        message_body: Any,
         delay_seconds: int = 0,
         message_group_id: str = None,
         message_deduplication_id: str = None,
+        message_attributes: Optional[Dict[str, MessageAttributeValue]] = None,
     ) -> SendMessageResponse:
-        """https://docs.aws.amazon.com/AWSSimpleQueueService/latest/APIReference/API_SendMessage.html"""
+        """https://docs.aws.amazon.com/AWSSimpleQueueService/latest/APIReference/API_SendMessage.html
+        The message body is a str, or UTF-8 encoded bytes which are sent without decoding.
+        With the codec of the client any payload supported by the codec is accepted.
+        """
+        message_body, message_attributes = await self.prepare_message(message_body=message_body, message_attributes=message_attributes)
         params = {
             "Action": "SendMessage",
             "DelaySeconds": delay_seconds,
@@ -206,6 +570,8 @@ class SQSClient:
             params["MessageGroupId"] = message_group_id
         if message_deduplication_id:
             params["MessageDeduplicationId"] = message_deduplication_id
+        if message_attributes:
+            params.update(flatten_message_attributes(prefix="MessageAttribute", attributes=message_attributes))
         return await self.request(params=params)
 
     async def receive_message(
@@ -214,7 +580,14 @@ class SQSClient:
         max_number_of_messages: int,
         visibility_timeout: int,
         wait_time_seconds: int = 0,
+        attribute_names: Optional[List[str]] = None,
+        message_attribute_names: Optional[List[str]] = None,
+        receive_request_attempt_id: Optional[str] = None,
     ) -> ReceiveMessageResponse:
+        """https://docs.aws.amazon.com/AWSSimpleQueueService/latest/APIReference/API_ReceiveMessage.html
+        System attributes, e.g. ["ApproximateReceiveCount"], are returned in "Attributes" of a message.
+        Message attributes, e.g. ["All"] or ["trace.*"], are returned in "MessageAttributes" and decoded on first access.
+        """
         params = {
             "Action": "ReceiveMessage",
             "QueueUrl": queue_url,
@@ -227,12 +600,159 @@ class SQSClient:
             # and the wait time expires, the call returns successfully with an empty list of messages.
             "WaitTimeSeconds": wait_time_seconds,
         }
-        return await self.request(params=params)
+        # Attributes of the codec and the offloader are required to decode messages
+        required_names = self.required_message_attribute_names()
+        if required_names and "All" not in (message_attribute_names or []):
+            message_attribute_names = [*(message_attribute_names or []), *required_names]
+        if attribute_names:
+            params.update(flatten_list(prefix="AttributeName", values=attribute_names))
+        if message_attribute_names:
+            params.update(flatten_list(prefix="MessageAttributeName", values=message_attribute_names))
+        # Only for FIFO queues, retries of a failed receive return the same messages
+        if receive_request_attempt_id:
+            params["ReceiveRequestAttemptId"] = receive_request_attempt_id
+
+        messages = await self.request(params=params)
+        if self.offloader and messages:
+            await self.load_offloaded(messages=messages)
+        if self.codec and messages:
+            for message in messages:
+                # Bodies which are not fetched from the blob store are decoded after streaming
+                if "PayloadError" in message or (self.offloader and not self.offloader.fetch and self.offloader.is_pointer(message)):
+                    continue
+                self.decode_payload(message=message)
+        return messages
+
+    def decode_payload(self, message: Message):
+        """Messages which can't be decoded get "PayloadError" instead of "Payload", the other messages of the batch are returned."""
+        try:
+            message["Payload"] = self.codec.decode(message)
+        except Exception as e:
+            self.logger.error("Failed to decode payload of message %s: %r", message["MessageId"], e)
+            message["PayloadError"] = e
+
+    def required_message_attribute_names(self) -> List[str]:
+        names = []
+        if self.codec:
+            names.extend(self.codec.attribute_names)
+        if self.offloader:
+            names.append(self.offloader.pointer_attribute)
+        return names
+
+    async def load_offloaded(self, messages: List[Message]):
+        pointers = [message for message in messages if self.offloader.is_pointer(message)]
+        for message in pointers:
+            self.offloader.resolve(message)
+        if not self.offloader.fetch or not pointers:
+            return
+        # A missing blob, e.g. of a duplicate delivery of a deleted message, fails only its own message
+        results = await asyncio.gather(*[self.offloader.load(message) for message in pointers], return_exceptions=True)
+        for message, result in zip(pointers, results):
+            if isinstance(result, BaseException):
+                if not isinstance(result, Exception):
+                    raise result
+                self.logger.error("Failed to load offloaded body of message %s: %r", message["MessageId"], result)
+                message["PayloadError"] = result
+
+    def stream_message_body(self, message: Message, chunk_size: int = DEFAULT_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """Streams the body of an offloaded message from the blob store in chunks, so it's never loaded as a whole.
+        Requires the offloader with `fetch=False`, otherwise bodies are already loaded by `receive_message`.
+        """
+        if self.offloader and not self.offloader.fetch and self.offloader.is_pointer(message):
+            return self.offloader.stream(message=message, chunk_size=chunk_size)
+        return self._stream_body(message=message, chunk_size=chunk_size)
+
+    async def _stream_body(self, message: Message, chunk_size: int) -> AsyncIterator[bytes]:
+        body = message["Body"].encode("utf-8")
+        for offset in range(0, len(body), chunk_size):
+            yield body[offset : offset + chunk_size]
 
     async def delete_message(self, queue_url: str, receipt_handle: str) -> None:
+        """The blob of an offloaded message is deleted after the message."""
+        blob_key, receipt_handle = split_receipt_handle(receipt_handle)
         params = {
             "Action": "DeleteMessage",
             "QueueUrl": queue_url,
             "ReceiptHandle": receipt_handle,
         }
+        response = await self.request(params=params)
+        if blob_key and self.offloader:
+            await self.offloader.store.delete(key=blob_key)
+        return response
+
+    async def change_message_visibility(self, queue_url: str, receipt_handle: str, visibility_timeout: int) -> None:
+        """https://docs.aws.amazon.com/AWSSimpleQueueService/latest/APIReference/API_ChangeMessageVisibility.html
+        Visibility timeout 0 makes the message visible to other consumers immediately.
+        """
+        _, receipt_handle = split_receipt_handle(receipt_handle)
+        params = {
+            "Action": "ChangeMessageVisibility",
+            "QueueUrl": queue_url,
+            "ReceiptHandle": receipt_handle,
+            "VisibilityTimeout": visibility_timeout,
+        }
+        return await self.request(params=params)
+
+    def check_batch_size(self, entries: List):
+        if not 0 < len(entries) <= self.max_batch_size:
+            raise ValueError(f"Batch must contain from 1 to {self.max_batch_size} entries, got {len(entries)}")
+
+    async def send_message_batch(
+        self,
+        queue_url: str,
+        entries: List[SendMessageBatchRequestEntry],
+    ) -> SendMessageBatchResponse:
+        """https://docs.aws.amazon.com/AWSSimpleQueueService/latest/APIReference/API_SendMessageBatch.html
+        Failed entries are returned in the "Failed" list, they don't fail the whole batch.
+        Entries are sent as is, payloads can be serialized with `encode_message`.
+        """
+        self.check_batch_size(entries=entries)
+        params = {
+            "Action": "SendMessageBatch",
+            "QueueUrl": queue_url,
+            **flatten_entries(prefix="SendMessageBatchRequestEntry", entries=entries),
+        }
+        return await self.request(params=params)
+
+    async def delete_message_batch(
+        self,
+        queue_url: str,
+        entries: List[DeleteMessageBatchRequestEntry],
+    ) -> DeleteMessageBatchResponse:
+        """https://docs.aws.amazon.com/AWSSimpleQueueService/latest/APIReference/API_DeleteMessageBatch.html
+        Blobs of offloaded messages are deleted for successful entries.
+        """
+        self.check_batch_size(entries=entries)
+        blob_keys = {}
+        request_entries = []
+        for entry in entries:
+            blob_key, receipt_handle = split_receipt_handle(entry["ReceiptHandle"])
+            if blob_key:
+                blob_keys[entry["Id"]] = blob_key
+                entry = {**entry, "ReceiptHandle": receipt_handle}
+            request_entries.append(entry)
+        params = {
+            "Action": "DeleteMessageBatch",
+            "QueueUrl": queue_url,
+            **flatten_entries(prefix="DeleteMessageBatchRequestEntry", entries=request_entries),
+        }
+        response = await self.request(params=params)
+        if blob_keys and self.offloader:
+            deleted = [blob_keys[result["Id"]] for result in response["Successful"] if result["Id"] in blob_keys]
+            await asyncio.gather(*[self.offloader.store.delete(key=key) for key in deleted])
+        return response
+
+    async def change_message_visibility_batch(
+        self,
+        queue_url: str,
+        entries: List[ChangeMessageVisibilityBatchRequestEntry],
+    ) -> ChangeMessageVisibilityBatchResponse:
+        """https://docs.aws.amazon.com/AWSSimpleQueueService/latest/APIReference/API_ChangeMessageVisibilityBatch.html"""
+        self.check_batch_size(entries=entries)
+        entries = [{**entry, "ReceiptHandle": split_receipt_handle(entry["ReceiptHandle"])[1]} for entry in entries]
+        params = {
+            "Action": "ChangeMessageVisibilityBatch",
+            "QueueUrl": queue_url,
+            **flatten_entries(prefix="ChangeMessageVisibilityBatchRequestEntry", entries=entries),
+        }
         return await self.request(params=params)
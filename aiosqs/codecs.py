@@ -0,0 +1,241 @@
+"""
+Payload codecs serialize payloads into message bodies and back.
+
+Message bodies may contain only text, so binary data (msgpack, raw bytes and compressed payloads) is sent as base64.
+The codec and the compression are marked with message attributes, so messages sent without a codec, or with
+a different one, are still decoded correctly.
+"""
+import base64
+import json
+import zlib
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional, Sequence, Tuple, Union
+
+from aiosqs.speedups import orjson
+from aiosqs.types import Message, MessageAttributeValue
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    from compression import zstd
+except ImportError:
+    try:
+        from backports import zstd
+    except ImportError:
+        zstd = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+Body = Union[str, bytes]
+
+CONTENT_TYPE_ATTRIBUTE = "aiosqs.content-type"
+CONTENT_ENCODING_ATTRIBUTE = "aiosqs.content-encoding"
+BASE64_ENCODING = "base64"
+
+
+class Codec(ABC):
+    name = ""
+    # Serialized payloads are bytes which are not valid text, they are sent as base64
+    binary = False
+
+    @abstractmethod
+    def dumps(self, payload: Any) -> Body:
+        pass
+
+    @abstractmethod
+    def loads(self, data: Body) -> Any:
+        pass
+
+
+class TextCodec(Codec):
+    """Payloads are strings which are sent as is."""
+
+    name = "text"
+
+    def dumps(self, payload: str) -> Body:
+        return payload
+
+    def loads(self, data: Body) -> str:
+        if isinstance(data, bytes):
+            return data.decode("utf-8")
+        return data
+
+
+class JSONCodec(Codec):
+    """Uses orjson if it's installed. orjson returns UTF-8 bytes, they are sent without decoding to str."""
+
+    name = "json"
+
+    def dumps(self, payload: Any) -> Body:
+        if orjson is not None:
+            return orjson.dumps(payload)
+        return json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+
+    def loads(self, data: Body) -> Any:
+        if orjson is not None:
+            return orjson.loads(data)
+        return json.loads(data)
+
+
+class MsgpackCodec(Codec):
+    """Requires msgpack to be installed."""
+
+    name = "msgpack"
+    binary = True
+
+    def __init__(self):
+        if msgpack is None:
+            raise RuntimeError("msgpack is not installed")
+
+    def dumps(self, payload: Any) -> Body:
+        return msgpack.packb(payload)
+
+    def loads(self, data: Body) -> Any:
+        return msgpack.unpackb(data)
+
+
+class BytesCodec(Codec):
+    """Payloads are raw bytes."""
+
+    name = "bytes"
+    binary = True
+
+    def dumps(self, payload: bytes) -> Body:
+        return payload
+
+    def loads(self, data: Body) -> bytes:
+        return data
+
+
+class Compressor(ABC):
+    name = ""
+
+    @abstractmethod
+    def compress(self, data: bytes) -> bytes:
+        pass
+
+    @abstractmethod
+    def decompress(self, data: bytes) -> bytes:
+        pass
+
+
+class ZlibCompressor(Compressor):
+    name = "zlib"
+
+    def __init__(self, level: int = 6):
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, self.level)
+
+    def decompress(self, data: bytes) -> bytes:
+        return zlib.decompress(data)
+
+
+class ZstdCompressor(Compressor):
+    """Uses `compression.zstd` (Python 3.14+), `backports.zstd` or `zstandard`, whichever is installed."""
+
+    name = "zstd"
+
+    def __init__(self, level: int = 3):
+        if zstd is None and zstandard is None:
+            raise RuntimeError("zstd is not available, install backports.zstd or zstandard")
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        if zstd is not None:
+            return zstd.compress(data, level=self.level)
+        return zstandard.ZstdCompressor(level=self.level).compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        if zstd is not None:
+            return zstd.decompress(data)
+        return zstandard.ZstdDecompressor().decompress(data)
+
+
+def available_codecs() -> Tuple[Codec, ...]:
+    codecs = [TextCodec(), JSONCodec(), BytesCodec()]
+    if msgpack is not None:
+        codecs.append(MsgpackCodec())
+    return tuple(codecs)
+
+
+def available_compressors() -> Tuple[Compressor, ...]:
+    compressors = [ZlibCompressor()]
+    if zstd is not None or zstandard is not None:
+        compressors.append(ZstdCompressor())
+    return tuple(compressors)
+
+
+class PayloadCodec:
+    """Serializes payloads with `codec`. Serialized payloads of at least `compress_min_bytes` are compressed
+    with `compressor`, if that makes them smaller.
+
+    Messages are decoded by their attributes with any of `codecs` and `compressors`, all available ones by default.
+    Messages without the attributes are returned as is.
+    """
+
+    def __init__(
+        self,
+        codec: Optional[Codec] = None,
+        compressor: Optional[Compressor] = None,
+        compress_min_bytes: int = 1024,
+        codecs: Optional[Sequence[Codec]] = None,
+        compressors: Optional[Sequence[Compressor]] = None,
+    ):
+        self.codec = codec or JSONCodec()
+        self.compressor = compressor
+        self.compress_min_bytes = compress_min_bytes
+
+        self.codecs: Dict[str, Codec] = {codec.name: codec for codec in codecs or available_codecs()}
+        self.codecs[self.codec.name] = self.codec
+        self.compressors: Dict[str, Compressor] = {compressor.name: compressor for compressor in compressors or available_compressors()}
+        if compressor:
+            self.compressors[compressor.name] = compressor
+
+    @property
+    def attribute_names(self) -> Tuple[str, str]:
+        """Names of message attributes which must be received to decode messages."""
+        return CONTENT_TYPE_ATTRIBUTE, CONTENT_ENCODING_ATTRIBUTE
+
+    def encode(self, payload: Any) -> Tuple[Body, Dict[str, MessageAttributeValue]]:
+        """Returns the message body and the message attributes which mark the codec and the compression."""
+        data = self.codec.dumps(payload)
+        attributes = {CONTENT_TYPE_ATTRIBUTE: {"DataType": "String", "StringValue": self.codec.name}}
+
+        if self.compressor and len(data) >= self.compress_min_bytes:
+            raw = data.encode("utf-8") if isinstance(data, str) else data
+            compressed = self.compressor.compress(raw)
+            # base64 adds a third to the size
+            if (len(compressed) + 2) // 3 * 4 < len(raw):
+                attributes[CONTENT_ENCODING_ATTRIBUTE] = {"DataType": "String", "StringValue": self.compressor.name}
+                return base64.b64encode(compressed), attributes
+
+        if self.codec.binary:
+            attributes[CONTENT_ENCODING_ATTRIBUTE] = {"DataType": "String", "StringValue": BASE64_ENCODING}
+            return base64.b64encode(data), attributes
+        return data, attributes
+
+    def decode(self, message: Message) -> Any:
+        body = message["Body"]
+        attributes = message.get("MessageAttributes")
+        if not attributes or CONTENT_TYPE_ATTRIBUTE not in attributes:
+            return body
+
+        content_type = attributes[CONTENT_TYPE_ATTRIBUTE]
+        if content_type not in self.codecs:
+            raise ValueError(f"Unknown codec {content_type!r} of message {message['MessageId']}")
+        data = body
+        if encoding := attributes.get(CONTENT_ENCODING_ATTRIBUTE):
+            data = base64.b64decode(body)
+            if encoding != BASE64_ENCODING:
+                if encoding not in self.compressors:
+                    raise ValueError(f"Unknown compression {encoding!r} of message {message['MessageId']}")
+                data = self.compressors[encoding].decompress(data)
+        return self.codecs[content_type].loads(data)
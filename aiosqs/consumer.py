@@ -0,0 +1,354 @@
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from logging import getLogger
+from typing import Any, Awaitable, Callable, List, Optional
+
+from aiosqs.acker import Acker
+from aiosqs.client import SQSClient
+from aiosqs.dedup import DONE, Deduplicator
+from aiosqs.lease import LeaseManager
+from aiosqs.polling import PollController, PollParams
+from aiosqs.types import LoggerType, Message
+
+default_logger = getLogger(__name__)
+
+Handler = Callable[[Message], Awaitable[Any]]
+
+# Outcomes of processing a message
+HANDLED = "handled"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+class PrefetchedMessage:
+    __slots__ = ("message", "deadline")
+
+    def __init__(self, message: Message, deadline: float):
+        self.message = message
+        # Monotonic time when the visibility timeout of the message expires
+        self.deadline = deadline
+
+
+class BaseConsumer(ABC):
+    """Runtime shared by consumers: `fetchers` tasks poll queues and `workers` tasks handle prefetched messages.
+
+    A message is deleted when the handler returns, and its visibility timeout is set to `nack_visibility_timeout`
+    when the handler raises. With `nack_visibility_timeout=None` the message becomes visible again
+    only after its visibility timeout.
+
+    With `lease_manager` the visibility timeout of a message is extended while its handler is running.
+    A lease manager which isn't running is started with the consumer and closed on shutdown.
+
+    With `deduplicator` repeated deliveries of handled messages are deleted without calling the handler,
+    and deliveries of messages being handled are left until their visibility timeout expires.
+    """
+
+    def __init__(
+        self,
+        client: SQSClient,
+        workers: int,
+        prefetch: int,
+        fetchers: int,
+        visibility_timeout: int,
+        nack_visibility_timeout: Optional[int],
+        acker: Optional[Acker],
+        lease_manager: Optional[LeaseManager],
+        error_delay_sec: float,
+        poll_controller: Optional[PollController],
+        deduplicator: Optional[Deduplicator],
+        logger: Optional[LoggerType],
+    ):
+        self.client = client
+        self.workers = workers
+        self.prefetch = prefetch
+        self.fetchers = fetchers
+        self.visibility_timeout = visibility_timeout
+        self.nack_visibility_timeout = nack_visibility_timeout
+        self.error_delay_sec = error_delay_sec
+        self.poll_controller = poll_controller
+        self.deduplicator = deduplicator
+        self.logger = logger or default_logger
+
+        # Deletions are batched, the own acker is closed together with the consumer
+        self._owns_acker = acker is None
+        self.acker = acker
+        self.lease_manager = lease_manager
+        self._owns_lease_task = False
+
+        self._stopping: Optional[asyncio.Event] = None
+        self._fetcher_tasks: List[asyncio.Task] = []
+        self._worker_tasks: List[asyncio.Task] = []
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.shutdown()
+
+    def start(self):
+        if self._fetcher_tasks or self._worker_tasks:
+            raise RuntimeError(f"{self.__class__.__name__} is already started")
+        if self.acker is None:
+            self.acker = Acker(client=self.client, logger=self.logger)
+        if self.lease_manager is not None and not self.lease_manager.running:
+            self.lease_manager.start()
+            self._owns_lease_task = True
+        self._stopping = asyncio.Event()
+        self._setup()
+        self._fetcher_tasks = [asyncio.ensure_future(self._fetch()) for _ in range(self.fetchers)]
+        self._worker_tasks = self._start_workers()
+
+    def _setup(self):
+        """Creates the state of a run, called by `start` before fetchers and workers are started."""
+
+    def _start_workers(self) -> List[asyncio.Task]:
+        return [asyncio.ensure_future(self._work()) for _ in range(self.workers)]
+
+    @abstractmethod
+    async def _stop_workers(self):
+        """Lets workers exit once all prefetched messages are handled."""
+
+    @abstractmethod
+    async def _fetch(self):
+        pass
+
+    @abstractmethod
+    async def _work(self):
+        pass
+
+    def stop(self):
+        """Signals `run` to shut down."""
+        if self._stopping:
+            self._stopping.set()
+
+    async def run(self):
+        """Consumes messages until `stop` is called."""
+        self.start()
+        try:
+            await self._stopping.wait()
+        finally:
+            await self.shutdown()
+
+    async def shutdown(self):
+        """Stops polling, processes all prefetched messages and waits for handlers in flight."""
+        if self._stopping:
+            self._stopping.set()
+
+        # Long polls take up to `wait_time_seconds`, there is no need to wait for them
+        for task in self._fetcher_tasks:
+            task.cancel()
+        await asyncio.gather(*self._fetcher_tasks, return_exceptions=True)
+
+        await self._stop_workers()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._fetcher_tasks = []
+        self._worker_tasks = []
+
+        if self._owns_acker and self.acker:
+            await self.acker.close()
+            self.acker = None
+        if self._owns_lease_task:
+            await self.lease_manager.close()
+            self._owns_lease_task = False
+
+    def is_expired(self, prefetched: PrefetchedMessage) -> bool:
+        if time.monotonic() < prefetched.deadline:
+            return False
+        self.logger.warning("Visibility timeout of message %s has expired in the buffer", prefetched.message["MessageId"])
+        return True
+
+    async def _handle(self, queue_url: str, handler: Handler, prefetched: PrefetchedMessage) -> str:
+        if self.lease_manager is None:
+            return await self.process(queue_url=queue_url, handler=handler, message=prefetched.message)
+
+        receipt_handle = prefetched.message["ReceiptHandle"]
+        self.lease_manager.track(queue_url=queue_url, receipt_handle=receipt_handle, deadline=prefetched.deadline)
+        try:
+            return await self.process(queue_url=queue_url, handler=handler, message=prefetched.message)
+        finally:
+            self.lease_manager.release(receipt_handle=receipt_handle)
+
+    async def process(self, queue_url: str, handler: Handler, message: Message) -> str:
+        """Returns HANDLED when the handler has succeeded or the message is a duplicate of a handled one,
+        SKIPPED when the message is a duplicate of one being handled and FAILED when the handler has raised.
+        """
+        if self.deduplicator and (state := await self.deduplicator.claim(message=message)):
+            if state != DONE:
+                return SKIPPED
+            await self.ack(queue_url=queue_url, message=message)
+            return HANDLED
+
+        started_at = time.monotonic()
+        try:
+            await handler(message)
+        except Exception as e:
+            self.logger.exception("Failed to handle message %s: %r", message["MessageId"], e)
+            if self.deduplicator:
+                await self.deduplicator.discard(message=message)
+            await self.nack(queue_url=queue_url, message=message)
+            return FAILED
+        else:
+            if self.deduplicator:
+                await self.deduplicator.complete(message=message)
+            await self.ack(queue_url=queue_url, message=message)
+            return HANDLED
+        finally:
+            if self.poll_controller:
+                self.poll_controller.record_processing(queue_url=queue_url, duration_sec=time.monotonic() - started_at)
+
+    async def ack(self, queue_url: str, message: Message):
+        await self.acker.ack(queue_url=queue_url, receipt_handle=message["ReceiptHandle"])
+
+    async def nack(self, queue_url: str, message: Message):
+        if self.nack_visibility_timeout is None:
+            return
+        try:
+            await self.client.change_message_visibility(
+                queue_url=queue_url,
+                receipt_handle=message["ReceiptHandle"],
+                visibility_timeout=self.nack_visibility_timeout,
+            )
+        except Exception as e:
+            self.logger.error("Failed to change visibility of message %s: %r", message["MessageId"], e)
+
+
+class Consumer(BaseConsumer):
+    """Runs `fetchers` concurrent long polls of the queue which feed a prefetch buffer of at most `prefetch` messages,
+    and `workers` concurrent handlers which drain the buffer.
+
+    Fetchers request only as many messages as there is free space in the buffer and pause while it's full,
+    so messages don't wait in the buffer while their visibility timeout runs out.
+    Messages whose visibility timeout has expired in the buffer are skipped, they will be delivered again.
+
+    With `poll_controller` the number of messages, the visibility timeout and the wait time of every receive
+    are picked by the controller, `visibility_timeout` and `wait_time_seconds` are not used.
+
+    Acknowledgements, leases, `nack_visibility_timeout` and `deduplicator` work as described in `BaseConsumer`.
+    """
+
+    def __init__(
+        self,
+        client: SQSClient,
+        queue_url: str,
+        handler: Handler,
+        workers: int = 10,
+        prefetch: int = 10,
+        fetchers: int = 1,
+        visibility_timeout: int = 30,
+        wait_time_seconds: int = 20,
+        nack_visibility_timeout: Optional[int] = 0,
+        acker: Optional[Acker] = None,
+        lease_manager: Optional[LeaseManager] = None,
+        error_delay_sec: float = 1,
+        poll_controller: Optional[PollController] = None,
+        deduplicator: Optional[Deduplicator] = None,
+        logger: Optional[LoggerType] = None,
+    ):
+        super().__init__(
+            client=client,
+            workers=workers,
+            prefetch=prefetch,
+            fetchers=fetchers,
+            visibility_timeout=visibility_timeout,
+            nack_visibility_timeout=nack_visibility_timeout,
+            acker=acker,
+            lease_manager=lease_manager,
+            error_delay_sec=error_delay_sec,
+            poll_controller=poll_controller,
+            deduplicator=deduplicator,
+            logger=logger,
+        )
+        self.queue_url = queue_url
+        self.handler = handler
+        self.wait_time_seconds = wait_time_seconds
+
+        self._buffer: Optional[asyncio.Queue] = None
+        # Free space in the prefetch buffer, including space reserved by polls in flight
+        self._free = prefetch
+        self._free_changed: Optional[asyncio.Condition] = None
+
+    @property
+    def buffered(self) -> int:
+        """Number of prefetched messages waiting for a worker."""
+        return self._buffer.qsize() if self._buffer else 0
+
+    def _setup(self):
+        self._buffer = asyncio.Queue()
+        self._free = self.prefetch
+        self._free_changed = asyncio.Condition()
+
+    async def _stop_workers(self):
+        # Every worker exits when it gets None, after all prefetched messages
+        for _ in self._worker_tasks:
+            self._buffer.put_nowait(None)
+
+    def poll_params(self) -> PollParams:
+        if self.poll_controller:
+            return self.poll_controller.params(queue_url=self.queue_url)
+        return PollParams(
+            max_number_of_messages=self.client.max_batch_size,
+            visibility_timeout=self.visibility_timeout,
+            wait_time_seconds=self.wait_time_seconds,
+        )
+
+    async def _reserve(self, max_number_of_messages: int) -> int:
+        """Waits for free space in the prefetch buffer and reserves it for one poll."""
+        async with self._free_changed:
+            await self._free_changed.wait_for(lambda: self._free > 0)
+            reserved = min(self._free, max_number_of_messages)
+            self._free -= reserved
+            return reserved
+
+    async def _release(self, count: int):
+        async with self._free_changed:
+            self._free += count
+            self._free_changed.notify_all()
+
+    async def receive(self, max_number_of_messages: int, params: Optional[PollParams] = None) -> List[Message]:
+        params = params or self.poll_params()
+        messages = await self.client.receive_message(
+            queue_url=self.queue_url,
+            max_number_of_messages=max_number_of_messages,
+            visibility_timeout=params.visibility_timeout,
+            wait_time_seconds=params.wait_time_seconds,
+        )
+        return messages or []
+
+    async def _fetch(self):
+        while not self._stopping.is_set():
+            params = self.poll_params()
+            reserved = await self._reserve(max_number_of_messages=params.max_number_of_messages)
+            try:
+                received_at = time.monotonic()
+                messages = await self.receive(max_number_of_messages=reserved, params=params)
+            except asyncio.CancelledError:
+                # Workers are woken up by the shutdown
+                self._free += reserved
+                raise
+            except Exception as e:
+                self.logger.error("Failed to receive messages from %s: %r", self.queue_url, e)
+                await self._release(reserved)
+                await asyncio.sleep(self.error_delay_sec)
+                continue
+
+            if self.poll_controller:
+                self.poll_controller.record_receive(queue_url=self.queue_url, requested=reserved, received=len(messages))
+            buffered = self._enqueue(messages=messages[:reserved], deadline=received_at + params.visibility_timeout)
+            await self._release(reserved - buffered)
+
+    def _enqueue(self, messages: List[Message], deadline: float) -> int:
+        """Puts received messages into the prefetch buffer, returns the number of buffered messages."""
+        for message in messages:
+            self._buffer.put_nowait(PrefetchedMessage(message=message, deadline=deadline))
+        return len(messages)
+
+    async def _work(self):
+        while True:
+            prefetched = await self._buffer.get()
+            if prefetched is None:
+                return
+            await self._release(1)
+            if not self.is_expired(prefetched):
+                await self._handle(queue_url=self.queue_url, handler=self.handler, prefetched=prefetched)
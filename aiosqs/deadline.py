@@ -0,0 +1,36 @@
+"""
+Deadlines of calls, which propagate through retries and hedged requests.
+
+The deadline is kept in a context variable, so it applies to all requests made inside the block,
+including requests made by other coroutines started in the block.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+_deadline: ContextVar[Optional[float]] = ContextVar("aiosqs_deadline", default=None)
+
+
+@contextmanager
+def deadline(timeout_sec: float) -> Iterator[float]:
+    """Requests inside the block, with all their retries, must finish within `timeout_sec`.
+    A nested deadline can't extend the outer one. Yields the deadline in monotonic time.
+    """
+    deadline_at = time.monotonic() + timeout_sec
+    outer = _deadline.get()
+    if outer is not None:
+        deadline_at = min(deadline_at, outer)
+    token = _deadline.set(deadline_at)
+    try:
+        yield deadline_at
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_sec() -> Optional[float]:
+    """Time left until the current deadline, None without a deadline."""
+    deadline_at = _deadline.get()
+    if deadline_at is None:
+        return None
+    return deadline_at - time.monotonic()
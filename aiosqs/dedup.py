@@ -0,0 +1,171 @@
+"""
+Deduplication of messages on the consumer side.
+
+Standard queues deliver messages at least once: a message is delivered again when its visibility timeout expires
+while it's being handled, and occasionally even when it hasn't. The deduplicator remembers keys of messages which
+have been handled, so repeated deliveries are deleted without running the handler again.
+
+A key is claimed before the handler runs, so a duplicate delivered while the first delivery is being handled is
+not handled either. It's left in flight and delivered again after its visibility timeout, by then the first delivery
+has either succeeded or failed and released the key. Keys are stored as fixed-size digests.
+"""
+import hashlib
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from logging import getLogger
+from typing import Callable, Optional, Tuple
+
+from aiosqs.types import DedupStats, LoggerType, Message
+
+default_logger = getLogger(__name__)
+
+KeyFunc = Callable[[Message], str]
+
+# States of claimed keys
+IN_PROGRESS = "in_progress"
+DONE = "done"
+
+DIGEST_SIZE = 16
+
+
+def message_id(message: Message) -> str:
+    return message["MessageId"]
+
+
+def digest(key: str) -> bytes:
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=DIGEST_SIZE).digest()
+
+
+class DedupStore(ABC):
+    """Keys of claimed messages, shared by consumers which deduplicate the same queues, e.g. Redis.
+
+    `claim` must be atomic, with Redis it's `SET key in_progress NX PX ttl`, `complete` is `SET key done PX ttl`
+    and `discard` is `DEL key`.
+    """
+
+    @abstractmethod
+    async def claim(self, key: bytes, ttl_sec: float) -> Optional[str]:
+        """Stores the key as in progress unless it's known, returns None when claimed, otherwise the state of the key."""
+
+    @abstractmethod
+    async def complete(self, key: bytes, ttl_sec: float):
+        pass
+
+    @abstractmethod
+    async def discard(self, key: bytes):
+        """Discarding a missing key is not an error, e.g. when it has expired."""
+
+
+class MemoryDedupStore(DedupStore):
+    """Keeps at most `max_size` keys of one process, the least recently used keys are evicted first.
+    Expired keys are evicted from the least recently used end and ignored everywhere else.
+    """
+
+    def __init__(self, max_size: int = 100_000, clock: Callable[[], float] = time.monotonic):
+        if max_size < 1:
+            raise ValueError("Store must keep at least one key")
+        self.max_size = max_size
+        self.clock = clock
+        # Key digest -> (state, expiration time), from the least to the most recently used
+        self._keys: "OrderedDict[bytes, Tuple[str, float]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _evict_expired(self, now: float):
+        while self._keys:
+            _, expires_at = next(iter(self._keys.values()))
+            if expires_at > now:
+                return
+            self._keys.popitem(last=False)
+
+    def _set(self, key: bytes, state: str, expires_at: float):
+        self._keys[key] = (state, expires_at)
+        self._keys.move_to_end(key)
+        if len(self._keys) > self.max_size:
+            self._keys.popitem(last=False)
+
+    async def claim(self, key: bytes, ttl_sec: float) -> Optional[str]:
+        now = self.clock()
+        self._evict_expired(now)
+        entry = self._keys.get(key)
+        if entry is not None and entry[1] > now:
+            self._keys.move_to_end(key)
+            return entry[0]
+        self._set(key=key, state=IN_PROGRESS, expires_at=now + ttl_sec)
+        return None
+
+    async def complete(self, key: bytes, ttl_sec: float):
+        self._set(key=key, state=DONE, expires_at=self.clock() + ttl_sec)
+
+    async def discard(self, key: bytes):
+        self._keys.pop(key, None)
+
+
+class Deduplicator:
+    """Skips messages whose keys have been claimed within `ttl_sec`, the key is the message ID by default.
+
+    A claim expires after `in_progress_ttl_sec` unless the handler has completed, so it should be longer than handlers
+    take, including extended visibility timeouts. When the handler fails, the key is discarded and the message is handled
+    again on the next delivery. Errors of the store are logged and the message is handled, as without deduplication.
+    """
+
+    def __init__(
+        self,
+        store: Optional[DedupStore] = None,
+        key: KeyFunc = message_id,
+        ttl_sec: float = 60 * 60,
+        in_progress_ttl_sec: float = 15 * 60,
+        logger: Optional[LoggerType] = None,
+    ):
+        self.store = store or MemoryDedupStore()
+        self.key = key
+        self.ttl_sec = ttl_sec
+        self.in_progress_ttl_sec = in_progress_ttl_sec
+        self.logger = logger or default_logger
+
+        self._checked = 0
+        self._duplicates = 0
+        self._in_progress = 0
+        self._errors = 0
+
+    def stats(self) -> DedupStats:
+        return DedupStats(
+            checked=self._checked,
+            duplicates=self._duplicates,
+            in_progress=self._in_progress,
+            errors=self._errors,
+        )
+
+    async def claim(self, message: Message) -> Optional[str]:
+        """Returns None when the message should be handled, otherwise the state of its key."""
+        self._checked += 1
+        try:
+            state = await self.store.claim(key=digest(self.key(message)), ttl_sec=self.in_progress_ttl_sec)
+        except Exception as e:
+            self._errors += 1
+            self.logger.error("Failed to claim message %s: %r", message["MessageId"], e)
+            return None
+
+        if state == DONE:
+            self._duplicates += 1
+            self.logger.info("Message %s is a duplicate of a handled message", message["MessageId"])
+        elif state is not None:
+            self._in_progress += 1
+            self.logger.info("Message %s is a duplicate of a message being handled", message["MessageId"])
+        return state
+
+    async def complete(self, message: Message):
+        try:
+            await self.store.complete(key=digest(self.key(message)), ttl_sec=self.ttl_sec)
+        except Exception as e:
+            self._errors += 1
+            self.logger.error("Failed to complete message %s: %r", message["MessageId"], e)
+
+    async def discard(self, message: Message):
+        try:
+            await self.store.discard(key=digest(self.key(message)))
+        except Exception as e:
+            self._errors += 1
+            self.logger.error("Failed to discard message %s: %r", message["MessageId"], e)
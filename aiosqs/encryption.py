@@ -22,6 +22,10 @@ def sha256_hexdigest(msg: str):
     return hashlib.sha256(msg.encode("utf-8")).hexdigest()
 
 
+def sha256_bytes_hexdigest(msg: bytes):
+    return hashlib.sha256(msg).hexdigest()
+
+
 def get_signature_key(aws_secret_access_key: str, date_stamp: str, region_name: str, service_name: str):
     kDate = hmac_sha256_digest(("AWS4" + aws_secret_access_key).encode("utf-8"), date_stamp)
     kRegion = hmac_sha256_digest(kDate, region_name)
@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from typing import Optional
 
 
 @dataclass
@@ -14,10 +15,22 @@ class SQSClientBaseError(Exception):
     https://docs.aws.amazon.com/AWSSimpleQueueService/latest/APIReference/CommonErrors.html
     """
 
+    # HTTP status of the response, None for transportation errors
+    status_code: Optional[int] = None
+
+    def __init__(self, *args, status_code: Optional[int] = None):
+        super().__init__(*args)
+        self.status_code = status_code
+
 
 class SQSErrorResponse(SQSClientBaseError):
     """ErrorResponse XML from SQS service."""
 
-    def __init__(self, error: ErrorData, request_id: str):
+    def __init__(self, error: ErrorData, request_id: str, status_code: Optional[int] = None):
+        super().__init__(error, request_id, status_code=status_code)
         self.error = error
         self.request_id = request_id
+
+
+class DeadlineExceeded(SQSClientBaseError):
+    """The deadline of the call has passed before the request could be made or retried."""
@@ -0,0 +1,1042 @@
+"""
+An in-memory SQS endpoint for tests and benchmarks without network access and AWS credentials.
+
+`FakeSQSServer` is an aiohttp application which verifies SigV4 signatures and implements the Query API
+(GET and POST) and the JSON protocol for all actions of `SQSClient`. Queues are kept in memory with
+visibility timeouts, delays, long polling, FIFO message groups and deduplication.
+Latency, throttling, errors and dropped connections are injected with `Faults`.
+"""
+import asyncio
+import base64
+import datetime
+import hashlib
+import heapq
+import hmac
+import itertools
+import json
+import random
+import re
+import socket
+import struct
+import time
+import urllib.parse
+import uuid
+from collections import Counter, OrderedDict, deque
+from logging import getLogger
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+from xml.sax.saxutils import escape
+
+from aiohttp import web
+
+from aiosqs import json_protocol
+from aiosqs.client import SQSClient
+from aiosqs.encryption import get_signature_key, hmac_sha256_hexdigest, sha256_bytes_hexdigest, sha256_hexdigest
+from aiosqs.types import LoggerType
+
+default_logger = getLogger(__name__)
+
+DEFAULT_ACCOUNT_ID = "123456789012"
+DEFAULT_ACCESS_KEY_ID = "fake-access-key-id"
+DEFAULT_SECRET_ACCESS_KEY = "fake-secret-access-key"
+
+XML_NAMESPACE = "http://queue.amazonaws.com/doc/2012-11-05/"
+ALGORITHM = "AWS4-HMAC-SHA256"
+SERVICE_NAME = "sqs"
+
+MAX_BATCH_SIZE = 10
+MAX_MESSAGE_SIZE = 256 * 1024
+MAX_DELAY_SECONDS = 15 * 60
+MAX_VISIBILITY_TIMEOUT = 12 * 60 * 60
+MAX_WAIT_TIME_SECONDS = 20
+# Percent-encoded messages of the maximum size fit into the URL of a GET request
+MAX_REQUEST_LINE_SIZE = 4 * 1024 * 1024
+# Messages with the same deduplication ID, and retried receives with the same attempt ID, within the interval
+DEDUPLICATION_INTERVAL_SEC = 5 * 60
+
+# Characters allowed in message bodies and string attributes: #x9 | #xA | #xD | #x20 to #xD7FF | #xE000 to #xFFFD | #x10000 to #x10FFFF
+INVALID_CHARACTERS = re.compile("[^\x09\x0a\x0d\x20-\ud7ff\ue000-\ufffd\U00010000-\U0010ffff]")
+
+# Query API error codes and their names in the JSON protocol, other codes are the same
+JSON_ERROR_TYPES = {
+    "AWS.SimpleQueueService.NonExistentQueue": "QueueDoesNotExist",
+    "AWS.SimpleQueueService.MessageNotInflight": "MessageNotInflight",
+    "AWS.SimpleQueueService.EmptyBatchRequest": "EmptyBatchRequest",
+    "AWS.SimpleQueueService.TooManyEntriesInBatchRequest": "TooManyEntriesInBatchRequest",
+    "AWS.SimpleQueueService.BatchEntryIdsNotDistinct": "BatchEntryIdsNotDistinct",
+    "AWS.SimpleQueueService.BatchRequestTooLong": "BatchRequestTooLong",
+}
+
+
+class FakeSQSError(Exception):
+    def __init__(self, code: str, message: str, status: int = 400, error_type: str = "Sender"):
+        super().__init__(f"{code}: {message}")
+        self.code = code
+        self.message = message
+        self.status = status
+        self.error_type = error_type
+
+
+def missing_parameter(name: str) -> FakeSQSError:
+    return FakeSQSError(code="MissingParameter", message=f"The request must contain the parameter {name}.")
+
+
+def invalid_parameter(message: str) -> FakeSQSError:
+    return FakeSQSError(code="InvalidParameterValue", message=message)
+
+
+def md5_hexdigest(data: bytes) -> str:
+    return hashlib.md5(data).hexdigest()
+
+
+def md5_of_message_attributes(attributes: Dict[str, Dict]) -> str:
+    """https://docs.aws.amazon.com/AWSSimpleQueueService/latest/SQSDeveloperGuide/sqs-message-metadata.html#sqs-attributes-md5-message-digest-calculation
+    Names, types and values are length-prefixed, values follow the transport type: 1 for strings, 2 for binary.
+    """
+    digest = hashlib.md5()
+
+    def update(data: bytes):
+        digest.update(struct.pack(">I", len(data)))
+        digest.update(data)
+
+    for name in sorted(attributes):
+        value = attributes[name]
+        update(name.encode("utf-8"))
+        update(value["DataType"].encode("utf-8"))
+        if "BinaryValue" in value:
+            digest.update(b"\x02")
+            update(base64.b64decode(value["BinaryValue"]))
+        else:
+            digest.update(b"\x01")
+            update(value["StringValue"].encode("utf-8"))
+    return digest.hexdigest()
+
+
+def canonical_querystring(raw_querystring: str) -> str:
+    """Parameters are decoded and encoded again the way AWS does it, sorted by name and value."""
+    params = urllib.parse.parse_qsl(raw_querystring, keep_blank_values=True)
+    return "&".join(f"{urllib.parse.quote(name, safe='-_.~')}={urllib.parse.quote(value, safe='-_.~')}" for name, value in sorted(params))
+
+
+class FakeMessage:
+    __slots__ = (
+        "message_id",
+        "body",
+        "attributes",
+        "md5_of_body",
+        "sent_timestamp",
+        "visible_at",
+        "receive_count",
+        "first_receive_timestamp",
+        "receipt_handle",
+        "ready",
+        "group_id",
+        "deduplication_id",
+        "sequence_number",
+    )
+
+    def __init__(self, body: str, attributes: Dict[str, Dict], visible_at: float):
+        self.message_id = str(uuid.uuid4())
+        self.body = body
+        self.attributes = attributes
+        self.md5_of_body = md5_hexdigest(body.encode("utf-8"))
+        self.sent_timestamp = int(time.time() * 1000)
+        # Clock time when the message becomes visible after the delay or the visibility timeout
+        self.visible_at = visible_at
+        self.receive_count = 0
+        self.first_receive_timestamp: Optional[int] = None
+        # The receipt handle of the last receive
+        self.receipt_handle: Optional[str] = None
+        # In the queue of visible messages of a standard queue
+        self.ready = False
+        self.group_id: Optional[str] = None
+        self.deduplication_id: Optional[str] = None
+        self.sequence_number: Optional[str] = None
+
+    def in_flight(self, now: float) -> bool:
+        return self.receipt_handle is not None and self.visible_at > now
+
+
+class FakeQueue:
+    """Messages of a standard queue are received in the order they become visible.
+    Messages of a FIFO queue are received in the order they are sent within a message group, and a group is locked
+    while it has messages in flight.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        account_id: str,
+        visibility_timeout: int = 30,
+        delay_seconds: int = 0,
+        receive_message_wait_time_seconds: int = 0,
+        content_based_deduplication: bool = False,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.account_id = account_id
+        self.fifo = name.endswith(".fifo")
+        self.visibility_timeout = visibility_timeout
+        self.delay_seconds = delay_seconds
+        self.receive_message_wait_time_seconds = receive_message_wait_time_seconds
+        self.content_based_deduplication = content_based_deduplication
+        self.clock = clock
+
+        self.messages: Dict[str, FakeMessage] = {}
+        # Standard queues: IDs of visible messages and a heap of (visible_at, counter, message_id) of the others.
+        # Entries are not removed from the heap, the stale ones are skipped.
+        self._ready: Deque[str] = deque()
+        self._pending: List[Tuple[float, int, str]] = []
+        self._counter = itertools.count()
+        # FIFO queues: messages by group in the order they are sent
+        self._groups: Dict[str, Deque[FakeMessage]] = OrderedDict()
+        # Deduplication ID -> (expires_at, message)
+        self._deduplication: Dict[str, Tuple[float, FakeMessage]] = OrderedDict()
+        # Receive request attempt ID -> (expires_at, messages)
+        self._attempts: Dict[str, Tuple[float, List[Tuple[FakeMessage, str]]]] = OrderedDict()
+        self._sequence = itertools.count(10**19)
+        self._changed: Optional[asyncio.Event] = None
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def visible_count(self) -> int:
+        now = self.clock()
+        return sum(1 for message in self.messages.values() if message.visible_at <= now)
+
+    def in_flight_count(self) -> int:
+        now = self.clock()
+        return sum(1 for message in self.messages.values() if message.in_flight(now))
+
+    def purge(self):
+        self.messages.clear()
+        self._ready.clear()
+        self._pending.clear()
+        self._groups.clear()
+        self._attempts.clear()
+
+    def notify(self):
+        if self._changed:
+            self._changed.set()
+            self._changed = None
+
+    async def wait(self, timeout: float):
+        """Waits until a message is sent to the queue, or for the timeout."""
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def next_visible_at(self) -> Optional[float]:
+        if self.fifo:
+            now = self.clock()
+            return min(
+                (message.visible_at for group in self._groups.values() for message in group if message.visible_at > now), default=None
+            )
+        return self._pending[0][0] if self._pending else None
+
+    def send(
+        self,
+        body: str,
+        attributes: Dict[str, Dict],
+        delay_seconds: Optional[int] = None,
+        group_id: Optional[str] = None,
+        deduplication_id: Optional[str] = None,
+    ) -> FakeMessage:
+        """Returns the sent message, or the previous one with the same deduplication ID."""
+        now = self.clock()
+        if self.fifo:
+            if not group_id:
+                raise missing_parameter("MessageGroupId")
+            if delay_seconds:
+                raise invalid_parameter(
+                    f"Value {delay_seconds} for parameter DelaySeconds is invalid. "
+                    f"Reason: The request include parameter that is not valid for this queue type."
+                )
+            if not deduplication_id:
+                if not self.content_based_deduplication:
+                    raise invalid_parameter(
+                        "The queue should either have ContentBasedDeduplication enabled or MessageDeduplicationId provided explicitly"
+                    )
+                deduplication_id = sha256_hexdigest(body)
+            self._expire_deduplication(now=now)
+            if previous := self._deduplication.get(deduplication_id):
+                return previous[1]
+        elif deduplication_id:
+            raise invalid_parameter(
+                f"Value {deduplication_id} for parameter MessageDeduplicationId is invalid. "
+                f"Reason: The request includes a parameter that is not valid for this queue type."
+            )
+
+        delay = self.delay_seconds if delay_seconds is None else delay_seconds
+        message = FakeMessage(body=body, attributes=attributes, visible_at=now + delay)
+        self.messages[message.message_id] = message
+        if self.fifo:
+            message.group_id = group_id
+            message.deduplication_id = deduplication_id
+            message.sequence_number = str(next(self._sequence))
+            self._deduplication[deduplication_id] = (now + DEDUPLICATION_INTERVAL_SEC, message)
+            if (group := self._groups.get(group_id)) is None:
+                group = self._groups[group_id] = deque()
+            group.append(message)
+        else:
+            message.group_id = group_id
+            self._schedule(message=message, now=now)
+        self.notify()
+        return message
+
+    def receive(
+        self, max_number_of_messages: int, visibility_timeout: int, attempt_id: Optional[str] = None
+    ) -> List[Tuple[FakeMessage, str]]:
+        """Returns received messages with their new receipt handles."""
+        now = self.clock()
+        if attempt_id and self.fifo:
+            if (retried := self._retry_attempt(attempt_id=attempt_id, now=now)) is not None:
+                return retried
+
+        messages = (
+            self._receive_fifo(max_number_of_messages, now=now) if self.fifo else self._receive_standard(max_number_of_messages, now=now)
+        )
+        received = []
+        timestamp = int(time.time() * 1000)
+        for message in messages:
+            message.receive_count += 1
+            if message.first_receive_timestamp is None:
+                message.first_receive_timestamp = timestamp
+            message.receipt_handle = f"{message.message_id}#{message.receive_count}#{uuid.uuid4().hex}"
+            message.visible_at = now + visibility_timeout
+            if not self.fifo:
+                self._push(message)
+            received.append((message, message.receipt_handle))
+
+        if attempt_id and self.fifo and received:
+            self._attempts[attempt_id] = (now + DEDUPLICATION_INTERVAL_SEC, received)
+        return received
+
+    def delete(self, receipt_handle: str):
+        message_id = self._parse_receipt_handle(receipt_handle)
+        # Deleting a message which is already deleted succeeds
+        if (message := self.messages.pop(message_id, None)) is None:
+            return
+        if self.fifo:
+            group = self._groups[message.group_id]
+            group.remove(message)
+            if not group:
+                del self._groups[message.group_id]
+            # The next message of the group may be received now
+            self.notify()
+
+    def change_visibility(self, receipt_handle: str, visibility_timeout: int):
+        message_id = self._parse_receipt_handle(receipt_handle)
+        now = self.clock()
+        message = self.messages.get(message_id)
+        if message is None or message.receipt_handle != receipt_handle or not message.in_flight(now):
+            raise FakeSQSError(
+                code="AWS.SimpleQueueService.MessageNotInflight",
+                message=f"Value {receipt_handle} for parameter ReceiptHandle is invalid. Reason: Message does not exist or is not available for visibility timeout change.",
+            )
+        message.visible_at = now + visibility_timeout
+        if not self.fifo:
+            self._push(message)
+        if visibility_timeout == 0:
+            self.notify()
+
+    def _parse_receipt_handle(self, receipt_handle: str) -> str:
+        message_id, separator, _ = receipt_handle.partition("#")
+        if not separator:
+            raise FakeSQSError(
+                code="ReceiptHandleIsInvalid", message=f"The input receipt handle {receipt_handle!r} is not a valid receipt handle."
+            )
+        return message_id
+
+    def _schedule(self, message: FakeMessage, now: float):
+        if message.visible_at <= now:
+            message.ready = True
+            self._ready.append(message.message_id)
+        else:
+            self._push(message)
+
+    def _push(self, message: FakeMessage):
+        heapq.heappush(self._pending, (message.visible_at, next(self._counter), message.message_id))
+
+    def _receive_standard(self, max_number_of_messages: int, now: float) -> List[FakeMessage]:
+        # Messages whose delay or visibility timeout has passed become visible
+        while self._pending and self._pending[0][0] <= now:
+            visible_at, _, message_id = heapq.heappop(self._pending)
+            message = self.messages.get(message_id)
+            if message is None or message.ready or message.visible_at != visible_at:
+                continue
+            message.ready = True
+            self._ready.append(message_id)
+
+        messages = []
+        while self._ready and len(messages) < max_number_of_messages:
+            message = self.messages.get(self._ready.popleft())
+            if message is None or not message.ready:
+                continue
+            message.ready = False
+            messages.append(message)
+        return messages
+
+    def _receive_fifo(self, max_number_of_messages: int, now: float) -> List[FakeMessage]:
+        messages = []
+        for group in self._groups.values():
+            if len(messages) >= max_number_of_messages:
+                break
+            # The group is locked until its messages in flight are deleted or become visible again
+            if group[0].in_flight(now):
+                continue
+            for message in group:
+                if len(messages) >= max_number_of_messages or message.visible_at > now:
+                    break
+                messages.append(message)
+        return messages
+
+    def _retry_attempt(self, attempt_id: str, now: float) -> Optional[List[Tuple[FakeMessage, str]]]:
+        while self._attempts:
+            key, (expires_at, _) = next(iter(self._attempts.items()))
+            if expires_at > now:
+                break
+            del self._attempts[key]
+        if (attempt := self._attempts.get(attempt_id)) is None:
+            return None
+        # The same messages are returned while none of them is deleted or changed
+        received = attempt[1]
+        for message, receipt_handle in received:
+            if (
+                self.messages.get(message.message_id) is not message
+                or message.receipt_handle != receipt_handle
+                or not message.in_flight(now)
+            ):
+                return None
+        return received
+
+    def _expire_deduplication(self, now: float):
+        while self._deduplication:
+            key, (expires_at, _) = next(iter(self._deduplication.items()))
+            if expires_at > now:
+                return
+            del self._deduplication[key]
+
+
+class Faults:
+    """Faults injected into requests of all actions, or only of `actions`. Rates are probabilities from 0 to 1.
+
+    - `latency_sec` plus a random jitter up to `latency_jitter_sec` delays every response.
+    - `throttle_rate` of requests, and requests over `requests_per_sec` with bursts of `burst`, fail with ThrottlingException.
+    - `error_rate` of requests fail with InternalError and status 500.
+    - `disconnect_rate` of requests are dropped without a response.
+    """
+
+    def __init__(
+        self,
+        latency_sec: float = 0,
+        latency_jitter_sec: float = 0,
+        throttle_rate: float = 0,
+        requests_per_sec: Optional[float] = None,
+        burst: Optional[float] = None,
+        error_rate: float = 0,
+        disconnect_rate: float = 0,
+        actions: Optional[Set[str]] = None,
+        seed: Optional[int] = None,
+    ):
+        self.latency_sec = latency_sec
+        self.latency_jitter_sec = latency_jitter_sec
+        self.throttle_rate = throttle_rate
+        self.requests_per_sec = requests_per_sec
+        self.burst = burst or requests_per_sec
+        self.error_rate = error_rate
+        self.disconnect_rate = disconnect_rate
+        self.actions = actions
+        self.random = random.Random(seed)
+        # Token bucket of the rate limit
+        self._tokens = self.burst
+        self._updated_at: Optional[float] = None
+
+    def applies(self, action: str) -> bool:
+        return self.actions is None or action in self.actions
+
+    def latency(self) -> float:
+        return self.latency_sec + self.random.uniform(0, self.latency_jitter_sec) if self.latency_jitter_sec else self.latency_sec
+
+    def throttled(self) -> bool:
+        if self.throttle_rate and self.random.random() < self.throttle_rate:
+            return True
+        if self.requests_per_sec is None:
+            return False
+        now = time.monotonic()
+        if self._updated_at is not None:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.requests_per_sec)
+        self._updated_at = now
+        if self._tokens < 1:
+            return True
+        self._tokens -= 1
+        return False
+
+    def failed(self) -> bool:
+        return bool(self.error_rate) and self.random.random() < self.error_rate
+
+    def disconnected(self) -> bool:
+        return bool(self.disconnect_rate) and self.random.random() < self.disconnect_rate
+
+
+class ScriptedFault:
+    __slots__ = ("action", "error", "times")
+
+    def __init__(self, action: Optional[str], error: FakeSQSError, times: int):
+        self.action = action
+        self.error = error
+        self.times = times
+
+
+class FakeSQSServer:
+    """Serves the SQS API on `bind_host` and `port`, a free port by default:
+
+        async with FakeSQSServer() as server:
+            queue_url = server.create_queue("queue")
+            async with server.client() as client:
+                await client.send_message(queue_url=queue_url, message_body="hello")
+
+    Requests must be signed with a key of `credentials` (access key ID -> secret access key) for `region_name`,
+    unless `verify_signature=False`. Visibility timeouts and delays use `clock`, which can be replaced in tests.
+    `app` can also be served with `aiohttp.test_utils.TestServer`.
+    """
+
+    def __init__(
+        self,
+        credentials: Optional[Dict[str, str]] = None,
+        region_name: str = "us-west-2",
+        account_id: str = DEFAULT_ACCOUNT_ID,
+        bind_host: str = "127.0.0.1",
+        port: int = 0,
+        verify_signature: bool = True,
+        max_clock_skew_sec: float = 5 * 60,
+        max_message_size: int = MAX_MESSAGE_SIZE,
+        faults: Optional[Faults] = None,
+        clock: Callable[[], float] = time.monotonic,
+        logger: Optional[LoggerType] = None,
+    ):
+        self.credentials = {DEFAULT_ACCESS_KEY_ID: DEFAULT_SECRET_ACCESS_KEY} if credentials is None else dict(credentials)
+        self.region_name = region_name
+        self.account_id = account_id
+        self.bind_host = bind_host
+        self.port = port
+        self.verify_signature = verify_signature
+        self.max_clock_skew_sec = max_clock_skew_sec
+        self.max_message_size = max_message_size
+        self.faults = faults
+        self.clock = clock
+        self.logger = logger or default_logger
+
+        self.queues: Dict[str, FakeQueue] = {}
+        # Number of requests by action, and of injected faults by kind
+        self.requests: Counter = Counter()
+        self.injected: Counter = Counter()
+        self._scripted: List[ScriptedFault] = []
+        self._runner: Optional[web.AppRunner] = None
+
+        self.app = web.Application()
+        self.app.router.add_route("*", "/", self.handle)
+        self._handlers = {
+            "GetQueueUrl": self.get_queue_url,
+            "SendMessage": self.send_message,
+            "ReceiveMessage": self.receive_message,
+            "DeleteMessage": self.delete_message,
+            "ChangeMessageVisibility": self.change_message_visibility,
+            "SendMessageBatch": self.send_message_batch,
+            "DeleteMessageBatch": self.delete_message_batch,
+            "ChangeMessageVisibilityBatch": self.change_message_visibility_batch,
+        }
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    @property
+    def host(self) -> str:
+        """The value of the "host" header, to be passed to `SQSClient`."""
+        if self._runner is None:
+            raise RuntimeError(f"{self.__class__.__name__} is not started")
+        return f"{self.bind_host}:{self.port}"
+
+    @property
+    def endpoint_url(self) -> str:
+        return f"http://{self.host}"
+
+    async def start(self):
+        if self._runner is not None:
+            raise RuntimeError(f"{self.__class__.__name__} is already started")
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.bind_host, self.port))
+        self.port = sock.getsockname()[1]
+        # Messages of GET requests are sent in the URL, so it may be longer than aiohttp accepts by default
+        self._runner = web.AppRunner(self.app, access_log=None, max_line_size=MAX_REQUEST_LINE_SIZE)
+        await self._runner.setup()
+        await web.SockSite(self._runner, sock=sock).start()
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def client(self, **kwargs) -> SQSClient:
+        """Returns a client of the server signed with the first credentials, `kwargs` are passed to `SQSClient`."""
+        aws_access_key_id, aws_secret_access_key = next(iter(self.credentials.items()))
+        options = {
+            "region_name": self.region_name,
+            "aws_access_key_id": aws_access_key_id,
+            "aws_secret_access_key": aws_secret_access_key,
+            "host": self.host,
+            "endpoint_url": self.endpoint_url,
+            **kwargs,
+        }
+        return SQSClient(**options)
+
+    def create_queue(
+        self,
+        name: str,
+        visibility_timeout: int = 30,
+        delay_seconds: int = 0,
+        receive_message_wait_time_seconds: int = 0,
+        content_based_deduplication: bool = False,
+    ) -> str:
+        """Creates the queue, or keeps the existing one, and returns its URL. Names ending with ".fifo" are FIFO queues."""
+        if name not in self.queues:
+            self.queues[name] = FakeQueue(
+                name=name,
+                account_id=self.account_id,
+                visibility_timeout=visibility_timeout,
+                delay_seconds=delay_seconds,
+                receive_message_wait_time_seconds=receive_message_wait_time_seconds,
+                content_based_deduplication=content_based_deduplication,
+                clock=self.clock,
+            )
+        return f"{self.endpoint_url}/{self.account_id}/{name}"
+
+    def queue(self, name: str) -> FakeQueue:
+        return self.queues[name]
+
+    def fail_next(
+        self, code: str = "InternalError", message: str = "Injected error", status: int = 500, action: Optional[str] = None, times: int = 1
+    ):
+        """The next `times` requests of the action, or of any action, fail with the error."""
+        error_type = "Receiver" if status >= 500 else "Sender"
+        error = FakeSQSError(code=code, message=message, status=status, error_type=error_type)
+        self._scripted.append(ScriptedFault(action=action, error=error, times=times))
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        request_id = str(uuid.uuid4())
+        target = request.headers.get("x-amz-target")
+        protocol = "query" if target is None else "json"
+        try:
+            body = await request.read()
+            if target is None:
+                action, payload = self.parse_query_request(request=request, body=body)
+            else:
+                action, payload = self.parse_json_request(target=target, body=body)
+            self.requests[action] += 1
+
+            faults = self.faults if self.faults and self.faults.applies(action) else None
+            if faults and (latency := faults.latency()) > 0:
+                await asyncio.sleep(latency)
+            if faults and faults.disconnected():
+                self.injected["disconnect"] += 1
+                if request.transport:
+                    request.transport.close()
+                return web.Response(status=500)
+
+            if self.verify_signature:
+                self.check_signature(request=request, body=body)
+            self.inject_error(action=action, faults=faults)
+
+            if (handler := self._handlers.get(action)) is None:
+                raise FakeSQSError(code="InvalidAction", message=f"The action {action} is not valid for this endpoint.")
+            result = await handler(payload, request)
+        except FakeSQSError as e:
+            return self.render_error(protocol=protocol, error=e, request_id=request_id)
+
+        if protocol == "json":
+            return web.Response(
+                body=json.dumps(result or {}).encode("utf-8"),
+                content_type=json_protocol.CONTENT_TYPE,
+                headers={"x-amzn-RequestId": request_id},
+            )
+        return web.Response(
+            body=render_xml(action=action, result=result, request_id=request_id).encode("utf-8"),
+            content_type="text/xml",
+        )
+
+    def parse_query_request(self, request: web.Request, body: bytes) -> Tuple[str, Dict]:
+        # Parameters of POST requests are form-encoded in the body
+        raw = request.rel_url.raw_query_string if request.method == "GET" else body.decode("utf-8")
+        params = dict(urllib.parse.parse_qsl(raw, keep_blank_values=True))
+        if not (action := params.get("Action")):
+            raise FakeSQSError(code="MissingAction", message="The request must contain the parameter Action.")
+        try:
+            return action, json_protocol.build_json_payload(params=params)
+        except (KeyError, ValueError) as e:
+            raise invalid_parameter(f"Malformed parameters: {e!r}")
+
+    def parse_json_request(self, target: str, body: bytes) -> Tuple[str, Dict]:
+        if not target.startswith(json_protocol.TARGET_PREFIX):
+            raise FakeSQSError(code="UnknownOperationException", message=f"Unknown target {target}")
+        try:
+            payload = json.loads(body) if body else {}
+        except ValueError:
+            raise FakeSQSError(code="SerializationException", message="Malformed JSON payload")
+        return target[len(json_protocol.TARGET_PREFIX) :], payload
+
+    def check_signature(self, request: web.Request, body: bytes):
+        authorization = request.headers.get("Authorization")
+        if not authorization:
+            raise FakeSQSError(code="MissingAuthenticationToken", message="Request is missing Authentication Token", status=403)
+        try:
+            algorithm, fields = authorization.split(" ", 1)
+            parts = dict(field.strip().split("=", 1) for field in fields.split(","))
+            access_key_id, date_stamp, region_name, service_name, terminator = parts["Credential"].split("/")
+            signed_headers = parts["SignedHeaders"]
+            signature = parts["Signature"]
+        except (KeyError, ValueError):
+            raise FakeSQSError(code="IncompleteSignature", message=f"Authorization header is malformed: {authorization}", status=403)
+
+        if (secret_access_key := self.credentials.get(access_key_id)) is None:
+            raise FakeSQSError(code="InvalidClientTokenId", message="The security token included in the request is invalid.", status=403)
+
+        amz_date = request.headers.get("x-amz-date", "")
+        try:
+            signed_at = datetime.datetime.strptime(amz_date, "%Y%m%dT%H%M%SZ").replace(tzinfo=datetime.timezone.utc)
+        except ValueError:
+            raise FakeSQSError(code="IncompleteSignature", message="The x-amz-date header is missing or malformed", status=403)
+        if abs(time.time() - signed_at.timestamp()) > self.max_clock_skew_sec:
+            raise FakeSQSError(code="RequestExpired", message=f"Request has expired, signed at {amz_date}", status=400)
+
+        scope = (date_stamp, region_name, service_name, terminator)
+        if algorithm != ALGORITHM or scope != (amz_date[:8], self.region_name, SERVICE_NAME, "aws4_request"):
+            raise FakeSQSError(
+                code="SignatureDoesNotMatch", message=f"Credential should be scoped to {self.region_name}/{SERVICE_NAME}", status=403
+            )
+
+        canonical_headers = "".join(
+            f"{name}:{' '.join(','.join(request.headers.getall(name, [])).split())}\n" for name in signed_headers.split(";")
+        )
+        canonical_request = "\n".join(
+            [
+                request.method,
+                request.rel_url.raw_path,
+                canonical_querystring(request.rel_url.raw_query_string),
+                canonical_headers,
+                signed_headers,
+                sha256_bytes_hexdigest(body),
+            ]
+        )
+        string_to_sign = "\n".join([ALGORITHM, amz_date, "/".join((date_stamp, *scope[1:])), sha256_hexdigest(canonical_request)])
+        signing_key = get_signature_key(
+            aws_secret_access_key=secret_access_key,
+            date_stamp=date_stamp,
+            region_name=region_name,
+            service_name=service_name,
+        )
+        if not hmac.compare_digest(hmac_sha256_hexdigest(key=signing_key, msg=string_to_sign), signature):
+            raise FakeSQSError(
+                code="SignatureDoesNotMatch",
+                message="The request signature we calculated does not match the signature you provided.",
+                status=403,
+            )
+
+    def inject_error(self, action: str, faults: Optional[Faults]):
+        for scripted in self._scripted:
+            if scripted.action in (None, action):
+                scripted.times -= 1
+                if scripted.times <= 0:
+                    self._scripted.remove(scripted)
+                self.injected["scripted"] += 1
+                raise scripted.error
+
+        if faults and faults.throttled():
+            self.injected["throttle"] += 1
+            raise FakeSQSError(code="ThrottlingException", message="Rate exceeded")
+        if faults and faults.failed():
+            self.injected["error"] += 1
+            raise FakeSQSError(
+                code="InternalError", message="We encountered an internal error. Please try again.", status=500, error_type="Receiver"
+            )
+
+    def render_error(self, protocol: str, error: FakeSQSError, request_id: str) -> web.Response:
+        if protocol == "json":
+            body = {"__type": f"com.amazonaws.sqs#{JSON_ERROR_TYPES.get(error.code, error.code)}", "message": error.message}
+            return web.Response(
+                status=error.status,
+                body=json.dumps(body).encode("utf-8"),
+                content_type=json_protocol.CONTENT_TYPE,
+                headers={"x-amzn-RequestId": request_id, "x-amzn-query-error": f"{error.code};{error.error_type}"},
+            )
+        body = (
+            f'<?xml version="1.0"?><ErrorResponse xmlns="{XML_NAMESPACE}"><Error><Type>{error.error_type}</Type>'
+            f"<Code>{escape(error.code)}</Code><Message>{escape(error.message)}</Message><Detail/></Error>"
+            f"<RequestId>{request_id}</RequestId></ErrorResponse>"
+        )
+        return web.Response(status=error.status, body=body.encode("utf-8"), content_type="text/xml")
+
+    def get_queue(self, payload: Dict) -> FakeQueue:
+        if not (queue_url := payload.get("QueueUrl")):
+            raise missing_parameter("QueueUrl")
+        account_id, _, name = urllib.parse.urlsplit(queue_url).path.strip("/").rpartition("/")
+        if account_id != self.account_id or (queue := self.queues.get(name)) is None:
+            raise FakeSQSError(code="AWS.SimpleQueueService.NonExistentQueue", message="The specified queue does not exist.")
+        return queue
+
+    async def get_queue_url(self, payload: Dict, request: web.Request) -> Dict:
+        if not (name := payload.get("QueueName")):
+            raise missing_parameter("QueueName")
+        account_id = payload.get("QueueOwnerAWSAccountId") or self.account_id
+        if account_id != self.account_id or name not in self.queues:
+            raise FakeSQSError(code="AWS.SimpleQueueService.NonExistentQueue", message="The specified queue does not exist.")
+        return {"QueueUrl": f"{request.scheme}://{request.host}/{account_id}/{name}"}
+
+    def validate_message(self, entry: Dict) -> Tuple[str, Dict[str, Dict]]:
+        if not (body := entry.get("MessageBody")):
+            raise missing_parameter("MessageBody")
+        attributes = entry.get("MessageAttributes") or {}
+        size = len(body.encode("utf-8"))
+        for name, value in attributes.items():
+            if not value.get("DataType"):
+                raise invalid_parameter(f"The message attribute '{name}' must contain non-empty message attribute type.")
+            size += len(name) + len(value["DataType"]) + len(value.get("BinaryValue") or value.get("StringValue") or "")
+            if "StringValue" in value and INVALID_CHARACTERS.search(value["StringValue"]):
+                raise FakeSQSError(code="InvalidMessageContents", message=f"Invalid characters found in the message attribute '{name}'.")
+        if INVALID_CHARACTERS.search(body):
+            raise FakeSQSError(
+                code="InvalidMessageContents",
+                message="Invalid characters found. Valid unicode characters are #x9 | #xA | #xD | #x20 to #xD7FF | #xE000 to #xFFFD | #x10000 to #x10FFFF",
+            )
+        if size > self.max_message_size:
+            raise invalid_parameter(
+                f"One or more parameters are invalid. Reason: Message must be shorter than {self.max_message_size} bytes."
+            )
+        return body, attributes
+
+    def send(self, queue: FakeQueue, entry: Dict) -> Dict:
+        body, attributes = self.validate_message(entry)
+        delay_seconds = entry.get("DelaySeconds")
+        if delay_seconds is not None and not 0 <= delay_seconds <= MAX_DELAY_SECONDS:
+            raise invalid_parameter(
+                f"Value {delay_seconds} for parameter DelaySeconds is invalid. Reason: Must be between 0 and {MAX_DELAY_SECONDS}."
+            )
+        message = queue.send(
+            body=body,
+            attributes=attributes,
+            delay_seconds=delay_seconds,
+            group_id=entry.get("MessageGroupId"),
+            deduplication_id=entry.get("MessageDeduplicationId"),
+        )
+        result = {"MessageId": message.message_id, "MD5OfMessageBody": message.md5_of_body}
+        if message.attributes:
+            result["MD5OfMessageAttributes"] = md5_of_message_attributes(message.attributes)
+        if message.sequence_number:
+            result["SequenceNumber"] = message.sequence_number
+        return result
+
+    async def send_message(self, payload: Dict, request: web.Request) -> Dict:
+        return self.send(queue=self.get_queue(payload), entry=payload)
+
+    async def receive_message(self, payload: Dict, request: web.Request) -> Dict:
+        queue = self.get_queue(payload)
+        max_number_of_messages = payload.get("MaxNumberOfMessages", 1)
+        visibility_timeout = payload.get("VisibilityTimeout", queue.visibility_timeout)
+        wait_time_seconds = payload.get("WaitTimeSeconds", queue.receive_message_wait_time_seconds)
+        for name, value, maximum in (
+            ("MaxNumberOfMessages", max_number_of_messages, MAX_BATCH_SIZE),
+            ("VisibilityTimeout", visibility_timeout, MAX_VISIBILITY_TIMEOUT),
+            ("WaitTimeSeconds", wait_time_seconds, MAX_WAIT_TIME_SECONDS),
+        ):
+            if not 0 <= value <= maximum or (name == "MaxNumberOfMessages" and value < 1):
+                raise invalid_parameter(f"Value {value} for parameter {name} is invalid.")
+
+        # Long polling returns as soon as there are messages, waking up when they are sent or become visible
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait_time_seconds
+        while True:
+            received = queue.receive(
+                max_number_of_messages=max_number_of_messages,
+                visibility_timeout=visibility_timeout,
+                attempt_id=payload.get("ReceiveRequestAttemptId"),
+            )
+            remaining = deadline - loop.time()
+            if received or remaining <= 0:
+                break
+            if (visible_at := queue.next_visible_at()) is not None:
+                remaining = min(remaining, max(0.0, visible_at - queue.clock()) + 0.001)
+            await queue.wait(timeout=remaining)
+
+        attribute_names = set(payload.get("AttributeNames") or ()) | set(payload.get("MessageSystemAttributeNames") or ())
+        message_attribute_names = payload.get("MessageAttributeNames") or ()
+        messages = [
+            self.render_message(
+                queue=queue,
+                message=message,
+                receipt_handle=receipt_handle,
+                attribute_names=attribute_names,
+                message_attribute_names=message_attribute_names,
+            )
+            for message, receipt_handle in received
+        ]
+        return {"Messages": messages} if messages else {}
+
+    def render_message(
+        self, queue: FakeQueue, message: FakeMessage, receipt_handle: str, attribute_names: Set[str], message_attribute_names
+    ) -> Dict:
+        result = {
+            "MessageId": message.message_id,
+            "ReceiptHandle": receipt_handle,
+            "MD5OfBody": message.md5_of_body,
+            "Body": message.body,
+        }
+        if attribute_names:
+            system_attributes = {
+                "SenderId": self.account_id,
+                "SentTimestamp": str(message.sent_timestamp),
+                "ApproximateReceiveCount": str(message.receive_count),
+                "ApproximateFirstReceiveTimestamp": str(message.first_receive_timestamp),
+            }
+            if queue.fifo:
+                system_attributes["MessageGroupId"] = message.group_id
+                system_attributes["MessageDeduplicationId"] = message.deduplication_id
+                system_attributes["SequenceNumber"] = message.sequence_number
+            if "All" not in attribute_names:
+                system_attributes = {name: value for name, value in system_attributes.items() if name in attribute_names}
+            if system_attributes:
+                result["Attributes"] = system_attributes
+
+        # Message attributes are returned by names, "All", ".*" or prefixes, e.g. "trace.*"
+        attributes = {
+            name: value
+            for name, value in message.attributes.items()
+            if any(
+                pattern in ("All", ".*") or pattern == name or (pattern.endswith(".*") and name.startswith(pattern[:-1]))
+                for pattern in message_attribute_names
+            )
+        }
+        if attributes:
+            result["MD5OfMessageAttributes"] = md5_of_message_attributes(attributes)
+            result["MessageAttributes"] = attributes
+        return result
+
+    async def delete_message(self, payload: Dict, request: web.Request) -> None:
+        queue = self.get_queue(payload)
+        if not (receipt_handle := payload.get("ReceiptHandle")):
+            raise missing_parameter("ReceiptHandle")
+        queue.delete(receipt_handle=receipt_handle)
+
+    async def change_message_visibility(self, payload: Dict, request: web.Request) -> None:
+        queue = self.get_queue(payload)
+        self.change_visibility(queue=queue, entry=payload)
+
+    def change_visibility(self, queue: FakeQueue, entry: Dict):
+        if not (receipt_handle := entry.get("ReceiptHandle")):
+            raise missing_parameter("ReceiptHandle")
+        if (visibility_timeout := entry.get("VisibilityTimeout")) is None:
+            raise missing_parameter("VisibilityTimeout")
+        if not 0 <= visibility_timeout <= MAX_VISIBILITY_TIMEOUT:
+            raise invalid_parameter(f"Value {visibility_timeout} for parameter VisibilityTimeout is invalid.")
+        queue.change_visibility(receipt_handle=receipt_handle, visibility_timeout=visibility_timeout)
+
+    def batch_entries(self, payload: Dict, entry_name: str) -> List[Dict]:
+        entries = payload.get("Entries") or []
+        if not entries:
+            raise FakeSQSError(
+                code="AWS.SimpleQueueService.EmptyBatchRequest",
+                message=f"There should be at least one {entry_name} in the request.",
+            )
+        if len(entries) > MAX_BATCH_SIZE:
+            raise FakeSQSError(
+                code="AWS.SimpleQueueService.TooManyEntriesInBatchRequest",
+                message=f"Maximum number of entries per request are {MAX_BATCH_SIZE}. You have sent {len(entries)}.",
+            )
+        ids = [entry.get("Id") for entry in entries]
+        if len(set(ids)) != len(ids):
+            raise FakeSQSError(
+                code="AWS.SimpleQueueService.BatchEntryIdsNotDistinct", message="Two or more batch entries in the request have the same Id."
+            )
+        return entries
+
+    def run_batch(self, entries: List[Dict], call: Callable[[Dict], Any]) -> Dict:
+        successful = []
+        failed = []
+        for entry in entries:
+            try:
+                result = call(entry)
+            except FakeSQSError as e:
+                failed.append({"Id": entry["Id"], "SenderFault": e.error_type == "Sender", "Code": e.code, "Message": e.message})
+            else:
+                successful.append({"Id": entry["Id"], **(result or {})})
+        return {"Successful": successful, "Failed": failed}
+
+    async def send_message_batch(self, payload: Dict, request: web.Request) -> Dict:
+        queue = self.get_queue(payload)
+        entries = self.batch_entries(payload=payload, entry_name="SendMessageBatchRequestEntry")
+        size = sum(len((entry.get("MessageBody") or "").encode("utf-8")) for entry in entries)
+        if size > self.max_message_size:
+            raise FakeSQSError(
+                code="AWS.SimpleQueueService.BatchRequestTooLong",
+                message=f"Batch requests cannot be longer than {self.max_message_size} bytes.",
+            )
+        return self.run_batch(entries=entries, call=lambda entry: self.send(queue=queue, entry=entry))
+
+    async def delete_message_batch(self, payload: Dict, request: web.Request) -> Dict:
+        queue = self.get_queue(payload)
+        entries = self.batch_entries(payload=payload, entry_name="DeleteMessageBatchRequestEntry")
+
+        def delete(entry: Dict):
+            if not (receipt_handle := entry.get("ReceiptHandle")):
+                raise missing_parameter("ReceiptHandle")
+            queue.delete(receipt_handle=receipt_handle)
+
+        return self.run_batch(entries=entries, call=delete)
+
+    async def change_message_visibility_batch(self, payload: Dict, request: web.Request) -> Dict:
+        queue = self.get_queue(payload)
+        entries = self.batch_entries(payload=payload, entry_name="ChangeMessageVisibilityBatchRequestEntry")
+        return self.run_batch(entries=entries, call=lambda entry: self.change_visibility(queue=queue, entry=entry))
+
+
+def render_xml(action: str, result: Optional[Dict], request_id: str) -> str:
+    parts = [f'<?xml version="1.0"?><{action}Response xmlns="{XML_NAMESPACE}">']
+    if result is not None:
+        parts.append(f"<{action}Result>")
+        render_fields(parts=parts, action=action, fields=result)
+        parts.append(f"</{action}Result>")
+    parts.append(f"<ResponseMetadata><RequestId>{request_id}</RequestId></ResponseMetadata></{action}Response>")
+    return "".join(parts)
+
+
+def render_fields(parts: List[str], action: str, fields: Dict):
+    """Renders JSON-shaped results as Query API XML, lists and maps become repeated elements."""
+    for key, value in fields.items():
+        if key == "Messages":
+            for message in value:
+                parts.append("<Message>")
+                render_fields(parts=parts, action=action, fields=message)
+                parts.append("</Message>")
+        elif key == "Attributes":
+            for name, attribute in value.items():
+                parts.append(f"<Attribute><Name>{escape(name)}</Name><Value>{escape(attribute)}</Value></Attribute>")
+        elif key == "MessageAttributes":
+            for name, attribute in value.items():
+                parts.append(f"<MessageAttribute><Name>{escape(name)}</Name><Value>")
+                render_fields(parts=parts, action=action, fields=attribute)
+                parts.append("</Value></MessageAttribute>")
+        elif key in ("Successful", "Failed"):
+            tag = f"{action}ResultEntry" if key == "Successful" else "BatchResultErrorEntry"
+            for entry in value:
+                parts.append(f"<{tag}>")
+                render_fields(parts=parts, action=action, fields=entry)
+                parts.append(f"</{tag}>")
+        elif isinstance(value, bool):
+            parts.append(f"<{key}>{'true' if value else 'false'}</{key}>")
+        else:
+            parts.append(f"<{key}>{escape(str(value))}</{key}>")
@@ -0,0 +1,284 @@
+"""
+Consuming FIFO queues in parallel without breaking the order of messages of a message group.
+
+Every message group is assigned to one worker by consistent hashing. A worker keeps a lane of prefetched messages
+for every group assigned to it and takes one message of every group in turn, so messages of a group are handled
+one by one in the order they were received, while different groups are handled in parallel by different workers.
+
+Visibility timeouts of messages waiting in a lane are extended, so a slow handler of one group doesn't make
+prefetched messages of other groups of the same worker expire.
+
+When a message can't be handled, its visibility timeout is set to `nack_visibility_timeout` and the rest of
+its group lane is returned to the queue. SQS doesn't deliver messages of a group while a message of the group is
+in flight, so the group is delivered again in order starting with the failed message, and only this group waits.
+"""
+import asyncio
+import bisect
+import hashlib
+import uuid
+from collections import deque
+from typing import Deque, Dict, List, Optional, Sequence, Set
+
+from aiosqs.acker import Acker, VisibilityChanger
+from aiosqs.client import SQSClient
+from aiosqs.consumer import FAILED, Consumer, Handler, PrefetchedMessage
+from aiosqs.dedup import Deduplicator
+from aiosqs.lease import Lease, LeaseManager
+from aiosqs.polling import PollController, PollParams
+from aiosqs.types import LoggerType, Message
+
+GROUP_ID_ATTRIBUTE = "MessageGroupId"
+
+
+def hash_key(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent hashing of keys to nodes, every node has `virtual_nodes` points on the ring.
+    When a node is added or removed, only keys of that node move to other nodes.
+    """
+
+    def __init__(self, nodes: Sequence[int], virtual_nodes: int = 100):
+        if not nodes:
+            raise ValueError("Hash ring must have at least one node")
+        points = sorted((hash_key(f"{node}:{replica}"), node) for node in nodes for replica in range(virtual_nodes))
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node(self, key: str) -> int:
+        index = bisect.bisect(self._hashes, hash_key(key))
+        return self._nodes[index % len(self._nodes)]
+
+
+class LaneMessage(PrefetchedMessage):
+    __slots__ = ("lease",)
+
+    def __init__(self, message: Message, deadline: float, lease: Lease):
+        super().__init__(message=message, deadline=deadline)
+        # Extends the visibility timeout while the message waits in its lane
+        self.lease = lease
+
+
+class WorkerLanes:
+    __slots__ = ("groups", "ready", "changed")
+
+    def __init__(self):
+        # Prefetched messages by group, a group being handled stays here until its lane is empty
+        self.groups: Dict[str, Deque[LaneMessage]] = {}
+        # Groups with prefetched messages which are not being handled, in the order they take turns
+        self.ready: Deque[str] = deque()
+        self.changed = asyncio.Event()
+
+
+class FifoConsumer(Consumer):
+    """`Consumer` of a FIFO queue which keeps the order of messages within every message group.
+
+    A lane of a group holds at most `max_group_backlog` messages, messages over it are returned to the queue
+    with `release_visibility_timeout` and delivered again when the lane has been handled.
+    Visibility timeouts of messages in lanes are extended by `lease_manager`, or by an own lease manager
+    with `visibility_timeout` which is closed on shutdown.
+    Returned messages are batched by a `VisibilityChanger` which is closed on shutdown.
+    The prefetch buffer of all lanes is bounded by `prefetch`, the same as in `Consumer`.
+
+    Receives of FIFO queues have an attempt ID, so when a receive is retried by the retry policy of the client,
+    SQS returns the same messages instead of locking their groups until the visibility timeout.
+    """
+
+    def __init__(
+        self,
+        client: SQSClient,
+        queue_url: str,
+        handler: Handler,
+        workers: int = 10,
+        prefetch: int = 10,
+        fetchers: int = 1,
+        visibility_timeout: int = 30,
+        wait_time_seconds: int = 20,
+        nack_visibility_timeout: Optional[int] = 0,
+        acker: Optional[Acker] = None,
+        lease_manager: Optional[LeaseManager] = None,
+        error_delay_sec: float = 1,
+        poll_controller: Optional[PollController] = None,
+        deduplicator: Optional[Deduplicator] = None,
+        max_group_backlog: int = 10,
+        release_visibility_timeout: int = 0,
+        virtual_nodes: int = 100,
+        logger: Optional[LoggerType] = None,
+    ):
+        super().__init__(
+            client=client,
+            queue_url=queue_url,
+            handler=handler,
+            workers=workers,
+            prefetch=prefetch,
+            fetchers=fetchers,
+            visibility_timeout=visibility_timeout,
+            wait_time_seconds=wait_time_seconds,
+            nack_visibility_timeout=nack_visibility_timeout,
+            acker=acker,
+            lease_manager=lease_manager,
+            error_delay_sec=error_delay_sec,
+            poll_controller=poll_controller,
+            deduplicator=deduplicator,
+            logger=logger,
+        )
+        if max_group_backlog < 1:
+            raise ValueError("Group backlog must be at least 1 message")
+        self.max_group_backlog = max_group_backlog
+        self.release_visibility_timeout = release_visibility_timeout
+        self.ring = HashRing(nodes=range(self.workers), virtual_nodes=virtual_nodes)
+
+        self._lanes: List[WorkerLanes] = []
+        self._draining = False
+        self._visibility_changer: Optional[VisibilityChanger] = None
+        self._lane_leases: Optional[LeaseManager] = None
+        self._owns_lane_leases = False
+        # Submissions of released messages to the visibility changer
+        self._release_tasks: Set[asyncio.Task] = set()
+
+    @property
+    def buffered(self) -> int:
+        return sum(len(lane) for lanes in self._lanes for lane in lanes.groups.values())
+
+    @property
+    def groups(self) -> int:
+        """Number of message groups with prefetched messages or messages being handled."""
+        return sum(len(lanes.groups) for lanes in self._lanes)
+
+    def worker_of(self, group_id: str) -> int:
+        return self.ring.node(group_id)
+
+    def _setup(self):
+        super()._setup()
+        self._visibility_changer = VisibilityChanger(client=self.client, logger=self.logger)
+        if self.lease_manager is not None:
+            self._lane_leases = self.lease_manager
+        else:
+            extend_before_sec = min(5, self.visibility_timeout / 2)
+            self._lane_leases = LeaseManager(
+                client=self.client,
+                visibility_timeout=self.visibility_timeout,
+                extend_before_sec=extend_before_sec,
+                logger=self.logger,
+            )
+            self._lane_leases.start()
+            self._owns_lane_leases = True
+
+    def _start_workers(self) -> List[asyncio.Task]:
+        self._draining = False
+        self._lanes = [WorkerLanes() for _ in range(self.workers)]
+        return [asyncio.ensure_future(self._work_lanes(lanes)) for lanes in self._lanes]
+
+    async def _stop_workers(self):
+        # Workers exit when their lanes are empty
+        self._draining = True
+        for lanes in self._lanes:
+            lanes.changed.set()
+
+    async def shutdown(self):
+        await super().shutdown()
+        await asyncio.gather(*self._release_tasks, return_exceptions=True)
+        if self._visibility_changer:
+            await self._visibility_changer.close()
+            self._visibility_changer = None
+        if self._owns_lane_leases:
+            await self._lane_leases.close()
+            self._owns_lane_leases = False
+        self._lane_leases = None
+
+    async def receive(self, max_number_of_messages: int, params: Optional[PollParams] = None) -> List[Message]:
+        params = params or self.poll_params()
+        messages = await self.client.receive_message(
+            queue_url=self.queue_url,
+            max_number_of_messages=max_number_of_messages,
+            visibility_timeout=params.visibility_timeout,
+            wait_time_seconds=params.wait_time_seconds,
+            attribute_names=[GROUP_ID_ATTRIBUTE],
+            receive_request_attempt_id=uuid.uuid4().hex,
+        )
+        return messages or []
+
+    def _enqueue(self, messages: List[Message], deadline: float) -> int:
+        buffered = 0
+        released: List[Message] = []
+        # Once a message of a group is released, the following messages of the group must be released too
+        released_groups: Set[str] = set()
+        for message in messages:
+            group_id = (message.get("Attributes") or {}).get(GROUP_ID_ATTRIBUTE, "")
+            lanes = self._lanes[self.worker_of(group_id)]
+            lane = lanes.groups.get(group_id)
+            if group_id in released_groups or (lane is not None and len(lane) >= self.max_group_backlog):
+                released_groups.add(group_id)
+                released.append(message)
+                continue
+            if lane is None:
+                lane = lanes.groups[group_id] = deque()
+                lanes.ready.append(group_id)
+            lease = self._lane_leases.track(queue_url=self.queue_url, receipt_handle=message["ReceiptHandle"], deadline=deadline)
+            lane.append(LaneMessage(message=message, deadline=deadline, lease=lease))
+            lanes.changed.set()
+            buffered += 1
+
+        if released:
+            self.logger.warning("Backlog of groups %s is full, returning %s messages to the queue", sorted(released_groups), len(released))
+            self._release_messages(messages=released)
+        return buffered
+
+    async def _work_lanes(self, lanes: WorkerLanes):
+        while True:
+            while not lanes.ready:
+                if self._draining:
+                    return
+                lanes.changed.clear()
+                await lanes.changed.wait()
+
+            group_id = lanes.ready.popleft()
+            lane = lanes.groups[group_id]
+            prefetched = lane.popleft()
+            await self._release(1)
+            self._stop_lease(prefetched)
+
+            if self.is_expired(prefetched):
+                # The message may be delivered to another consumer, later messages of the group must wait for it
+                await self._release_group(lanes=lanes, group_id=group_id)
+                continue
+
+            # A duplicate of a message being handled elsewhere is left in flight, the group goes on
+            if await self._handle(queue_url=self.queue_url, handler=self.handler, prefetched=prefetched) == FAILED:
+                await self._release_group(lanes=lanes, group_id=group_id)
+                continue
+
+            if lane:
+                lanes.ready.append(group_id)
+            else:
+                del lanes.groups[group_id]
+
+    async def _release_group(self, lanes: WorkerLanes, group_id: str):
+        """Returns prefetched messages of the group to the queue, they are delivered again after the failed one."""
+        lane = lanes.groups.pop(group_id)
+        if not lane:
+            return
+        for prefetched in lane:
+            self._stop_lease(prefetched)
+        await self._release(len(lane))
+        self._release_messages(messages=[prefetched.message for prefetched in lane])
+
+    def _stop_lease(self, prefetched: LaneMessage):
+        """Stops extending the visibility timeout of a message taken out of its lane."""
+        self._lane_leases.release(receipt_handle=prefetched.message["ReceiptHandle"])
+        # The message expires when its last extension does
+        prefetched.deadline = prefetched.lease.deadline
+
+    def _release_messages(self, messages: List[Message]):
+        task = asyncio.ensure_future(self._submit_releases(messages=messages))
+        self._release_tasks.add(task)
+        task.add_done_callback(self._release_tasks.discard)
+
+    async def _submit_releases(self, messages: List[Message]):
+        for message in messages:
+            await self._visibility_changer.release(
+                queue_url=self.queue_url,
+                receipt_handle=message["ReceiptHandle"],
+                visibility_timeout=self.release_visibility_timeout,
+            )
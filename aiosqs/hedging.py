@@ -0,0 +1,173 @@
+"""
+Hedged requests: if an idempotent request hasn't completed after the observed latency quantile of its action
+(p95 by default), the same request is sent again and the first successful response is used.
+The slower request is not cancelled, it completes in the background, so the latency saved by the hedge is measured.
+
+https://research.google/pubs/the-tail-at-scale/
+"""
+import asyncio
+import time
+from collections import deque
+from logging import getLogger
+from typing import Awaitable, Callable, Deque, Dict, Optional, Set, TypeVar
+
+from aiosqs.types import HedgeStats, LoggerType
+
+default_logger = getLogger(__name__)
+
+T = TypeVar("T")
+
+# Actions which can be sent twice without side effects
+IDEMPOTENT_ACTIONS = {
+    "GetQueueUrl",
+    "DeleteMessage",
+    "DeleteMessageBatch",
+}
+
+
+class LatencyTracker:
+    """Latencies of the last `window` successful requests of one action.
+    The quantile is recomputed after every `window // 10` new samples, not on every request.
+    """
+
+    def __init__(self, quantile: float, window: int = 1000, min_samples: int = 20):
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.samples: Deque[float] = deque(maxlen=window)
+        self._refresh_every = max(1, window // 10)
+        self._new_samples = 0
+        self._value: Optional[float] = None
+
+    def add(self, latency: float):
+        self.samples.append(latency)
+        self._new_samples += 1
+        if self._value is None or self._new_samples >= self._refresh_every:
+            self._refresh()
+
+    def value(self) -> Optional[float]:
+        """The latency quantile, None until there are enough samples."""
+        if len(self.samples) < self.min_samples:
+            return None
+        return self._value
+
+    def _refresh(self):
+        self._new_samples = 0
+        ordered = sorted(self.samples)
+        self._value = ordered[min(len(ordered) - 1, int(len(ordered) * self.quantile))]
+
+
+class HedgingPolicy:
+    """Hedges requests of idempotent actions, and ReceiveMessage with a ReceiveRequestAttemptId.
+    At most `max_hedge_ratio` of requests are hedged, so hedging doesn't double the load when the service is slow.
+    """
+
+    def __init__(
+        self,
+        quantile: float = 0.95,
+        min_delay_sec: float = 0.005,
+        max_hedge_ratio: float = 0.1,
+        window: int = 1000,
+        min_samples: int = 20,
+        logger: Optional[LoggerType] = None,
+    ):
+        self.quantile = quantile
+        self.min_delay_sec = min_delay_sec
+        self.max_hedge_ratio = max_hedge_ratio
+        self.window = window
+        self.min_samples = min_samples
+        self.logger = logger or default_logger
+
+        self._trackers: Dict[str, LatencyTracker] = {}
+        self._background: Set[asyncio.Task] = set()
+
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.saved_sec = 0.0
+
+    def can_hedge(self, params: Dict) -> bool:
+        action = params["Action"]
+        if action == "ReceiveMessage":
+            # Only FIFO receives with the same attempt ID return the same messages
+            return "ReceiveRequestAttemptId" in params
+        return action in IDEMPOTENT_ACTIONS
+
+    def tracker(self, action: str) -> LatencyTracker:
+        if (tracker := self._trackers.get(action)) is None:
+            tracker = self._trackers[action] = LatencyTracker(quantile=self.quantile, window=self.window, min_samples=self.min_samples)
+        return tracker
+
+    def stats(self) -> HedgeStats:
+        return {
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "hedge_rate": self.hedged / self.requests if self.requests else 0.0,
+            "hedge_wins": self.hedge_wins,
+            "saved_sec": self.saved_sec,
+        }
+
+    async def close(self):
+        """Cancels slower requests which are still running in the background."""
+        for task in self._background:
+            task.cancel()
+        await asyncio.gather(*self._background, return_exceptions=True)
+
+    async def call(self, action: str, func: Callable[[], Awaitable[T]]) -> T:
+        self.requests += 1
+        tracker = self.tracker(action)
+        delay = tracker.value()
+        if delay is None or self.hedged >= self.requests * self.max_hedge_ratio:
+            return await self._timed(tracker, func)
+
+        primary = asyncio.ensure_future(self._timed(tracker, func))
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=max(delay, self.min_delay_sec))
+            if done:
+                return primary.result()
+
+            self.hedged += 1
+            hedge = asyncio.ensure_future(self._timed(tracker, func))
+            pending.add(hedge)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedge_wins += 1
+                        self._finish_in_background(pending=pending, primary=primary)
+                        pending = set()
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _timed(self, tracker: LatencyTracker, func: Callable[[], Awaitable[T]]) -> T:
+        started_at = time.monotonic()
+        result = await func()
+        tracker.add(time.monotonic() - started_at)
+        return result
+
+    def _finish_in_background(self, pending: Set[asyncio.Task], primary: asyncio.Task):
+        """The request which lost the race completes in the background. When the hedge has won,
+        the latency it saved is known once the primary request completes.
+        """
+        won_at = time.monotonic()
+
+        def add_saved(task: asyncio.Task):
+            if not task.cancelled():
+                self.saved_sec += time.monotonic() - won_at
+
+        for task in pending:
+            if task is primary:
+                task.add_done_callback(add_saved)
+            self._background.add(task)
+            task.add_done_callback(self._background_done)
+
+    def _background_done(self, task: asyncio.Task):
+        self._background.discard(task)
+        if not task.cancelled() and task.exception():
+            self.logger.debug("Hedged request failed in the background: %r", task.exception())
@@ -0,0 +1,294 @@
+"""
+Request hooks are called with the metrics of every attempt of `SQSClient.request`: retries and hedged requests
+are reported separately. Without hooks the client doesn't measure anything.
+
+- `HistogramAggregator` keeps latency histograms, byte counters and error counts per action in process.
+- `PrometheusHook` and `OpenTelemetryHook` export the same metrics, they need prometheus_client
+  and opentelemetry-api installed.
+"""
+import bisect
+import time
+from logging import getLogger
+from typing import Callable, Dict, Optional, Sequence
+
+import aiohttp
+
+from aiosqs.types import HistogramSnapshot, LoggerType
+
+try:
+    import prometheus_client
+except ImportError:
+    prometheus_client = None
+
+try:
+    from opentelemetry import metrics as otel_metrics, trace as otel_trace
+except ImportError:
+    otel_metrics = None
+    otel_trace = None
+
+default_logger = getLogger(__name__)
+
+# Phases of a request, in seconds:
+# - sign: serialization of parameters and the signature, serialize is its first part
+# - pool_wait: waiting for a free connection of the pool, measured only when the client owns the session
+# - connect: opening a new connection, including DNS and TLS, measured only when the client owns the session
+# - send: from sending the request to the response headers, including pool_wait and connect
+# - read: reading the response body
+# - parse: parsing the response
+# - total: the whole attempt
+PHASES = ("serialize", "sign", "pool_wait", "connect", "send", "read", "parse", "total")
+
+# Upper bounds of histogram buckets in seconds, the last bucket is unbounded
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class RequestMetrics:
+    """Metrics of one attempt of a request. Phases which didn't happen, e.g. after a connection error, are None."""
+
+    __slots__ = (
+        "action",
+        "started_at",
+        "status_code",
+        "error_code",
+        "bytes_sent",
+        "bytes_received",
+    ) + tuple(f"{phase}_sec" for phase in PHASES)
+
+    def __init__(self, action: str, started_at: float):
+        self.action = action
+        # Wall-clock time of the start, for tracing
+        self.started_at = started_at
+        self.status_code: Optional[int] = None
+        # The error code of an API error, or the exception name of other errors
+        self.error_code: Optional[str] = None
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        for phase in PHASES:
+            setattr(self, f"{phase}_sec", None)
+
+    def phases(self) -> Dict[str, float]:
+        """Durations of the phases which happened."""
+        return {phase: value for phase in PHASES if (value := getattr(self, f"{phase}_sec")) is not None}
+
+    def __repr__(self) -> str:
+        return f"RequestMetrics(action={self.action!r}, status_code={self.status_code}, error_code={self.error_code!r}, {self.phases()})"
+
+
+RequestHook = Callable[[RequestMetrics], None]
+
+
+def emit(hooks: Sequence[RequestHook], metrics: RequestMetrics, logger: LoggerType):
+    """A failing hook doesn't fail the request."""
+    for hook in hooks:
+        try:
+            hook(metrics)
+        except Exception as e:
+            logger.error("Request hook %r failed: %r", hook, e)
+
+
+class Histogram:
+    """Counts of values in fixed buckets. Quantiles are estimated as upper bounds of buckets."""
+
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def add(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= rank and count:
+                return self.buckets[index] if index < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def snapshot(self) -> HistogramSnapshot:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip(self.buckets + (float("inf"),), self.counts)),
+        }
+
+
+class ActionStats:
+    __slots__ = ("requests", "errors", "bytes_sent", "bytes_received", "phases")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors: Dict[str, int] = {}
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.phases: Dict[str, Histogram] = {}
+
+
+class HistogramAggregator:
+    """In-process request metrics per action. Use `snapshot()` to read them, e.g. for a status endpoint."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.actions: Dict[str, ActionStats] = {}
+
+    def __call__(self, metrics: RequestMetrics):
+        if (stats := self.actions.get(metrics.action)) is None:
+            stats = self.actions[metrics.action] = ActionStats()
+        stats.requests += 1
+        if metrics.error_code:
+            stats.errors[metrics.error_code] = stats.errors.get(metrics.error_code, 0) + 1
+        stats.bytes_sent += metrics.bytes_sent
+        stats.bytes_received += metrics.bytes_received
+        for phase, value in metrics.phases().items():
+            if (histogram := stats.phases.get(phase)) is None:
+                histogram = stats.phases[phase] = Histogram(buckets=self.buckets)
+            histogram.add(value)
+
+    def histogram(self, action: str, phase: str = "total") -> Optional[Histogram]:
+        if stats := self.actions.get(action):
+            return stats.phases.get(phase)
+        return None
+
+    def snapshot(self) -> Dict[str, Dict]:
+        return {
+            action: {
+                "requests": stats.requests,
+                "errors": dict(stats.errors),
+                "bytes_sent": stats.bytes_sent,
+                "bytes_received": stats.bytes_received,
+                "latency": {phase: histogram.snapshot() for phase, histogram in stats.phases.items()},
+            }
+            for action, stats in self.actions.items()
+        }
+
+    def reset(self):
+        self.actions.clear()
+
+
+class PrometheusHook:
+    """Exports request metrics with prometheus_client:
+    - `{namespace}_request_duration_seconds` histogram by action and phase
+    - `{namespace}_requests_total` counter by action and outcome, the error code or "ok"
+    - `{namespace}_request_bytes_total` and `{namespace}_response_bytes_total` counters by action
+    """
+
+    def __init__(self, namespace: str = "aiosqs", registry=None, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        if prometheus_client is None:
+            raise RuntimeError("prometheus_client is not installed")
+        registry = registry or prometheus_client.REGISTRY
+        self.duration = prometheus_client.Histogram(
+            name="request_duration_seconds",
+            documentation="Duration of SQS request phases",
+            labelnames=("action", "phase"),
+            namespace=namespace,
+            buckets=buckets,
+            registry=registry,
+        )
+        self.requests = prometheus_client.Counter(
+            name="requests_total",
+            documentation="SQS requests by outcome",
+            labelnames=("action", "outcome"),
+            namespace=namespace,
+            registry=registry,
+        )
+        self.bytes_sent = prometheus_client.Counter(
+            name="request_bytes_total",
+            documentation="Bytes of SQS requests",
+            labelnames=("action",),
+            namespace=namespace,
+            registry=registry,
+        )
+        self.bytes_received = prometheus_client.Counter(
+            name="response_bytes_total",
+            documentation="Bytes of SQS responses",
+            labelnames=("action",),
+            namespace=namespace,
+            registry=registry,
+        )
+
+    def __call__(self, metrics: RequestMetrics):
+        action = metrics.action
+        for phase, value in metrics.phases().items():
+            self.duration.labels(action, phase).observe(value)
+        self.requests.labels(action, metrics.error_code or "ok").inc()
+        self.bytes_sent.labels(action).inc(metrics.bytes_sent)
+        self.bytes_received.labels(action).inc(metrics.bytes_received)
+
+
+class OpenTelemetryHook:
+    """Records a client span per attempt with the phases as attributes, and the same metrics as `PrometheusHook`.
+    The span is recorded when the attempt completes, with its real start and end time.
+    """
+
+    def __init__(self, tracer_provider=None, meter_provider=None, logger: Optional[LoggerType] = None):
+        if otel_trace is None:
+            raise RuntimeError("opentelemetry-api is not installed")
+        self.logger = logger or default_logger
+        self.tracer = otel_trace.get_tracer(__name__, tracer_provider=tracer_provider)
+        meter = otel_metrics.get_meter(__name__, meter_provider=meter_provider)
+        self.duration = meter.create_histogram(name="aiosqs.request.duration", unit="s", description="Duration of SQS request phases")
+        self.bytes_sent = meter.create_counter(name="aiosqs.request.size", unit="By", description="Bytes of SQS requests")
+        self.bytes_received = meter.create_counter(name="aiosqs.response.size", unit="By", description="Bytes of SQS responses")
+
+    def __call__(self, metrics: RequestMetrics):
+        phases = metrics.phases()
+        attributes: Dict[str, object] = {
+            "rpc.system": "aws-api",
+            "rpc.service": "SQS",
+            "rpc.method": metrics.action,
+        }
+        if metrics.status_code is not None:
+            attributes["http.response.status_code"] = metrics.status_code
+        if metrics.error_code:
+            attributes["error.type"] = metrics.error_code
+
+        started_at_ns = int(metrics.started_at * 1e9)
+        span = self.tracer.start_span(
+            name=f"SQS.{metrics.action}",
+            kind=otel_trace.SpanKind.CLIENT,
+            start_time=started_at_ns,
+            attributes={**attributes, **{f"aiosqs.{phase}_sec": value for phase, value in phases.items()}},
+        )
+        if metrics.error_code:
+            span.set_status(otel_trace.Status(otel_trace.StatusCode.ERROR, metrics.error_code))
+        span.end(end_time=started_at_ns + int(phases.get("total", 0) * 1e9))
+
+        for phase, value in phases.items():
+            self.duration.record(value, attributes={**attributes, "aiosqs.phase": phase})
+        self.bytes_sent.add(metrics.bytes_sent, attributes=attributes)
+        self.bytes_received.add(metrics.bytes_received, attributes=attributes)
+
+
+def pool_trace_config() -> aiohttp.TraceConfig:
+    """Measures pool_wait and connect of requests sent with a RequestMetrics as `trace_request_ctx`."""
+    trace_config = aiohttp.TraceConfig()
+
+    def measure(attribute: str, start: bool):
+        async def callback(session, context, params):
+            metrics = context.trace_request_ctx
+            if not isinstance(metrics, RequestMetrics):
+                return
+            now = time.perf_counter()
+            if start:
+                setattr(context, attribute, now)
+            elif (started_at := getattr(context, attribute, None)) is not None:
+                setattr(metrics, attribute, now - started_at)
+
+        return callback
+
+    trace_config.on_connection_queued_start.append(measure("pool_wait_sec", start=True))
+    trace_config.on_connection_queued_end.append(measure("pool_wait_sec", start=False))
+    trace_config.on_connection_create_start.append(measure("connect_sec", start=True))
+    trace_config.on_connection_create_end.append(measure("connect_sec", start=False))
+    return trace_config
@@ -0,0 +1,169 @@
+"""
+Amazon SQS JSON protocol (AWS JSON 1.0):
+https://docs.aws.amazon.com/AWSSimpleQueueService/latest/SQSDeveloperGuide/sqs-json-faqs.html
+
+Requests are built from the same parameters as Query API requests, responses are returned in the same shapes
+as `parse_xml_result_response` returns them.
+"""
+from logging import getLogger
+from typing import Any, Dict, Optional, Union
+
+from aiosqs.attributes import MessageAttributes
+from aiosqs.exceptions import ErrorData, SQSErrorResponse
+from aiosqs.parser import log_response
+from aiosqs.speedups import json_dumps, json_loads
+from aiosqs.types import LoggerType
+
+default_logger = getLogger(__name__)
+
+CONTENT_TYPE = "application/x-amz-json-1.0"
+TARGET_PREFIX = "AmazonSQS."
+
+# Query API parameters which are sent as strings, but typed as numbers in JSON
+INTEGER_PARAMS = {
+    "DelaySeconds",
+    "MaxNumberOfMessages",
+    "VisibilityTimeout",
+    "WaitTimeSeconds",
+}
+
+# Indexed Query API parameters, e.g. "SendMessageBatchRequestEntry.1.Id" or "AttributeName.1",
+# and their names of lists in JSON
+LIST_PARAMS = {
+    "SendMessageBatchRequestEntry": "Entries",
+    "DeleteMessageBatchRequestEntry": "Entries",
+    "ChangeMessageVisibilityBatchRequestEntry": "Entries",
+    "AttributeName": "AttributeNames",
+    "MessageAttributeName": "MessageAttributeNames",
+}
+
+# Indexed Query API parameters of Name and Value pairs, e.g. "MessageAttribute.1.Name", and their names of maps in JSON
+MAP_PARAMS = {
+    "MessageAttribute": "MessageAttributes",
+}
+
+# Query API parameters which are not a part of the JSON payload
+SKIP_PARAMS = {
+    "Action",
+    "Version",
+}
+
+# Actions which return a list of objects, by the key of the list
+LIST_RESULTS = {
+    "ReceiveMessage": "Messages",
+}
+
+
+def build_json_payload(params: Dict) -> Dict:
+    """Converts flat Query API parameters to the nested JSON payload, e.g.
+    {"SendMessageBatchRequestEntry.1.MessageAttribute.1.Name": "city", ...}
+    -> {"Entries": [{"MessageAttributes": {"city": {...}}}]}
+    """
+    # Parameters split by dots, e.g. {"SendMessageBatchRequestEntry": {"1": {"Id": "1"}}}
+    tree: Dict[str, Any] = {}
+    for key, value in params.items():
+        if key in SKIP_PARAMS:
+            continue
+        *path, field = key.split(".")
+        node = tree
+        for part in path:
+            node = node.setdefault(part, {})
+        node[field] = value
+    return convert_tree(tree)
+
+
+def convert_tree(tree: Dict[str, Any]) -> Dict:
+    payload = {}
+    for key, value in tree.items():
+        if key in LIST_PARAMS:
+            payload[LIST_PARAMS[key]] = [convert_value(value[index]) for index in sorted(value, key=int)]
+        elif key in MAP_PARAMS:
+            items = (value[index] for index in sorted(value, key=int))
+            payload[MAP_PARAMS[key]] = {item["Name"]: convert_value(item["Value"]) for item in items}
+        elif key in INTEGER_PARAMS:
+            payload[key] = int(value)
+        else:
+            payload[key] = convert_value(value)
+    return payload
+
+
+def convert_value(value: Any) -> Any:
+    # Encoded message bodies may be passed as bytes
+    if isinstance(value, dict):
+        return convert_tree(value)
+    if isinstance(value, bytes):
+        return value.decode("utf-8")
+    return value
+
+
+def encode_json_request(params: Dict) -> bytes:
+    return json_dumps(build_json_payload(params=params))
+
+
+def parse_error(body: Dict, query_error: Optional[str] = None) -> ErrorData:
+    """Error code and type of the Query API are passed in the header for backward compatibility,
+    e.g. "x-amzn-query-error: AWS.SimpleQueueService.NonExistentQueue;Sender".
+    The `__type` field contains the JSON error name, e.g. "com.amazonaws.sqs#QueueDoesNotExist".
+    """
+    if query_error and ";" in query_error:
+        code, error_type = query_error.split(";", 1)
+    else:
+        code = body["__type"].rsplit("#", 1)[-1]
+        error_type = "Sender"
+    return ErrorData(
+        type=error_type,
+        code=code,
+        message=body.get("message") or body.get("Message"),
+    )
+
+
+def wrap_message_attributes(message: Dict):
+    """Message attributes are decoded on first access, the same as in XML responses:
+    {"city": {"DataType": "String", "StringValue": "Any City"}} -> MessageAttributes({"city": ("String", "Any City")})
+    """
+    if attributes := message.get("MessageAttributes"):
+        message["MessageAttributes"] = MessageAttributes(
+            {
+                name: (value["DataType"], value["BinaryValue"] if "BinaryValue" in value else value.get("StringValue"))
+                for name, value in attributes.items()
+            }
+        )
+    elif "MessageAttributes" in message:
+        del message["MessageAttributes"]
+
+
+def parse_json_result_response(
+    action: str,
+    body: Union[str, bytes],
+    query_error: Optional[str] = None,
+    request_id: Optional[str] = None,
+    logger: Optional[LoggerType] = None,
+):
+    logger = logger or default_logger
+    log_response(logger=logger, action=action, body=body)
+
+    data = json_loads(body) if body else {}
+
+    if "__type" in data:
+        raise SQSErrorResponse(
+            error=parse_error(body=data, query_error=query_error),
+            request_id=request_id,
+        )
+
+    # Successful and failed entries of batch actions
+    if action.endswith("Batch"):
+        return {
+            "Successful": data.get("Successful", []),
+            "Failed": data.get("Failed", []),
+        }
+
+    # Response is a list of objects of the same type
+    if key := LIST_RESULTS.get(action):
+        items = data.get(key) or None
+        if items and action == "ReceiveMessage":
+            for message in items:
+                wrap_message_attributes(message=message)
+        return items
+
+    # Response is 1 object, or no response result
+    return data or None
@@ -0,0 +1,183 @@
+import asyncio
+import heapq
+import itertools
+import time
+from logging import getLogger
+from typing import Dict, List, Optional, Tuple
+
+from aiosqs.client import SQSClient
+from aiosqs.types import LoggerType
+
+default_logger = getLogger(__name__)
+
+
+class Lease:
+    __slots__ = ("queue_url", "receipt_handle", "deadline", "expires_at", "released")
+
+    def __init__(self, queue_url: str, receipt_handle: str, deadline: float, expires_at: float):
+        self.queue_url = queue_url
+        self.receipt_handle = receipt_handle
+        # Monotonic time when the visibility timeout of the message expires
+        self.deadline = deadline
+        # Monotonic time after which the visibility timeout is not extended anymore
+        self.expires_at = expires_at
+        self.released = False
+
+
+class LeaseManager:
+    """Extends visibility timeouts of messages in progress, so long-running handlers don't cause duplicate deliveries.
+
+    Leases are kept in a heap ordered by the time of the next extension, released leases are dropped lazily
+    when they reach the top of the heap. `extend_before_sec` before a lease expires, the visibility timeout is set
+    to `visibility_timeout` again. All leases due at the same time are extended with ChangeMessageVisibilityBatch
+    requests grouped by queue. Leases are not extended for longer than `max_lease_sec` since tracking has started.
+    """
+
+    def __init__(
+        self,
+        client: SQSClient,
+        visibility_timeout: int = 30,
+        extend_before_sec: float = 5,
+        max_lease_sec: float = 12 * 60 * 60,
+        logger: Optional[LoggerType] = None,
+    ):
+        if extend_before_sec >= visibility_timeout:
+            raise ValueError(f"Leases must be extended less than {visibility_timeout} seconds before they expire, got {extend_before_sec}")
+        self.client = client
+        self.visibility_timeout = visibility_timeout
+        self.extend_before_sec = extend_before_sec
+        self.max_lease_sec = max_lease_sec
+        self.logger = logger or default_logger
+
+        self._leases: Dict[str, Lease] = {}
+        # (time of the next extension, sequence number, lease)
+        self._heap: List[Tuple[float, int, Lease]] = []
+        self._counter = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def __len__(self) -> int:
+        return len(self._leases)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.ensure_future(self._run())
+
+    async def close(self):
+        """Stops extending leases, the visibility timeouts of tracked messages expire as usual."""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._leases.clear()
+        self._heap.clear()
+
+    def track(self, queue_url: str, receipt_handle: str, deadline: float) -> Lease:
+        """Starts extending the visibility timeout of the message which expires at `deadline` (monotonic time)."""
+        self.release(receipt_handle=receipt_handle)
+        lease = Lease(
+            queue_url=queue_url,
+            receipt_handle=receipt_handle,
+            deadline=deadline,
+            expires_at=time.monotonic() + self.max_lease_sec,
+        )
+        self._leases[receipt_handle] = lease
+        self._schedule(lease=lease)
+        return lease
+
+    def release(self, receipt_handle: str):
+        """Stops extending the visibility timeout, e.g. when the message is deleted."""
+        if lease := self._leases.pop(receipt_handle, None):
+            lease.released = True
+
+    def _drop(self, lease: Lease):
+        lease.released = True
+        if self._leases.get(lease.receipt_handle) is lease:
+            del self._leases[lease.receipt_handle]
+
+    def _schedule(self, lease: Lease):
+        extend_at = lease.deadline - self.extend_before_sec
+        # Wake up the loop if the lease is due earlier than all others
+        if self._wakeup and (not self._heap or extend_at < self._heap[0][0]):
+            self._wakeup.set()
+        heapq.heappush(self._heap, (extend_at, next(self._counter), lease))
+
+    def _pop_due(self, now: float) -> List[Lease]:
+        due = []
+        while self._heap and (self._heap[0][2].released or self._heap[0][0] <= now):
+            _, _, lease = heapq.heappop(self._heap)
+            if lease.released:
+                continue
+            if now >= lease.expires_at or now >= lease.deadline:
+                self.logger.warning("Stopped extending visibility timeout of %s", lease.receipt_handle)
+                self._drop(lease=lease)
+                continue
+            due.append(lease)
+        return due
+
+    async def _run(self):
+        while True:
+            due = self._pop_due(now=time.monotonic())
+            if due:
+                await self._extend(leases=due)
+                continue
+
+            self._wakeup.clear()
+            timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _extend(self, leases: List[Lease]):
+        by_queue: Dict[str, List[Lease]] = {}
+        for lease in leases:
+            by_queue.setdefault(lease.queue_url, []).append(lease)
+
+        batches = []
+        for queue_url, queue_leases in by_queue.items():
+            for i in range(0, len(queue_leases), self.client.max_batch_size):
+                batches.append(self._extend_batch(queue_url=queue_url, leases=queue_leases[i : i + self.client.max_batch_size]))
+        await asyncio.gather(*batches)
+
+    async def _extend_batch(self, queue_url: str, leases: List[Lease]):
+        extended_at = time.monotonic()
+        entries = [
+            {"Id": str(index), "ReceiptHandle": lease.receipt_handle, "VisibilityTimeout": self.visibility_timeout}
+            for index, lease in enumerate(leases)
+        ]
+        try:
+            response = await self.client.change_message_visibility_batch(queue_url=queue_url, entries=entries)
+        except Exception as e:
+            # Try again on the next iteration, while the visibility timeout hasn't expired
+            self.logger.error("Failed to extend visibility timeouts for %s: %r", queue_url, e)
+            retry_at = extended_at + min(1.0, self.extend_before_sec / 2)
+            for lease in leases:
+                if not lease.released:
+                    heapq.heappush(self._heap, (retry_at, next(self._counter), lease))
+            return
+
+        extended = {entry["Id"]: lease for entry, lease in zip(entries, leases)}
+        for error in response["Failed"]:
+            if (lease := extended.pop(error.get("Id"), None)) is None:
+                self.logger.warning("Unexpected entry %r in the batch response for %s", error.get("Id"), queue_url)
+                continue
+            self.logger.warning("Failed to extend visibility timeout of %s: %s", lease.receipt_handle, error["Message"])
+            self._drop(lease=lease)
+
+        for lease in extended.values():
+            if not lease.released:
+                lease.deadline = extended_at + self.visibility_timeout
+                self._schedule(lease=lease)
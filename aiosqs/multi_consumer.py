@@ -0,0 +1,284 @@
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Deque, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from aiosqs.acker import Acker
+from aiosqs.client import SQSClient
+from aiosqs.consumer import BaseConsumer, Handler, PrefetchedMessage
+from aiosqs.dedup import Deduplicator
+from aiosqs.lease import LeaseManager
+from aiosqs.polling import PollController, PollParams
+from aiosqs.types import LoggerType, Message, QueueStats
+
+
+class WeightedQueue(NamedTuple):
+    queue_url: str
+    weight: float = 1
+    # Handler of messages of this queue, the handler of the consumer by default
+    handler: Optional[Handler] = None
+
+
+class QueueState:
+    __slots__ = (
+        "queue_url",
+        "weight",
+        "handler",
+        "poll_pass",
+        "dispatch_pass",
+        "buffer",
+        "held",
+        "polls",
+        "empty_receives",
+        "last_full",
+        "received",
+        "errors",
+    )
+
+    def __init__(self, queue: WeightedQueue, handler: Handler):
+        self.queue_url = queue.queue_url
+        self.weight = queue.weight
+        self.handler = queue.handler or handler
+        # Virtual times of stride scheduling, the queue with the lowest one is polled or dispatched next
+        self.poll_pass = 0.0
+        self.dispatch_pass = 0.0
+        self.buffer: Deque[PrefetchedMessage] = deque()
+        # Prefetched messages and space reserved by polls in flight
+        self.held = 0
+        self.polls = 0
+        self.empty_receives = 0
+        # The last receive returned a full batch, the queue may be polled by several fetchers at once
+        self.last_full = False
+        self.received = 0
+        self.errors = 0
+
+
+class MultiQueueConsumer(BaseConsumer):
+    """Consumes several queues with `fetchers` long polls and `workers` handlers shared by all queues.
+
+    Polls and handlers are scheduled by queue weights with stride scheduling: a queue with weight 2 gets
+    twice as many messages polled and dispatched to workers as a queue with weight 1, while both have messages.
+
+    The prefetch buffer of `prefetch` messages is shared too. Every queue which has messages can hold at most
+    its weighted share of the buffer, so a burst on one queue cannot take the whole buffer from the others.
+    Queues which have no messages don't take a share.
+
+    Consecutive empty receives about double the long poll wait time of the queue from `min_wait_time_seconds`
+    up to `max_wait_time_seconds`, a non-empty one resets it. Failed receives are logged and counted separately,
+    they don't change the wait time. Queues which have no messages take one fetcher at most,
+    so with fewer fetchers than queues new messages on idle queues wait up to `max_wait_time_seconds`.
+
+    With `poll_controller` the receive parameters of every queue are picked by the controller instead,
+    the number of messages is still limited by the share of the queue.
+
+    Acknowledgements, leases, `nack_visibility_timeout` and `deduplicator` work as described in `BaseConsumer`.
+    """
+
+    def __init__(
+        self,
+        client: SQSClient,
+        queues: Sequence[WeightedQueue],
+        handler: Optional[Handler] = None,
+        workers: int = 10,
+        prefetch: int = 10,
+        fetchers: int = 2,
+        visibility_timeout: int = 30,
+        min_wait_time_seconds: int = 1,
+        max_wait_time_seconds: int = 20,
+        nack_visibility_timeout: Optional[int] = 0,
+        acker: Optional[Acker] = None,
+        lease_manager: Optional[LeaseManager] = None,
+        error_delay_sec: float = 1,
+        poll_controller: Optional[PollController] = None,
+        deduplicator: Optional[Deduplicator] = None,
+        logger: Optional[LoggerType] = None,
+    ):
+        if not queues:
+            raise ValueError("At least one queue is required")
+        if handler is None and any(queue.handler is None for queue in queues):
+            raise ValueError("Handler is required for queues without own handlers")
+        if any(queue.weight <= 0 for queue in queues):
+            raise ValueError("Queue weights must be positive")
+
+        super().__init__(
+            client=client,
+            workers=workers,
+            prefetch=prefetch,
+            fetchers=fetchers,
+            visibility_timeout=visibility_timeout,
+            nack_visibility_timeout=nack_visibility_timeout,
+            acker=acker,
+            lease_manager=lease_manager,
+            error_delay_sec=error_delay_sec,
+            poll_controller=poll_controller,
+            deduplicator=deduplicator,
+            logger=logger,
+        )
+        self.queues = [QueueState(queue=queue, handler=handler) for queue in queues]
+        self.min_wait_time_seconds = min_wait_time_seconds
+        self.max_wait_time_seconds = max_wait_time_seconds
+
+        # Free space in the prefetch buffer, including space reserved by polls in flight
+        self._free = prefetch
+        # Virtual times of the last scheduled poll and dispatch
+        self._poll_clock = 0.0
+        self._dispatch_clock = 0.0
+        self._changed: Optional[asyncio.Condition] = None
+
+    @property
+    def buffered(self) -> int:
+        """Number of prefetched messages waiting for a worker."""
+        return sum(len(state.buffer) for state in self.queues)
+
+    def wait_time_seconds(self, state: QueueState) -> int:
+        # 1, 3, 7, 15 seconds after consecutive empty receives, 31 is above the longest poll SQS allows
+        backoff = 2 ** min(state.empty_receives, 5) - 1
+        return min(self.max_wait_time_seconds, max(self.min_wait_time_seconds, backoff))
+
+    def poll_params(self, state: QueueState) -> PollParams:
+        if self.poll_controller:
+            return self.poll_controller.params(queue_url=state.queue_url)
+        return PollParams(
+            max_number_of_messages=self.client.max_batch_size,
+            visibility_timeout=self.visibility_timeout,
+            wait_time_seconds=self.wait_time_seconds(state),
+        )
+
+    def share(self, state: QueueState) -> int:
+        """The part of the prefetch buffer which the queue can hold."""
+        active_weight = sum(other.weight for other in self.queues if other is state or other.held or not other.empty_receives)
+        return max(1, math.ceil(self.prefetch * state.weight / active_weight))
+
+    def stats(self) -> Dict[str, QueueStats]:
+        return {
+            state.queue_url: {
+                "weight": state.weight,
+                "received": state.received,
+                "buffered": len(state.buffer),
+                "polls": state.polls,
+                "empty_receives": state.empty_receives,
+                "wait_time_seconds": self.poll_params(state).wait_time_seconds,
+                "errors": state.errors,
+            }
+            for state in self.queues
+        }
+
+    def _setup(self):
+        self._changed = asyncio.Condition()
+
+    async def _stop_workers(self):
+        # Workers exit when all buffers are empty
+        if self._changed:
+            async with self._changed:
+                self._changed.notify_all()
+
+    def _pollable(self, state: QueueState) -> int:
+        """Number of messages the queue can be polled for now."""
+        if state.polls and not state.last_full:
+            return 0
+        return min(self._free, self.share(state) - state.held, self.poll_params(state).max_number_of_messages)
+
+    async def _schedule_poll(self):
+        """Waits for a queue which can be polled and reserves space in the buffer for it."""
+        async with self._changed:
+            while True:
+                candidates = [state for state in self.queues if self._pollable(state) > 0]
+                if candidates:
+                    state = min(candidates, key=lambda candidate: candidate.poll_pass)
+                    reserved = self._pollable(state)
+                    state.poll_pass = max(state.poll_pass, self._poll_clock)
+                    self._poll_clock = state.poll_pass
+                    state.polls += 1
+                    state.held += reserved
+                    self._free -= reserved
+                    return state, reserved
+                await self._changed.wait()
+
+    async def receive(self, state: QueueState, max_number_of_messages: int, params: PollParams) -> List[Message]:
+        messages = await self.client.receive_message(
+            queue_url=state.queue_url,
+            max_number_of_messages=max_number_of_messages,
+            visibility_timeout=params.visibility_timeout,
+            wait_time_seconds=params.wait_time_seconds,
+        )
+        return messages or []
+
+    async def _fetch(self):
+        while not self._stopping.is_set():
+            state, reserved = await self._schedule_poll()
+            params = self.poll_params(state)
+            try:
+                received_at = time.monotonic()
+                messages = (await self.receive(state=state, max_number_of_messages=reserved, params=params))[:reserved]
+            except asyncio.CancelledError:
+                # Workers are woken up by the shutdown
+                state.polls -= 1
+                state.held -= reserved
+                self._free += reserved
+                raise
+            except Exception as e:
+                self.logger.error("Failed to receive messages from %s: %r", state.queue_url, e)
+                await self._fail_poll(state=state, reserved=reserved)
+                await asyncio.sleep(self.error_delay_sec)
+                continue
+
+            if self.poll_controller:
+                self.poll_controller.record_receive(queue_url=state.queue_url, requested=reserved, received=len(messages))
+            deadline = received_at + params.visibility_timeout
+            await self._complete_poll(state=state, reserved=reserved, messages=messages, deadline=deadline)
+
+    async def _fail_poll(self, state: QueueState, reserved: int):
+        """Releases the space reserved by a failed poll. The queue isn't known to be empty, so its wait time and share
+        stay the same, but the poll costs as much as an empty one, so a failing queue doesn't take every poll.
+        """
+        async with self._changed:
+            state.polls -= 1
+            state.errors += 1
+            state.held -= reserved
+            self._free += reserved
+            state.poll_pass += 1 / state.weight
+            self._changed.notify_all()
+
+    async def _complete_poll(self, state: QueueState, reserved: int, messages: List[Message], deadline: float):
+        async with self._changed:
+            state.polls -= 1
+            unused = reserved - len(messages)
+            state.held -= unused
+            self._free += unused
+
+            # Polls of empty queues cost as much as one message
+            state.poll_pass += max(1, len(messages)) / state.weight
+            state.last_full = len(messages) == reserved
+            if messages:
+                state.empty_receives = 0
+                state.received += len(messages)
+                if not state.buffer:
+                    state.dispatch_pass = max(state.dispatch_pass, self._dispatch_clock)
+                state.buffer.extend(PrefetchedMessage(message=message, deadline=deadline) for message in messages)
+            else:
+                state.empty_receives += 1
+            self._changed.notify_all()
+
+    async def _dispatch(self) -> Optional[Tuple[QueueState, PrefetchedMessage]]:
+        """Waits for a prefetched message and takes it from the queue with the lowest dispatch pass."""
+        async with self._changed:
+            while True:
+                candidates = [state for state in self.queues if state.buffer]
+                if candidates:
+                    state = min(candidates, key=lambda candidate: candidate.dispatch_pass)
+                    self._dispatch_clock = state.dispatch_pass
+                    state.dispatch_pass += 1 / state.weight
+                    state.held -= 1
+                    self._free += 1
+                    self._changed.notify_all()
+                    return state, state.buffer.popleft()
+                if self._stopping.is_set():
+                    return None
+                await self._changed.wait()
+
+    async def _work(self):
+        while dispatched := await self._dispatch():
+            state, prefetched = dispatched
+            if not self.is_expired(prefetched):
+                await self._handle(queue_url=state.queue_url, handler=state.handler, prefetched=prefetched)
@@ -0,0 +1,207 @@
+"""
+Offloading of message bodies larger than the SQS size limit to a blob store, similar to the Amazon SQS Extended Client.
+
+The body is stored in the blob store and a small pointer message is sent instead. The key of the blob is added to the
+receipt handle of the received message, so the blob is deleted together with the message.
+"""
+import asyncio
+import json
+import mmap
+import os
+import uuid
+from abc import ABC, abstractmethod
+from functools import partial
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from aiosqs.types import Message, MessageAttributeValue
+
+# Same marker attribute as in the Amazon SQS Extended Client, its value is the size of the original body
+POINTER_ATTRIBUTE = "ExtendedPayloadSize"
+POINTER_KEY = "blobKey"
+# Receipt handles of offloaded messages: "-..blob..-{key}-..blob..-{receipt handle}"
+RECEIPT_HANDLE_MARKER = "-..blob..-"
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+class BlobStore(ABC):
+    """Storage of offloaded message bodies, e.g. S3."""
+
+    @abstractmethod
+    async def put(self, key: str, data: bytes):
+        pass
+
+    async def get(self, key: str) -> bytes:
+        chunks = [chunk async for chunk in self.stream(key=key)]
+        return b"".join(chunks)
+
+    @abstractmethod
+    def stream(self, key: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        pass
+
+    @abstractmethod
+    async def delete(self, key: str):
+        """Deleting a missing blob is not an error, e.g. when a message is deleted twice."""
+        pass
+
+
+class MemoryBlobStore(BlobStore):
+    def __init__(self):
+        self.blobs: Dict[str, bytes] = {}
+
+    async def put(self, key: str, data: bytes):
+        self.blobs[key] = bytes(data)
+
+    async def get(self, key: str) -> bytes:
+        return self.blobs[key]
+
+    async def stream(self, key: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        view = memoryview(self.blobs[key])
+        for offset in range(0, len(view), chunk_size):
+            yield bytes(view[offset : offset + chunk_size])
+
+    async def delete(self, key: str):
+        self.blobs.pop(key, None)
+
+
+class LocalBlobStore(BlobStore):
+    """Stores blobs as files in the directory. Blobs are streamed from memory-mapped files,
+    so only one chunk at a time is copied into memory. Blocking file operations run in the default executor.
+
+    Keys may contain "/", e.g. with `key_prefix="orders/"`, blobs are stored in subdirectories then.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._root = os.path.realpath(directory)
+
+    def path(self, key: str) -> str:
+        parts = key.split("/")
+        if not key or any(not part or part.startswith(".") or "\\" in part for part in parts):
+            raise ValueError(f"Invalid blob key {key!r}")
+        path = os.path.realpath(os.path.join(self._root, *parts))
+        # Symbolic links must not lead out of the directory either
+        if os.path.commonpath([self._root, path]) != self._root:
+            raise ValueError(f"Invalid blob key {key!r}")
+        return path
+
+    async def run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, partial(func, *args))
+
+    async def put(self, key: str, data: bytes):
+        await self.run(self._write, self.path(key), data)
+
+    async def get(self, key: str) -> bytes:
+        return await self.run(self._read, self.path(key))
+
+    async def stream(self, key: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        file = await self.run(open, self.path(key), "rb")
+        try:
+            size = os.fstat(file.fileno()).st_size
+            # Empty files can't be mapped
+            if not size:
+                return
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                for offset in range(0, size, chunk_size):
+                    yield mapped[offset : offset + chunk_size]
+        finally:
+            file.close()
+
+    async def delete(self, key: str):
+        try:
+            await self.run(os.remove, self.path(key))
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _write(path: str, data: bytes):
+        # Readers never see partially written blobs
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _read(path: str) -> bytes:
+        with open(path, "rb") as file:
+            return file.read()
+
+
+def split_receipt_handle(receipt_handle: str) -> Tuple[Optional[str], str]:
+    """Returns the blob key and the original receipt handle of an offloaded message, or no key for other messages."""
+    if not receipt_handle.startswith(RECEIPT_HANDLE_MARKER):
+        return None, receipt_handle
+    key, _, receipt_handle = receipt_handle[len(RECEIPT_HANDLE_MARKER) :].partition(RECEIPT_HANDLE_MARKER)
+    return key, receipt_handle
+
+
+class PayloadOffloader:
+    """Message bodies larger than `min_bytes` (with message attributes) are stored in `store`.
+    With `fetch=True` bodies of received messages are fetched from the store, otherwise they can be streamed
+    with `stream`, e.g. for payloads of many megabytes.
+    """
+
+    # Maximum size of a message, including message attributes
+    max_message_bytes = 256 * 1024
+    pointer_attribute = POINTER_ATTRIBUTE
+
+    def __init__(self, store: BlobStore, min_bytes: int = max_message_bytes, fetch: bool = True, key_prefix: str = ""):
+        self.store = store
+        self.min_bytes = min_bytes
+        self.fetch = fetch
+        self.key_prefix = key_prefix
+
+    def pointer_key(self, message: Message) -> Optional[str]:
+        """Returns the blob key of a pointer message, or None for other messages. Messages of the Amazon SQS Extended
+        Client have the same marker attribute but another body, they are not pointers for the offloader.
+        """
+        key, _ = split_receipt_handle(message["ReceiptHandle"])
+        if key:
+            return key
+        attributes = message.get("MessageAttributes")
+        if not attributes or POINTER_ATTRIBUTE not in attributes:
+            return None
+        try:
+            pointer = json.loads(message["Body"])
+        except ValueError:
+            return None
+        if isinstance(pointer, dict) and isinstance(pointer.get(POINTER_KEY), str):
+            return pointer[POINTER_KEY]
+        return None
+
+    def is_pointer(self, message: Message) -> bool:
+        return self.pointer_key(message) is not None
+
+    def blob_key(self, message: Message) -> str:
+        if (key := self.pointer_key(message)) is None:
+            raise ValueError(f"Message {message['MessageId']} is not a pointer to a blob")
+        return key
+
+    async def offload(
+        self,
+        message_body: bytes,
+        message_attributes: Optional[Dict[str, MessageAttributeValue]],
+    ) -> Tuple[str, Dict[str, MessageAttributeValue]]:
+        """Stores the encoded body, returns the pointer body and attributes."""
+        key = f"{self.key_prefix}{uuid.uuid4().hex}"
+        await self.store.put(key=key, data=message_body)
+        attributes = dict(message_attributes or {})
+        attributes[POINTER_ATTRIBUTE] = {"DataType": "Number", "StringValue": str(len(message_body))}
+        return json.dumps({POINTER_KEY: key}), attributes
+
+    def resolve(self, message: Message):
+        """Adds the blob key to the receipt handle of a received pointer message."""
+        if split_receipt_handle(message["ReceiptHandle"])[0]:
+            return
+        key = self.blob_key(message)
+        message["ReceiptHandle"] = f"{RECEIPT_HANDLE_MARKER}{key}{RECEIPT_HANDLE_MARKER}{message['ReceiptHandle']}"
+
+    async def load(self, message: Message):
+        """Replaces the pointer body with the stored body."""
+        data = await self.store.get(key=self.blob_key(message))
+        message["Body"] = data.decode("utf-8")
+
+    def stream(self, message: Message, chunk_size: int = DEFAULT_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        return self.store.stream(key=self.blob_key(message), chunk_size=chunk_size)
@@ -1,14 +1,52 @@
-import re
-from logging import getLogger
-from typing import Optional
+import threading
+from logging import DEBUG, getLogger
+from typing import Optional, Dict, List, Tuple, Union
 
 from lxml import etree
 
+from aiosqs.attributes import MessageAttributes
 from aiosqs.exceptions import ErrorData, SQSErrorResponse
-from aiosqs.types import LoggerType
+from aiosqs.types import LoggerType, Message
 
 default_logger = getLogger(__name__)
 
+# Responses are logged at the DEBUG level up to this size, ReceiveMessage responses may take megabytes
+LOGGED_BODY_LIMIT = 1024
+
+# Larger ReceiveMessage responses are fed to a pull parser in chunks of this size, so collected messages are dropped
+# from the tree before the rest of the response is parsed. Smaller ones are parsed faster at once.
+FEED_CHUNK_SIZE = 16 * 1024
+
+# Options are the same for all responses, so one parser is reused. lxml parsers can't be shared between threads,
+# clients running event loops in different threads get their own parsers.
+_local = threading.local()
+
+
+def xml_parser() -> etree.XMLParser:
+    parser = getattr(_local, "xml_parser", None)
+    if parser is None:
+        parser = _local.xml_parser = etree.XMLParser(
+            remove_blank_text=True,
+            remove_comments=True,
+            remove_pis=True,
+            recover=False,
+        )
+    return parser
+
+
+def pull_parser() -> etree.XMLPullParser:
+    """Parser which reports ends of <Message> elements, it's ready for the next response once it's closed."""
+    parser = getattr(_local, "pull_parser", None)
+    if parser is None:
+        parser = _local.pull_parser = etree.XMLPullParser(
+            events=("end",),
+            tag="{*}Message",
+            remove_blank_text=True,
+            remove_comments=True,
+            remove_pis=True,
+        )
+    return parser
+
 
 def el_text(el) -> Optional[str]:
     if text := el.text:
@@ -20,8 +58,7 @@ def el_tag(el) -> str:
     """Returns element tag name without namespace
     {http://queue.amazonaws.com/doc/2012-11-05/}Error -> Error
     """
-    tag = el.tag
-    return re.sub(r"\{.*?}", "", tag, flags=re.IGNORECASE)
+    return el.tag.rpartition("}")[2]
 
 
 def collect_elements(root, xpath: str):
@@ -35,6 +72,124 @@ def collect_elements(root, xpath: str):
     return multi_response
 
 
+def collect_batch_result(root, action: str) -> Dict[str, List[Dict]]:
+    """Batch results contain entries of two types, both are lists:
+    <SendMessageBatchResult>
+        <SendMessageBatchResultEntry>...</SendMessageBatchResultEntry>
+        <BatchResultErrorEntry>...</BatchResultErrorEntry>
+    </SendMessageBatchResult>
+    """
+    xpath = f"./*[local-name() = '{action}Result']"
+    successful = collect_elements(root=root, xpath=f"{xpath}/*[local-name() = '{action}ResultEntry']")
+    failed = collect_elements(root=root, xpath=f"{xpath}/*[local-name() = 'BatchResultErrorEntry']")
+    for entry in failed:
+        entry["SenderFault"] = entry.get("SenderFault") == "true"
+    return {
+        "Successful": successful,
+        "Failed": failed,
+    }
+
+
+def collect_messages(root) -> List[Message]:
+    """Fast path for ReceiveMessage, the schema is fixed so messages are collected in one pass over the tree:
+    <ReceiveMessageResponse>
+        <ReceiveMessageResult>
+            <Message>
+                <MessageId>...</MessageId>
+                ...
+            </Message>
+        </ReceiveMessageResult>
+    </ReceiveMessageResponse>
+    """
+    messages = []
+    for result in root:
+        if el_tag(result) == "ReceiveMessageResult":
+            for message in result:
+                messages.append(collect_message(message))
+    return messages
+
+
+def stream_messages(body: Union[str, bytes]) -> Tuple[List[Message], etree._Element]:
+    """Collects messages of a large ReceiveMessage response while it's parsed. Collected <Message> elements
+    are removed from the tree, so it doesn't hold all bodies of the response at once.
+    Returns the messages and the root element, which is parsed as usual when it's an error response.
+    """
+    parser = pull_parser()
+    messages: List[Message] = []
+    try:
+        for start in range(0, len(body), FEED_CHUNK_SIZE):
+            parser.feed(body[start : start + FEED_CHUNK_SIZE])
+            collect_pulled_messages(parser=parser, messages=messages)
+        root = parser.close()
+    except Exception:
+        # Closing resets the parser for the next response
+        try:
+            parser.close()
+        except etree.XMLSyntaxError:
+            pass
+        raise
+    collect_pulled_messages(parser=parser, messages=messages)
+    return messages, root
+
+
+def collect_pulled_messages(parser: etree.XMLPullParser, messages: List[Message]):
+    for _, el in parser.read_events():
+        parent = el.getparent()
+        # <Message> of an <Error> is a field of the error
+        if parent is None or el_tag(parent) != "ReceiveMessageResult":
+            continue
+        messages.append(collect_message(el))
+        el.clear()
+        while el.getprevious() is not None:
+            del parent[0]
+
+
+def collect_message(el) -> Message:
+    """System attributes and message attributes are repeated elements, they are collected into mappings:
+    <Attribute>
+        <Name>ApproximateReceiveCount</Name>
+        <Value>1</Value>
+    </Attribute>
+    <MessageAttribute>
+        <Name>city</Name>
+        <Value>
+            <StringValue>Any City</StringValue>
+            <DataType>String</DataType>
+        </Value>
+    </MessageAttribute>
+    """
+    message = {}
+    message_attributes = None
+    for child in el:
+        tag = el_tag(child)
+        if tag == "Attribute":
+            fields = {el_tag(field): field for field in child}
+            message.setdefault("Attributes", {})[el_text(fields["Name"])] = el_text(fields["Value"])
+        elif tag == "MessageAttribute":
+            name = value = data_type = None
+            for field in child:
+                if el_tag(field) == "Name":
+                    name = el_text(field)
+                else:
+                    for item in field:
+                        item_tag = el_tag(item)
+                        if item_tag == "DataType":
+                            data_type = el_text(item)
+                        elif item_tag in ("StringValue", "BinaryValue"):
+                            value = item.text or ""
+            if message_attributes is None:
+                message_attributes = {}
+            message_attributes[name] = (data_type, value)
+        elif tag == "Body":
+            # The body is returned exactly as it was sent
+            message[tag] = child.text
+        else:
+            message[tag] = el_text(child)
+    if message_attributes:
+        message["MessageAttributes"] = MessageAttributes(message_attributes)
+    return message
+
+
 def find_request_id(root) -> Optional[str]:
     for child in root.xpath("./*[local-name() = 'RequestId']"):
         if text := el_text(child):
@@ -42,17 +197,36 @@ def find_request_id(root) -> Optional[str]:
     return None
 
 
-def parse_xml_result_response(action: str, body: str, logger: Optional[LoggerType] = None):
+def logged_text(body: Union[str, bytes]) -> str:
+    """The body decoded for logs, at most `LOGGED_BODY_LIMIT` characters of it."""
+    text = body[:LOGGED_BODY_LIMIT]
+    if isinstance(text, bytes):
+        text = text.decode("utf-8", errors="replace")
+    return text
+
+
+def log_response(logger: LoggerType, action: str, body: Union[str, bytes]):
+    if not logger.isEnabledFor(DEBUG):
+        return
+    if len(body) > LOGGED_BODY_LIMIT:
+        logger.debug("Message for %s (%s bytes): %s...", action, len(body), logged_text(body))
+    else:
+        logger.debug("Message for %s: %s", action, logged_text(body))
+
+
+def parse_xml_result_response(action: str, body: Union[str, bytes], logger: Optional[LoggerType] = None):
     logger = logger or default_logger
-    logger.debug("Message for %s: %s", action, body)
+    log_response(logger=logger, action=action, body=body)
 
-    parser = etree.XMLParser(
-        remove_blank_text=True,
-        remove_comments=True,
-        remove_pis=True,
-        recover=False,
-    )
-    root = etree.fromstring(text=body, parser=parser)
+    # Error responses have the <ErrorResponse> root
+    if action == "ReceiveMessage" and len(body) > FEED_CHUNK_SIZE:
+        messages, root = stream_messages(body=body)
+        if el_tag(root) == "ReceiveMessageResponse":
+            return messages or None
+    else:
+        root = etree.fromstring(text=body, parser=xml_parser())
+        if action == "ReceiveMessage" and el_tag(root) == "ReceiveMessageResponse":
+            return collect_messages(root=root) or None
 
     request_id = find_request_id(root=root)
 
@@ -69,6 +243,10 @@ def parse_xml_result_response(action: str, body: str, logger: Optional[LoggerTyp
             request_id=request_id,
         )
 
+    # Successful and failed entries of batch actions
+    if action.endswith("Batch"):
+        return collect_batch_result(root=root, action=action)
+
     # Find if it's a single element or a list
     xpath = f"./*[local-name() = '{action}Result']"
     elements = collect_elements(root=root, xpath=xpath)
@@ -77,7 +255,7 @@ def parse_xml_result_response(action: str, body: str, logger: Optional[LoggerTyp
     if len(elements) == 1 and len(elements[0]) == 1:
         key, value = list(elements[0].items())[0]
         if not value:
-            xpath = f"{xpath}/{key}"
+            xpath = f"{xpath}/*[local-name() = '{key}']"
             return collect_elements(root=root, xpath=xpath)
 
     # Response is 1 object
@@ -0,0 +1,125 @@
+"""
+Adaptive receive parameters. The controller observes receives and handlers of every queue and picks:
+
+- `wait_time_seconds` from the share of empty receives and the fill ratio of batches: hot queues are polled with
+  the shortest wait time, idle queues with the longest one, so they cost fewer requests. Bursty queues which return
+  full batches between empty receives have a backlog, so their wait time is shortened by the fill ratio.
+- `max_number_of_messages` from the number of received messages: consumers reserve space in their prefetch buffer
+  for every poll, so polls of sparse queues ask for about twice as many messages as they usually get.
+  Polls which return full batches ask for `max_batch_size`.
+- `visibility_timeout` from the processing time quantile of handlers times `visibility_factor`.
+"""
+import math
+from typing import Dict, NamedTuple
+
+from aiosqs.hedging import LatencyTracker
+from aiosqs.types import PollStats
+
+
+class PollParams(NamedTuple):
+    max_number_of_messages: int
+    visibility_timeout: int
+    wait_time_seconds: int
+
+
+class QueuePollState:
+    __slots__ = ("empty_rate", "fill_ratio", "received", "receives", "processing")
+
+    def __init__(self, initial_batch_size: float, processing: LatencyTracker):
+        # Exponential moving averages of empty receives, received to requested messages and received messages
+        self.empty_rate = 0.0
+        self.fill_ratio = 1.0
+        self.received = initial_batch_size
+        self.receives = 0
+        self.processing = processing
+
+
+class PollController:
+    """Receive parameters per queue within the bounds. Moving averages use the `smoothing` weight of the last
+    observation, the processing time quantile is taken from the last `window` handled messages.
+    """
+
+    def __init__(
+        self,
+        min_wait_time_seconds: int = 0,
+        max_wait_time_seconds: int = 20,
+        min_batch_size: int = 1,
+        max_batch_size: int = 10,
+        min_visibility_timeout: int = 30,
+        max_visibility_timeout: int = 12 * 60 * 60,
+        visibility_factor: float = 4,
+        quantile: float = 0.99,
+        smoothing: float = 0.2,
+        window: int = 1000,
+        min_samples: int = 20,
+    ):
+        if not 0 <= min_wait_time_seconds <= max_wait_time_seconds <= 20:
+            raise ValueError("Wait time must be within 0..20 seconds")
+        if not 1 <= min_batch_size <= max_batch_size <= 10:
+            raise ValueError("Batch size must be within 1..10 messages")
+        if not 0 <= min_visibility_timeout <= max_visibility_timeout <= 12 * 60 * 60:
+            raise ValueError("Visibility timeout must be within 0..43200 seconds")
+        self.min_wait_time_seconds = min_wait_time_seconds
+        self.max_wait_time_seconds = max_wait_time_seconds
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        self.min_visibility_timeout = min_visibility_timeout
+        self.max_visibility_timeout = max_visibility_timeout
+        self.visibility_factor = visibility_factor
+        self.quantile = quantile
+        self.smoothing = smoothing
+        self.window = window
+        self.min_samples = min_samples
+
+        self._queues: Dict[str, QueuePollState] = {}
+
+    def state(self, queue_url: str) -> QueuePollState:
+        if (state := self._queues.get(queue_url)) is None:
+            processing = LatencyTracker(quantile=self.quantile, window=self.window, min_samples=self.min_samples)
+            state = self._queues[queue_url] = QueuePollState(initial_batch_size=self.max_batch_size, processing=processing)
+        return state
+
+    def params(self, queue_url: str) -> PollParams:
+        state = self.state(queue_url)
+
+        idle = state.empty_rate * (1 - state.fill_ratio)
+        wait_time_seconds = self.min_wait_time_seconds + (self.max_wait_time_seconds - self.min_wait_time_seconds) * idle
+        batch_size = round(state.received * 2)
+
+        visibility_timeout = self.min_visibility_timeout
+        if (processing_sec := state.processing.value()) is not None:
+            visibility_timeout = math.ceil(processing_sec * self.visibility_factor)
+
+        return PollParams(
+            max_number_of_messages=min(self.max_batch_size, max(self.min_batch_size, batch_size)),
+            visibility_timeout=min(self.max_visibility_timeout, max(self.min_visibility_timeout, visibility_timeout)),
+            wait_time_seconds=round(wait_time_seconds),
+        )
+
+    def record_receive(self, queue_url: str, requested: int, received: int):
+        state = self.state(queue_url)
+        state.receives += 1
+        # A full batch means there may be more messages, the average of smaller batches would shrink the next request
+        observed = self.max_batch_size if received >= requested else received
+        state.received += (observed - state.received) * self.smoothing
+        state.empty_rate += ((0.0 if received else 1.0) - state.empty_rate) * self.smoothing
+        state.fill_ratio += (min(1.0, received / requested) - state.fill_ratio) * self.smoothing
+
+    def record_processing(self, queue_url: str, duration_sec: float):
+        self.state(queue_url).processing.add(duration_sec)
+
+    def stats(self) -> Dict[str, PollStats]:
+        stats = {}
+        for queue_url, state in self._queues.items():
+            params = self.params(queue_url)
+            stats[queue_url] = {
+                "receives": state.receives,
+                "empty_rate": state.empty_rate,
+                "fill_ratio": state.fill_ratio,
+                "messages_per_receive": state.received,
+                "processing_sec": state.processing.value(),
+                "max_number_of_messages": params.max_number_of_messages,
+                "visibility_timeout": params.visibility_timeout,
+                "wait_time_seconds": params.wait_time_seconds,
+            }
+        return stats
@@ -0,0 +1,70 @@
+from typing import Any, Dict, List, Optional
+
+from aiosqs.batching import Batcher
+from aiosqs.client import SQSClient, message_size
+from aiosqs.types import LoggerType, MessageAttributeValue, SendMessageResponse, SendMessageBatchResponse, SendMessageBatchResultEntry
+
+
+class BatchingProducer(Batcher):
+    """Coalesces `send_message` calls from many coroutines into SendMessageBatch requests.
+    Order of messages is kept only inside a batch, use `max_in_flight=1` for FIFO queues.
+    """
+
+    # Maximum total size of all messages in one batch
+    max_payload_bytes = 256 * 1024
+
+    def __init__(
+        self,
+        client: SQSClient,
+        max_batch_size: int = SQSClient.max_batch_size,
+        max_batch_bytes: int = max_payload_bytes,
+        linger_sec: float = 0.005,
+        max_in_flight: int = 10,
+        max_pending: int = 1000,
+        logger: Optional[LoggerType] = None,
+    ):
+        super().__init__(
+            client=client,
+            max_batch_size=max_batch_size,
+            max_batch_bytes=max_batch_bytes,
+            linger_sec=linger_sec,
+            max_in_flight=max_in_flight,
+            max_pending=max_pending,
+            logger=logger,
+        )
+
+    async def send_batch(self, queue_url: str, entries: List[Dict]) -> SendMessageBatchResponse:
+        return await self.client.send_message_batch(queue_url=queue_url, entries=entries)
+
+    def entry_result(self, result: SendMessageBatchResultEntry) -> SendMessageResponse:
+        return {key: value for key, value in result.items() if key != "Id"}
+
+    async def send_message(
+        self,
+        queue_url: str,
+        message_body: Any,
+        delay_seconds: int = 0,
+        message_group_id: str = None,
+        message_deduplication_id: str = None,
+        message_attributes: Optional[Dict[str, MessageAttributeValue]] = None,
+    ) -> SendMessageResponse:
+        """Same as `SQSClient.send_message`, but the message is sent in a batch with other messages."""
+        message_body, message_attributes = await self.client.prepare_message(
+            message_body=message_body, message_attributes=message_attributes
+        )
+        entry = {
+            "MessageBody": message_body,
+            "DelaySeconds": delay_seconds,
+        }
+        # Only for FIFO queues
+        if message_group_id:
+            entry["MessageGroupId"] = message_group_id
+        if message_deduplication_id:
+            entry["MessageDeduplicationId"] = message_deduplication_id
+        if message_attributes:
+            entry["MessageAttributes"] = message_attributes
+
+        future = await self.submit(
+            queue_url=queue_url, entry=entry, size=message_size(message_body=message_body, message_attributes=message_attributes)
+        )
+        return await future
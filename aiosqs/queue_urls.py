@@ -0,0 +1,98 @@
+import asyncio
+import copy
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, NoReturn, Optional, Tuple, Union
+
+from aiosqs.exceptions import SQSErrorResponse
+
+# Queue name and the account ID of the queue owner, None for the own account
+CacheKey = Tuple[str, Optional[str]]
+
+NON_EXISTENT_QUEUE_CODES = {
+    "AWS.SimpleQueueService.NonExistentQueue",
+    "QueueDoesNotExist",
+}
+
+
+def is_queue_url(queue: str) -> bool:
+    return queue.startswith("https://") or queue.startswith("http://")
+
+
+def raise_copy(error: Exception) -> NoReturn:
+    """Raises a new exception with the same arguments and attributes, but without the traceback of the error.
+    The error itself is raised again if it can't be copied.
+    """
+    try:
+        copied = copy.copy(error)
+    except Exception:
+        copied = None
+    if copied is None:
+        raise error
+    raise copied from error
+
+
+class QueueUrlCache:
+    """Queue URLs by queue name and account ID, at most `max_size` of recently used ones for `ttl_sec`.
+    Concurrent lookups of the same queue share one GetQueueUrl request.
+    Missing queues are cached for `negative_ttl_sec`, so a wrong name doesn't cause a request per message.
+    """
+
+    def __init__(self, ttl_sec: float = 300, max_size: int = 1024, negative_ttl_sec: float = 5):
+        self.ttl_sec = ttl_sec
+        self.max_size = max_size
+        self.negative_ttl_sec = negative_ttl_sec
+
+        # Expiration time in monotonic time and the URL, or the error for missing queues
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Union[str, SQSErrorResponse]]]" = OrderedDict()
+        self._lookups: Dict[CacheKey, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+
+    def invalidate(self, queue_name: str, account_id: Optional[str] = None):
+        """Drops the cached URL, e.g. after the queue was deleted and created again."""
+        self._entries.pop((queue_name, account_id), None)
+
+    async def get(self, queue_name: str, account_id: Optional[str], loader: Callable[[], Awaitable[str]]) -> str:
+        key = (queue_name, account_id)
+        if entry := self._entries.get(key):
+            expires_at, value = entry
+            if time.monotonic() < expires_at:
+                self._entries.move_to_end(key)
+                if isinstance(value, SQSErrorResponse):
+                    # Every caller gets its own exception, the cached one doesn't collect tracebacks
+                    raise_copy(value)
+                return value
+            del self._entries[key]
+
+        lookup = self._lookups.get(key)
+        if lookup is None:
+            lookup = self._lookups[key] = asyncio.ensure_future(self._load(key=key, loader=loader))
+        # The lookup isn't cancelled together with one of the callers waiting for it
+        await asyncio.wait({lookup})
+        if error := lookup.exception():
+            # Callers sharing the lookup get their own exceptions, the error of the lookup isn't raised again
+            raise_copy(error)
+        return lookup.result()
+
+    async def _load(self, key: CacheKey, loader: Callable[[], Awaitable[str]]) -> str:
+        try:
+            url = await loader()
+        except SQSErrorResponse as e:
+            if e.error.code in NON_EXISTENT_QUEUE_CODES:
+                self._put(key=key, value=e, ttl_sec=self.negative_ttl_sec)
+            raise
+        finally:
+            del self._lookups[key]
+        self._put(key=key, value=url, ttl_sec=self.ttl_sec)
+        return url
+
+    def _put(self, key: CacheKey, value: Union[str, SQSErrorResponse], ttl_sec: float):
+        self._entries[key] = (time.monotonic() + ttl_sec, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
@@ -0,0 +1,254 @@
+"""
+Retries of failed requests, modeled on the "standard" and "adaptive" retry modes of AWS SDKs:
+https://docs.aws.amazon.com/sdkref/latest/guide/feature-retry-behavior.html
+
+- Errors are classified by the error code and the HTTP status, only throttling and transient errors are retried.
+- Delays grow exponentially with full jitter, so clients don't retry in sync during an outage.
+- Retries are paid from a retry budget, which is refilled by successful requests. When most requests fail,
+  the budget runs out and errors are raised without retries instead of multiplying the load.
+- The adaptive rate limiter is a token bucket which is enabled by the first throttling error. Its rate is cut
+  on every throttling error and grows back along a cubic curve while requests succeed.
+"""
+import asyncio
+import math
+import random
+import time
+from logging import getLogger
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from aiosqs.deadline import remaining_sec
+from aiosqs.exceptions import DeadlineExceeded, SQSClientBaseError, SQSErrorResponse
+from aiosqs.types import LoggerType
+
+default_logger = getLogger(__name__)
+
+T = TypeVar("T")
+
+THROTTLING = "throttling"
+TRANSIENT = "transient"
+TIMEOUT = "timeout"
+
+THROTTLING_ERROR_CODES = {
+    "Throttling",
+    "ThrottlingException",
+    "ThrottledException",
+    "RequestThrottled",
+    "RequestThrottledException",
+    "TooManyRequestsException",
+    "RequestLimitExceeded",
+    "SlowDown",
+    "KmsThrottled",
+}
+
+TRANSIENT_ERROR_CODES = {
+    "InternalError",
+    "InternalFailure",
+    "ServiceUnavailable",
+    "RequestTimeout",
+    "RequestTimeoutException",
+}
+
+THROTTLING_STATUS_CODES = {429}
+TRANSIENT_STATUS_CODES = {500, 502, 503, 504}
+
+
+def classify_error(error: SQSClientBaseError) -> Optional[str]:
+    """Returns the kind of a retryable error, or None if the error must not be retried."""
+    if isinstance(error, DeadlineExceeded):
+        return None
+    if isinstance(error, SQSErrorResponse):
+        # Query API codes may have a prefix, e.g. "AWS.SimpleQueueService.RequestThrottled"
+        code = error.error.code.rpartition(".")[2]
+        if code in THROTTLING_ERROR_CODES:
+            return THROTTLING
+        if code in TRANSIENT_ERROR_CODES:
+            return TRANSIENT
+    if error.status_code in THROTTLING_STATUS_CODES:
+        return THROTTLING
+    if error.status_code in TRANSIENT_STATUS_CODES:
+        return TRANSIENT
+    # Transport errors, the request didn't get a response
+    if error.status_code is None and not isinstance(error, SQSErrorResponse):
+        if isinstance(error.__cause__, asyncio.TimeoutError):
+            return TIMEOUT
+        return TRANSIENT
+    return None
+
+
+class RetryBudget:
+    """Token bucket of retries shared by all requests of the client.
+    A retry costs `retry_cost` tokens, or `timeout_cost` after a timeout. A request that succeeds on the first
+    attempt returns `success_refund` tokens, a request that succeeds after retries returns the cost of its retries.
+    """
+
+    def __init__(self, capacity: int = 500, retry_cost: int = 5, timeout_cost: int = 10, success_refund: int = 1):
+        self.capacity = capacity
+        self.retry_cost = retry_cost
+        self.timeout_cost = timeout_cost
+        self.success_refund = success_refund
+        self.tokens = capacity
+
+    def cost(self, kind: str) -> int:
+        return self.timeout_cost if kind == TIMEOUT else self.retry_cost
+
+    def withdraw(self, cost: int) -> bool:
+        if cost > self.tokens:
+            return False
+        self.tokens -= cost
+        return True
+
+    def deposit(self, amount: int):
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class AdaptiveRateLimiter:
+    """Client-side rate limiting of the "adaptive" retry mode of AWS SDKs.
+    Requests are not limited until the first throttling error.
+    """
+
+    min_fill_rate = 0.5
+    min_capacity = 1.0
+    # Weight of the last measurement of the request rate
+    smooth = 0.8
+    # The rate is multiplied by `beta` on a throttling error
+    beta = 0.7
+    scale_constant = 0.4
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.enabled = False
+
+        # Token bucket
+        self.fill_rate = 0.0
+        self.max_capacity = 0.0
+        self.current_capacity = 0.0
+        self.last_timestamp: Optional[float] = None
+
+        # Measured rate of requests per second
+        self.measured_tx_rate = 0.0
+        self.last_tx_rate_bucket = math.floor(clock())
+        self.request_count = 0
+
+        # Cubic curve
+        self.last_max_rate = 0.0
+        self.last_throttle_time = clock()
+        self.time_window = 0.0
+
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def acquire(self):
+        """Waits for a token, if the rate limiter is enabled."""
+        if not self.enabled:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # Waiters get tokens in order
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.current_capacity >= 1:
+                    self.current_capacity -= 1
+                    return
+                await asyncio.sleep((1 - self.current_capacity) / self.fill_rate)
+
+    def update(self, throttled: bool):
+        """Adjusts the rate after a response."""
+        self._update_measured_rate()
+        now = self.clock()
+        if throttled:
+            rate_to_use = min(self.measured_tx_rate, self.fill_rate) if self.enabled else self.measured_tx_rate
+            self.last_max_rate = rate_to_use
+            self._calculate_time_window()
+            self.last_throttle_time = now
+            new_rate = rate_to_use * self.beta
+            self.enabled = True
+        else:
+            self._calculate_time_window()
+            new_rate = self.scale_constant * (now - self.last_throttle_time - self.time_window) ** 3 + self.last_max_rate
+        self._update_bucket(min(new_rate, 2 * self.measured_tx_rate))
+
+    def _refill(self):
+        now = self.clock()
+        if self.last_timestamp is not None:
+            fill_amount = (now - self.last_timestamp) * self.fill_rate
+            self.current_capacity = min(self.max_capacity, self.current_capacity + fill_amount)
+        self.last_timestamp = now
+
+    def _update_bucket(self, new_rate: float):
+        self._refill()
+        self.fill_rate = max(new_rate, self.min_fill_rate)
+        self.max_capacity = max(new_rate, self.min_capacity)
+        self.current_capacity = min(self.current_capacity, self.max_capacity)
+
+    def _update_measured_rate(self):
+        now = self.clock()
+        time_bucket = math.floor(now * 2) / 2
+        self.request_count += 1
+        if time_bucket > self.last_tx_rate_bucket:
+            current_rate = self.request_count / (time_bucket - self.last_tx_rate_bucket)
+            self.measured_tx_rate = current_rate * self.smooth + self.measured_tx_rate * (1 - self.smooth)
+            self.request_count = 0
+            self.last_tx_rate_bucket = time_bucket
+
+    def _calculate_time_window(self):
+        self.time_window = (self.last_max_rate * (1 - self.beta) / self.scale_constant) ** (1 / 3)
+
+
+class RetryPolicy:
+    """Makes up to `max_attempts` attempts of a request. The delay before the retry N is a random value
+    between 0 and min(`max_delay_sec`, `base_delay_sec` * 2 ** N).
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay_sec: float = 0.05,
+        max_delay_sec: float = 20,
+        budget: Optional[RetryBudget] = None,
+        rate_limiter: Optional[AdaptiveRateLimiter] = None,
+        logger: Optional[LoggerType] = None,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay_sec = base_delay_sec
+        self.max_delay_sec = max_delay_sec
+        self.budget = budget or RetryBudget()
+        self.rate_limiter = rate_limiter
+        self.logger = logger or default_logger
+
+    def delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay_sec, self.base_delay_sec * 2**attempt))
+
+    async def call(self, func: Callable[[], Awaitable[T]]) -> T:
+        attempt = 0
+        retries_cost = 0
+        while True:
+            if self.rate_limiter:
+                await self.rate_limiter.acquire()
+            try:
+                result = await func()
+            except SQSClientBaseError as e:
+                kind = classify_error(e)
+                if self.rate_limiter:
+                    self.rate_limiter.update(throttled=kind == THROTTLING)
+
+                attempt += 1
+                if kind is None or attempt >= self.max_attempts:
+                    raise
+                cost = self.budget.cost(kind)
+                if not self.budget.withdraw(cost):
+                    self.logger.warning("Retry budget is exhausted, not retrying the %s error", kind)
+                    raise
+                retries_cost += cost
+
+                delay = self.delay(attempt)
+                remaining = remaining_sec()
+                if remaining is not None and delay >= remaining:
+                    raise
+                self.logger.warning("Retrying the %s error in %.3f sec, attempt %s of %s", kind, delay, attempt + 1, self.max_attempts)
+                await asyncio.sleep(delay)
+                continue
+
+            if self.rate_limiter:
+                self.rate_limiter.update(throttled=False)
+            self.budget.deposit(retries_cost or self.budget.success_refund)
+            return result
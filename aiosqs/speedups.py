@@ -0,0 +1,131 @@
+"""
+Optional accelerated implementations, installed with `pip install aiosqs[fast]`.
+
+- uvloop runs event loops of `run` and of `Supervisor` workers.
+- orjson serializes JSON protocol requests, parses responses and backs `JSONCodec`.
+
+Query strings are encoded with a table of quoted bytes instead of `urllib.parse.urlencode`. Parameter names and
+values which repeat in every request (actions, queue URLs, attribute names and data types) are quoted once and cached,
+message bodies and receipt handles are not. The result is the same byte for byte, so signatures don't change.
+It doesn't need extra packages and is used unless the client has a custom `quote_via`. `features` reports what is in use.
+"""
+import asyncio
+import json
+import sys
+from functools import lru_cache
+from typing import Any, Awaitable, Dict, Optional, TypeVar, Union
+
+import aiohttp
+from aiohttp import http_parser, resolver
+
+from aiosqs.types import Features
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+T = TypeVar("T")
+
+# Characters which `urllib.parse.quote` never quotes
+ALWAYS_SAFE = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_.-~"
+
+# Quoted bytes by value
+QUOTED_BYTES = tuple(chr(byte) if byte in ALWAYS_SAFE else f"%{byte:02X}" for byte in range(256))
+
+# Parameters whose values repeat in every request, besides names and data types of attributes
+REPEATING_PARAMS = frozenset(("Action", "Version", "QueueUrl", "QueueName"))
+REPEATING_SUFFIXES = (".Name", ".DataType")
+
+
+def quote(value: Union[str, bytes]) -> str:
+    """The same as `urllib.parse.quote(value, safe="")`."""
+    data = value.encode("utf-8") if isinstance(value, str) else value
+    return "".join([QUOTED_BYTES[byte] for byte in data])
+
+
+@lru_cache(maxsize=4096)
+def quote_name(value: str) -> str:
+    """Cached `quote` of parameter names and repeating values."""
+    return quote(value)
+
+
+def encode_query(params: Dict[str, Any]) -> str:
+    """Sorted parameters, the same as `urllib.parse.urlencode(sorted(params.items()), quote_via=urllib.parse.quote)`."""
+    parts = []
+    for key, value in sorted(params.items()):
+        if not isinstance(value, (str, bytes)):
+            value = str(value)
+        repeating = isinstance(value, str) and (key in REPEATING_PARAMS or key.endswith(REPEATING_SUFFIXES))
+        parts.append(f"{quote_name(key)}={quote_name(value) if repeating else quote(value)}")
+    return "&".join(parts)
+
+
+def json_dumps(value: Any) -> bytes:
+    """Compact JSON as UTF-8 bytes."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+def json_loads(data: Union[str, bytes]) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def run(main: Awaitable[T], use_uvloop: Optional[bool] = None) -> T:
+    """Runs the coroutine in a new event loop like `asyncio.run`, the loop is an uvloop one if it's installed.
+    With `use_uvloop=False` it's always an asyncio loop.
+    """
+    if use_uvloop is None:
+        use_uvloop = uvloop is not None
+    if not use_uvloop:
+        return asyncio.run(main)
+    if uvloop is None:
+        raise RuntimeError("uvloop is not installed")
+    if sys.version_info >= (3, 11):
+        with asyncio.Runner(loop_factory=uvloop.new_event_loop) as runner:
+            return runner.run(main)
+    return _run_in_loop(main=main, loop=uvloop.new_event_loop())
+
+
+def _run_in_loop(main: Awaitable[T], loop: asyncio.AbstractEventLoop) -> T:
+    """`asyncio.run` with the given loop, the event loop policy of the process stays the same."""
+    try:
+        asyncio.set_event_loop(loop)
+        return loop.run_until_complete(main)
+    finally:
+        try:
+            tasks = asyncio.all_tasks(loop)
+            for task in tasks:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            if sys.version_info >= (3, 9):
+                loop.run_until_complete(loop.shutdown_default_executor())
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
+
+def features() -> Features:
+    """Implementations in use. The event loop is the running one, or the one `run` creates."""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        event_loop = "uvloop" if uvloop is not None else "asyncio"
+    else:
+        event_loop = "uvloop" if uvloop is not None and isinstance(loop, uvloop.Loop) else "asyncio"
+    return Features(
+        event_loop=event_loop,
+        json="orjson" if orjson is not None else "json",
+        http_parser="c" if http_parser.HttpResponseParser.__module__ == "aiohttp._http_parser" else "python",
+        dns_resolver="aiodns" if resolver.DefaultResolver is resolver.AsyncResolver else "threaded",
+        aiohttp=aiohttp.__version__,
+    )
@@ -0,0 +1,282 @@
+"""
+Scaling CPU-bound handlers across cores.
+
+`Supervisor` starts `processes` worker processes, every one runs the target coroutine in its own event loop,
+so it creates its own `SQSClient` and consumer. SIGTERM and SIGINT of the supervisor stop all workers gracefully,
+workers which crash are restarted with an exponential delay. Workers publish counters, the supervisor sums them.
+
+`process_pool_handler` is the other option: one process fetches and acknowledges messages, handlers run
+in a `ProcessPoolExecutor`.
+"""
+import asyncio
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from concurrent.futures import Executor
+from functools import partial
+from logging import getLogger
+from multiprocessing.connection import wait
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from aiosqs import speedups
+from aiosqs.consumer import Handler
+from aiosqs.types import LoggerType, Message, SupervisorStats
+
+default_logger = getLogger(__name__)
+
+# A restarted worker which runs longer than this is considered healthy, its restart delay is reset
+HEALTHY_AFTER_SEC = 60
+
+
+class WorkerContext:
+    """Passed to the target coroutine in a worker process."""
+
+    def __init__(self, index: int):
+        # Number of the worker, from 0 to `processes - 1`, the same after restarts
+        self.index = index
+        self.stopping = asyncio.Event()
+        self.counters: Dict[str, float] = {}
+        self._stop_callbacks: List[Callable[[], Any]] = []
+
+    def increment(self, name: str, value: float = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def add_stop_callback(self, callback: Callable[[], Any]):
+        self._stop_callbacks.append(callback)
+
+    def stop(self):
+        if self.stopping.is_set():
+            return
+        self.stopping.set()
+        for callback in self._stop_callbacks:
+            callback()
+
+    async def run(self, runner):
+        """Runs a consumer, or anything else with `run` and `stop` methods, until the worker is stopped."""
+        task = asyncio.ensure_future(runner.run())
+        stopping = asyncio.ensure_future(self.stopping.wait())
+        try:
+            await asyncio.wait({task, stopping}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            stopping.cancel()
+        if not task.done():
+            runner.stop()
+        await task
+
+
+Target = Callable[[WorkerContext], Awaitable[Any]]
+
+
+async def run_worker(target: Target, index: int, stats_queue, stats_interval_sec: float):
+    context = WorkerContext(index=index)
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, context.stop)
+
+    async def report():
+        while True:
+            await asyncio.sleep(stats_interval_sec)
+            stats_queue.put((index, os.getpid(), dict(context.counters)))
+
+    reporter = asyncio.ensure_future(report())
+    try:
+        await target(context)
+    finally:
+        reporter.cancel()
+        stats_queue.put((index, os.getpid(), dict(context.counters)))
+
+
+def worker_main(target: Target, index: int, stats_queue, stats_interval_sec: float, use_uvloop: Optional[bool] = None):
+    speedups.run(
+        run_worker(target=target, index=index, stats_queue=stats_queue, stats_interval_sec=stats_interval_sec),
+        use_uvloop=use_uvloop,
+    )
+
+
+class WorkerSlot:
+    __slots__ = ("index", "process", "started_at", "restart_delay_sec", "restart_at", "finished")
+
+    def __init__(self, index: int, restart_delay_sec: float):
+        self.index = index
+        self.process: Optional[multiprocessing.Process] = None
+        self.started_at = 0.0
+        self.restart_delay_sec = restart_delay_sec
+        # Monotonic time to restart the crashed worker at
+        self.restart_at: Optional[float] = None
+        # The target has returned, the worker is not restarted
+        self.finished = False
+
+
+class Supervisor:
+    """Runs `target` in `processes` worker processes, `os.cpu_count()` by default.
+    The target must be a module-level coroutine function, so it can be passed to a new process.
+
+    `run` blocks until all workers have finished, or until SIGTERM or SIGINT. Then workers get SIGTERM,
+    and those which haven't stopped in `stop_timeout_sec` are killed. A worker which exits with a non-zero code
+    is restarted after `restart_delay_sec`, doubled after every crash up to `max_restart_delay_sec`.
+
+    Workers run uvloop event loops if uvloop is installed, unless `use_uvloop=False`.
+    """
+
+    def __init__(
+        self,
+        target: Target,
+        processes: Optional[int] = None,
+        restart_delay_sec: float = 1,
+        max_restart_delay_sec: float = 60,
+        stop_timeout_sec: float = 30,
+        stats_interval_sec: float = 5,
+        on_stats: Optional[Callable[[SupervisorStats], Any]] = None,
+        start_method: Optional[str] = None,
+        use_uvloop: Optional[bool] = None,
+        logger: Optional[LoggerType] = None,
+    ):
+        self.target = target
+        self.processes = processes or os.cpu_count() or 1
+        self.restart_delay_sec = restart_delay_sec
+        self.max_restart_delay_sec = max_restart_delay_sec
+        self.stop_timeout_sec = stop_timeout_sec
+        self.stats_interval_sec = stats_interval_sec
+        self.on_stats = on_stats
+        if use_uvloop and speedups.uvloop is None:
+            raise RuntimeError("uvloop is not installed")
+        self.use_uvloop = use_uvloop
+        self.logger = logger or default_logger
+        self._context = multiprocessing.get_context(start_method)
+
+        self._slots = [WorkerSlot(index=index, restart_delay_sec=restart_delay_sec) for index in range(self.processes)]
+        self._stopping = threading.Event()
+        self._restarts = 0
+        # The last counters of running workers by index, and the sum of counters of exited processes
+        self._counters: Dict[int, Dict[str, float]] = {}
+        self._retired: Dict[str, float] = {}
+        self._pids: Dict[int, int] = {}
+
+    def stop(self):
+        """Stops all workers gracefully, can be called from a signal handler or another thread."""
+        self._stopping.set()
+
+    def stats(self) -> SupervisorStats:
+        counters = dict(self._retired)
+        for worker_counters in self._counters.values():
+            for name, value in worker_counters.items():
+                counters[name] = counters.get(name, 0) + value
+        return {
+            "processes": self.processes,
+            "alive": sum(1 for slot in self._slots if slot.process is not None and slot.process.is_alive()),
+            "restarts": self._restarts,
+            "counters": counters,
+        }
+
+    def run(self):
+        stats_queue = self._context.Queue()
+        previous_handlers = {}
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                previous_handlers[signum] = signal.signal(signum, lambda *args: self.stop())
+
+        try:
+            for slot in self._slots:
+                self._start(slot=slot, stats_queue=stats_queue)
+            self._supervise(stats_queue=stats_queue)
+        finally:
+            self._shutdown()
+            self._drain(stats_queue=stats_queue)
+            for signum, handler in previous_handlers.items():
+                signal.signal(signum, handler)
+            stats_queue.close()
+
+    def _start(self, slot: WorkerSlot, stats_queue):
+        slot.process = self._context.Process(
+            target=worker_main,
+            kwargs={
+                "target": self.target,
+                "index": slot.index,
+                "stats_queue": stats_queue,
+                "stats_interval_sec": self.stats_interval_sec,
+                "use_uvloop": self.use_uvloop,
+            },
+            name=f"aiosqs-worker-{slot.index}",
+        )
+        slot.process.start()
+        slot.started_at = time.monotonic()
+        slot.restart_at = None
+        self.logger.info("Started worker %s with pid %s", slot.index, slot.process.pid)
+
+    def _supervise(self, stats_queue):
+        next_stats_at = time.monotonic() + self.stats_interval_sec
+        while not self._stopping.is_set():
+            running = [slot.process.sentinel for slot in self._slots if slot.restart_at is None and not slot.finished]
+            if not running and all(slot.finished for slot in self._slots):
+                return
+            wait(running, timeout=0.2)
+            self._drain(stats_queue=stats_queue)
+
+            now = time.monotonic()
+            for slot in self._slots:
+                if slot.finished:
+                    continue
+                if slot.restart_at is not None:
+                    if now >= slot.restart_at and not self._stopping.is_set():
+                        self._restarts += 1
+                        self._start(slot=slot, stats_queue=stats_queue)
+                    continue
+                if slot.process.is_alive():
+                    continue
+
+                exitcode = slot.process.exitcode
+                slot.process.join()
+                if exitcode == 0:
+                    self.logger.info("Worker %s has finished", slot.index)
+                    slot.finished = True
+                    continue
+                if now - slot.started_at >= HEALTHY_AFTER_SEC:
+                    slot.restart_delay_sec = self.restart_delay_sec
+                self.logger.error("Worker %s exited with code %s, restarting in %.1f sec", slot.index, exitcode, slot.restart_delay_sec)
+                slot.restart_at = now + slot.restart_delay_sec
+                slot.restart_delay_sec = min(self.max_restart_delay_sec, slot.restart_delay_sec * 2)
+
+            if self.on_stats and now >= next_stats_at:
+                next_stats_at = now + self.stats_interval_sec
+                self.on_stats(self.stats())
+
+    def _shutdown(self):
+        alive = [slot.process for slot in self._slots if slot.process is not None and slot.process.is_alive()]
+        for process in alive:
+            process.terminate()
+        deadline = time.monotonic() + self.stop_timeout_sec
+        for process in alive:
+            process.join(timeout=max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                self.logger.error("Worker %s hasn't stopped in %s sec, killing it", process.name, self.stop_timeout_sec)
+                process.kill()
+                process.join()
+
+    def _drain(self, stats_queue):
+        while True:
+            try:
+                index, pid, counters = stats_queue.get_nowait()
+            except queue.Empty:
+                return
+            # Counters of a previous process of the slot are kept in the retired sum
+            if self._pids.get(index) not in (None, pid):
+                for name, value in self._counters.pop(index, {}).items():
+                    self._retired[name] = self._retired.get(name, 0) + value
+            self._pids[index] = pid
+            self._counters[index] = counters
+
+
+def process_pool_handler(func: Callable[[Message], Any], executor: Executor) -> Handler:
+    """Returns a consumer handler which runs `func` in the executor, e.g. a `ProcessPoolExecutor`.
+    The message is pickled to the executor, the result or the exception is returned to the consumer,
+    which acknowledges the message in the parent process. `func` must be a module-level function.
+    """
+
+    async def handler(message: Message):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, partial(func, message))
+
+    return handler
@@ -1,17 +1,139 @@
+import asyncio
 import unittest
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
 
+from aiosqs.client import SQSClient
+from aiosqs.exceptions import SQSClientBaseError
+from aiosqs.json_protocol import parse_json_result_response
 from aiosqs.parser import parse_xml_result_response
 from aiosqs.tests.fixtures import load_fixture
+from aiosqs.types import Message
 
 
 class ActionTestCase(unittest.TestCase):
     maxDiff = None
     action: str = None
 
-    def parseXMLResponse(self, fixture_name: str):
+    def parseXMLResponse(self, fixture_name: str, mode: str = "r"):
         self.assertIsNotNone(self.action)
         res = parse_xml_result_response(
+            action=self.action,
+            body=load_fixture(fixture_name, mode=mode),
+        )
+        return res
+
+    def parseJSONResponse(self, fixture_name: str, query_error: str = None):
+        self.assertIsNotNone(self.action)
+        res = parse_json_result_response(
             action=self.action,
             body=load_fixture(fixture_name),
+            query_error=query_error,
         )
         return res
+
+
+class FakeClock:
+    """Monotonic clock which is moved by tests."""
+
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def stub_messages(count: int, body: Optional[str] = None) -> List[Message]:
+    """Messages "0", "1"... with receipt handles "handle-0", "handle-1"..., the body is the number by default."""
+    return [{"MessageId": str(i), "ReceiptHandle": f"handle-{i}", "MD5OfBody": "md5", "Body": body or str(i)} for i in range(count)]
+
+
+class StubSQSClient(SQSClient):
+    """Answers receives and batch requests from memory and records them, for tests of batchers and consumers.
+
+    Receives take `messages` of the queue URL. An entry of a batch request fails with the next code of `errors`
+    for its receipt handle or message body, codes other than "InternalError" are sender faults.
+    The next `receive_errors` receives and the next `request_errors` batch requests raise `SQSClientBaseError`.
+    """
+
+    def __init__(self, messages: Optional[Dict[str, List[Message]]] = None, **kwargs):
+        super().__init__(
+            aws_access_key_id="access_key_id",
+            aws_secret_access_key="secret_access_key",
+            region_name="us-west-2",
+            host="mocked_amazon_host.com",
+            **kwargs,
+        )
+        self.messages: Dict[str, List[Message]] = defaultdict(list, messages or {})
+        self.errors: Dict[str, List[str]] = {}
+        self.receive_errors = 0
+        self.request_errors = 0
+
+        # Requested numbers of messages and wait times of receives by queue URL
+        self.requested: Dict[str, List[int]] = defaultdict(list)
+        self.wait_times: Dict[str, List[int]] = defaultdict(list)
+        self.send_batches: List[List[Dict]] = []
+        self.delete_batches: List[List[str]] = []
+        # Visibility timeouts by receipt handle of every batch
+        self.visibility_batches: List[Dict[str, int]] = []
+        self.deleted: List[str] = []
+        self.visibility: Dict[str, int] = {}
+
+    async def receive_message(
+        self,
+        queue_url: str,
+        max_number_of_messages: int,
+        visibility_timeout: int,
+        wait_time_seconds: int = 0,
+        attribute_names: Optional[List[str]] = None,
+        message_attribute_names: Optional[List[str]] = None,
+        receive_request_attempt_id: Optional[str] = None,
+    ):
+        self.requested[queue_url].append(max_number_of_messages)
+        self.wait_times[queue_url].append(wait_time_seconds)
+        await asyncio.sleep(0.001)
+        if self.receive_errors:
+            self.receive_errors -= 1
+            raise SQSClientBaseError
+        messages = self.messages[queue_url][:max_number_of_messages]
+        del self.messages[queue_url][:max_number_of_messages]
+        return messages or None
+
+    async def send_message_batch(self, queue_url: str, entries: List[Dict]):
+        self.send_batches.append(entries)
+        await asyncio.sleep(0)
+        return self._batch_response(
+            entries=entries,
+            key="MessageBody",
+            result=lambda entry: {"MessageId": f"id-{entry['MessageBody']}", "MD5OfMessageBody": "md5"},
+        )
+
+    async def delete_message_batch(self, queue_url: str, entries: List[Dict]):
+        self.delete_batches.append([entry["ReceiptHandle"] for entry in entries])
+        await asyncio.sleep(0)
+        response = self._batch_response(entries=entries, key="ReceiptHandle")
+        deleted = {result["Id"] for result in response["Successful"]}
+        self.deleted.extend(entry["ReceiptHandle"] for entry in entries if entry["Id"] in deleted)
+        return response
+
+    async def change_message_visibility_batch(self, queue_url: str, entries: List[Dict]):
+        self.visibility_batches.append({entry["ReceiptHandle"]: entry["VisibilityTimeout"] for entry in entries})
+        await asyncio.sleep(0)
+        return self._batch_response(entries=entries, key="ReceiptHandle")
+
+    async def change_message_visibility(self, queue_url: str, receipt_handle: str, visibility_timeout: int):
+        self.visibility[receipt_handle] = visibility_timeout
+
+    def _batch_response(self, entries: List[Dict], key: str, result: Callable[[Dict], Dict] = lambda entry: {}) -> Dict:
+        if self.request_errors:
+            self.request_errors -= 1
+            raise SQSClientBaseError
+
+        successful, failed = [], []
+        for entry in entries:
+            if errors := self.errors.get(entry[key]):
+                code = errors.pop(0)
+                failed.append({"Id": entry["Id"], "Code": code, "Message": code, "SenderFault": code != "InternalError"})
+            else:
+                successful.append({"Id": entry["Id"], **result(entry)})
+        return {"Successful": successful, "Failed": failed}
@@ -1,8 +1,8 @@
 import os
 
 
-def load_fixture(filename: str):
+def load_fixture(filename: str, mode: str = "r"):
     tests_dir = os.path.dirname(os.path.abspath(__file__))
     path = os.path.join(tests_dir, "fixtures", filename)
-    with open(path, "r") as f:
+    with open(path, mode) as f:
         return f.read()
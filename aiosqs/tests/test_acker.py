@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import unittest
+from typing import Dict, List
+
+from aiosqs.acker import Acker, VisibilityChanger
+from aiosqs.exceptions import ErrorData, SQSErrorResponse
+from aiosqs.fake_server import FakeSQSServer
+from aiosqs.tests.cases import StubSQSClient
+
+
+class AckerTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.CRITICAL)
+        self.client = StubSQSClient(logger=self.logger)
+
+    async def asyncTearDown(self):
+        await self.client.close()
+
+    async def test_acks_are_coalesced(self):
+        async with Acker(client=self.client, logger=self.logger) as acker:
+            for i in range(15):
+                await acker.ack(queue_url="queue", receipt_handle=str(i))
+            self.assertEqual(len(self.client.delete_batches), 0)
+
+        self.assertEqual(self.client.delete_batches, [[str(i) for i in range(10)], [str(i) for i in range(10, 15)]])
+        self.assertEqual(acker.pending, 0)
+
+    async def test_only_failed_entries_are_retried(self):
+        self.client.errors = {"b": ["InternalError", "InternalError"]}
+        async with Acker(client=self.client, linger_sec=0.001, logger=self.logger) as acker:
+            results = await asyncio.gather(
+                acker.delete_message(queue_url="queue", receipt_handle="a"),
+                acker.delete_message(queue_url="queue", receipt_handle="b"),
+            )
+
+        self.assertEqual(results, [True, True])
+        self.assertEqual(self.client.delete_batches, [["a", "b"], ["b"], ["b"]])
+
+    async def test_retries_are_limited(self):
+        self.client.errors = {"a": ["InternalError"] * 3}
+        async with Acker(client=self.client, linger_sec=0.001, max_retries=1, logger=self.logger) as acker:
+            with self.assertRaises(SQSErrorResponse) as e:
+                await acker.delete_message(queue_url="queue", receipt_handle="a")
+
+        self.assertEqual(e.exception.error.type, "Receiver")
+        self.assertEqual(self.client.delete_batches, [["a"], ["a"]])
+
+    async def test_request_errors_are_retried(self):
+        self.client.request_errors = 2
+        async with Acker(client=self.client, linger_sec=0.001, logger=self.logger) as acker:
+            self.assertTrue(await acker.delete_message(queue_url="queue", receipt_handle="a"))
+        self.assertEqual(len(self.client.delete_batches), 3)
+
+    async def test_sender_request_errors_are_not_retried(self):
+        error = SQSErrorResponse(
+            error=ErrorData(type="Sender", code="InvalidParameterValue", message="Invalid"), request_id=None, status_code=400
+        )
+
+        async def delete_message_batch(queue_url: str, entries: List[Dict]):
+            self.client.delete_batches.append([entry["ReceiptHandle"] for entry in entries])
+            raise error
+
+        self.client.delete_message_batch = delete_message_batch
+        async with Acker(client=self.client, linger_sec=0.001, logger=self.logger) as acker:
+            with self.assertRaises(SQSErrorResponse):
+                await acker.delete_message(queue_url="queue", receipt_handle="a")
+        self.assertEqual(len(self.client.delete_batches), 1)
+
+    async def test_expired_receipt_handle_is_ignored(self):
+        self.client.errors = {"a": ["ReceiptHandleIsInvalid"]}
+        async with Acker(client=self.client, linger_sec=0.001, logger=self.logger) as acker:
+            self.assertFalse(await acker.delete_message(queue_url="queue", receipt_handle="a"))
+        self.assertEqual(len(self.client.delete_batches), 1)
+
+    async def test_expired_receipt_handle_is_raised(self):
+        self.client.errors = {"a": ["ReceiptHandleIsInvalid"]}
+        async with Acker(client=self.client, linger_sec=0.001, on_expired="raise", logger=self.logger) as acker:
+            with self.assertRaises(SQSErrorResponse) as e:
+                await acker.delete_message(queue_url="queue", receipt_handle="a")
+        self.assertEqual(e.exception.error.code, "ReceiptHandleIsInvalid")
+
+    async def test_sender_errors_are_not_retried(self):
+        self.client.errors = {"a": ["InvalidIdFormat"]}
+        async with Acker(client=self.client, linger_sec=0.001, logger=self.logger) as acker:
+            await acker.ack(queue_url="queue", receipt_handle="a")
+        self.assertEqual(len(self.client.delete_batches), 1)
+
+
+class AckerServerTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = FakeSQSServer()
+        await self.server.start()
+        self.addAsyncCleanup(self.server.close)
+        self.client = self.server.client()
+        self.addAsyncCleanup(self.client.close)
+        self.queue_url = self.server.create_queue("queue")
+
+    async def test_unavailable_service_is_retried(self):
+        await self.client.send_message(queue_url=self.queue_url, message_body="body")
+        messages = await self.client.receive_message(queue_url=self.queue_url, max_number_of_messages=1, visibility_timeout=30)
+        self.server.fail_next(code="ServiceUnavailable", status=503, action="DeleteMessageBatch")
+        self.server.fail_next(code="ThrottlingException", status=400, action="DeleteMessageBatch")
+
+        async with Acker(client=self.client, linger_sec=0.001) as acker:
+            await acker.ack(queue_url=self.queue_url, receipt_handle=messages[0]["ReceiptHandle"])
+
+        self.assertEqual(self.server.requests["DeleteMessageBatch"], 3)
+        self.assertEqual(len(self.server.queue("queue")), 0)
+
+
+class VisibilityChangerTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.logger = logging.getLogger(__name__)
+        self.client = StubSQSClient(logger=self.logger)
+
+    async def asyncTearDown(self):
+        await self.client.close()
+
+    async def test_releases_are_coalesced(self):
+        async with VisibilityChanger(client=self.client, logger=self.logger) as changer:
+            for i in range(12):
+                await changer.release(queue_url="queue", receipt_handle=str(i))
+            await changer.change_message_visibility(queue_url="queue", receipt_handle="a", visibility_timeout=30)
+
+        self.assertEqual(
+            self.client.visibility_batches,
+            [{str(i): 0 for i in range(10)}, {"10": 0, "11": 0, "a": 30}],
+        )
+
+    async def test_errors_are_logged(self):
+        self.client.errors = {"a": ["ReceiptHandleIsInvalid", "ReceiptHandleIsInvalid"]}
+        async with VisibilityChanger(client=self.client, logger=self.logger) as changer:
+            with self.assertRaises(SQSErrorResponse):
+                await changer.change_message_visibility(queue_url="queue", receipt_handle="a", visibility_timeout=30)
+            with self.assertLogs(self.logger, level=logging.ERROR):
+                await changer.release(queue_url="queue", receipt_handle="a")
+                await changer.flush()
+        self.assertEqual(len(self.client.visibility_batches), 2)
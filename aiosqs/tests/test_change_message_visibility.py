@@ -0,0 +1,13 @@
+from aiosqs.tests.cases import ActionTestCase
+
+
+class ChangeMessageVisibilityTestCase(ActionTestCase):
+    action = "ChangeMessageVisibility"
+
+    def test_change_message_visibility_ok(self):
+        res = self.parseXMLResponse("change_message_visibility.xml")
+        self.assertIsNone(res)
+
+    def test_change_message_visibility_json(self):
+        res = self.parseJSONResponse("receive_message_empty.json")
+        self.assertIsNone(res)
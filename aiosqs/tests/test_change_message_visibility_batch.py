@@ -0,0 +1,22 @@
+from aiosqs.tests.cases import ActionTestCase
+
+
+class ChangeMessageVisibilityBatchTestCase(ActionTestCase):
+    action = "ChangeMessageVisibilityBatch"
+
+    def test_partial_failure(self):
+        res = self.parseXMLResponse("change_message_visibility_batch.xml")
+        self.assertEqual(
+            res,
+            {
+                "Successful": [{"Id": "change_visibility_msg_2"}],
+                "Failed": [
+                    {
+                        "Id": "change_visibility_msg_3",
+                        "Code": "ReceiptHandleIsInvalid",
+                        "Message": "The input receipt handle is invalid.",
+                        "SenderFault": True,
+                    },
+                ],
+            },
+        )
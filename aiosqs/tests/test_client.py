@@ -1,14 +1,22 @@
+import json
 import unittest
 import re
 import logging
 import urllib.parse
 
+import aiohttp
 import ddt
+from aiohttp import web
+from aiohttp.test_utils import TestServer
 from freezegun import freeze_time
 from aioresponses import aioresponses
+from yarl import URL
 
-from aiosqs.exceptions import SQSErrorResponse
+from aiosqs.exceptions import SQSClientBaseError, SQSErrorResponse
+from aiosqs import json_protocol
 from aiosqs.client import SQSClient
+from aiosqs.encryption import get_signature_key
+from aiosqs.parser import LOGGED_BODY_LIMIT
 from aiosqs.tests.fixtures import load_fixture
 
 
@@ -72,6 +80,32 @@ class DefaultClientTestCase(unittest.IsolatedAsyncioTestCase):
             response = await client.get_queue_url(queue_name="mocked_queue_name")
             self.assertEqual(response, {"QueueUrl": "http://sqs.mcs.mail.ru/account123/example_queue"})
 
+    @aioresponses()
+    async def test_receive_message_with_attributes(self, mock):
+        mock.get(
+            url=re.compile(r"https://mocked_amazon_host.com"),
+            status=200,
+            body=load_fixture("receive_message_attributes.xml"),
+        )
+
+        response = await self.client.receive_message(
+            queue_url="http://host.com/internal/tests",
+            max_number_of_messages=1,
+            visibility_timeout=30,
+            attribute_names=["ApproximateReceiveCount"],
+            message_attribute_names=["city", "count"],
+            receive_request_attempt_id="attempt-1",
+        )
+        self.assertEqual(response[0]["Attributes"]["ApproximateReceiveCount"], "5")
+        self.assertEqual(response[0]["MessageAttributes"]["city"], "Any City")
+
+        ((_, request_url),) = mock.requests.keys()
+        query = request_url.query
+        self.assertEqual(query["AttributeName.1"], "ApproximateReceiveCount")
+        self.assertEqual(query["MessageAttributeName.1"], "city")
+        self.assertEqual(query["MessageAttributeName.2"], "count")
+        self.assertEqual(query["ReceiveRequestAttemptId"], "attempt-1")
+
     @ddt.data(
         ("error_invalid_access_key.xml", "key_id is invalid"),
         ("error_invalid_secret_key.xml", "The security token included in the request is invalid."),
@@ -211,3 +245,474 @@ class VKClientTestCase(DefaultClientTestCase):
             signed_request.querystring,
             "Action=SendMessage&DelaySeconds=0&MessageBody=a+++++b++++c+++++d&QueueUrl=http%3A%2F%2Fhost.com%2Finternal%2Ftests&Version=2012-11-05",
         )
+
+
+@ddt.ddt(testNameFormat=ddt.TestNameFormat.INDEX_ONLY)
+class SignatureTestCase(unittest.IsolatedAsyncioTestCase):
+    """Signatures below were produced by the signer before signing keys were cached."""
+
+    def create_client(self, **kwargs) -> SQSClient:
+        client = SQSClient(
+            aws_access_key_id="access_key_id",
+            aws_secret_access_key="secret_access_key",
+            region_name="us-west-2",
+            host="mocked_amazon_host.com",
+            timeout_sec=0,
+            **kwargs,
+        )
+        self.addAsyncCleanup(client.close)
+        return client
+
+    @ddt.data(
+        (
+            {},
+            "2022-03-07T11:30:00",
+            {"Action": "GetQueueUrl", "QueueName": "orders", "Version": "2012-11-05"},
+            "9c8eac7022935ca4654342171d62ac5ca262ea55fe9d2399f075db1da32c4665",
+            "Action=GetQueueUrl&QueueName=orders&Version=2012-11-05",
+        ),
+        (
+            {"aws_session_token": "session_token_123"},
+            "2022-03-07T23:59:59",
+            {
+                "Action": "ReceiveMessage",
+                "MaxNumberOfMessages": 10,
+                "QueueUrl": "https://sqs.us-west-2.amazonaws.com/123/q",
+                "VisibilityTimeout": 30,
+                "WaitTimeSeconds": 20,
+                "Version": "2012-11-05",
+            },
+            "d4f4563320ec690282423e05898c065c725b3f2dd139ed1a049579d386536b0a",
+            (
+                "Action=ReceiveMessage&MaxNumberOfMessages=10&QueueUrl=https%3A%2F%2Fsqs.us-west-2.amazonaws.com%2F123%2Fq"
+                "&Version=2012-11-05&VisibilityTimeout=30&WaitTimeSeconds=20"
+            ),
+        ),
+        (
+            {"quote_via": urllib.parse.quote_plus},
+            "2022-03-08T00:00:00",
+            {
+                "Action": "SendMessage",
+                "DelaySeconds": 0,
+                "MessageBody": 'привет мир & {"a": 1}',
+                "QueueUrl": "http://host.com/internal/tests",
+                "Version": "2012-11-05",
+            },
+            "d63f7ea1f890e824c22cb26e754af29e4d0563bc4e65cf3f44c4d6033c067ab1",
+            (
+                "Action=SendMessage&DelaySeconds=0&MessageBody=%D0%BF%D1%80%D0%B8%D0%B2%D0%B5%D1%82+%D0%BC%D0%B8%D1%80+%26+%7B%22a%22%3A+1%7D"
+                "&QueueUrl=http%3A%2F%2Fhost.com%2Finternal%2Ftests&Version=2012-11-05"
+            ),
+        ),
+    )
+    @ddt.unpack
+    async def test_signature_is_unchanged(self, client_kwargs: dict, now: str, params: dict, signature: str, querystring: str):
+        client = self.create_client(**client_kwargs)
+        # Sign twice to make sure the cached signing key gives the same result
+        for _ in range(2):
+            with freeze_time(now):
+                signed_request = client.build_signed_request(params=params)
+            self.assertTrue(signed_request.headers["Authorization"].endswith(f"Signature={signature}"))
+            self.assertEqual(signed_request.querystring, querystring)
+
+    async def test_signing_key_is_cached(self):
+        client = self.create_client()
+        params = {"Action": "GetQueueUrl", "QueueName": "orders"}
+
+        with freeze_time("2022-03-07T11:30:00"):
+            client.build_signed_request(params=params)
+        signing_key = client.get_signing_key(date_stamp="20220307")
+
+        with freeze_time("2022-03-07T23:59:59"):
+            client.build_signed_request(params=params)
+        self.assertIs(client.get_signing_key(date_stamp="20220307"), signing_key)
+
+    async def test_signing_key_rotates_at_midnight(self):
+        client = self.create_client()
+        params = {"Action": "GetQueueUrl", "QueueName": "orders"}
+
+        with freeze_time("2022-03-07T23:59:59"):
+            client.build_signed_request(params=params)
+        with freeze_time("2022-03-08T00:00:00"):
+            signed_request = client.build_signed_request(params=params)
+
+        self.assertEqual(client._signing_key_cache[0], "20220308")
+        self.assertEqual(
+            client._signing_key_cache[2],
+            get_signature_key(
+                aws_secret_access_key="secret_access_key",
+                date_stamp="20220308",
+                region_name="us-west-2",
+                service_name="sqs",
+            ),
+        )
+        self.assertIn("Credential=access_key_id/20220308/us-west-2/sqs/aws4_request", signed_request.headers["Authorization"])
+
+    async def test_signing_key_rotates_with_credentials(self):
+        client = self.create_client()
+        old_signing_key = client.get_signing_key(date_stamp="20220307")
+
+        client.aws_secret_access_key = "new_secret_access_key"
+        new_signing_key = client.get_signing_key(date_stamp="20220307")
+
+        self.assertNotEqual(old_signing_key, new_signing_key)
+        self.assertEqual(
+            new_signing_key,
+            get_signature_key(
+                aws_secret_access_key="new_secret_access_key",
+                date_stamp="20220307",
+                region_name="us-west-2",
+                service_name="sqs",
+            ),
+        )
+
+
+class PostClientTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.CRITICAL)
+
+        self.client = SQSClient(
+            aws_access_key_id="access_key_id",
+            aws_secret_access_key="secret_access_key",
+            region_name="us-west-2",
+            host="mocked_amazon_host.com",
+            timeout_sec=0,
+            logger=self.logger,
+            http_method="POST",
+        )
+
+    async def asyncTearDown(self):
+        await self.client.close()
+
+    def test_signature_with_body(self):
+        params = {
+            "Action": "SendMessage",
+            "DelaySeconds": 0,
+            "MessageBody": "a     b    c     d",
+            "QueueUrl": "http://host.com/internal/tests",
+            "Version": "2012-11-05",
+        }
+        with freeze_time("2022-03-07T11:30:00.0000"):
+            signed_request = self.client.build_signed_request(params=params)
+
+        self.assertEqual(
+            signed_request.headers,
+            {
+                "x-amz-date": "20220307T113000Z",
+                "Authorization": "AWS4-HMAC-SHA256 Credential=access_key_id/20220307/us-west-2/sqs/aws4_request, SignedHeaders=host;x-amz-date, Signature=adf1e4d85ec98e184efea8574445b451d0f0a69e88542930a02a1f809cdd3402",
+                "content-type": "application/x-www-form-urlencoded",
+            },
+        )
+        self.assertEqual(signed_request.querystring, "")
+        self.assertEqual(
+            signed_request.body,
+            b"Action=SendMessage&DelaySeconds=0&MessageBody=a%20%20%20%20%20b%20%20%20%20c%20%20%20%20%20d&QueueUrl=http%3A%2F%2Fhost.com%2Finternal%2Ftests&Version=2012-11-05",
+        )
+
+    @aioresponses()
+    async def test_send_message_in_body(self, mock):
+        mock.post(
+            url="https://mocked_amazon_host.com",
+            status=200,
+            body=load_fixture("send_message.xml"),
+        )
+
+        message_body = "x" * 64 * 1024
+        response = await self.client.send_message(queue_url="http://host.com/internal/tests", message_body=message_body)
+        self.assertEqual(response["MessageId"], "acdf9b7f-a639-4a5b-9557-b4de52a56d01")
+
+        [request] = mock.requests[("POST", URL("https://mocked_amazon_host.com"))]
+        data = request.kwargs["data"]
+        self.assertIsInstance(data, bytes)
+        self.assertEqual(urllib.parse.parse_qs(data.decode())["MessageBody"], [message_body])
+
+    async def test_unsupported_http_method(self):
+        with self.assertRaises(ValueError):
+            SQSClient(
+                aws_access_key_id="access_key_id",
+                aws_secret_access_key="secret_access_key",
+                region_name="us-west-2",
+                host="mocked_amazon_host.com",
+                http_method="PUT",
+            )
+
+
+class JSONClientTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.CRITICAL)
+
+        self.client = SQSClient(
+            aws_access_key_id="access_key_id",
+            aws_secret_access_key="secret_access_key",
+            region_name="us-west-2",
+            host="mocked_amazon_host.com",
+            timeout_sec=0,
+            logger=self.logger,
+            protocol="json",
+        )
+
+    async def asyncTearDown(self):
+        await self.client.close()
+
+    def test_signed_request(self):
+        params = {
+            "Action": "ReceiveMessage",
+            "QueueUrl": "http://host.com/internal/tests",
+            "MaxNumberOfMessages": 10,
+            "VisibilityTimeout": "30",
+            "WaitTimeSeconds": 20,
+            "Version": "2012-11-05",
+        }
+        with freeze_time("2022-03-07T11:30:00.0000"):
+            signed_request = self.client.build_signed_request(params=params)
+
+        self.assertEqual(signed_request.headers["content-type"], "application/x-amz-json-1.0")
+        self.assertEqual(signed_request.headers["x-amz-target"], "AmazonSQS.ReceiveMessage")
+        self.assertEqual(signed_request.querystring, "")
+        self.assertEqual(
+            json.loads(signed_request.body),
+            {
+                "QueueUrl": "http://host.com/internal/tests",
+                "MaxNumberOfMessages": 10,
+                "VisibilityTimeout": 30,
+                "WaitTimeSeconds": 20,
+            },
+        )
+
+    def test_signed_request_with_attribute_names(self):
+        params = {
+            "Action": "ReceiveMessage",
+            "QueueUrl": "http://host.com/internal/tests",
+            "AttributeName.1": "ApproximateReceiveCount",
+            "AttributeName.2": "SentTimestamp",
+            "MessageAttributeName.1": "All",
+            "ReceiveRequestAttemptId": "attempt-1",
+            "Version": "2012-11-05",
+        }
+        signed_request = self.client.build_signed_request(params=params)
+        self.assertEqual(
+            json.loads(signed_request.body),
+            {
+                "QueueUrl": "http://host.com/internal/tests",
+                "AttributeNames": ["ApproximateReceiveCount", "SentTimestamp"],
+                "MessageAttributeNames": ["All"],
+                "ReceiveRequestAttemptId": "attempt-1",
+            },
+        )
+
+    @aioresponses()
+    async def test_receive_message(self, mock):
+        mock.post(
+            url="https://mocked_amazon_host.com",
+            status=200,
+            body=load_fixture("receive_messages.json"),
+        )
+
+        response = await self.client.receive_message(
+            queue_url="http://host.com/internal/tests",
+            max_number_of_messages=10,
+            visibility_timeout=30,
+        )
+        self.assertEqual(len(response), 2)
+        self.assertEqual(response[0]["ReceiptHandle"], "1668283200-b0eef428-d880-46fd-9c88-58882a421937")
+
+    @aioresponses()
+    async def test_delete_message(self, mock):
+        mock.post(
+            url="https://mocked_amazon_host.com",
+            status=200,
+            body="{}",
+        )
+
+        response = await self.client.delete_message(queue_url="http://host.com/internal/tests", receipt_handle="handle")
+        self.assertIsNone(response)
+
+    @aioresponses()
+    async def test_error_response(self, mock):
+        mock.post(
+            url="https://mocked_amazon_host.com",
+            status=400,
+            body=load_fixture("error_non_existent_queue.json"),
+            headers={
+                "x-amzn-RequestId": "42d59b56-7407-4c4a-be0f-4c88daeea257",
+                "x-amzn-query-error": "AWS.SimpleQueueService.NonExistentQueue;Sender",
+            },
+        )
+
+        with self.assertRaises(SQSErrorResponse) as e:
+            await self.client.get_queue_url(queue_name="ErrorDoesNotExistName")
+        exception = e.exception
+        self.assertEqual(exception.request_id, "42d59b56-7407-4c4a-be0f-4c88daeea257")
+        self.assertEqual(exception.error.type, "Sender")
+        self.assertEqual(exception.error.code, "AWS.SimpleQueueService.NonExistentQueue")
+        self.assertEqual(exception.error.message, "The specified queue does not exist.")
+
+    @aioresponses()
+    async def test_error_body_is_logged_as_text(self, mock):
+        body = "Сервис недоступен " * 100
+        mock.post(url="https://mocked_amazon_host.com", status=503, body=body)
+
+        with self.assertLogs(self.logger, level=logging.ERROR) as logs:
+            with self.assertRaises(SQSClientBaseError):
+                await self.client.get_queue_url(queue_name="example_queue")
+        (message,) = [record.getMessage() for record in logs.records if "SQS API error" in record.getMessage()]
+        self.assertIn("status_code=503", message)
+        self.assertIn("Сервис недоступен", message)
+        self.assertNotIn("b'", message)
+        self.assertLess(len(message), LOGGED_BODY_LIMIT + 100)
+
+
+class BatchClientTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.CRITICAL)
+
+        self.client = SQSClient(
+            aws_access_key_id="access_key_id",
+            aws_secret_access_key="secret_access_key",
+            region_name="us-west-2",
+            host="mocked_amazon_host.com",
+            timeout_sec=0,
+            logger=self.logger,
+        )
+
+    async def asyncTearDown(self):
+        await self.client.close()
+
+    @aioresponses()
+    async def test_send_message_batch_params(self, mock):
+        mock.get(
+            url=re.compile(r"https://mocked_amazon_host.com"),
+            status=200,
+            body=load_fixture("send_message_batch.xml"),
+        )
+
+        response = await self.client.send_message_batch(
+            queue_url="http://host.com/internal/tests",
+            entries=[
+                {"Id": "test_msg_001", "MessageBody": "a b"},
+                {"Id": "test_msg_002", "MessageBody": "c", "DelaySeconds": 5},
+                {"Id": "test_msg_003", "MessageBody": "d"},
+            ],
+        )
+        self.assertEqual([entry["Id"] for entry in response["Successful"]], ["test_msg_001", "test_msg_003"])
+        self.assertEqual([entry["Id"] for entry in response["Failed"]], ["test_msg_002"])
+
+        [(_, url)] = mock.requests.keys()
+        self.assertEqual(
+            dict(url.query),
+            {
+                "Action": "SendMessageBatch",
+                "QueueUrl": "http://host.com/internal/tests",
+                "SendMessageBatchRequestEntry.1.Id": "test_msg_001",
+                "SendMessageBatchRequestEntry.1.MessageBody": "a b",
+                "SendMessageBatchRequestEntry.2.Id": "test_msg_002",
+                "SendMessageBatchRequestEntry.2.MessageBody": "c",
+                "SendMessageBatchRequestEntry.2.DelaySeconds": "5",
+                "SendMessageBatchRequestEntry.3.Id": "test_msg_003",
+                "SendMessageBatchRequestEntry.3.MessageBody": "d",
+                "Version": "2012-11-05",
+            },
+        )
+
+    async def test_batch_size_is_checked(self):
+        with self.assertRaises(ValueError):
+            await self.client.delete_message_batch(queue_url="http://host.com/internal/tests", entries=[])
+
+        entries = [{"Id": str(i), "ReceiptHandle": str(i), "VisibilityTimeout": 0} for i in range(11)]
+        with self.assertRaises(ValueError):
+            await self.client.change_message_visibility_batch(queue_url="http://host.com/internal/tests", entries=entries)
+
+    def test_json_batch_payload(self):
+        self.assertEqual(
+            json_protocol.build_json_payload(
+                params={
+                    "Action": "ChangeMessageVisibilityBatch",
+                    "QueueUrl": "http://host.com/internal/tests",
+                    "ChangeMessageVisibilityBatchRequestEntry.2.Id": "2",
+                    "ChangeMessageVisibilityBatchRequestEntry.2.ReceiptHandle": "handle_2",
+                    "ChangeMessageVisibilityBatchRequestEntry.2.VisibilityTimeout": "60",
+                    "ChangeMessageVisibilityBatchRequestEntry.1.Id": "1",
+                    "ChangeMessageVisibilityBatchRequestEntry.1.ReceiptHandle": "handle_1",
+                    "ChangeMessageVisibilityBatchRequestEntry.1.VisibilityTimeout": 30,
+                    "Version": "2012-11-05",
+                }
+            ),
+            {
+                "QueueUrl": "http://host.com/internal/tests",
+                "Entries": [
+                    {"Id": "1", "ReceiptHandle": "handle_1", "VisibilityTimeout": 30},
+                    {"Id": "2", "ReceiptHandle": "handle_2", "VisibilityTimeout": 60},
+                ],
+            },
+        )
+
+
+class ConnectionPoolTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.CRITICAL)
+
+        app = web.Application()
+        app.router.add_get("/", self.handle)
+        self.server = TestServer(app)
+        await self.server.start_server()
+
+    async def asyncTearDown(self):
+        await self.server.close()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        return web.Response(body=load_fixture("get_queue_url.xml"), content_type="text/xml")
+
+    def create_client(self, **kwargs) -> SQSClient:
+        client = SQSClient(
+            aws_access_key_id="access_key_id",
+            aws_secret_access_key="secret_access_key",
+            region_name="us-west-2",
+            host=f"{self.server.host}:{self.server.port}",
+            logger=self.logger,
+            **kwargs,
+        )
+        client.endpoint_url = str(self.server.make_url("/"))
+        return client
+
+    async def test_connector_options(self):
+        client = self.create_client(connection_limit=5, connection_limit_per_host=2, keepalive_timeout=30)
+        self.assertEqual(client.session.connector.limit, 5)
+        self.assertEqual(client.session.connector.limit_per_host, 2)
+        await client.close()
+        self.assertTrue(client.session.closed)
+
+    async def test_pool_stats(self):
+        async with self.create_client() as client:
+            self.assertEqual(client.pool_stats()["open"], 0)
+            await client.get_queue_url(queue_name="example_queue")
+            self.assertEqual(
+                client.pool_stats(),
+                {"limit": 100, "limit_per_host": 0, "open": 1, "acquired": 0, "idle": 1, "waiting": 0},
+            )
+
+    async def test_shared_connector_is_not_closed(self):
+        connector = aiohttp.TCPConnector(limit=10)
+        try:
+            async with self.create_client(connector=connector) as client_1, self.create_client(connector=connector) as client_2:
+                await client_1.get_queue_url(queue_name="example_queue")
+                await client_2.get_queue_url(queue_name="example_queue")
+                self.assertEqual(client_1.pool_stats()["open"], 1)
+
+            self.assertFalse(connector.closed)
+        finally:
+            await connector.close()
+
+    async def test_external_session_is_not_closed(self):
+        session = aiohttp.ClientSession()
+        self.addAsyncCleanup(session.close)
+
+        async with self.create_client(session=session) as client:
+            self.assertIs(client.session, session)
+            response = await client.get_queue_url(queue_name="example_queue")
+            self.assertEqual(response, {"QueueUrl": "http://sqs.mcs.mail.ru/account123/example_queue"})
+
+        self.assertFalse(session.closed)
@@ -0,0 +1,222 @@
+import json
+import logging
+import re
+import unittest
+import urllib.parse
+
+from aioresponses import aioresponses
+
+from aiosqs import json_protocol
+from aiosqs.attributes import MessageAttributes
+from aiosqs.client import SQSClient
+from aiosqs.codecs import (
+    BytesCodec,
+    Codec,
+    JSONCodec,
+    PayloadCodec,
+    TextCodec,
+    ZlibCompressor,
+    ZstdCompressor,
+    zstd,
+    zstandard,
+)
+from aiosqs.tests.fixtures import load_fixture
+
+
+def encoded_message(body, attributes) -> dict:
+    """Message as it's received, with the attributes of the codec."""
+    if isinstance(body, bytes):
+        body = body.decode("utf-8")
+    raw = {name: (value["DataType"], value["StringValue"]) for name, value in attributes.items()}
+    return {"MessageId": "1", "Body": body, "MessageAttributes": MessageAttributes(raw)}
+
+
+class PayloadCodecTestCase(unittest.TestCase):
+    def roundtrip(self, codec: PayloadCodec, payload):
+        body, attributes = codec.encode(payload)
+        return codec.decode(encoded_message(body=body, attributes=attributes))
+
+    def test_json(self):
+        codec = PayloadCodec()
+        body, attributes = codec.encode({"test": "Привет"})
+        self.assertEqual(json.loads(body), {"test": "Привет"})
+        self.assertEqual(attributes, {"aiosqs.content-type": {"DataType": "String", "StringValue": "json"}})
+        self.assertEqual(self.roundtrip(codec, {"test": "Привет"}), {"test": "Привет"})
+
+    def test_text(self):
+        codec = PayloadCodec(codec=TextCodec())
+        self.assertEqual(codec.encode(" a b ")[0], " a b ")
+        self.assertEqual(self.roundtrip(codec, " a b "), " a b ")
+
+    def test_bytes_are_sent_as_base64(self):
+        codec = PayloadCodec(codec=BytesCodec())
+        body, attributes = codec.encode(b"\x00\xff")
+        self.assertEqual(body, b"AP8=")
+        self.assertEqual(attributes["aiosqs.content-encoding"]["StringValue"], "base64")
+        self.assertEqual(self.roundtrip(codec, b"\x00\xff"), b"\x00\xff")
+
+    def test_compression_above_threshold(self):
+        codec = PayloadCodec(compressor=ZlibCompressor(), compress_min_bytes=100)
+        payload = {"items": ["value"] * 100}
+        body, attributes = codec.encode(payload)
+        self.assertEqual(attributes["aiosqs.content-encoding"]["StringValue"], "zlib")
+        self.assertLess(len(body), len(json.dumps(payload)))
+        self.assertEqual(self.roundtrip(codec, payload), payload)
+
+    def test_no_compression_below_threshold(self):
+        codec = PayloadCodec(compressor=ZlibCompressor(), compress_min_bytes=100)
+        body, attributes = codec.encode({"items": ["value"] * 5})
+        self.assertNotIn("aiosqs.content-encoding", attributes)
+        self.assertEqual(json.loads(body), {"items": ["value"] * 5})
+
+    def test_no_compression_if_not_smaller(self):
+        codec = PayloadCodec(codec=TextCodec(), compressor=ZlibCompressor(), compress_min_bytes=1)
+        body, attributes = codec.encode("abc")
+        self.assertEqual(body, "abc")
+        self.assertNotIn("aiosqs.content-encoding", attributes)
+
+    @unittest.skipIf(zstd is None and zstandard is None, "zstd is not installed")
+    def test_zstd(self):
+        codec = PayloadCodec(compressor=ZstdCompressor(), compress_min_bytes=100)
+        payload = {"items": ["value"] * 100}
+        body, attributes = codec.encode(payload)
+        self.assertEqual(attributes["aiosqs.content-encoding"]["StringValue"], "zstd")
+        # Decoded by a codec without the compressor, all available compressors are used for decoding
+        self.assertEqual(PayloadCodec().decode(encoded_message(body=body, attributes=attributes)), payload)
+
+    def test_message_without_attributes(self):
+        self.assertEqual(PayloadCodec().decode({"MessageId": "1", "Body": "plain"}), "plain")
+
+    def test_unknown_codec(self):
+        message = encoded_message(body="{}", attributes={"aiosqs.content-type": {"DataType": "String", "StringValue": "yaml"}})
+        with self.assertRaises(ValueError):
+            PayloadCodec().decode(message)
+
+
+class CodecClientTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.CRITICAL)
+
+        self.client = SQSClient(
+            aws_access_key_id="access_key_id",
+            aws_secret_access_key="secret_access_key",
+            region_name="us-west-2",
+            host="mocked_amazon_host.com",
+            timeout_sec=0,
+            logger=self.logger,
+            codec=PayloadCodec(codec=JSONCodec(), compressor=ZlibCompressor(), compress_min_bytes=10),
+        )
+
+    async def asyncTearDown(self):
+        await self.client.close()
+
+    @aioresponses()
+    async def test_send_message(self, mock):
+        mock.get(
+            url=re.compile(r"https://mocked_amazon_host.com"),
+            status=200,
+            body=load_fixture("send_message.xml"),
+        )
+
+        await self.client.send_message(
+            queue_url="http://host.com/internal/tests",
+            message_body={"items": ["x"] * 20},
+            message_attributes={"trace": {"DataType": "Binary", "BinaryValue": b"\x00\x01"}},
+        )
+
+        ((_, request_url),) = mock.requests.keys()
+        query = urllib.parse.parse_qs(request_url.raw_query_string)
+        self.assertEqual(query["MessageBody"], ["eJyrVsosSc0tVrKKVqpQ0qEijq0FACAgFkU="])
+        self.assertEqual(query["MessageAttribute.1.Name"], ["trace"])
+        self.assertEqual(query["MessageAttribute.1.Value.DataType"], ["Binary"])
+        self.assertEqual(query["MessageAttribute.1.Value.BinaryValue"], ["AAE="])
+        self.assertEqual(query["MessageAttribute.2.Name"], ["aiosqs.content-type"])
+        self.assertEqual(query["MessageAttribute.2.Value.StringValue"], ["json"])
+        self.assertEqual(query["MessageAttribute.3.Name"], ["aiosqs.content-encoding"])
+        self.assertEqual(query["MessageAttribute.3.Value.StringValue"], ["zlib"])
+
+    @aioresponses()
+    async def test_receive_message(self, mock):
+        mock.get(
+            url=re.compile(r"https://mocked_amazon_host.com"),
+            status=200,
+            body=load_fixture("receive_message_codec.xml"),
+        )
+
+        response = await self.client.receive_message(
+            queue_url="http://host.com/internal/tests",
+            max_number_of_messages=2,
+            visibility_timeout=30,
+        )
+        self.assertEqual(response[0]["Payload"], {"items": ["x"] * 20})
+        # Messages sent without the codec are returned as is, the body isn't stripped
+        self.assertEqual(response[1]["Payload"], " plain text ")
+
+        ((_, request_url),) = mock.requests.keys()
+        self.assertEqual(request_url.query["MessageAttributeName.1"], "aiosqs.content-type")
+        self.assertEqual(request_url.query["MessageAttributeName.2"], "aiosqs.content-encoding")
+
+    async def test_undecodable_message_does_not_fail_batch(self):
+        content_type = {"aiosqs.content-type": {"DataType": "String", "StringValue": "json"}}
+        messages = [
+            encoded_message(body='{"a": 1}', attributes=content_type),
+            encoded_message(body="{}", attributes={"aiosqs.content-type": {"DataType": "String", "StringValue": "yaml"}}),
+            encoded_message(
+                body="not base64!", attributes={**content_type, "aiosqs.content-encoding": {"DataType": "String", "StringValue": "zlib"}}
+            ),
+        ]
+
+        async def request(params):
+            return messages
+
+        self.client.request = request
+        response = await self.client.receive_message(
+            queue_url="http://host.com/internal/tests", max_number_of_messages=3, visibility_timeout=30
+        )
+        self.assertEqual(response[0]["Payload"], {"a": 1})
+        for message in response[1:]:
+            self.assertNotIn("Payload", message)
+            self.assertIsInstance(message["PayloadError"], ValueError)
+
+    def test_codecs_must_implement_methods(self):
+        class HalfCodec(Codec):
+            def dumps(self, payload):
+                return payload
+
+        with self.assertRaises(TypeError):
+            HalfCodec()
+
+    def test_json_payload_with_message_attributes(self):
+        self.assertEqual(
+            json_protocol.build_json_payload(
+                params={
+                    "Action": "SendMessageBatch",
+                    "QueueUrl": "http://host.com/internal/tests",
+                    "SendMessageBatchRequestEntry.1.Id": "1",
+                    "SendMessageBatchRequestEntry.1.MessageBody": b"eJyrVsosSc0tVrKKVqpQ0qEijq0FACAgFkU=",
+                    "SendMessageBatchRequestEntry.1.DelaySeconds": 0,
+                    "SendMessageBatchRequestEntry.1.MessageAttribute.1.Name": "aiosqs.content-type",
+                    "SendMessageBatchRequestEntry.1.MessageAttribute.1.Value.DataType": "String",
+                    "SendMessageBatchRequestEntry.1.MessageAttribute.1.Value.StringValue": "json",
+                    "SendMessageBatchRequestEntry.1.MessageAttribute.2.Name": "trace",
+                    "SendMessageBatchRequestEntry.1.MessageAttribute.2.Value.DataType": "Binary",
+                    "SendMessageBatchRequestEntry.1.MessageAttribute.2.Value.BinaryValue": b"AAE=",
+                    "Version": "2012-11-05",
+                }
+            ),
+            {
+                "QueueUrl": "http://host.com/internal/tests",
+                "Entries": [
+                    {
+                        "Id": "1",
+                        "MessageBody": "eJyrVsosSc0tVrKKVqpQ0qEijq0FACAgFkU=",
+                        "DelaySeconds": 0,
+                        "MessageAttributes": {
+                            "aiosqs.content-type": {"DataType": "String", "StringValue": "json"},
+                            "trace": {"DataType": "Binary", "BinaryValue": "AAE="},
+                        },
+                    },
+                ],
+            },
+        )
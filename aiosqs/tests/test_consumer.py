@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import unittest
+
+from aiosqs.consumer import Consumer
+from aiosqs.polling import PollController
+from aiosqs.tests.cases import StubSQSClient, stub_messages
+from aiosqs.types import Message
+
+
+class ConsumerTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.CRITICAL)
+
+    async def create_client(self, messages: int) -> StubSQSClient:
+        client = StubSQSClient(messages={"queue": stub_messages(messages)}, logger=self.logger)
+        self.addAsyncCleanup(client.close)
+        return client
+
+    async def wait_for(self, predicate, timeout: float = 5):
+        async def wait():
+            while not predicate():
+                await asyncio.sleep(0.001)
+
+        await asyncio.wait_for(wait(), timeout=timeout)
+
+    async def test_messages_are_handled_and_deleted(self):
+        client = await self.create_client(messages=50)
+        handled = []
+        running = 0
+        max_running = 0
+
+        async def handler(message: Message):
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.002)
+            handled.append(message["Body"])
+            running -= 1
+
+        async with Consumer(client=client, queue_url="queue", handler=handler, workers=5, prefetch=10, fetchers=2, logger=self.logger):
+            await self.wait_for(lambda: len(handled) == 50)
+
+        self.assertEqual(sorted(handled, key=int), [str(i) for i in range(50)])
+        self.assertEqual(sorted(client.deleted), sorted(f"handle-{i}" for i in range(50)))
+        self.assertLessEqual(max_running, 5)
+
+    async def test_prefetch_is_bounded(self):
+        client = await self.create_client(messages=100)
+        release = asyncio.Event()
+        buffered = []
+
+        async def handler(message: Message):
+            await release.wait()
+
+        async with Consumer(
+            client=client, queue_url="queue", handler=handler, workers=2, prefetch=7, fetchers=3, logger=self.logger
+        ) as consumer:
+            await self.wait_for(lambda: consumer.buffered == 7)
+            await asyncio.sleep(0.01)
+            buffered.append(consumer.buffered)
+            requested = list(client.requested["queue"])
+            release.set()
+
+        # 7 messages prefetched, then 2 more when workers took 2 messages, nothing else while the buffer is full
+        self.assertEqual(buffered, [7])
+        self.assertEqual(requested, [7, 2])
+
+    async def test_failed_message_is_released(self):
+        client = await self.create_client(messages=2)
+        handled = []
+
+        async def handler(message: Message):
+            handled.append(message["Body"])
+            if message["Body"] == "1":
+                raise ValueError("Unexpected message")
+
+        async with Consumer(client=client, queue_url="queue", handler=handler, logger=self.logger):
+            await self.wait_for(lambda: len(handled) == 2)
+
+        self.assertEqual(client.deleted, ["handle-0"])
+        self.assertEqual(client.visibility, {"handle-1": 0})
+
+    async def test_receive_errors_are_retried(self):
+        client = await self.create_client(messages=1)
+        client.receive_errors = 2
+        handled = []
+
+        async def handler(message: Message):
+            handled.append(message["Body"])
+
+        async with Consumer(client=client, queue_url="queue", handler=handler, error_delay_sec=0.001, logger=self.logger):
+            await self.wait_for(lambda: len(handled) == 1)
+
+    async def test_shutdown_drains_messages_in_flight(self):
+        client = await self.create_client(messages=10)
+        started = []
+        handled = []
+
+        async def handler(message: Message):
+            started.append(message["Body"])
+            await asyncio.sleep(0.05)
+            handled.append(message["Body"])
+
+        consumer = Consumer(client=client, queue_url="queue", handler=handler, workers=2, prefetch=10, logger=self.logger)
+        task = asyncio.ensure_future(consumer.run())
+        await self.wait_for(lambda: len(started) == 2)
+        consumer.stop()
+        await task
+
+        self.assertEqual(len(handled), 10)
+        self.assertEqual(len(client.deleted), 10)
+
+    async def test_restart_after_cancelled_receive(self):
+        client = await self.create_client(messages=0)
+        release = asyncio.Event()
+
+        async def handler(message: Message):
+            await release.wait()
+
+        consumer = Consumer(client=client, queue_url="queue", handler=handler, prefetch=7, fetchers=3, logger=self.logger)
+        async with consumer:
+            # The shutdown cancels receives of the empty queue in flight
+            await self.wait_for(lambda: len(client.requested["queue"]) >= 3)
+
+        client.messages["queue"] = stub_messages(20)
+        async with consumer:
+            # The whole prefetch buffer is available again
+            await self.wait_for(lambda: consumer.buffered == 7)
+            release.set()
+
+    async def test_poll_controller(self):
+        client = await self.create_client(messages=3)
+        handled = []
+
+        async def handler(message: Message):
+            handled.append(message["Body"])
+
+        controller = PollController(smoothing=0.5)
+        consumer = Consumer(client=client, queue_url="queue", handler=handler, poll_controller=controller, logger=self.logger)
+        async with consumer:
+            # Receives are recorded after they return, the shutdown cancels the one in flight
+            await self.wait_for(lambda: len(handled) == 3 and controller.stats()["queue"]["receives"] >= 4)
+
+        # The queue is hot at first, then it turns out to be empty
+        self.assertEqual(client.wait_times["queue"][:4], [0, 0, 7, 13])
+        # Polls of the sparse queue ask for fewer messages
+        self.assertEqual(client.requested["queue"][0], 10)
+        self.assertLess(client.requested["queue"][3], 10)
+        stats = controller.stats()["queue"]
+        self.assertGreaterEqual(stats["receives"], 4)
+        self.assertGreater(stats["empty_rate"], 0.5)
@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import unittest
+from typing import List, Optional
+
+from aiosqs.consumer import Consumer
+from aiosqs.dedup import DIGEST_SIZE, DONE, IN_PROGRESS, Deduplicator, DedupStore, MemoryDedupStore, digest
+from aiosqs.tests.cases import FakeClock, StubSQSClient, stub_messages
+from aiosqs.types import Message
+
+
+class BrokenDedupStore(DedupStore):
+    async def claim(self, key: bytes, ttl_sec: float) -> Optional[str]:
+        raise ConnectionError
+
+    async def complete(self, key: bytes, ttl_sec: float):
+        raise ConnectionError
+
+    async def discard(self, key: bytes):
+        raise ConnectionError
+
+
+class MemoryDedupStoreTestCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.store = MemoryDedupStore(max_size=3, clock=self.clock)
+
+    def test_store_must_implement_all_methods(self):
+        class IncompleteDedupStore(DedupStore):
+            async def claim(self, key: bytes, ttl_sec: float) -> Optional[str]:
+                return None
+
+        with self.assertRaises(TypeError):
+            IncompleteDedupStore()
+
+    def test_digest(self):
+        self.assertEqual(len(digest("a" * 1000)), DIGEST_SIZE)
+        self.assertNotEqual(digest("a"), digest("b"))
+
+    async def test_claim(self):
+        self.assertIsNone(await self.store.claim(key=b"a", ttl_sec=10))
+        self.assertEqual(await self.store.claim(key=b"a", ttl_sec=10), IN_PROGRESS)
+        await self.store.complete(key=b"a", ttl_sec=100)
+        self.assertEqual(await self.store.claim(key=b"a", ttl_sec=10), DONE)
+        await self.store.discard(key=b"a")
+        await self.store.discard(key=b"missing")
+        self.assertIsNone(await self.store.claim(key=b"a", ttl_sec=10))
+
+    async def test_expired_keys_are_evicted(self):
+        await self.store.claim(key=b"a", ttl_sec=10)
+        await self.store.claim(key=b"b", ttl_sec=30)
+        self.clock.now = 20
+        self.assertIsNone(await self.store.claim(key=b"c", ttl_sec=10))
+        self.assertEqual(len(self.store), 2)
+        self.assertEqual(await self.store.claim(key=b"b", ttl_sec=10), IN_PROGRESS)
+        self.clock.now = 40
+        self.assertIsNone(await self.store.claim(key=b"b", ttl_sec=10))
+
+    async def test_least_recently_used_keys_are_evicted(self):
+        for key in (b"a", b"b", b"c"):
+            await self.store.claim(key=key, ttl_sec=10)
+        # Touching "a" makes "b" the least recently used key
+        await self.store.claim(key=b"a", ttl_sec=10)
+        await self.store.claim(key=b"d", ttl_sec=10)
+        self.assertEqual(len(self.store), 3)
+        self.assertIsNone(await self.store.claim(key=b"b", ttl_sec=10))
+        self.assertEqual(await self.store.claim(key=b"a", ttl_sec=10), IN_PROGRESS)
+
+
+class DeduplicatorTestCase(unittest.IsolatedAsyncioTestCase):
+    def message(self, message_id: str, body: str = "body") -> Message:
+        return {"MessageId": message_id, "ReceiptHandle": f"handle-{message_id}", "MD5OfBody": "md5", "Body": body}
+
+    async def test_custom_key(self):
+        deduplicator = Deduplicator(key=lambda message: message["Body"])
+        self.assertIsNone(await deduplicator.claim(message=self.message("1", body="order-1")))
+        await deduplicator.complete(message=self.message("1", body="order-1"))
+        self.assertEqual(await deduplicator.claim(message=self.message("2", body="order-1")), DONE)
+        self.assertIsNone(await deduplicator.claim(message=self.message("3", body="order-2")))
+        self.assertEqual(deduplicator.stats(), {"checked": 3, "duplicates": 1, "in_progress": 0, "errors": 0})
+
+    async def test_store_errors_are_ignored(self):
+        deduplicator = Deduplicator(store=BrokenDedupStore(), logger=logging.getLogger(__name__))
+        with self.assertLogs(__name__, level=logging.ERROR):
+            self.assertIsNone(await deduplicator.claim(message=self.message("1")))
+            await deduplicator.complete(message=self.message("1"))
+            await deduplicator.discard(message=self.message("1"))
+        self.assertEqual(deduplicator.stats()["errors"], 3)
+
+
+class ConsumerDeduplicationTestCase(unittest.IsolatedAsyncioTestCase):
+    async def test_duplicates_are_deleted_without_handling(self):
+        client = StubSQSClient(messages={"queue": stub_messages(6)})
+        # Messages 0 and 1 are delivered again
+        client.messages["queue"].extend(
+            dict(message, ReceiptHandle=f"{message['ReceiptHandle']}-again") for message in client.messages["queue"][:2]
+        )
+        handled: List[str] = []
+        deduplicator = Deduplicator()
+
+        async def handler(message: Message):
+            handled.append(message["MessageId"])
+
+        async with Consumer(client=client, queue_url="queue", handler=handler, workers=1, deduplicator=deduplicator):
+            while len(client.deleted) < 8:
+                await asyncio.sleep(0.01)
+
+        self.assertEqual(handled, [str(i) for i in range(6)])
+        self.assertIn("handle-0-again", client.deleted)
+        self.assertEqual(deduplicator.stats()["duplicates"], 2)
+        await client.close()
+
+    async def test_failed_message_is_handled_again(self):
+        client = StubSQSClient(messages={"queue": stub_messages(1)})
+        client.messages["queue"].append(dict(client.messages["queue"][0], ReceiptHandle="handle-0-again"))
+        attempts: List[str] = []
+
+        async def handler(message: Message):
+            attempts.append(message["ReceiptHandle"])
+            if len(attempts) == 1:
+                raise RuntimeError("Failure")
+
+        async with Consumer(client=client, queue_url="queue", handler=handler, workers=1, deduplicator=Deduplicator()):
+            while not client.deleted:
+                await asyncio.sleep(0.01)
+
+        self.assertEqual(attempts, ["handle-0", "handle-0-again"])
+        self.assertEqual(client.deleted, ["handle-0-again"])
+        await client.close()
+
+    async def test_duplicate_of_message_in_progress_is_left_in_flight(self):
+        client = StubSQSClient(messages={"queue": stub_messages(1)})
+        client.messages["queue"].append(dict(client.messages["queue"][0], ReceiptHandle="handle-0-again"))
+        release = asyncio.Event()
+        deduplicator = Deduplicator()
+
+        async def handler(message: Message):
+            await release.wait()
+
+        async with Consumer(client=client, queue_url="queue", handler=handler, workers=2, deduplicator=deduplicator):
+            while deduplicator.stats()["in_progress"] < 1:
+                await asyncio.sleep(0.01)
+            release.set()
+
+        self.assertEqual(client.deleted, ["handle-0"])
+        self.assertEqual(client.visibility, {})
+        await client.close()
@@ -23,3 +23,7 @@ class DeleteMessageTestCase(ActionTestCase):
                 "Must be an alphanumeric String of 1 to 80 in length."
             ),
         )
+
+    def test_delete_message_json(self):
+        res = self.parseJSONResponse("delete_message.json")
+        self.assertIsNone(res)
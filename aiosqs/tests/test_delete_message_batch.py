@@ -0,0 +1,15 @@
+from aiosqs.tests.cases import ActionTestCase
+
+
+class DeleteMessageBatchTestCase(ActionTestCase):
+    action = "DeleteMessageBatch"
+
+    def test_all_deleted(self):
+        res = self.parseXMLResponse("delete_message_batch.xml")
+        self.assertEqual(
+            res,
+            {
+                "Successful": [{"Id": "msg1"}, {"Id": "msg2"}],
+                "Failed": [],
+            },
+        )
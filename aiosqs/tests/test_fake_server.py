@@ -0,0 +1,299 @@
+import asyncio
+import hashlib
+import time
+import unittest
+from typing import List
+
+from aiosqs.consumer import Consumer
+from aiosqs.exceptions import SQSClientBaseError, SQSErrorResponse
+from aiosqs.fake_server import Faults, FakeSQSServer, md5_of_message_attributes
+from aiosqs.retry import RetryPolicy
+from aiosqs.tests.cases import FakeClock
+from aiosqs.types import Message
+
+
+class FakeSQSServerTestCase(unittest.IsolatedAsyncioTestCase):
+    client_options = {}
+
+    async def asyncSetUp(self):
+        self.clock = FakeClock(now=1000.0)
+        self.server = FakeSQSServer(clock=self.clock)
+        await self.server.start()
+        self.addAsyncCleanup(self.server.close)
+        self.client = self.server.client(**self.client_options)
+        self.addAsyncCleanup(self.client.close)
+        self.queue_url = self.server.create_queue("queue")
+        self.fifo_queue_url = self.server.create_queue("queue.fifo")
+
+    async def receive(self, queue_url: str, max_number_of_messages: int = 10, visibility_timeout: int = 30, **kwargs) -> List[Message]:
+        messages = await self.client.receive_message(
+            queue_url=queue_url,
+            max_number_of_messages=max_number_of_messages,
+            visibility_timeout=visibility_timeout,
+            **kwargs,
+        )
+        return messages or []
+
+    async def test_send_receive_delete(self):
+        attributes = {
+            "city": {"DataType": "String", "StringValue": "Any City & <Town>"},
+            "blob": {"DataType": "Binary", "BinaryValue": b"\x00\x01"},
+        }
+        sent = await self.client.send_message(queue_url=self.queue_url, message_body="hello, мир <&>", message_attributes=attributes)
+        self.assertEqual(sent["MD5OfMessageBody"], hashlib.md5("hello, мир <&>".encode("utf-8")).hexdigest())
+
+        messages = await self.receive(self.queue_url, attribute_names=["All"], message_attribute_names=["All"])
+        self.assertEqual(len(messages), 1)
+        message = messages[0]
+        self.assertEqual(message["MessageId"], sent["MessageId"])
+        self.assertEqual(message["Body"], "hello, мир <&>")
+        self.assertEqual(message["MD5OfBody"], sent["MD5OfMessageBody"])
+        self.assertEqual(message["Attributes"]["ApproximateReceiveCount"], "1")
+        self.assertEqual(message["MessageAttributes"]["city"], "Any City & <Town>")
+        self.assertEqual(message["MessageAttributes"]["blob"], b"\x00\x01")
+
+        # The message is in flight
+        self.assertEqual(await self.receive(self.queue_url), [])
+
+        await self.client.delete_message(queue_url=self.queue_url, receipt_handle=message["ReceiptHandle"])
+        self.assertEqual(len(self.server.queue("queue")), 0)
+        self.assertEqual(self.server.requests["DeleteMessage"], 1)
+
+    async def test_message_attribute_names(self):
+        attributes = {
+            "trace.id": {"DataType": "String", "StringValue": "1"},
+            "trace.span": {"DataType": "Number", "StringValue": "2"},
+            "city": {"DataType": "String", "StringValue": "Any City"},
+        }
+        await self.client.send_message(queue_url=self.queue_url, message_body="hello", message_attributes=attributes)
+        messages = await self.receive(self.queue_url, message_attribute_names=["trace.*"])
+        self.assertEqual(set(messages[0]["MessageAttributes"]), {"trace.id", "trace.span"})
+        self.assertEqual(
+            messages[0]["MD5OfMessageAttributes"],
+            md5_of_message_attributes({name: attributes[name] for name in ("trace.id", "trace.span")}),
+        )
+
+    async def test_visibility_timeout(self):
+        await self.client.send_message(queue_url=self.queue_url, message_body="hello")
+        first = await self.receive(self.queue_url, visibility_timeout=10)
+        self.clock.now += 9
+        self.assertEqual(await self.receive(self.queue_url), [])
+
+        self.clock.now += 1
+        second = await self.receive(self.queue_url, visibility_timeout=10, attribute_names=["ApproximateReceiveCount"])
+        self.assertEqual(second[0]["MessageId"], first[0]["MessageId"])
+        self.assertEqual(second[0]["Attributes"], {"ApproximateReceiveCount": "2"})
+
+        # Visibility of the previous receive can't be changed
+        with self.assertRaises(SQSErrorResponse) as context:
+            await self.client.change_message_visibility(
+                queue_url=self.queue_url, receipt_handle=first[0]["ReceiptHandle"], visibility_timeout=0
+            )
+        self.assertEqual(context.exception.error.code, "AWS.SimpleQueueService.MessageNotInflight")
+
+        await self.client.change_message_visibility(
+            queue_url=self.queue_url, receipt_handle=second[0]["ReceiptHandle"], visibility_timeout=0
+        )
+        third = await self.receive(self.queue_url)
+        self.assertEqual(third[0]["MessageId"], first[0]["MessageId"])
+
+    async def test_delay_seconds(self):
+        await self.client.send_message(queue_url=self.queue_url, message_body="later", delay_seconds=5)
+        await self.client.send_message(queue_url=self.queue_url, message_body="now")
+        self.assertEqual([message["Body"] for message in await self.receive(self.queue_url)], ["now"])
+        self.clock.now += 5
+        self.assertEqual([message["Body"] for message in await self.receive(self.queue_url)], ["later"])
+
+    async def test_batches(self):
+        result = await self.client.send_message_batch(
+            queue_url=self.queue_url,
+            entries=[
+                {"Id": "1", "MessageBody": "first"},
+                {"Id": "2", "MessageBody": "second", "DelaySeconds": 1000},
+                {"Id": "3", "MessageBody": "third"},
+            ],
+        )
+        self.assertEqual([entry["Id"] for entry in result["Successful"]], ["1", "3"])
+        self.assertEqual(result["Failed"][0]["Id"], "2")
+        self.assertEqual(result["Failed"][0]["Code"], "InvalidParameterValue")
+        self.assertTrue(result["Failed"][0]["SenderFault"])
+
+        messages = await self.receive(self.queue_url)
+        self.assertEqual([message["Body"] for message in messages], ["first", "third"])
+
+        result = await self.client.change_message_visibility_batch(
+            queue_url=self.queue_url,
+            entries=[
+                {"Id": message["MessageId"], "ReceiptHandle": message["ReceiptHandle"], "VisibilityTimeout": 60} for message in messages
+            ],
+        )
+        self.assertEqual(len(result["Successful"]), 2)
+
+        result = await self.client.delete_message_batch(
+            queue_url=self.queue_url,
+            entries=[
+                {"Id": "1", "ReceiptHandle": messages[0]["ReceiptHandle"]},
+                {"Id": "2", "ReceiptHandle": "invalid"},
+            ],
+        )
+        self.assertEqual([entry["Id"] for entry in result["Successful"]], ["1"])
+        self.assertEqual(result["Failed"][0]["Code"], "ReceiptHandleIsInvalid")
+        self.assertEqual(len(self.server.queue("queue")), 1)
+
+    async def test_fifo_groups(self):
+        for group, body in [("a", "a1"), ("a", "a2"), ("b", "b1")]:
+            await self.client.send_message(
+                queue_url=self.fifo_queue_url, message_body=body, message_group_id=group, message_deduplication_id=body
+            )
+
+        messages = await self.receive(self.fifo_queue_url, max_number_of_messages=1)
+        self.assertEqual(messages[0]["Body"], "a1")
+        # Group "a" is locked while "a1" is in flight
+        messages = await self.receive(self.fifo_queue_url, attribute_names=["All"])
+        self.assertEqual([message["Body"] for message in messages], ["b1"])
+        self.assertEqual(messages[0]["Attributes"]["MessageGroupId"], "b")
+        self.assertEqual(await self.receive(self.fifo_queue_url), [])
+
+        self.clock.now += 30
+        messages = await self.receive(self.fifo_queue_url)
+        self.assertEqual([message["Body"] for message in messages], ["a1", "a2", "b1"])
+
+    async def test_fifo_deduplication(self):
+        first = await self.client.send_message(
+            queue_url=self.fifo_queue_url, message_body="hello", message_group_id="a", message_deduplication_id="1"
+        )
+        second = await self.client.send_message(
+            queue_url=self.fifo_queue_url, message_body="hello", message_group_id="a", message_deduplication_id="1"
+        )
+        self.assertEqual(first["MessageId"], second["MessageId"])
+        self.assertEqual(first["SequenceNumber"], second["SequenceNumber"])
+        self.assertEqual(len(self.server.queue("queue.fifo")), 1)
+
+        # The deduplication interval is 5 minutes
+        self.clock.now += 300
+        third = await self.client.send_message(
+            queue_url=self.fifo_queue_url, message_body="hello", message_group_id="a", message_deduplication_id="1"
+        )
+        self.assertNotEqual(third["MessageId"], first["MessageId"])
+
+        with self.assertRaises(SQSErrorResponse) as context:
+            await self.client.send_message(queue_url=self.fifo_queue_url, message_body="hello", message_group_id="a")
+        self.assertEqual(context.exception.error.code, "InvalidParameterValue")
+
+    async def test_receive_request_attempt_id(self):
+        await self.client.send_message(
+            queue_url=self.fifo_queue_url, message_body="hello", message_group_id="a", message_deduplication_id="1"
+        )
+        first = await self.receive(self.fifo_queue_url, receive_request_attempt_id="attempt")
+        second = await self.receive(self.fifo_queue_url, receive_request_attempt_id="attempt")
+        self.assertEqual(first[0]["ReceiptHandle"], second[0]["ReceiptHandle"])
+
+    async def test_long_polling(self):
+        async def send():
+            await asyncio.sleep(0.1)
+            await self.client.send_message(queue_url=self.queue_url, message_body="hello")
+
+        task = asyncio.ensure_future(send())
+        started_at = time.monotonic()
+        messages = await self.receive(self.queue_url, wait_time_seconds=5)
+        await task
+        self.assertEqual(messages[0]["Body"], "hello")
+        self.assertLess(time.monotonic() - started_at, 2)
+
+    async def test_queue_names(self):
+        url = await self.client.get_queue_url(queue_name="queue")
+        self.assertEqual(url["QueueUrl"], self.queue_url)
+        await self.client.send_message(queue_url="queue", message_body="hello")
+        self.assertEqual(len(self.server.queue("queue")), 1)
+
+        with self.assertRaises(SQSErrorResponse) as context:
+            await self.client.send_message(queue_url=f"{self.server.endpoint_url}/123456789012/missing", message_body="hello")
+        self.assertEqual(context.exception.error.code, "AWS.SimpleQueueService.NonExistentQueue")
+
+    async def test_invalid_messages(self):
+        with self.assertRaises(SQSErrorResponse) as context:
+            await self.client.send_message(queue_url=self.queue_url, message_body="\x00")
+        self.assertEqual(context.exception.error.code, "InvalidMessageContents")
+
+        with self.assertRaises(SQSErrorResponse) as context:
+            await self.client.send_message(queue_url=self.queue_url, message_body="a" * (256 * 1024 + 1))
+        self.assertEqual(context.exception.error.code, "InvalidParameterValue")
+
+    async def test_signature_is_verified(self):
+        async with self.server.client(aws_secret_access_key="wrong") as client:
+            with self.assertRaises(SQSErrorResponse) as context:
+                await client.send_message(queue_url=self.queue_url, message_body="hello")
+        self.assertEqual(context.exception.error.code, "SignatureDoesNotMatch")
+        self.assertEqual(context.exception.status_code, 403)
+
+        async with self.server.client(aws_access_key_id="unknown") as client:
+            with self.assertRaises(SQSErrorResponse) as context:
+                await client.send_message(queue_url=self.queue_url, message_body="hello")
+        self.assertEqual(context.exception.error.code, "InvalidClientTokenId")
+        self.assertEqual(len(self.server.queue("queue")), 0)
+
+    async def test_session_token_is_signed(self):
+        async with self.server.client(aws_session_token="token", **self.client_options) as client:
+            await client.send_message(queue_url=self.queue_url, message_body="hello")
+        self.assertEqual(len(self.server.queue("queue")), 1)
+
+    async def test_injected_errors_are_retried(self):
+        self.server.fail_next(action="SendMessage", times=2)
+        async with self.server.client(retry_policy=RetryPolicy(max_attempts=3, base_delay_sec=0.01), **self.client_options) as client:
+            await client.send_message(queue_url=self.queue_url, message_body="hello")
+        self.assertEqual(self.server.requests["SendMessage"], 3)
+        self.assertEqual(self.server.injected["scripted"], 2)
+
+    async def test_throttling(self):
+        self.server.faults = Faults(requests_per_sec=1, burst=2, actions={"SendMessage"})
+        for _ in range(2):
+            await self.client.send_message(queue_url=self.queue_url, message_body="hello")
+        with self.assertRaises(SQSErrorResponse) as context:
+            await self.client.send_message(queue_url=self.queue_url, message_body="hello")
+        self.assertEqual(context.exception.error.code, "ThrottlingException")
+        # Other actions are not throttled
+        await self.receive(self.queue_url)
+
+    async def test_latency_and_disconnects(self):
+        self.server.faults = Faults(latency_sec=0.05, disconnect_rate=1)
+        started_at = time.monotonic()
+        with self.assertRaises(SQSClientBaseError) as context:
+            await self.client.send_message(queue_url=self.queue_url, message_body="hello")
+        self.assertGreaterEqual(time.monotonic() - started_at, 0.05)
+        self.assertNotIsInstance(context.exception, SQSErrorResponse)
+        # aiohttp retries a request once when a reused connection is closed
+        self.assertGreaterEqual(self.server.injected["disconnect"], 1)
+
+
+class FakeSQSServerPostTestCase(FakeSQSServerTestCase):
+    client_options = {"http_method": "POST"}
+
+
+class FakeSQSServerJsonTestCase(FakeSQSServerTestCase):
+    client_options = {"protocol": "json"}
+
+
+class FakeSQSServerConsumerTestCase(unittest.IsolatedAsyncioTestCase):
+    async def test_consumer(self):
+        async with FakeSQSServer() as server:
+            queue_url = server.create_queue("queue")
+            async with server.client() as client:
+                for index in range(0, 50, 10):
+                    await client.send_message_batch(
+                        queue_url=queue_url,
+                        entries=[{"Id": str(number), "MessageBody": str(number)} for number in range(index, index + 10)],
+                    )
+
+                handled = set()
+                done = asyncio.Event()
+
+                async def handler(message: Message):
+                    handled.add(message["Body"])
+                    if len(handled) == 50:
+                        done.set()
+
+                async with Consumer(client=client, queue_url=queue_url, handler=handler, wait_time_seconds=1):
+                    await asyncio.wait_for(done.wait(), timeout=5)
+
+        self.assertEqual(len(handled), 50)
+        self.assertEqual(len(server.queue("queue")), 0)
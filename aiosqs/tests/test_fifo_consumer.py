@@ -0,0 +1,172 @@
+import asyncio
+import unittest
+from collections import Counter, defaultdict
+from typing import Dict, List
+
+from aiosqs.dedup import Deduplicator, MemoryDedupStore, digest
+from aiosqs.fake_server import FakeSQSServer
+from aiosqs.fifo_consumer import FifoConsumer, HashRing
+from aiosqs.types import Message
+
+
+class HashRingTestCase(unittest.TestCase):
+    def test_keys_are_spread_over_nodes(self):
+        ring = HashRing(nodes=range(4))
+        counts = Counter(ring.node(f"group-{index}") for index in range(4000))
+        self.assertEqual(set(counts), {0, 1, 2, 3})
+        self.assertGreater(min(counts.values()), 600)
+
+    def test_only_keys_of_removed_node_move(self):
+        before = HashRing(nodes=range(5))
+        after = HashRing(nodes=range(4))
+        for index in range(1000):
+            key = f"group-{index}"
+            if before.node(key) != 4:
+                self.assertEqual(after.node(key), before.node(key))
+
+
+class FifoConsumerTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = FakeSQSServer()
+        await self.server.start()
+        self.addAsyncCleanup(self.server.close)
+        self.client = self.server.client()
+        self.addAsyncCleanup(self.client.close)
+        self.queue_url = self.server.create_queue("queue.fifo")
+
+    async def send(self, groups: Dict[str, int]):
+        for group, count in groups.items():
+            for number in range(count):
+                await self.client.send_message(
+                    queue_url=self.queue_url,
+                    message_body=f"{group}:{number}",
+                    message_group_id=group,
+                    message_deduplication_id=f"{group}:{number}",
+                )
+
+    async def consume(self, handler, total: int, **kwargs) -> Dict[str, List[int]]:
+        """Runs the consumer until `total` messages are handled, returns handled numbers by group."""
+        handled = defaultdict(list)
+        done = asyncio.Event()
+
+        async def record(message: Message):
+            group, number = message["Body"].split(":")
+            await handler(group, int(number))
+            handled[group].append(int(number))
+            if sum(len(numbers) for numbers in handled.values()) >= total:
+                done.set()
+
+        options = {"workers": 4, "prefetch": 20, "wait_time_seconds": 1, **kwargs}
+        async with FifoConsumer(client=self.client, queue_url=self.queue_url, handler=record, **options):
+            await asyncio.wait_for(done.wait(), timeout=10)
+        return handled
+
+    async def test_groups_are_ordered_and_parallel(self):
+        await self.send({"a": 10, "b": 10, "c": 10, "d": 10})
+        running = set()
+        max_running = 0
+
+        async def handler(group: str, number: int):
+            nonlocal max_running
+            self.assertNotIn(group, running)
+            running.add(group)
+            max_running = max(max_running, len(running))
+            await asyncio.sleep(0.01)
+            running.remove(group)
+
+        handled = await self.consume(handler=handler, total=40)
+        for group in "abcd":
+            self.assertEqual(handled[group], list(range(10)))
+        self.assertGreater(max_running, 1)
+        self.assertEqual(len(self.server.queue("queue.fifo")), 0)
+
+    async def test_failed_message_keeps_order(self):
+        await self.send({"a": 5, "b": 5})
+        failures = Counter()
+
+        async def handler(group: str, number: int):
+            if group == "a" and number == 2 and failures[group] < 2:
+                failures[group] += 1
+                raise RuntimeError("Failure")
+
+        handled = await self.consume(handler=handler, total=10)
+        self.assertEqual(failures["a"], 2)
+        self.assertEqual(handled["a"], list(range(5)))
+        self.assertEqual(handled["b"], list(range(5)))
+
+    async def test_blocked_group_does_not_block_others(self):
+        await self.send({"a": 3, "b": 5})
+
+        async def handler(group: str, number: int):
+            if group == "a":
+                raise RuntimeError("Failure")
+
+        # One worker handles both groups, the failing group is released every time
+        handled = await self.consume(handler=handler, total=5, workers=1, nack_visibility_timeout=1)
+        self.assertEqual(handled["b"], list(range(5)))
+        self.assertEqual(handled["a"], [])
+
+    async def test_duplicate_in_progress_does_not_release_group(self):
+        await self.send({"a": 3})
+        store = MemoryDedupStore()
+        # Another consumer is handling the first message
+        await store.claim(key=digest("a:0"), ttl_sec=60)
+        deduplicator = Deduplicator(store=store, key=lambda message: message["Body"])
+
+        async def handler(group: str, number: int):
+            pass
+
+        handled = await self.consume(handler=handler, total=2, workers=1, deduplicator=deduplicator)
+        self.assertEqual(handled["a"], [1, 2])
+        self.assertEqual(deduplicator.stats()["in_progress"], 1)
+
+    async def test_slow_group_does_not_expire_others(self):
+        await self.send({"a": 2, "b": 3})
+        released: List[str] = []
+
+        class RecordingConsumer(FifoConsumer):
+            def _release_messages(self, messages: List[Message]):
+                released.extend(message["Body"] for message in messages)
+                super()._release_messages(messages=messages)
+
+        handled = []
+        done = asyncio.Event()
+
+        async def handler(message: Message):
+            if message["Body"] == "a:0":
+                # Longer than the visibility timeout of messages of group "b" waiting behind it
+                await asyncio.sleep(2.5)
+            handled.append(message["Body"])
+            if len(handled) == 5:
+                done.set()
+
+        # One worker handles both groups
+        consumer = RecordingConsumer(
+            client=self.client, queue_url=self.queue_url, handler=handler, workers=1, visibility_timeout=2, wait_time_seconds=1
+        )
+        async with consumer:
+            await asyncio.wait_for(done.wait(), timeout=10)
+
+        self.assertEqual(released, [])
+        self.assertEqual([body for body in handled if body.startswith("b")], ["b:0", "b:1", "b:2"])
+        self.assertEqual(handled[0], "a:0")
+
+    async def test_group_backlog_is_bounded(self):
+        await self.send({"a": 8})
+        handled = []
+        buffered = []
+        done = asyncio.Event()
+
+        async def handler(message: Message):
+            # The message being handled is already taken out of its lane
+            buffered.append(consumer.buffered)
+            handled.append(int(message["Body"].split(":")[1]))
+            if len(handled) == 8:
+                done.set()
+
+        consumer = FifoConsumer(client=self.client, queue_url=self.queue_url, handler=handler, max_group_backlog=3, wait_time_seconds=1)
+        async with consumer:
+            await asyncio.wait_for(done.wait(), timeout=10)
+
+        self.assertEqual(handled, list(range(8)))
+        self.assertLessEqual(max(buffered), 2)
@@ -1,3 +1,4 @@
+from aiosqs.exceptions import SQSErrorResponse
 from aiosqs.tests.cases import ActionTestCase
 
 
@@ -21,3 +22,27 @@ class GetQueueUrlTestCase(ActionTestCase):
                 "QueueUrl": "http://sqs.mcs.mail.ru/account123/example_queue",
             },
         )
+
+    def test_get_queue_url_json(self):
+        res = self.parseJSONResponse("get_queue_url.json")
+        self.assertEqual(
+            res,
+            {
+                "QueueUrl": "https://sqs.us-east-1.amazonaws.com/177715257436/MyQueue",
+            },
+        )
+
+    def test_non_existent_queue_json(self):
+        with self.assertRaises(SQSErrorResponse) as e:
+            self.parseJSONResponse("error_non_existent_queue.json", query_error="AWS.SimpleQueueService.NonExistentQueue;Sender")
+        exception = e.exception
+        self.assertEqual(exception.error.type, "Sender")
+        self.assertEqual(exception.error.code, "AWS.SimpleQueueService.NonExistentQueue")
+        self.assertEqual(exception.error.message, "The specified queue does not exist.")
+
+    def test_non_existent_queue_json_without_query_error(self):
+        with self.assertRaises(SQSErrorResponse) as e:
+            self.parseJSONResponse("error_non_existent_queue.json")
+        exception = e.exception
+        self.assertEqual(exception.error.type, "Sender")
+        self.assertEqual(exception.error.code, "QueueDoesNotExist")
@@ -0,0 +1,186 @@
+import asyncio
+import logging
+import time
+import unittest
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from aiosqs.client import SQSClient
+from aiosqs.deadline import deadline, remaining_sec
+from aiosqs.exceptions import DeadlineExceeded, SQSClientBaseError
+from aiosqs.hedging import HedgingPolicy, LatencyTracker
+from aiosqs.retry import RetryPolicy
+from aiosqs.tests.fixtures import load_fixture
+
+
+class LatencyTrackerTestCase(unittest.TestCase):
+    def test_quantile(self):
+        tracker = LatencyTracker(quantile=0.95, window=100, min_samples=20)
+        for latency in range(19):
+            tracker.add(latency)
+        self.assertIsNone(tracker.value())
+
+        # The quantile is recomputed after 10 new samples, the window keeps samples 1..100
+        for latency in range(19, 101):
+            tracker.add(latency)
+        self.assertEqual(tracker.value(), 96)
+
+    def test_window(self):
+        tracker = LatencyTracker(quantile=0.5, window=10, min_samples=1)
+        for _ in range(10):
+            tracker.add(1.0)
+        for _ in range(10):
+            tracker.add(5.0)
+        self.assertEqual(tracker.value(), 5.0)
+
+
+class HedgingPolicyTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.CRITICAL)
+        self.policy = HedgingPolicy(min_samples=5, max_hedge_ratio=1, logger=self.logger)
+        for _ in range(10):
+            self.policy.tracker("GetQueueUrl").add(0.01)
+
+    async def asyncTearDown(self):
+        await self.policy.close()
+
+    def create_func(self, *delays, error: Exception = None):
+        delays = list(delays)
+        self.calls = 0
+
+        async def func():
+            call = self.calls = self.calls + 1
+            await asyncio.sleep(delays.pop(0))
+            if error:
+                raise error
+            return call
+
+        return func
+
+    def test_can_hedge(self):
+        self.assertTrue(self.policy.can_hedge({"Action": "GetQueueUrl"}))
+        self.assertTrue(self.policy.can_hedge({"Action": "DeleteMessage"}))
+        self.assertTrue(self.policy.can_hedge({"Action": "ReceiveMessage", "ReceiveRequestAttemptId": "1"}))
+        self.assertFalse(self.policy.can_hedge({"Action": "ReceiveMessage"}))
+        self.assertFalse(self.policy.can_hedge({"Action": "SendMessage"}))
+
+    async def test_fast_request_is_not_hedged(self):
+        self.assertEqual(await self.policy.call("GetQueueUrl", self.create_func(0)), 1)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.policy.stats()["hedged"], 0)
+
+    async def test_not_hedged_without_samples(self):
+        self.assertEqual(await self.policy.call("DeleteMessage", self.create_func(0.05)), 1)
+        self.assertEqual(self.calls, 1)
+
+    async def test_hedge_wins(self):
+        self.assertEqual(await self.policy.call("GetQueueUrl", self.create_func(0.2, 0)), 2)
+        stats = self.policy.stats()
+        self.assertEqual(stats["requests"], 1)
+        self.assertEqual(stats["hedged"], 1)
+        self.assertEqual(stats["hedge_rate"], 1.0)
+        self.assertEqual(stats["hedge_wins"], 1)
+
+        # The saved latency is known when the slow request completes
+        await asyncio.sleep(0.25)
+        self.assertGreater(self.policy.stats()["saved_sec"], 0.1)
+
+    async def test_primary_wins(self):
+        self.assertEqual(await self.policy.call("GetQueueUrl", self.create_func(0.03, 0.2)), 1)
+        self.assertEqual(self.policy.stats()["hedge_wins"], 0)
+
+    async def test_both_fail(self):
+        with self.assertRaises(SQSClientBaseError):
+            await self.policy.call("GetQueueUrl", self.create_func(0.03, 0, error=SQSClientBaseError()))
+        self.assertEqual(self.calls, 2)
+
+    async def test_hedge_ratio(self):
+        self.policy.max_hedge_ratio = 0.5
+        await self.policy.call("GetQueueUrl", self.create_func(0.03, 0))
+        await self.policy.call("GetQueueUrl", self.create_func(0.03, 0))
+        self.assertEqual(self.policy.stats(), {**self.policy.stats(), "requests": 2, "hedged": 1})
+
+
+class DeadlineTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.CRITICAL)
+
+        self.delay_sec = 0
+        # Delays of the first requests
+        self.delays = []
+        self.requests = 0
+        app = web.Application()
+        app.router.add_get("/", self.handle)
+        self.server = TestServer(app)
+        await self.server.start_server()
+
+    async def asyncTearDown(self):
+        await self.server.close()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        await asyncio.sleep(self.delays.pop(0) if self.delays else self.delay_sec)
+        return web.Response(body=load_fixture("get_queue_url.xml"), content_type="text/xml")
+
+    def create_client(self, **kwargs) -> SQSClient:
+        client = SQSClient(
+            aws_access_key_id="access_key_id",
+            aws_secret_access_key="secret_access_key",
+            region_name="us-west-2",
+            host=f"{self.server.host}:{self.server.port}",
+            logger=self.logger,
+            **kwargs,
+        )
+        client.endpoint_url = str(self.server.make_url("/"))
+        return client
+
+    def test_nested_deadline(self):
+        self.assertIsNone(remaining_sec())
+        with deadline(10):
+            with deadline(20):
+                self.assertLessEqual(remaining_sec(), 10)
+            with deadline(1):
+                self.assertLessEqual(remaining_sec(), 1)
+        self.assertIsNone(remaining_sec())
+
+    async def test_deadline_limits_request(self):
+        self.delay_sec = 1
+        async with self.create_client() as client:
+            started_at = time.monotonic()
+            with self.assertRaises(SQSClientBaseError):
+                with deadline(0.1):
+                    await client.get_queue_url(queue_name="example_queue")
+            self.assertLess(time.monotonic() - started_at, 0.5)
+
+    async def test_deadline_stops_retries(self):
+        self.delay_sec = 1
+        async with self.create_client(retry_policy=RetryPolicy(max_attempts=10, base_delay_sec=0, logger=self.logger)) as client:
+            with self.assertRaises(DeadlineExceeded):
+                with deadline(0.2):
+                    await client.get_queue_url(queue_name="example_queue")
+            # The attempt timed out because of the deadline, so it's not retried
+            self.assertEqual(self.requests, 1)
+
+    async def test_expired_deadline(self):
+        async with self.create_client() as client:
+            with self.assertRaises(DeadlineExceeded):
+                with deadline(-1):
+                    await client.get_queue_url(queue_name="example_queue")
+            self.assertEqual(self.requests, 0)
+
+    async def test_hedged_request(self):
+        hedging = HedgingPolicy(min_samples=5, max_hedge_ratio=1, logger=self.logger)
+        for _ in range(5):
+            hedging.tracker("GetQueueUrl").add(0.01)
+
+        async with self.create_client(hedging=hedging) as client:
+            # The hedged request is sent on another connection of the pool
+            self.delays = [0.5]
+            response = await asyncio.wait_for(client.get_queue_url(queue_name="example_queue"), timeout=0.3)
+
+        self.assertEqual(response, {"QueueUrl": "http://sqs.mcs.mail.ru/account123/example_queue"})
+        self.assertEqual(self.requests, 2)
+        self.assertEqual(hedging.stats()["hedge_wins"], 1)
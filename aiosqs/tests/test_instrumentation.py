@@ -0,0 +1,202 @@
+import logging
+import re
+import unittest
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from aioresponses import aioresponses
+
+from aiosqs.client import SQSClient
+from aiosqs.exceptions import SQSClientBaseError, SQSErrorResponse
+from aiosqs.instrumentation import (
+    Histogram,
+    HistogramAggregator,
+    OpenTelemetryHook,
+    PrometheusHook,
+    RequestMetrics,
+    otel_trace,
+    prometheus_client,
+)
+from aiosqs.parser import LOGGED_BODY_LIMIT, parse_xml_result_response
+from aiosqs.tests.fixtures import load_fixture
+
+
+def request_metrics(action: str = "SendMessage", total_sec: float = 0.01, error_code: str = None) -> RequestMetrics:
+    metrics = RequestMetrics(action=action, started_at=1700000000.0)
+    metrics.status_code = 200
+    metrics.error_code = error_code
+    metrics.bytes_sent = 100
+    metrics.bytes_received = 400
+    metrics.sign_sec = 0.0001
+    metrics.total_sec = total_sec
+    return metrics
+
+
+class HistogramTestCase(unittest.TestCase):
+    def test_quantiles(self):
+        histogram = Histogram(buckets=(0.01, 0.1, 1.0))
+        self.assertIsNone(histogram.quantile(0.5))
+
+        for value in [0.005] * 90 + [0.05] * 9 + [5.0]:
+            histogram.add(value)
+        self.assertEqual(histogram.quantile(0.5), 0.01)
+        self.assertEqual(histogram.quantile(0.95), 0.1)
+        self.assertEqual(histogram.quantile(1.0), float("inf"))
+
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot["count"], 100)
+        self.assertEqual(snapshot["buckets"], {0.01: 90, 0.1: 9, 1.0: 0, float("inf"): 1})
+
+    def test_bucket_bounds_are_inclusive(self):
+        histogram = Histogram(buckets=(0.01, 0.1))
+        histogram.add(0.01)
+        self.assertEqual(histogram.counts, [1, 0, 0])
+
+
+class HistogramAggregatorTestCase(unittest.TestCase):
+    def test_aggregate(self):
+        aggregator = HistogramAggregator()
+        aggregator(request_metrics(total_sec=0.004))
+        aggregator(request_metrics(total_sec=0.02))
+        aggregator(request_metrics(error_code="AWS.SimpleQueueService.NonExistentQueue"))
+        aggregator(request_metrics(action="ReceiveMessage"))
+
+        snapshot = aggregator.snapshot()
+        self.assertEqual(set(snapshot), {"SendMessage", "ReceiveMessage"})
+        stats = snapshot["SendMessage"]
+        self.assertEqual(stats["requests"], 3)
+        self.assertEqual(stats["errors"], {"AWS.SimpleQueueService.NonExistentQueue": 1})
+        self.assertEqual(stats["bytes_sent"], 300)
+        self.assertEqual(stats["bytes_received"], 1200)
+        self.assertEqual(set(stats["latency"]), {"sign", "total"})
+        self.assertEqual(stats["latency"]["total"]["count"], 3)
+        self.assertEqual(aggregator.histogram(action="SendMessage").count, 3)
+
+        aggregator.reset()
+        self.assertEqual(aggregator.snapshot(), {})
+
+
+class AdaptersTestCase(unittest.TestCase):
+    @unittest.skipIf(prometheus_client is None, "prometheus_client is not installed")
+    def test_prometheus(self):
+        registry = prometheus_client.CollectorRegistry()
+        hook = PrometheusHook(registry=registry)
+        hook(request_metrics())
+        self.assertEqual(registry.get_sample_value("aiosqs_requests_total", {"action": "SendMessage", "outcome": "ok"}), 1)
+        self.assertEqual(registry.get_sample_value("aiosqs_request_bytes_total", {"action": "SendMessage"}), 100)
+
+    @unittest.skipIf(otel_trace is None, "opentelemetry-api is not installed")
+    def test_opentelemetry(self):
+        # Without an SDK the API records nothing, the hook must not fail
+        OpenTelemetryHook()(request_metrics(error_code="ThrottlingException"))
+
+    @unittest.skipIf(prometheus_client is not None, "prometheus_client is installed")
+    def test_prometheus_is_not_installed(self):
+        with self.assertRaises(RuntimeError):
+            PrometheusHook()
+
+
+class ClientHooksTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.CRITICAL)
+        self.metrics = []
+        self.client = SQSClient(
+            aws_access_key_id="access_key_id",
+            aws_secret_access_key="secret_access_key",
+            region_name="us-west-2",
+            host="mocked_amazon_host.com",
+            timeout_sec=0,
+            logger=self.logger,
+            request_hooks=[self.metrics.append],
+        )
+
+    async def asyncTearDown(self):
+        await self.client.close()
+
+    @aioresponses()
+    async def test_phases(self, mock):
+        body = load_fixture("get_queue_url.xml")
+        mock.get(url=re.compile(r"https://mocked_amazon_host.com"), status=200, body=body)
+
+        await self.client.get_queue_url(queue_name="example_queue")
+
+        (metrics,) = self.metrics
+        self.assertEqual(metrics.action, "GetQueueUrl")
+        self.assertEqual(metrics.status_code, 200)
+        self.assertIsNone(metrics.error_code)
+        self.assertGreater(metrics.bytes_sent, 0)
+        self.assertEqual(metrics.bytes_received, len(body.encode()))
+        self.assertEqual(set(metrics.phases()), {"serialize", "sign", "send", "read", "parse", "total"})
+        self.assertLessEqual(metrics.serialize_sec, metrics.sign_sec)
+        self.assertLessEqual(metrics.sign_sec + metrics.send_sec + metrics.read_sec + metrics.parse_sec, metrics.total_sec)
+
+    @aioresponses()
+    async def test_error_code(self, mock):
+        mock.get(url=re.compile(r"https://mocked_amazon_host.com"), status=403, body=load_fixture("error_invalid_access_key.xml"))
+        mock.get(url=re.compile(r"https://mocked_amazon_host.com"), exception=ConnectionResetError())
+
+        with self.assertRaises(SQSErrorResponse):
+            await self.client.get_queue_url(queue_name="example_queue")
+        with self.assertRaises(SQSClientBaseError):
+            await self.client.get_queue_url(queue_name="example_queue")
+
+        self.assertEqual([metrics.error_code for metrics in self.metrics], ["InvalidClientTokenId", "ConnectionResetError"])
+        self.assertEqual(self.metrics[0].status_code, 403)
+        self.assertIsNone(self.metrics[1].read_sec)
+
+    @aioresponses()
+    async def test_failing_hook(self, mock):
+        mock.get(url=re.compile(r"https://mocked_amazon_host.com"), status=200, body=load_fixture("get_queue_url.xml"))
+
+        def hook(metrics: RequestMetrics):
+            raise ValueError()
+
+        self.client.request_hooks = (hook,) + self.client.request_hooks
+        response = await self.client.get_queue_url(queue_name="example_queue")
+        self.assertEqual(response, {"QueueUrl": "http://sqs.mcs.mail.ru/account123/example_queue"})
+        self.assertEqual(len(self.metrics), 1)
+
+
+class PoolTracingTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        app = web.Application()
+        app.router.add_get("/", self.handle)
+        self.server = TestServer(app)
+        await self.server.start_server()
+
+    async def asyncTearDown(self):
+        await self.server.close()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        return web.Response(body=load_fixture("get_queue_url.xml"), content_type="text/xml")
+
+    async def test_connect_is_measured(self):
+        aggregator = HistogramAggregator()
+        client = SQSClient(
+            aws_access_key_id="access_key_id",
+            aws_secret_access_key="secret_access_key",
+            region_name="us-west-2",
+            host=f"{self.server.host}:{self.server.port}",
+            request_hooks=[aggregator],
+        )
+        client.endpoint_url = str(self.server.make_url("/"))
+        async with client:
+            await client.get_queue_url(queue_name="example_queue")
+            await client.get_queue_url(queue_name="example_queue")
+
+        # The second request reuses the connection
+        self.assertEqual(aggregator.histogram(action="GetQueueUrl", phase="connect").count, 1)
+        self.assertEqual(aggregator.snapshot()["GetQueueUrl"]["requests"], 2)
+
+
+class LogResponseTestCase(unittest.TestCase):
+    def test_large_body_is_truncated(self):
+        logger = logging.getLogger(f"{__name__}.log_response")
+        logger.setLevel(logging.DEBUG)
+        body = load_fixture("receive_message.xml").replace("</Body>", "x" * LOGGED_BODY_LIMIT + "</Body>")
+        with self.assertLogs(logger, level=logging.DEBUG) as logs:
+            parse_xml_result_response(action="ReceiveMessage", body=body, logger=logger)
+        (record,) = logs.records
+        self.assertLess(len(record.getMessage()), LOGGED_BODY_LIMIT + 100)
+        self.assertIn(f"({len(body)} bytes)", record.getMessage())
@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import time
+import unittest
+
+from aiosqs.consumer import Consumer
+from aiosqs.lease import LeaseManager
+from aiosqs.tests.cases import StubSQSClient, stub_messages
+from aiosqs.types import Message
+
+
+class LeaseManagerTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.CRITICAL)
+        self.client = StubSQSClient(logger=self.logger)
+
+    async def asyncTearDown(self):
+        await self.client.close()
+
+    async def test_leases_are_extended_in_batches(self):
+        async with LeaseManager(client=self.client, visibility_timeout=60, extend_before_sec=0.05, logger=self.logger) as manager:
+            deadline = time.monotonic() + 0.06
+            for i in range(12):
+                manager.track(queue_url="queue", receipt_handle=str(i), deadline=deadline)
+            manager.track(queue_url="other_queue", receipt_handle="other", deadline=deadline)
+            await asyncio.sleep(0.05)
+
+            self.assertEqual(sorted(len(batch) for batch in self.client.visibility_batches), [1, 2, 10])
+            # The next extension is due in about a minute
+            self.assertEqual(len(manager), 13)
+            self.assertGreater(manager._heap[0][0], time.monotonic() + 50)
+
+    async def test_released_lease_is_not_extended(self):
+        async with LeaseManager(client=self.client, extend_before_sec=0.05, logger=self.logger) as manager:
+            deadline = time.monotonic() + 0.06
+            manager.track(queue_url="queue", receipt_handle="a", deadline=deadline)
+            manager.track(queue_url="queue", receipt_handle="b", deadline=deadline)
+            manager.release(receipt_handle="a")
+            await asyncio.sleep(0.05)
+
+        self.assertEqual(self.client.visibility_batches, [{"b": 30}])
+
+    async def test_failed_lease_is_dropped(self):
+        self.client.errors = {"a": ["ReceiptHandleIsInvalid"]}
+        async with LeaseManager(client=self.client, visibility_timeout=60, extend_before_sec=0.05, logger=self.logger) as manager:
+            deadline = time.monotonic() + 0.06
+            manager.track(queue_url="queue", receipt_handle="a", deadline=deadline)
+            manager.track(queue_url="queue", receipt_handle="b", deadline=deadline)
+            await asyncio.sleep(0.05)
+            self.assertEqual(len(manager), 1)
+
+    async def test_unexpected_failed_entry_is_skipped(self):
+        async def change_message_visibility_batch(queue_url, entries):
+            failed = {"Id": "unknown", "SenderFault": True, "Code": "InvalidParameterValue", "Message": "Unexpected"}
+            return {"Successful": [{"Id": entry["Id"]} for entry in entries], "Failed": [failed]}
+
+        self.client.change_message_visibility_batch = change_message_visibility_batch
+        async with LeaseManager(client=self.client, visibility_timeout=60, extend_before_sec=0.05, logger=self.logger) as manager:
+            manager.track(queue_url="queue", receipt_handle="a", deadline=time.monotonic() + 0.06)
+            await asyncio.sleep(0.05)
+            # The lease is extended and the loop keeps running
+            self.assertEqual(len(manager), 1)
+            self.assertGreater(manager._heap[0][0], time.monotonic() + 50)
+            self.assertFalse(manager._task.done())
+
+    async def test_request_error_is_retried(self):
+        self.client.request_errors = 1
+        async with LeaseManager(client=self.client, visibility_timeout=60, extend_before_sec=0.1, logger=self.logger) as manager:
+            manager.track(queue_url="queue", receipt_handle="a", deadline=time.monotonic() + 0.11)
+            await asyncio.sleep(0.1)
+
+        self.assertEqual(self.client.visibility_batches, [{"a": 60}, {"a": 60}])
+
+    async def test_lease_is_limited(self):
+        async with LeaseManager(
+            client=self.client, visibility_timeout=60, extend_before_sec=0.05, max_lease_sec=0, logger=self.logger
+        ) as manager:
+            manager.track(queue_url="queue", receipt_handle="a", deadline=time.monotonic() + 0.06)
+            await asyncio.sleep(0.03)
+            self.assertEqual(len(manager), 0)
+
+        self.assertEqual(self.client.visibility_batches, [])
+
+    async def test_consumer_extends_visibility_while_handling(self):
+        self.client.messages["queue"] = stub_messages(1)
+        handled = asyncio.Event()
+
+        async def handler(message: Message):
+            await asyncio.sleep(0.1)
+            handled.set()
+
+        async with LeaseManager(client=self.client, visibility_timeout=60, extend_before_sec=1.95, logger=self.logger) as manager:
+            async with Consumer(
+                client=self.client,
+                queue_url="queue",
+                handler=handler,
+                visibility_timeout=2,
+                lease_manager=manager,
+                logger=self.logger,
+            ):
+                await asyncio.wait_for(handled.wait(), timeout=1)
+            self.assertEqual(len(manager), 0)
+
+        self.assertEqual(self.client.visibility_batches, [{"handle-0": 60}])
+
+    def test_extension_must_be_earlier_than_visibility_timeout(self):
+        with self.assertRaises(ValueError):
+            LeaseManager(client=self.client, visibility_timeout=5, extend_before_sec=5)
+
+    async def test_consumer_closes_lease_manager_it_has_started(self):
+        manager = LeaseManager(client=self.client, logger=self.logger)
+        async with Consumer(client=self.client, queue_url="queue", handler=lambda message: None, lease_manager=manager, logger=self.logger):
+            self.assertTrue(manager.running)
+        self.assertFalse(manager.running)
+
+        async with manager:
+            async with Consumer(
+                client=self.client, queue_url="queue", handler=lambda message: None, lease_manager=manager, logger=self.logger
+            ):
+                pass
+            self.assertTrue(manager.running)
@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import unittest
+from typing import Dict, List
+
+from aiosqs.multi_consumer import MultiQueueConsumer, WeightedQueue
+from aiosqs.tests.cases import StubSQSClient, stub_messages
+from aiosqs.types import Message
+
+HIGH = "https://sqs.us-west-2.amazonaws.com/123/high"
+LOW = "https://sqs.us-west-2.amazonaws.com/123/low"
+IDLE = "https://sqs.us-west-2.amazonaws.com/123/idle"
+
+
+class MultiQueueConsumerTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.CRITICAL)
+        self.handled: List[str] = []
+
+    async def create_client(self, messages: Dict[str, int]) -> StubSQSClient:
+        client = StubSQSClient(
+            messages={queue_url: stub_messages(count, body=queue_url) for queue_url, count in messages.items()}, logger=self.logger
+        )
+        self.addAsyncCleanup(client.close)
+        return client
+
+    async def wait_for(self, predicate, timeout: float = 5):
+        async def wait():
+            while not predicate():
+                await asyncio.sleep(0.001)
+
+        await asyncio.wait_for(wait(), timeout=timeout)
+
+    async def handler(self, message: Message):
+        await asyncio.sleep(0)
+        self.handled.append(message["Body"])
+
+    def test_validation(self):
+        with self.assertRaises(ValueError):
+            MultiQueueConsumer(client=None, queues=[], handler=self.handler)
+        with self.assertRaises(ValueError):
+            MultiQueueConsumer(client=None, queues=[WeightedQueue(queue_url=HIGH)])
+        with self.assertRaises(ValueError):
+            MultiQueueConsumer(client=None, queues=[WeightedQueue(queue_url=HIGH, weight=0)], handler=self.handler)
+
+    async def test_all_queues_are_consumed(self):
+        client = await self.create_client(messages={HIGH: 30, LOW: 20, IDLE: 0})
+        queues = [WeightedQueue(queue_url=HIGH, weight=2), WeightedQueue(queue_url=LOW), WeightedQueue(queue_url=IDLE)]
+        async with MultiQueueConsumer(client=client, queues=queues, handler=self.handler, workers=4, logger=self.logger) as consumer:
+            await self.wait_for(lambda: len(self.handled) == 50)
+
+        self.assertEqual(self.handled.count(HIGH), 30)
+        self.assertEqual(self.handled.count(LOW), 20)
+        self.assertEqual(len(client.deleted), 50)
+        self.assertEqual(consumer.stats()[HIGH]["received"], 30)
+        self.assertEqual(consumer.buffered, 0)
+
+    async def test_weights(self):
+        client = await self.create_client(messages={HIGH: 500, LOW: 500})
+        queues = [WeightedQueue(queue_url=HIGH, weight=3), WeightedQueue(queue_url=LOW, weight=1)]
+        async with MultiQueueConsumer(client=client, queues=queues, handler=self.handler, workers=1, prefetch=20, logger=self.logger):
+            await self.wait_for(lambda: len(self.handled) >= 200)
+
+        handled = self.handled[:200]
+        self.assertAlmostEqual(handled.count(HIGH) / handled.count(LOW), 3, delta=0.5)
+
+    async def test_burst_does_not_starve_other_queues(self):
+        client = await self.create_client(messages={HIGH: 1000, LOW: 20})
+        queues = [WeightedQueue(queue_url=HIGH), WeightedQueue(queue_url=LOW)]
+        async with MultiQueueConsumer(client=client, queues=queues, handler=self.handler, workers=1, prefetch=20, logger=self.logger):
+            await self.wait_for(lambda: len(self.handled) >= 60)
+
+        # Messages of the queues take turns
+        self.assertEqual(self.handled[:60].count(LOW), 20)
+        self.assertLessEqual(self.handled[:40].count(HIGH), 25)
+
+    async def test_per_queue_handler(self):
+        client = await self.create_client(messages={HIGH: 5, LOW: 5})
+        low_handled = []
+
+        async def low_handler(message: Message):
+            low_handled.append(message["MessageId"])
+
+        queues = [WeightedQueue(queue_url=HIGH), WeightedQueue(queue_url=LOW, handler=low_handler)]
+        async with MultiQueueConsumer(client=client, queues=queues, handler=self.handler, logger=self.logger):
+            await self.wait_for(lambda: len(self.handled) == 5 and len(low_handled) == 5)
+        self.assertEqual(self.handled, [HIGH] * 5)
+
+    async def test_wait_time_grows_on_empty_queue(self):
+        client = await self.create_client(messages={HIGH: 10, IDLE: 0})
+        queues = [WeightedQueue(queue_url=HIGH), WeightedQueue(queue_url=IDLE)]
+        consumer = MultiQueueConsumer(
+            client=client, queues=queues, handler=self.handler, fetchers=1, max_wait_time_seconds=10, logger=self.logger
+        )
+        async with consumer:
+            await self.wait_for(lambda: len(client.wait_times[IDLE]) >= 6)
+
+        self.assertEqual(client.wait_times[IDLE][:6], [1, 1, 3, 7, 10, 10])
+        self.assertEqual(client.wait_times[HIGH][:2], [1, 1])
+        self.assertEqual(consumer.stats()[IDLE]["wait_time_seconds"], 10)
+
+    async def test_receive_errors_are_not_empty_receives(self):
+        client = await self.create_client(messages={HIGH: 5, LOW: 5})
+        client.receive_errors = 4
+        queues = [WeightedQueue(queue_url=HIGH), WeightedQueue(queue_url=LOW)]
+        consumer = MultiQueueConsumer(
+            client=client, queues=queues, handler=self.handler, fetchers=1, error_delay_sec=0.001, logger=self.logger
+        )
+        async with consumer:
+            await self.wait_for(lambda: len(self.handled) == 10)
+
+        # Failing polls take turns too, and don't make the wait time grow
+        self.assertEqual(client.wait_times[HIGH][:3], [1, 1, 1])
+        self.assertEqual(client.wait_times[LOW][:3], [1, 1, 1])
+        stats = consumer.stats()
+        self.assertEqual(stats[HIGH]["errors"] + stats[LOW]["errors"], 4)
+        self.assertEqual(stats[HIGH]["errors"], 2)
@@ -0,0 +1,240 @@
+import json
+import logging
+import re
+import tempfile
+import unittest
+
+from aioresponses import aioresponses
+
+from aiosqs.attributes import MessageAttributes
+from aiosqs.client import SQSClient
+from aiosqs.offload import BlobStore, LocalBlobStore, MemoryBlobStore, PayloadOffloader, split_receipt_handle
+from aiosqs.tests.fixtures import load_fixture
+
+
+class LocalBlobStoreTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = LocalBlobStore(directory=self.directory.name)
+
+    async def asyncTearDown(self):
+        self.directory.cleanup()
+
+    async def test_put_get_delete(self):
+        await self.store.put(key="blob-1", data=b"payload")
+        self.assertEqual(await self.store.get(key="blob-1"), b"payload")
+
+        await self.store.delete(key="blob-1")
+        with self.assertRaises(FileNotFoundError):
+            await self.store.get(key="blob-1")
+        # Deleting a missing blob is not an error
+        await self.store.delete(key="blob-1")
+
+    async def test_stream_in_chunks(self):
+        data = bytes(range(256)) * 1000
+        await self.store.put(key="blob-1", data=data)
+
+        chunks = [chunk async for chunk in self.store.stream(key="blob-1", chunk_size=10000)]
+        self.assertEqual(len(chunks), 26)
+        self.assertTrue(all(len(chunk) <= 10000 for chunk in chunks))
+        self.assertEqual(b"".join(chunks), data)
+
+    async def test_stream_empty_blob(self):
+        await self.store.put(key="blob-1", data=b"")
+        self.assertEqual([chunk async for chunk in self.store.stream(key="blob-1")], [])
+
+    async def test_nested_key(self):
+        await self.store.put(key="orders/2024/blob-1", data=b"payload")
+        self.assertEqual(await self.store.get(key="orders/2024/blob-1"), b"payload")
+        await self.store.delete(key="orders/2024/blob-1")
+
+    async def test_invalid_key(self):
+        for key in ("", "../blob", "dir/../blob", "dir//blob", "/blob", "dir/", ".hidden", "dir/.hidden"):
+            with self.assertRaises(ValueError):
+                await self.store.put(key=key, data=b"payload")
+
+
+class OffloadClientTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.CRITICAL)
+
+        self.store = MemoryBlobStore()
+        self.client = self.create_client(offloader=PayloadOffloader(store=self.store, min_bytes=100, key_prefix="test-"))
+
+    async def asyncTearDown(self):
+        await self.client.close()
+
+    def create_client(self, **kwargs) -> SQSClient:
+        return SQSClient(
+            aws_access_key_id="access_key_id",
+            aws_secret_access_key="secret_access_key",
+            region_name="us-west-2",
+            host="mocked_amazon_host.com",
+            timeout_sec=0,
+            logger=self.logger,
+            **kwargs,
+        )
+
+    def pointer_message(self, message_id: str, body: str) -> dict:
+        return {
+            "MessageId": message_id,
+            "ReceiptHandle": f"handle-{message_id}",
+            "MD5OfBody": "md5",
+            "Body": body,
+            "MessageAttributes": MessageAttributes({"ExtendedPayloadSize": ("Number", "300")}),
+        }
+
+    async def test_missing_blob_fails_only_its_message(self):
+        await self.store.put(key="blob-1", data=b"y" * 300)
+        messages = [
+            self.pointer_message(message_id="1", body=json.dumps({"blobKey": "blob-1"})),
+            self.pointer_message(message_id="2", body=json.dumps({"blobKey": "deleted"})),
+        ]
+
+        async def request(params):
+            return messages
+
+        self.client.request = request
+        response = await self.client.receive_message(
+            queue_url="http://host.com/internal/tests", max_number_of_messages=2, visibility_timeout=30
+        )
+        self.assertEqual(response[0]["Body"], "y" * 300)
+        self.assertNotIn("PayloadError", response[0])
+        self.assertIsInstance(response[1]["PayloadError"], KeyError)
+
+    async def test_extended_client_pointer_is_not_resolved(self):
+        body = json.dumps(["software.amazon.payloadoffloading.PayloadS3Pointer", {"s3BucketName": "bucket", "s3Key": "key"}])
+        messages = [self.pointer_message(message_id="1", body=body), self.pointer_message(message_id="2", body="not json")]
+
+        async def request(params):
+            return messages
+
+        self.client.request = request
+        response = await self.client.receive_message(
+            queue_url="http://host.com/internal/tests", max_number_of_messages=2, visibility_timeout=30
+        )
+        self.assertEqual(response[0]["Body"], body)
+        self.assertEqual(response[0]["ReceiptHandle"], "handle-1")
+        self.assertEqual(response[1]["Body"], "not json")
+
+    def test_blob_store_must_implement_methods(self):
+        class ReadOnlyBlobStore(BlobStore):
+            async def put(self, key: str, data: bytes):
+                pass
+
+        with self.assertRaises(TypeError):
+            ReadOnlyBlobStore()
+
+    def test_split_receipt_handle(self):
+        self.assertEqual(split_receipt_handle("-..blob..-key-..blob..-handle"), ("key", "handle"))
+        self.assertEqual(split_receipt_handle("handle"), (None, "handle"))
+
+    @aioresponses()
+    async def test_send_large_message(self, mock):
+        mock.get(
+            url=re.compile(r"https://mocked_amazon_host.com"),
+            status=200,
+            body=load_fixture("send_message.xml"),
+        )
+
+        await self.client.send_message(queue_url="http://host.com/internal/tests", message_body="x" * 200)
+
+        ((_, request_url),) = mock.requests.keys()
+        key = json.loads(request_url.query["MessageBody"])["blobKey"]
+        self.assertTrue(key.startswith("test-"))
+        self.assertEqual(self.store.blobs, {key: b"x" * 200})
+        self.assertEqual(request_url.query["MessageAttribute.1.Name"], "ExtendedPayloadSize")
+        self.assertEqual(request_url.query["MessageAttribute.1.Value.StringValue"], "200")
+
+    @aioresponses()
+    async def test_send_small_message(self, mock):
+        mock.get(
+            url=re.compile(r"https://mocked_amazon_host.com"),
+            status=200,
+            body=load_fixture("send_message.xml"),
+        )
+
+        await self.client.send_message(queue_url="http://host.com/internal/tests", message_body="x" * 100)
+
+        ((_, request_url),) = mock.requests.keys()
+        self.assertEqual(request_url.query["MessageBody"], "x" * 100)
+        self.assertEqual(self.store.blobs, {})
+
+    @aioresponses()
+    async def test_receive_and_delete(self, mock):
+        mock.get(
+            url=re.compile(r"https://mocked_amazon_host.com"),
+            status=200,
+            body=load_fixture("receive_message_offloaded.xml"),
+        )
+        mock.get(
+            url=re.compile(r"https://mocked_amazon_host.com"),
+            status=200,
+            body=load_fixture("delete_message.xml"),
+        )
+        await self.store.put(key="blob-1", data=b"y" * 300)
+
+        messages = await self.client.receive_message(
+            queue_url="http://host.com/internal/tests",
+            max_number_of_messages=2,
+            visibility_timeout=30,
+        )
+        self.assertEqual(messages[0]["Body"], "y" * 300)
+        self.assertEqual(messages[0]["ReceiptHandle"], "-..blob..-blob-1-..blob..-1668283200-5fea7756-0ea4-451a-a703-a558b933e274")
+        self.assertEqual(messages[1]["Body"], "small message")
+        self.assertEqual(messages[1]["ReceiptHandle"], "1668283200-0f8509ff-53fd-40ca-88c9-a3c8de61421c")
+
+        await self.client.delete_message(queue_url="http://host.com/internal/tests", receipt_handle=messages[0]["ReceiptHandle"])
+        self.assertEqual(self.store.blobs, {})
+
+        receive_url, delete_url = [url for _, url in mock.requests.keys()]
+        self.assertEqual(receive_url.query["MessageAttributeName.1"], "ExtendedPayloadSize")
+        self.assertEqual(delete_url.query["ReceiptHandle"], "1668283200-5fea7756-0ea4-451a-a703-a558b933e274")
+
+    @aioresponses()
+    async def test_delete_message_batch(self, mock):
+        mock.get(
+            url=re.compile(r"https://mocked_amazon_host.com"),
+            status=200,
+            body=load_fixture("delete_message_batch.xml"),
+        )
+        await self.store.put(key="blob-1", data=b"y" * 300)
+        await self.store.put(key="blob-2", data=b"y" * 300)
+
+        await self.client.delete_message_batch(
+            queue_url="http://host.com/internal/tests",
+            entries=[
+                {"Id": "msg1", "ReceiptHandle": "-..blob..-blob-1-..blob..-handle-1"},
+                {"Id": "msg2", "ReceiptHandle": "handle-2"},
+            ],
+        )
+        # Only blobs of deleted messages are deleted
+        self.assertEqual(list(self.store.blobs), ["blob-2"])
+
+        ((_, request_url),) = mock.requests.keys()
+        self.assertEqual(request_url.query["DeleteMessageBatchRequestEntry.1.ReceiptHandle"], "handle-1")
+
+    @aioresponses()
+    async def test_stream_without_fetching(self, mock):
+        mock.get(
+            url=re.compile(r"https://mocked_amazon_host.com"),
+            status=200,
+            body=load_fixture("receive_message_offloaded.xml"),
+        )
+        await self.store.put(key="blob-1", data=b"y" * 300)
+        client = self.create_client(offloader=PayloadOffloader(store=self.store, fetch=False))
+        try:
+            messages = await client.receive_message(
+                queue_url="http://host.com/internal/tests",
+                max_number_of_messages=2,
+                visibility_timeout=30,
+            )
+        finally:
+            await client.close()
+
+        self.assertEqual(messages[0]["Body"], '{"blobKey": "blob-1"}')
+        chunks = [chunk async for chunk in client.stream_message_body(messages[0], chunk_size=100)]
+        self.assertEqual(chunks, [b"y" * 100] * 3)
+        chunks = [chunk async for chunk in client.stream_message_body(messages[1], chunk_size=100)]
+        self.assertEqual(chunks, [b"small message"])
@@ -0,0 +1,75 @@
+import unittest
+
+from aiosqs.polling import PollController, PollParams
+
+QUEUE = "https://sqs.us-west-2.amazonaws.com/123/queue"
+
+
+class PollControllerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.controller = PollController(min_wait_time_seconds=1, max_wait_time_seconds=20, min_samples=5, window=10)
+
+    def test_initial_params(self):
+        self.assertEqual(
+            self.controller.params(queue_url=QUEUE),
+            PollParams(max_number_of_messages=10, visibility_timeout=30, wait_time_seconds=1),
+        )
+
+    def test_bounds_are_validated(self):
+        with self.assertRaises(ValueError):
+            PollController(max_wait_time_seconds=30)
+        with self.assertRaises(ValueError):
+            PollController(min_batch_size=5, max_batch_size=2)
+        with self.assertRaises(ValueError):
+            PollController(max_visibility_timeout=50000)
+
+    def test_idle_queue(self):
+        for _ in range(30):
+            self.controller.record_receive(queue_url=QUEUE, requested=10, received=0)
+        params = self.controller.params(queue_url=QUEUE)
+        self.assertEqual(params.wait_time_seconds, 20)
+        self.assertEqual(params.max_number_of_messages, 1)
+
+        # Messages appear again
+        for _ in range(30):
+            self.controller.record_receive(queue_url=QUEUE, requested=params.max_number_of_messages, received=params.max_number_of_messages)
+            params = self.controller.params(queue_url=QUEUE)
+        self.assertEqual(params, PollParams(max_number_of_messages=10, visibility_timeout=30, wait_time_seconds=1))
+
+    def test_sparse_queue(self):
+        for _ in range(30):
+            self.controller.record_receive(queue_url=QUEUE, requested=10, received=2)
+        params = self.controller.params(queue_url=QUEUE)
+        self.assertEqual(params.max_number_of_messages, 4)
+        self.assertEqual(params.wait_time_seconds, 1)
+        self.assertAlmostEqual(self.controller.stats()[QUEUE]["fill_ratio"], 0.2, places=2)
+
+    def test_full_batches_shorten_wait_time(self):
+        bursty = "https://sqs.us-west-2.amazonaws.com/123/bursty"
+        # Both queues return every other batch empty, only the bursty one returns full batches in between
+        for _ in range(15):
+            for queue_url, received in ((QUEUE, 1), (bursty, 10)):
+                self.controller.record_receive(queue_url=queue_url, requested=10, received=0)
+                self.controller.record_receive(queue_url=queue_url, requested=10, received=received)
+        stats = self.controller.stats()
+        self.assertAlmostEqual(stats[QUEUE]["empty_rate"], stats[bursty]["empty_rate"])
+        self.assertLess(stats[bursty]["wait_time_seconds"], stats[QUEUE]["wait_time_seconds"])
+
+    def test_visibility_timeout_follows_processing_time(self):
+        for _ in range(5):
+            self.controller.record_processing(queue_url=QUEUE, duration_sec=20)
+        self.assertEqual(self.controller.params(queue_url=QUEUE).visibility_timeout, 80)
+
+        # Fast handlers don't lower the visibility timeout below the minimum
+        for _ in range(10):
+            self.controller.record_processing(queue_url=QUEUE, duration_sec=0.1)
+        self.assertEqual(self.controller.params(queue_url=QUEUE).visibility_timeout, 30)
+
+    def test_stats(self):
+        self.controller.record_receive(queue_url=QUEUE, requested=10, received=0)
+        stats = self.controller.stats()[QUEUE]
+        self.assertEqual(stats["receives"], 1)
+        self.assertAlmostEqual(stats["empty_rate"], 0.2)
+        self.assertAlmostEqual(stats["fill_ratio"], 0.8)
+        self.assertIsNone(stats["processing_sec"])
+        self.assertEqual(stats["wait_time_seconds"], 2)
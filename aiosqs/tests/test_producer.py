@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import unittest
+from typing import Dict, List
+
+from aiosqs.exceptions import SQSClientBaseError, SQSErrorResponse
+from aiosqs.producer import BatchingProducer
+from aiosqs.tests.cases import StubSQSClient
+
+
+class BatchingProducerTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.CRITICAL)
+        self.client = StubSQSClient(logger=self.logger)
+
+    async def asyncTearDown(self):
+        await self.client.close()
+
+    async def test_messages_are_coalesced(self):
+        async with BatchingProducer(client=self.client, linger_sec=10) as producer:
+            responses = await asyncio.gather(
+                *[producer.send_message(queue_url="queue", message_body=str(i)) for i in range(25)],
+                producer.flush(),
+            )
+
+        self.assertEqual([len(batch) for batch in self.client.send_batches], [10, 10, 5])
+        self.assertEqual(responses[:25], [{"MessageId": f"id-{i}", "MD5OfMessageBody": "md5"} for i in range(25)])
+
+    async def test_batch_is_sent_after_linger(self):
+        async with BatchingProducer(client=self.client, linger_sec=0.01) as producer:
+            response = await producer.send_message(queue_url="queue", message_body="a", delay_seconds=5, message_group_id="group")
+
+        self.assertEqual(response, {"MessageId": "id-a", "MD5OfMessageBody": "md5"})
+        self.assertEqual(self.client.send_batches, [[{"Id": "0", "MessageBody": "a", "DelaySeconds": 5, "MessageGroupId": "group"}]])
+
+    async def test_batches_are_split_by_queue_and_size(self):
+        async with BatchingProducer(client=self.client, max_batch_bytes=1000) as producer:
+            await asyncio.gather(
+                producer.send_message(queue_url="queue_1", message_body="a" * 400),
+                producer.send_message(queue_url="queue_2", message_body="b" * 400),
+                producer.send_message(queue_url="queue_1", message_body="c" * 400),
+                producer.send_message(queue_url="queue_1", message_body="d" * 400),
+            )
+
+        self.assertEqual(sorted(len(batch) for batch in self.client.send_batches), [1, 1, 2])
+
+    async def test_failed_entry_fails_only_its_caller(self):
+        self.client.errors = {"fail": ["InvalidParameterValue"]}
+        async with BatchingProducer(client=self.client) as producer:
+            responses = await asyncio.gather(
+                producer.send_message(queue_url="queue", message_body="ok"),
+                producer.send_message(queue_url="queue", message_body="fail"),
+                return_exceptions=True,
+            )
+
+        self.assertEqual(len(self.client.send_batches), 1)
+        self.assertEqual(responses[0], {"MessageId": "id-ok", "MD5OfMessageBody": "md5"})
+        self.assertIsInstance(responses[1], SQSErrorResponse)
+        self.assertEqual(responses[1].error.type, "Sender")
+        self.assertEqual(responses[1].error.code, "InvalidParameterValue")
+
+    async def test_request_error_fails_whole_batch(self):
+        self.client.request_errors = 1
+        async with BatchingProducer(client=self.client, logger=self.logger) as producer:
+            responses = await asyncio.gather(
+                producer.send_message(queue_url="queue", message_body="ok"),
+                producer.send_message(queue_url="queue", message_body="error"),
+                return_exceptions=True,
+            )
+
+        self.assertIsInstance(responses[0], SQSClientBaseError)
+        self.assertIsInstance(responses[1], SQSClientBaseError)
+
+    async def test_backpressure(self):
+        producer = BatchingProducer(client=self.client, max_batch_size=2, max_pending=4, max_in_flight=1)
+        pending_in_batches = []
+        send_message_batch = self.client.send_message_batch
+
+        async def watched_send_message_batch(queue_url: str, entries: List[Dict]):
+            pending_in_batches.append(producer.pending)
+            return await send_message_batch(queue_url=queue_url, entries=entries)
+
+        self.client.send_message_batch = watched_send_message_batch
+        async with producer:
+            await asyncio.gather(*[producer.send_message(queue_url="queue", message_body=str(i)) for i in range(20)])
+            self.assertEqual(producer.pending, 0)
+
+        self.assertEqual(len(pending_in_batches), 10)
+        self.assertLessEqual(max(pending_in_batches), 4)
+
+    async def test_closed_producer(self):
+        producer = BatchingProducer(client=self.client)
+        await producer.close()
+        with self.assertRaises(RuntimeError):
+            await producer.send_message(queue_url="queue", message_body="a")
+
+    async def test_unexpected_entries_are_ignored(self):
+        async def send_message_batch(queue_url: str, entries: List[Dict]):
+            return {
+                "Successful": [{"Id": "0", "MessageId": "id-0", "MD5OfMessageBody": "md5"}, {"Id": "0"}, {"Id": "x"}],
+                "Failed": [],
+            }
+
+        self.client.send_message_batch = send_message_batch
+        async with BatchingProducer(client=self.client, logger=self.logger) as producer:
+            responses = await asyncio.gather(
+                producer.send_message(queue_url="queue", message_body="a"),
+                producer.send_message(queue_url="queue", message_body="b"),
+                return_exceptions=True,
+            )
+
+        self.assertEqual(responses[0], {"MessageId": "id-0", "MD5OfMessageBody": "md5"})
+        self.assertEqual(responses[1].error.code, "MissingEntry")
+
+    async def test_cancelled_batch_cancels_entries(self):
+        started = asyncio.Event()
+
+        async def send_message_batch(queue_url: str, entries: List[Dict]):
+            started.set()
+            await asyncio.sleep(10)
+
+        self.client.send_message_batch = send_message_batch
+        producer = BatchingProducer(client=self.client)
+        sending = asyncio.ensure_future(producer.send_message(queue_url="queue", message_body="a"))
+        await started.wait()
+        for task in list(producer._tasks):
+            task.cancel()
+
+        with self.assertRaises(asyncio.CancelledError):
+            await asyncio.wait_for(sending, timeout=1)
+        self.assertEqual(producer.pending, 0)
@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import re
+import traceback
+import unittest
+from unittest import mock
+
+from aioresponses import aioresponses
+
+from aiosqs.client import SQSClient
+from aiosqs.exceptions import ErrorData, SQSClientBaseError, SQSErrorResponse
+from aiosqs.queue_urls import QueueUrlCache
+from aiosqs.tests.fixtures import load_fixture
+
+
+def non_existent_queue() -> SQSErrorResponse:
+    error = ErrorData(type="Sender", code="AWS.SimpleQueueService.NonExistentQueue", message="The specified queue does not exist.")
+    return SQSErrorResponse(error=error, request_id=None, status_code=400)
+
+
+class QueueUrlCacheTestCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.cache = QueueUrlCache(ttl_sec=60, max_size=2, negative_ttl_sec=5)
+        self.calls = 0
+
+    def create_loader(self, result, delay_sec: float = 0):
+        async def load():
+            self.calls += 1
+            await asyncio.sleep(delay_sec)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        return load
+
+    async def test_cached(self):
+        url = await self.cache.get(queue_name="queue", account_id=None, loader=self.create_loader("url"))
+        self.assertEqual(url, "url")
+        url = await self.cache.get(queue_name="queue", account_id=None, loader=self.create_loader("other_url"))
+        self.assertEqual(url, "url")
+        self.assertEqual(self.calls, 1)
+
+        # The account is a part of the key
+        url = await self.cache.get(queue_name="queue", account_id="123", loader=self.create_loader("other_url"))
+        self.assertEqual(url, "other_url")
+        self.assertEqual(self.calls, 2)
+
+    async def test_concurrent_lookups(self):
+        loader = self.create_loader("url", delay_sec=0.05)
+        urls = await asyncio.gather(*[self.cache.get(queue_name="queue", account_id=None, loader=loader) for _ in range(10)])
+        self.assertEqual(urls, ["url"] * 10)
+        self.assertEqual(self.calls, 1)
+
+    async def test_concurrent_failed_lookups(self):
+        loader = self.create_loader(non_existent_queue(), delay_sec=0.05)
+        errors = await asyncio.gather(
+            *[self.cache.get(queue_name="queue", account_id=None, loader=loader) for _ in range(2)],
+            return_exceptions=True,
+        )
+        self.assertEqual(self.calls, 1)
+        self.assertIsNot(errors[0], errors[1])
+        self.assertIs(errors[0].__cause__, errors[1].__cause__)
+        # Only the lookup has raised the original error
+        self.assertEqual(len(traceback.extract_tb(errors[0].__cause__.__traceback__)), 2)
+        self.assertEqual([error.error.code for error in errors], [non_existent_queue().error.code] * 2)
+        self.assertEqual([error.status_code for error in errors], [400, 400])
+
+    async def test_cancelled_caller(self):
+        loader = self.create_loader("url", delay_sec=0.05)
+        first = asyncio.ensure_future(self.cache.get(queue_name="queue", account_id=None, loader=loader))
+        second = asyncio.ensure_future(self.cache.get(queue_name="queue", account_id=None, loader=loader))
+        await asyncio.sleep(0)
+        first.cancel()
+        self.assertEqual(await second, "url")
+        self.assertEqual(self.calls, 1)
+
+    async def test_ttl(self):
+        with mock.patch("aiosqs.queue_urls.time.monotonic", return_value=100):
+            await self.cache.get(queue_name="queue", account_id=None, loader=self.create_loader("url"))
+        with mock.patch("aiosqs.queue_urls.time.monotonic", return_value=161):
+            url = await self.cache.get(queue_name="queue", account_id=None, loader=self.create_loader("new_url"))
+        self.assertEqual(url, "new_url")
+        self.assertEqual(self.calls, 2)
+
+    async def test_lru_eviction(self):
+        await self.cache.get(queue_name="first", account_id=None, loader=self.create_loader("first_url"))
+        await self.cache.get(queue_name="second", account_id=None, loader=self.create_loader("second_url"))
+        # The first queue becomes the most recently used one, the second one is evicted
+        await self.cache.get(queue_name="first", account_id=None, loader=self.create_loader("unused"))
+        await self.cache.get(queue_name="third", account_id=None, loader=self.create_loader("third_url"))
+        self.assertEqual(len(self.cache), 2)
+        self.assertEqual(self.calls, 3)
+
+        await self.cache.get(queue_name="first", account_id=None, loader=self.create_loader("unused"))
+        self.assertEqual(self.calls, 3)
+        await self.cache.get(queue_name="second", account_id=None, loader=self.create_loader("second_url"))
+        self.assertEqual(self.calls, 4)
+
+    async def test_negative_result(self):
+        with mock.patch("aiosqs.queue_urls.time.monotonic", return_value=100):
+            errors = []
+            for _ in range(3):
+                with self.assertRaises(SQSErrorResponse) as context:
+                    await self.cache.get(queue_name="queue", account_id=None, loader=self.create_loader(non_existent_queue()))
+                errors.append(context.exception)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(len({id(error) for error in errors}), 3)
+        self.assertEqual({error.error.code for error in errors}, {errors[0].error.code})
+
+        with mock.patch("aiosqs.queue_urls.time.monotonic", return_value=106):
+            url = await self.cache.get(queue_name="queue", account_id=None, loader=self.create_loader("url"))
+        self.assertEqual(url, "url")
+        self.assertEqual(self.calls, 2)
+
+    async def test_other_errors_are_not_cached(self):
+        with self.assertRaises(SQSClientBaseError):
+            await self.cache.get(queue_name="queue", account_id=None, loader=self.create_loader(SQSClientBaseError()))
+        url = await self.cache.get(queue_name="queue", account_id=None, loader=self.create_loader("url"))
+        self.assertEqual(url, "url")
+        self.assertEqual(self.calls, 2)
+
+    async def test_invalidate(self):
+        await self.cache.get(queue_name="queue", account_id=None, loader=self.create_loader("url"))
+        self.cache.invalidate(queue_name="queue")
+        url = await self.cache.get(queue_name="queue", account_id=None, loader=self.create_loader("new_url"))
+        self.assertEqual(url, "new_url")
+
+
+class ResolveQueueUrlTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.CRITICAL)
+
+        self.client = SQSClient(
+            aws_access_key_id="access_key_id",
+            aws_secret_access_key="secret_access_key",
+            region_name="us-west-2",
+            host="mocked_amazon_host.com",
+            timeout_sec=0,
+            logger=self.logger,
+        )
+
+    async def asyncTearDown(self):
+        await self.client.close()
+
+    @aioresponses()
+    async def test_url_is_returned_as_is(self, mock):
+        url = await self.client.resolve_queue_url(queue="https://mocked_amazon_host.com/123/queue")
+        self.assertEqual(url, "https://mocked_amazon_host.com/123/queue")
+        self.assertEqual(len(mock.requests), 0)
+
+    @aioresponses()
+    async def test_queue_owner(self, mock):
+        mock.get(url=re.compile(r"https://mocked_amazon_host.com"), status=200, body=load_fixture("get_queue_url.xml"))
+
+        url = await self.client.resolve_queue_url(queue="example_queue", queue_owner_aws_account_id="account123")
+        self.assertEqual(url, "http://sqs.mcs.mail.ru/account123/example_queue")
+
+        ((_, request_url),) = mock.requests.keys()
+        self.assertEqual(request_url.query["QueueName"], "example_queue")
+        self.assertEqual(request_url.query["QueueOwnerAWSAccountId"], "account123")
+
+    @aioresponses()
+    async def test_send_and_receive_by_queue_name(self, mock):
+        mock.get(url=re.compile(r"https://mocked_amazon_host.com"), status=200, body=load_fixture("get_queue_url.xml"))
+        mock.get(url=re.compile(r"https://mocked_amazon_host.com"), status=200, body=load_fixture("send_message.xml"))
+        mock.get(url=re.compile(r"https://mocked_amazon_host.com"), status=200, body=load_fixture("receive_message_empty.xml"))
+
+        await self.client.send_message(queue_url="example_queue", message_body="text")
+        await self.client.receive_message(queue_url="example_queue", max_number_of_messages=1, visibility_timeout=30)
+
+        queries = [request_url.query for _, request_url in mock.requests.keys()]
+        self.assertEqual([query["Action"] for query in queries], ["GetQueueUrl", "SendMessage", "ReceiveMessage"])
+        self.assertEqual(queries[1]["QueueUrl"], "http://sqs.mcs.mail.ru/account123/example_queue")
+        self.assertEqual(queries[2]["QueueUrl"], "http://sqs.mcs.mail.ru/account123/example_queue")
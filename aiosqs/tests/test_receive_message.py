@@ -1,4 +1,11 @@
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from lxml import etree
+
+from aiosqs.attributes import MessageAttributes
 from aiosqs.exceptions import SQSErrorResponse
+from aiosqs.parser import FEED_CHUNK_SIZE, parse_xml_result_response, xml_parser
 from aiosqs.tests.cases import ActionTestCase
 
 
@@ -87,3 +94,125 @@ class ReceiveMessageTestCase(ActionTestCase):
             exception.error.message,
             "The request processing has failed because of an unknown error, exception or failure.",
         )
+
+    def test_no_messages_json(self):
+        res = self.parseJSONResponse("receive_message_empty.json")
+        self.assertIsNone(res)
+
+    def test_many_messages_json(self):
+        res = self.parseJSONResponse("receive_messages.json")
+        self.assertEqual(
+            res,
+            [
+                {
+                    "MD5OfBody": "03ed928b62aee0c18f15dc123c695de9",
+                    "Body": '{"test": 1, "external_id": 5555}',
+                    "ReceiptHandle": "1668283200-b0eef428-d880-46fd-9c88-58882a421937",
+                    "MessageId": "b0eef428-d880-46fd-9c88-58882a421937",
+                },
+                {
+                    "MD5OfBody": "a88e5d79dc2948e662b90dc2857ba05c",
+                    "Body": '{"test": 2, "external_id": 4444}',
+                    "ReceiptHandle": "1668283200-0f8509ff-53fd-40ca-88c9-a3c8de61421c",
+                    "MessageId": "0f8509ff-53fd-40ca-88c9-a3c8de61421c",
+                },
+            ],
+        )
+
+    def test_messages_with_namespace(self):
+        res = self.parseXMLResponse("receive_messages_namespace.xml", mode="rb")
+        self.assertEqual(
+            res,
+            [
+                {
+                    "MessageId": "5fea7756-0ea4-451a-a703-a558b933e274",
+                    "ReceiptHandle": (
+                        "MbZj6wDWli+JvwwJaBV+3dcjk2YW2vA3+STFFljTM8tJJg6HRG6PYSasuWXPJB+CwLj1FjgXUv1uSj1gUPAWV66FU/WeR4mq2OKpEGYW"
+                        "bnLmpRCJVAyeMjeU5ZBdtcQ+QEauMZc8ZRv37sIW2iJKq3M9MFx1YvV11A2x/KSbkJ0="
+                    ),
+                    "MD5OfBody": "fafb00f5732ab283681e124bf8747ed1",
+                    "Body": "Привет, SQS!",
+                },
+            ],
+        )
+
+    def test_bytes_response(self):
+        self.assertEqual(self.parseXMLResponse("receive_messages.xml", mode="rb"), self.parseXMLResponse("receive_messages.xml"))
+
+    def large_response(self, count: int) -> bytes:
+        # Multibyte characters are split between chunks
+        items = "".join(
+            f"<Message><MessageId>{i}</MessageId><ReceiptHandle>handle-{i}</ReceiptHandle><Body>{self.large_body(i)}</Body></Message>"
+            for i in range(count)
+        )
+        response = f"<ReceiveMessageResponse><ReceiveMessageResult>{items}</ReceiveMessageResult></ReceiveMessageResponse>"
+        return response.encode("utf-8")
+
+    def large_body(self, index: int) -> str:
+        return f"{index}:" + "Привет, SQS! " * (FEED_CHUNK_SIZE // 10)
+
+    def test_messages_over_many_chunks(self):
+        res = parse_xml_result_response(action=self.action, body=self.large_response(count=5))
+        self.assertEqual(res, [{"MessageId": str(i), "ReceiptHandle": f"handle-{i}", "Body": self.large_body(i)} for i in range(5)])
+
+    def test_truncated_large_response(self):
+        body = self.large_response(count=3)
+        with self.assertRaises(etree.XMLSyntaxError):
+            parse_xml_result_response(action=self.action, body=body[: len(body) - 100])
+        # The parser is reset for the next response
+        self.assertEqual(len(parse_xml_result_response(action=self.action, body=body)), 3)
+
+    def test_parsing_in_threads(self):
+        expected = self.parseXMLResponse("receive_messages.xml")
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(lambda _: self.parseXMLResponse("receive_messages.xml"), range(20)))
+            parsers = set(executor.map(lambda _: id(xml_parser()), range(20)))
+        self.assertEqual(results, [expected] * 20)
+        self.assertIs(xml_parser(), xml_parser())
+        self.assertNotIn(id(xml_parser()), parsers)
+
+    def assertMessageWithAttributes(self, res):
+        self.assertEqual(len(res), 1)
+        message = res[0]
+        self.assertEqual(message["Body"], "This is a test message")
+        self.assertEqual(message["MD5OfMessageAttributes"], "d25a6aea97eb8f585bfa92d314504a92")
+        self.assertEqual(
+            message["Attributes"],
+            {
+                "SenderId": "195004372649",
+                "SentTimestamp": "1238099229000",
+                "ApproximateReceiveCount": "5",
+            },
+        )
+
+        attributes = message["MessageAttributes"]
+        self.assertIsInstance(attributes, MessageAttributes)
+        self.assertEqual(list(attributes), ["city", "count", "price", "payload"])
+        self.assertEqual(attributes.data_type("price"), "Number.float")
+        self.assertEqual(attributes.raw("payload"), ("Binary", "AAFnemlw"))
+        self.assertEqual(
+            dict(attributes),
+            {
+                "city": "Any City",
+                "count": 42,
+                "price": Decimal("0.1"),
+                "payload": b"\x00\x01gzip",
+            },
+        )
+
+    def test_message_attributes(self):
+        self.assertMessageWithAttributes(self.parseXMLResponse("receive_message_attributes.xml", mode="rb"))
+
+    def test_message_attributes_json(self):
+        self.assertMessageWithAttributes(self.parseJSONResponse("receive_message_attributes.json"))
+
+    def test_message_attributes_are_decoded_lazily(self):
+        attributes = self.parseXMLResponse("receive_message_attributes.xml")[0]["MessageAttributes"]
+        self.assertEqual(attributes._decoded, {})
+        self.assertEqual(attributes["count"], 42)
+        self.assertEqual(attributes._decoded, {"count": 42})
+
+    def test_no_message_attributes(self):
+        message = self.parseXMLResponse("receive_message.xml")[0]
+        self.assertNotIn("Attributes", message)
+        self.assertNotIn("MessageAttributes", message)
@@ -0,0 +1,190 @@
+import asyncio
+import logging
+import re
+import unittest
+
+from aioresponses import aioresponses
+
+from aiosqs.client import SQSClient
+from aiosqs.exceptions import ErrorData, SQSClientBaseError, SQSErrorResponse
+from aiosqs.retry import (
+    THROTTLING,
+    TIMEOUT,
+    TRANSIENT,
+    AdaptiveRateLimiter,
+    RetryBudget,
+    RetryPolicy,
+    classify_error,
+)
+from aiosqs.tests.cases import FakeClock
+from aiosqs.tests.fixtures import load_fixture
+
+
+def error_response(code: str, status_code: int = 400) -> SQSErrorResponse:
+    return SQSErrorResponse(error=ErrorData(type="Sender", code=code, message=""), request_id=None, status_code=status_code)
+
+
+class ClassifyErrorTestCase(unittest.TestCase):
+    def test_error_codes(self):
+        self.assertEqual(classify_error(error_response("ThrottlingException")), THROTTLING)
+        self.assertEqual(classify_error(error_response("AWS.SimpleQueueService.RequestThrottled")), THROTTLING)
+        self.assertEqual(classify_error(error_response("InternalFailure", status_code=500)), TRANSIENT)
+        self.assertIsNone(classify_error(error_response("AWS.SimpleQueueService.NonExistentQueue")))
+        self.assertIsNone(classify_error(error_response("InvalidClientTokenId", status_code=403)))
+
+    def test_status_codes(self):
+        self.assertEqual(classify_error(error_response("Unknown", status_code=429)), THROTTLING)
+        self.assertEqual(classify_error(error_response("Unknown", status_code=503)), TRANSIENT)
+        self.assertEqual(classify_error(SQSClientBaseError(status_code=502)), TRANSIENT)
+        self.assertIsNone(classify_error(SQSClientBaseError(status_code=404)))
+
+    def test_transport_errors(self):
+        self.assertEqual(classify_error(SQSClientBaseError()), TRANSIENT)
+        try:
+            raise SQSClientBaseError() from asyncio.TimeoutError()
+        except SQSClientBaseError as e:
+            self.assertEqual(classify_error(e), TIMEOUT)
+
+
+class RetryPolicyTestCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.CRITICAL)
+
+    def create_func(self, *results):
+        results = list(results)
+        self.calls = 0
+
+        async def func():
+            self.calls += 1
+            result = results.pop(0)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        return func
+
+    def test_delay_has_full_jitter(self):
+        policy = RetryPolicy(base_delay_sec=0.1, max_delay_sec=1)
+        delays = [policy.delay(attempt=3) for _ in range(1000)]
+        self.assertTrue(all(0 <= delay <= 0.8 for delay in delays))
+        self.assertLess(min(delays), 0.1)
+        self.assertTrue(all(policy.delay(attempt=10) <= 1 for _ in range(1000)))
+
+    async def test_retries_until_success(self):
+        policy = RetryPolicy(max_attempts=3, base_delay_sec=0, logger=self.logger)
+        func = self.create_func(error_response("ThrottlingException"), SQSClientBaseError(), "ok")
+        self.assertEqual(await policy.call(func), "ok")
+        self.assertEqual(self.calls, 3)
+        # Retries are refunded after the success
+        self.assertEqual(policy.budget.tokens, 500)
+
+    async def test_max_attempts(self):
+        policy = RetryPolicy(max_attempts=2, base_delay_sec=0, logger=self.logger)
+        func = self.create_func(SQSClientBaseError(), error_response("InternalError", status_code=500), "ok")
+        with self.assertRaises(SQSErrorResponse):
+            await policy.call(func)
+        self.assertEqual(self.calls, 2)
+
+    async def test_not_retryable(self):
+        policy = RetryPolicy(base_delay_sec=0, logger=self.logger)
+        with self.assertRaises(SQSErrorResponse):
+            await policy.call(self.create_func(error_response("AWS.SimpleQueueService.NonExistentQueue"), "ok"))
+        self.assertEqual(self.calls, 1)
+
+    async def test_budget_is_exhausted(self):
+        budget = RetryBudget(capacity=10, retry_cost=5)
+        policy = RetryPolicy(max_attempts=10, base_delay_sec=0, budget=budget, logger=self.logger)
+        func = self.create_func(*[SQSClientBaseError()] * 3, "ok")
+        with self.assertRaises(SQSClientBaseError):
+            await policy.call(func)
+        self.assertEqual(self.calls, 3)
+        self.assertEqual(budget.tokens, 0)
+
+        # Successful requests refill the budget
+        await policy.call(self.create_func("ok"))
+        self.assertEqual(budget.tokens, 1)
+
+
+class AdaptiveRateLimiterTestCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.clock = FakeClock(now=100.0)
+        self.limiter = AdaptiveRateLimiter(clock=self.clock)
+
+    def send(self, requests_per_sec: int, seconds: int, throttled_every: int = 0):
+        count = 0
+        for _ in range(seconds * requests_per_sec):
+            self.clock.now += 1 / requests_per_sec
+            count += 1
+            self.limiter.update(throttled=bool(throttled_every) and count % throttled_every == 0)
+
+    async def test_disabled_until_throttled(self):
+        self.send(requests_per_sec=100, seconds=2)
+        self.assertFalse(self.limiter.enabled)
+        await asyncio.wait_for(self.limiter.acquire(), timeout=0.1)
+
+    async def test_rate_is_cut_and_recovers(self):
+        self.send(requests_per_sec=100, seconds=2)
+        measured_rate = self.limiter.measured_tx_rate
+        self.limiter.update(throttled=True)
+        self.assertTrue(self.limiter.enabled)
+        self.assertAlmostEqual(self.limiter.fill_rate, measured_rate * 0.7, delta=1)
+
+        self.send(requests_per_sec=20, seconds=5, throttled_every=10)
+        throttled_rate = self.limiter.fill_rate
+        self.assertLess(throttled_rate, measured_rate * 0.7)
+
+        self.send(requests_per_sec=50, seconds=10)
+        self.assertGreater(self.limiter.fill_rate, throttled_rate)
+
+    async def test_acquire_waits_for_tokens(self):
+        self.limiter.enabled = True
+        self.limiter._update_bucket(new_rate=100)
+        self.limiter.current_capacity = 0
+        self.limiter.last_timestamp = self.clock.now
+
+        task = asyncio.ensure_future(self.limiter.acquire())
+        await asyncio.sleep(0.05)
+        self.assertFalse(task.done())
+
+        # One token is added in 0.01 sec
+        self.clock.now += 0.01
+        await asyncio.wait_for(task, timeout=1)
+        self.assertLess(self.limiter.current_capacity, 1)
+
+
+class RetryClientTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.CRITICAL)
+
+        self.client = SQSClient(
+            aws_access_key_id="access_key_id",
+            aws_secret_access_key="secret_access_key",
+            region_name="us-west-2",
+            host="mocked_amazon_host.com",
+            timeout_sec=0,
+            logger=self.logger,
+            retry_policy=RetryPolicy(base_delay_sec=0, rate_limiter=AdaptiveRateLimiter(), logger=self.logger),
+        )
+
+    async def asyncTearDown(self):
+        await self.client.close()
+
+    @aioresponses()
+    async def test_server_error_is_retried(self, mock):
+        mock.get(url=re.compile(r"https://mocked_amazon_host.com"), status=500, body=load_fixture("error_500.xml"))
+        mock.get(url=re.compile(r"https://mocked_amazon_host.com"), status=503, body="Service Unavailable")
+        mock.get(url=re.compile(r"https://mocked_amazon_host.com"), status=200, body=load_fixture("get_queue_url.xml"))
+
+        response = await self.client.get_queue_url(queue_name="mocked_queue_name")
+        self.assertEqual(response, {"QueueUrl": "http://sqs.mcs.mail.ru/account123/example_queue"})
+
+    @aioresponses()
+    async def test_client_error_is_not_retried(self, mock):
+        mock.get(url=re.compile(r"https://mocked_amazon_host.com"), status=403, body=load_fixture("error_invalid_access_key.xml"))
+
+        with self.assertRaises(SQSErrorResponse) as e:
+            await self.client.get_queue_url(queue_name="mocked_queue_name")
+        self.assertEqual(e.exception.status_code, 403)
+        self.assertEqual(e.exception.error.code, "InvalidClientTokenId")
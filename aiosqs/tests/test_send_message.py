@@ -22,3 +22,13 @@ class SendMessageTestCase(ActionTestCase):
         self.assertEqual(exception.request_id, "f679cf26-effe-5e59-81ca-92cf5c4c713b")
         self.assertEqual(exception.error.type, "Sender")
         self.assertEqual(exception.error.code, "SignatureDoesNotMatch")
+
+    def test_send_message_json(self):
+        res = self.parseJSONResponse("send_message.json")
+        self.assertEqual(
+            res,
+            {
+                "MessageId": "acdf9b7f-a639-4a5b-9557-b4de52a56d01",
+                "MD5OfMessageBody": "a88e5d79dc2948e662b90dc2857ba05c",
+            },
+        )
@@ -0,0 +1,56 @@
+from aiosqs.tests.cases import ActionTestCase
+
+
+class SendMessageBatchTestCase(ActionTestCase):
+    action = "SendMessageBatch"
+
+    def test_partial_failure(self):
+        res = self.parseXMLResponse("send_message_batch.xml")
+        self.assertEqual(
+            res,
+            {
+                "Successful": [
+                    {
+                        "Id": "test_msg_001",
+                        "MessageId": "0a5231c7-8bff-4955-be2e-8dc7c50a25fa",
+                        "MD5OfMessageBody": "0e024d309850c78cba5eabbeff7cae71",
+                    },
+                    {
+                        "Id": "test_msg_003",
+                        "MessageId": "15ee1ed3-87e7-40c1-bdaa-2e49968ea7e9",
+                        "MD5OfMessageBody": "7fb8146a82f95e0af155278f406862c2",
+                    },
+                ],
+                "Failed": [
+                    {
+                        "Id": "test_msg_002",
+                        "Code": "InvalidParameterValue",
+                        "Message": "One or more parameters are invalid. Reason: Message must be shorter than 262144 bytes.",
+                        "SenderFault": True,
+                    },
+                ],
+            },
+        )
+
+    def test_partial_failure_json(self):
+        res = self.parseJSONResponse("send_message_batch.json")
+        self.assertEqual(
+            res,
+            {
+                "Successful": [
+                    {
+                        "Id": "test_msg_001",
+                        "MessageId": "0a5231c7-8bff-4955-be2e-8dc7c50a25fa",
+                        "MD5OfMessageBody": "0e024d309850c78cba5eabbeff7cae71",
+                    },
+                ],
+                "Failed": [
+                    {
+                        "Id": "test_msg_002",
+                        "Code": "InternalError",
+                        "Message": "We encountered an internal error. Please try again.",
+                        "SenderFault": False,
+                    },
+                ],
+            },
+        )
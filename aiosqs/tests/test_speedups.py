@@ -0,0 +1,118 @@
+import asyncio
+import json
+import random
+import unittest
+import urllib.parse
+
+from aiosqs import speedups
+from aiosqs.supervisor import Supervisor
+
+
+async def worker(context):
+    pass
+
+
+class QuoteTestCase(unittest.TestCase):
+    def test_quote_is_the_same_as_urllib(self):
+        values = [
+            "",
+            "SendMessage",
+            "https://sqs.us-west-2.amazonaws.com/123456789012/queue.fifo",
+            "a b+c&d=e/f?g%h~i_j.k-l",
+            "Привет, мир! 🚀",
+            "\x00\x7f\x80\xff",
+            b"\x00\xffbytes",
+        ]
+        rng = random.Random(1)
+        alphabet = [chr(code) for code in range(0x250)] + ["😀", " ", "﻿"]
+        values.extend("".join(rng.choice(alphabet) for _ in range(rng.randint(1, 50))) for _ in range(1000))
+        for value in values:
+            self.assertEqual(speedups.quote(value), urllib.parse.quote(value, safe=""))
+
+    def test_encode_query_is_the_same_as_urlencode(self):
+        params = {
+            "Action": "SendMessage",
+            "QueueUrl": "https://sqs.us-west-2.amazonaws.com/123456789012/queue",
+            "MessageBody": '{"text": "Привет & до свидания"}',
+            "DelaySeconds": 5,
+            "MessageAttribute.1.Value.BinaryValue": b"\x00\x01",
+            "MessageAttribute.1.Name": "city name",
+        }
+        self.assertEqual(
+            speedups.encode_query(params=params),
+            urllib.parse.urlencode(query=sorted(params.items()), quote_via=urllib.parse.quote),
+        )
+
+    def test_only_names_and_repeating_values_are_cached(self):
+        speedups.quote_name.cache_clear()
+        params = {
+            "Action": "SendMessage",
+            "QueueUrl": "https://sqs.us-west-2.amazonaws.com/123456789012/queue",
+            "MessageBody": "x" * 100,
+            "MessageAttribute.1.Name": "city",
+            "MessageAttribute.1.Value.DataType": "String",
+            "MessageAttribute.1.Value.StringValue": "Berlin",
+        }
+        speedups.encode_query(params=params)
+        self.assertEqual(speedups.quote_name.cache_info().currsize, len(params) + 4)
+        speedups.encode_query(params=dict(params, MessageBody="y" * 100, **{"MessageAttribute.1.Value.StringValue": "Paris"}))
+        self.assertEqual(speedups.quote_name.cache_info().currsize, len(params) + 4)
+
+    def test_json(self):
+        value = {"QueueUrl": "queue", "MessageBody": "Привет", "DelaySeconds": 5, "Entries": [{"Id": "1"}]}
+        data = speedups.json_dumps(value)
+        self.assertIsInstance(data, bytes)
+        self.assertEqual(json.loads(data), value)
+        self.assertEqual(speedups.json_loads(data), value)
+        self.assertEqual(speedups.json_loads(data.decode("utf-8")), value)
+
+
+class RunTestCase(unittest.TestCase):
+    def test_run_without_uvloop(self):
+        async def main():
+            return speedups.features()["event_loop"]
+
+        self.assertEqual(speedups.run(main(), use_uvloop=False), "asyncio")
+
+    @unittest.skipIf(speedups.uvloop is None, "uvloop is not installed")
+    def test_run_with_uvloop(self):
+        async def main():
+            return speedups.features()["event_loop"]
+
+        self.assertEqual(speedups.run(main()), "uvloop")
+
+    @unittest.skipIf(speedups.uvloop is None, "uvloop is not installed")
+    def test_run_with_uvloop_keeps_event_loop_policy(self):
+        policy = asyncio.get_event_loop_policy()
+        self.assertEqual(speedups.run(asyncio.sleep(0, result="done")), "done")
+        self.assertIs(asyncio.get_event_loop_policy(), policy)
+
+    def test_run_in_loop(self):
+        policy = asyncio.get_event_loop_policy()
+        loop = asyncio.new_event_loop()
+        pending = []
+
+        async def main():
+            pending.append(asyncio.ensure_future(asyncio.sleep(10)))
+            return asyncio.get_running_loop()
+
+        self.assertIs(speedups._run_in_loop(main=main(), loop=loop), loop)
+        self.assertTrue(pending[0].cancelled())
+        self.assertTrue(loop.is_closed())
+        self.assertIs(asyncio.get_event_loop_policy(), policy)
+
+    @unittest.skipIf(speedups.uvloop is not None, "uvloop is installed")
+    def test_uvloop_is_required(self):
+        main = asyncio.sleep(0)
+        with self.assertRaises(RuntimeError):
+            speedups.run(main, use_uvloop=True)
+        main.close()
+        with self.assertRaises(RuntimeError):
+            Supervisor(target=worker, processes=1, use_uvloop=True)
+
+    def test_features(self):
+        features = speedups.features()
+        self.assertEqual(features["json"], "orjson" if speedups.orjson is not None else "json")
+        self.assertEqual(features["event_loop"], "uvloop" if speedups.uvloop is not None else "asyncio")
+        self.assertIn(features["http_parser"], ("c", "python"))
+        self.assertIn(features["dns_resolver"], ("aiodns", "threaded"))
@@ -0,0 +1,121 @@
+import asyncio
+import os
+import signal
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+from aiosqs.supervisor import Supervisor, WorkerContext, process_pool_handler
+from aiosqs.types import Message
+
+
+async def count_until_stopped(context: WorkerContext):
+    while not context.stopping.is_set():
+        context.increment("ticks")
+        await asyncio.sleep(0.01)
+
+
+async def crash_once(context: WorkerContext):
+    # The marker file is created by the first process of the worker
+    marker = os.path.join(os.environ["AIOSQS_TEST_DIR"], f"worker-{context.index}")
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        context.increment("crashes")
+        raise RuntimeError("Crash")
+    context.increment("runs")
+
+
+class Runner:
+    def __init__(self):
+        self.stopping: asyncio.Event = None
+        self.stopped = False
+
+    async def run(self):
+        self.stopping = asyncio.Event()
+        await self.stopping.wait()
+        self.stopped = True
+
+    def stop(self):
+        self.stopping.set()
+
+
+def decode(message: Message) -> int:
+    return len(message["Body"])
+
+
+class SupervisorTestCase(unittest.TestCase):
+    def create_supervisor(self, target, **kwargs) -> Supervisor:
+        return Supervisor(target=target, stats_interval_sec=0.05, stop_timeout_sec=5, **kwargs)
+
+    def test_workers_are_stopped_gracefully(self):
+        stats: List = []
+        supervisor = self.create_supervisor(count_until_stopped, processes=2, on_stats=stats.append)
+
+        def stop():
+            while not stats or stats[-1]["counters"].get("ticks", 0) < 10:
+                time.sleep(0.01)
+            supervisor.stop()
+
+        thread = threading.Thread(target=stop)
+        thread.start()
+        supervisor.run()
+        thread.join()
+
+        self.assertEqual(stats[-1]["processes"], 2)
+        self.assertEqual(stats[-1]["alive"], 2)
+        final = supervisor.stats()
+        self.assertEqual(final["alive"], 0)
+        self.assertEqual(final["restarts"], 0)
+        self.assertGreaterEqual(final["counters"]["ticks"], 10)
+
+    def test_signal_stops_workers(self):
+        supervisor = self.create_supervisor(count_until_stopped, processes=1)
+        timer = threading.Timer(0.3, os.kill, args=(os.getpid(), signal.SIGTERM))
+        timer.start()
+        started_at = time.monotonic()
+        supervisor.run()
+        timer.join()
+        self.assertLess(time.monotonic() - started_at, 3)
+        self.assertEqual(signal.getsignal(signal.SIGTERM), signal.SIG_DFL)
+
+    def test_crashed_workers_are_restarted(self):
+        with tempfile.TemporaryDirectory() as directory:
+            os.environ["AIOSQS_TEST_DIR"] = directory
+            self.addCleanup(os.environ.pop, "AIOSQS_TEST_DIR")
+            supervisor = self.create_supervisor(crash_once, processes=2, restart_delay_sec=0.01)
+            supervisor.run()
+
+        stats = supervisor.stats()
+        self.assertEqual(stats["restarts"], 2)
+        self.assertEqual(stats["counters"], {"crashes": 2, "runs": 2})
+
+
+class WorkerContextTestCase(unittest.IsolatedAsyncioTestCase):
+    async def test_run_until_stopped(self):
+        context = WorkerContext(index=0)
+        runner = Runner()
+        task = asyncio.ensure_future(context.run(runner))
+        await asyncio.sleep(0.01)
+        context.stop()
+        await asyncio.wait_for(task, timeout=1)
+        self.assertTrue(runner.stopped)
+
+    async def test_stopped_before_run(self):
+        context = WorkerContext(index=0)
+        stopped = []
+        context.add_stop_callback(lambda: stopped.append(True))
+        context.stop()
+        context.stop()
+        self.assertEqual(stopped, [True])
+        await asyncio.wait_for(context.run(Runner()), timeout=1)
+
+
+class ProcessPoolHandlerTestCase(unittest.IsolatedAsyncioTestCase):
+    async def test_handler(self):
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            handler = process_pool_handler(func=decode, executor=executor)
+            result = await handler({"MessageId": "1", "ReceiptHandle": "handle", "MD5OfBody": "md5", "Body": "body"})
+        self.assertEqual(result, 4)
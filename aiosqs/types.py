@@ -1,9 +1,99 @@
 import logging
-from typing import Union, TypedDict, List
+from typing import Any, Dict, Mapping, Optional, Union, TypedDict, List
 
 LoggerType = Union[logging.Logger, logging.LoggerAdapter]
 
 
+class PoolStats(TypedDict):
+    limit: int
+    limit_per_host: int
+    # Connections in use and idle keep-alive connections
+    open: int
+    acquired: int
+    idle: int
+    # Requests waiting for a free connection
+    waiting: int
+
+
+class HedgeStats(TypedDict):
+    requests: int
+    # Requests which were sent twice, and the share of them
+    hedged: int
+    hedge_rate: float
+    # Hedged requests which completed before the original ones, and the latency they saved in total
+    hedge_wins: int
+    saved_sec: float
+
+
+class HistogramSnapshot(TypedDict):
+    count: int
+    sum: float
+    # Upper bounds of the buckets which contain the quantiles, None without values
+    p50: Optional[float]
+    p90: Optional[float]
+    p99: Optional[float]
+    # Counts by upper bounds of buckets
+    buckets: Dict[float, int]
+
+
+class QueueStats(TypedDict):
+    weight: float
+    # Messages received from the queue and waiting for a worker
+    received: int
+    buffered: int
+    # Polls in flight
+    polls: int
+    # Consecutive empty receives and the wait time of the next poll
+    empty_receives: int
+    wait_time_seconds: int
+    # Failed receives, they don't count as empty ones
+    errors: int
+
+
+class PollStats(TypedDict):
+    receives: int
+    # Moving averages of empty receives, received to requested messages and messages per receive
+    empty_rate: float
+    fill_ratio: float
+    messages_per_receive: float
+    # Processing time quantile of handlers, None until there are enough samples
+    processing_sec: Optional[float]
+    # Parameters of the next receive
+    max_number_of_messages: int
+    visibility_timeout: int
+    wait_time_seconds: int
+
+
+class SupervisorStats(TypedDict):
+    processes: int
+    alive: int
+    # Workers restarted after crashes
+    restarts: int
+    # Sums of counters published by workers, including exited ones
+    counters: Dict[str, float]
+
+
+class DedupStats(TypedDict):
+    # Messages checked, duplicates of handled messages and of messages being handled
+    checked: int
+    duplicates: int
+    in_progress: int
+    # Failed requests to the store
+    errors: int
+
+
+class Features(TypedDict):
+    # "uvloop" or "asyncio"
+    event_loop: str
+    # "orjson" or "json"
+    json: str
+    # "c" or "python"
+    http_parser: str
+    # "aiodns" or "threaded"
+    dns_resolver: str
+    aiohttp: str
+
+
 class GetQueueUrlResponse(TypedDict):
     QueueUrl: str
 
@@ -13,11 +103,85 @@ class SendMessageResponse(TypedDict):
     MD5OfMessageBody: str
 
 
-class Message(TypedDict):
+class MessageAttributeValue(TypedDict, total=False):
+    # String, Number or Binary, optionally with a custom type, e.g. "Number.float"
+    DataType: str
+    StringValue: str
+    # Raw bytes, they are base64-encoded for the request
+    BinaryValue: bytes
+
+
+class _Message(TypedDict):
     MessageId: str
     ReceiptHandle: str
     Body: str
     MD5OfBody: str
 
 
+class Message(_Message, total=False):
+    # Only when requested with `attribute_names` and `message_attribute_names`
+    Attributes: Dict[str, str]
+    MessageAttributes: Mapping[str, Any]
+    MD5OfMessageAttributes: str
+    # Only when the client has a payload codec, the error instead of the payload when the body can't be decoded
+    # or loaded from the blob store
+    Payload: Any
+    PayloadError: Exception
+
+
 ReceiveMessageResponse = Union[List[Message], None]
+
+
+class _SendMessageBatchRequestEntry(TypedDict):
+    Id: str
+    MessageBody: str
+
+
+class SendMessageBatchRequestEntry(_SendMessageBatchRequestEntry, total=False):
+    DelaySeconds: int
+    MessageAttributes: Dict[str, MessageAttributeValue]
+    # Only for FIFO queues
+    MessageGroupId: str
+    MessageDeduplicationId: str
+
+
+class DeleteMessageBatchRequestEntry(TypedDict):
+    Id: str
+    ReceiptHandle: str
+
+
+class ChangeMessageVisibilityBatchRequestEntry(TypedDict):
+    Id: str
+    ReceiptHandle: str
+    VisibilityTimeout: int
+
+
+class BatchResultEntry(TypedDict):
+    Id: str
+
+
+class SendMessageBatchResultEntry(BatchResultEntry):
+    MessageId: str
+    MD5OfMessageBody: str
+
+
+class BatchResultErrorEntry(TypedDict):
+    Id: str
+    Code: str
+    Message: str
+    # Whether the error happened due to the caller of the batch API action
+    SenderFault: bool
+
+
+class SendMessageBatchResponse(TypedDict):
+    Successful: List[SendMessageBatchResultEntry]
+    Failed: List[BatchResultErrorEntry]
+
+
+class BatchResponse(TypedDict):
+    Successful: List[BatchResultEntry]
+    Failed: List[BatchResultErrorEntry]
+
+
+DeleteMessageBatchResponse = BatchResponse
+ChangeMessageVisibilityBatchResponse = BatchResponse
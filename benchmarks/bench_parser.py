@@ -0,0 +1,146 @@
+"""
+Parsing time of XML responses compared to the parser which ran XPath queries for every response,
+and the peak memory of parsing large ReceiveMessage responses, which are streamed instead of building the whole tree.
+
+Run: python -m benchmarks.bench_parser
+"""
+import ctypes
+import gc
+import multiprocessing
+import os
+import re
+import timeit
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+from lxml import etree
+
+from aiosqs.parser import parse_xml_result_response
+from aiosqs.tests.fixtures import load_fixture
+
+FIXTURES = {
+    "ReceiveMessage": [
+        "receive_message.xml",
+        "receive_message_ugly.xml",
+        "receive_messages.xml",
+        "receive_message_empty.xml",
+    ],
+    "SendMessage": ["send_message.xml"],
+    "GetQueueUrl": ["get_queue_url.xml"],
+    "DeleteMessage": ["delete_message.xml"],
+}
+
+
+def legacy_parse_xml_result_response(action: str, body: bytes):
+    """The parser before the ReceiveMessage fast path, without error handling."""
+
+    def el_tag(el) -> str:
+        return re.sub(r"\{.*?}", "", el.tag, flags=re.IGNORECASE)
+
+    def collect_elements(root, xpath: str):
+        multi_response = []
+        for child in root.xpath(xpath):
+            item = {}
+            for elem in child:
+                item[el_tag(elem)] = elem.text.strip() if elem.text else None
+            if item:
+                multi_response.append(item)
+        return multi_response
+
+    parser = etree.XMLParser(remove_blank_text=True, remove_comments=True, remove_pis=True, recover=False)
+    root = etree.fromstring(text=body, parser=parser)
+    root.xpath("./*[local-name() = 'RequestId']")
+    collect_elements(root=root, xpath="./*[local-name() = 'Error']")
+    xpath = f"./*[local-name() = '{action}Result']"
+    elements = collect_elements(root=root, xpath=xpath)
+    if len(elements) == 1 and len(elements[0]) == 1:
+        key, value = list(elements[0].items())[0]
+        if not value:
+            return collect_elements(root=root, xpath=f"{xpath}/{key}")
+    if len(elements) == 1:
+        return elements[0]
+    return None
+
+
+def synthetic_receive_message(messages: int, body_size: int) -> bytes:
+    items = []
+    for i in range(messages):
+        body = os.urandom(body_size // 2).hex()
+        items.append(
+            f"<Message><MessageId>{i}</MessageId><ReceiptHandle>handle-{i}</ReceiptHandle>"
+            f"<MD5OfBody>md5</MD5OfBody><Body>{body}</Body></Message>"
+        )
+    return (
+        "<ReceiveMessageResponse><ReceiveMessageResult>"
+        + "".join(items)
+        + "</ReceiveMessageResult><ResponseMetadata><RequestId>id</RequestId></ResponseMetadata></ReceiveMessageResponse>"
+    ).encode("utf-8")
+
+
+def status_kb(field: str) -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(f"{field}:"):
+                return int(line.split()[1])
+    raise KeyError(field)
+
+
+def peak_parse_memory_kb(legacy: bool, messages: int, body_size: int) -> Optional[int]:
+    """Growth of the peak RSS while one response is parsed, run in a new process. Linux only."""
+    body = synthetic_receive_message(messages=messages, body_size=body_size)
+    parse = legacy_parse_xml_result_response if legacy else parse_xml_result_response
+    gc.collect()
+    try:
+        # Memory freed while the body was built would be reused by the parser without growing RSS
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        before = status_kb("VmRSS")
+    except (OSError, KeyError):
+        return None
+    result = parse(action="ReceiveMessage", body=body)
+    peak = status_kb("VmHWM")
+    del result
+    return peak - before
+
+
+def compare_memory(name: str, messages: int, body_size: int):
+    peaks = []
+    for legacy in (True, False):
+        # A new process for every measurement, so memory kept by the allocator after other cases isn't reused
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            peaks.append(executor.submit(peak_parse_memory_kb, legacy=legacy, messages=messages, body_size=body_size).result())
+    before, after = peaks
+    if before is None or after is None:
+        print(f"{name:>36} {'n/a':>12} {'n/a':>12}")
+        return
+    print(f"{name:>36} {before:>12} {after:>12} {before / after:>8.2f}x")
+
+
+def compare(name: str, action: str, body: bytes, number: int):
+    before = min(timeit.repeat(lambda: legacy_parse_xml_result_response(action=action, body=body), number=number, repeat=3))
+    after = min(timeit.repeat(lambda: parse_xml_result_response(action=action, body=body), number=number, repeat=3))
+    print(f"{name:>36} {number / before:>12.0f} {number / after:>12.0f} {before / after:>8.2f}x")
+
+
+def main():
+    print(f"{'response':>36} {'before, ops':>12} {'after, ops':>12} {'speedup':>9}")
+    for action, fixtures in FIXTURES.items():
+        for fixture in fixtures:
+            compare(name=fixture, action=action, body=load_fixture(fixture, mode="rb"), number=5000)
+
+    synthetic: Dict[str, int] = {
+        "10 messages x 1 KB": 1024,
+        "10 messages x 25 KB": 25 * 1024,
+        "10 messages x 256 KB": 256 * 1024,
+    }
+    for name, body_size in synthetic.items():
+        compare(name=name, action="ReceiveMessage", body=synthetic_receive_message(messages=10, body_size=body_size), number=200)
+
+    print(f"\n{'response':>36} {'before, KB':>12} {'after, KB':>12} {'saving':>9}")
+    for name, body_size in synthetic.items():
+        compare_memory(name=name, messages=10, body_size=body_size)
+
+
+if __name__ == "__main__":
+    main()
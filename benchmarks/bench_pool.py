@@ -0,0 +1,86 @@
+"""
+Latency of 500 concurrent in-flight requests with different connection pool limits.
+
+Run: python -m benchmarks.bench_pool
+"""
+import asyncio
+import statistics
+import time
+
+from aiohttp import web
+
+from aiosqs.client import SQSClient
+from benchmarks.bench_transport import get_free_port
+
+CONCURRENCY = 500
+# Server side latency of one request
+SERVER_DELAY_SEC = 0.01
+POOL_LIMITS = (10, 100, 500, 0)
+QUEUE_URL = "https://sqs.us-west-2.amazonaws.com/123456789012/orders"
+SEND_MESSAGE_RESPONSE = """<SendMessageResponse>
+    <SendMessageResult>
+        <MessageId>acdf9b7f-a639-4a5b-9557-b4de52a56d01</MessageId>
+        <MD5OfMessageBody>a88e5d79dc2948e662b90dc2857ba05c</MD5OfMessageBody>
+    </SendMessageResult>
+</SendMessageResponse>"""
+
+
+async def handle(request: web.Request) -> web.Response:
+    await asyncio.sleep(SERVER_DELAY_SEC)
+    return web.Response(text=SEND_MESSAGE_RESPONSE, content_type="text/xml")
+
+
+async def run_server(port: int) -> web.AppRunner:
+    app = web.Application()
+    app.router.add_route("*", "/", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host="127.0.0.1", port=port, backlog=1024).start()
+    return runner
+
+
+async def timed_request(client: SQSClient) -> float:
+    started_at = time.perf_counter()
+    await client.send_message(queue_url=QUEUE_URL, message_body="benchmark")
+    return time.perf_counter() - started_at
+
+
+async def measure(port: int, connection_limit: int, rounds: int = 5):
+    async with SQSClient(
+        aws_access_key_id="access_key_id",
+        aws_secret_access_key="secret_access_key",
+        region_name="us-west-2",
+        host=f"127.0.0.1:{port}",
+        connection_limit=connection_limit,
+    ) as client:
+        client.endpoint_url = f"http://127.0.0.1:{port}"
+        # Warm up the pool
+        await asyncio.gather(*[timed_request(client) for _ in range(CONCURRENCY)])
+
+        latencies = []
+        started_at = time.perf_counter()
+        for _ in range(rounds):
+            latencies.extend(await asyncio.gather(*[timed_request(client) for _ in range(CONCURRENCY)]))
+        elapsed = time.perf_counter() - started_at
+        stats = client.pool_stats()
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    return len(latencies) / elapsed, quantiles[49], quantiles[98], stats["open"]
+
+
+async def main():
+    port = get_free_port()
+    runner = await run_server(port=port)
+    try:
+        print(f"{CONCURRENCY} concurrent requests, server latency {SERVER_DELAY_SEC * 1000:.0f} ms")
+        print(f"{'pool limit':>10} {'requests/sec':>14} {'p50, ms':>9} {'p99, ms':>9} {'open':>6}")
+        for connection_limit in POOL_LIMITS:
+            rps, p50, p99, open_connections = await measure(port=port, connection_limit=connection_limit)
+            limit_name = connection_limit or "no limit"
+            print(f"{limit_name:>10} {rps:>14.0f} {p50 * 1000:>9.1f} {p99 * 1000:>9.1f} {open_connections:>6}")
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
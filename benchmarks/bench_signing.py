@@ -0,0 +1,81 @@
+"""
+Signatures per second of `SQSClient.build_signed_request` compared to the signer without cached signing keys.
+
+Run: python -m benchmarks.bench_signing
+"""
+import asyncio
+import datetime
+import timeit
+import urllib.parse
+from typing import Dict
+
+from aiosqs.client import SignedRequest, SQSClient
+from aiosqs.encryption import get_signature_key, hmac_sha256_hexdigest, sha256_hexdigest
+
+PARAMS = {
+    "Action": "SendMessage",
+    "DelaySeconds": 0,
+    "MessageBody": '{"order_id": 123456, "status": "created", "amount": "16.05"}',
+    "QueueUrl": "https://sqs.us-west-2.amazonaws.com/123456789012/orders",
+    "Version": "2012-11-05",
+}
+
+
+def legacy_build_signed_request(client: SQSClient, params: Dict) -> SignedRequest:
+    """The signer as it was before signing keys and static fragments were cached."""
+    t = datetime.datetime.utcnow()
+    amz_date = t.strftime("%Y%m%dT%H%M%SZ")
+    date_stamp = t.strftime("%Y%m%d")
+    canonical_querystring = urllib.parse.urlencode(query=list(sorted(params.items())), quote_via=client.quote_via)
+    canonical_headers = f"host:{client.host}\nx-amz-date:{amz_date}\n"
+    signed_headers = "host;x-amz-date"
+    if client.aws_session_token:
+        canonical_headers += f"x-amz-security-token:{client.aws_session_token}\n"
+        signed_headers += ";x-amz-security-token"
+    payload_hash = sha256_hexdigest("")
+    canonical_request = "\n".join(["GET", "/", canonical_querystring, canonical_headers, signed_headers, payload_hash])
+    credential_scope = f"{date_stamp}/{client.region_name}/{client.service_name}/aws4_request"
+    string_to_sign = "\n".join([client.algorithm, amz_date, credential_scope, sha256_hexdigest(canonical_request)])
+    signing_key = get_signature_key(
+        aws_secret_access_key=client.aws_secret_access_key,
+        date_stamp=date_stamp,
+        region_name=client.region_name,
+        service_name=client.service_name,
+    )
+    signature = hmac_sha256_hexdigest(key=signing_key, msg=string_to_sign)
+    authorization_header = (
+        f"{client.algorithm} Credential={client.aws_access_key_id}/{credential_scope}, "
+        f"SignedHeaders={signed_headers}, Signature={signature}"
+    )
+    headers = {
+        "x-amz-date": amz_date,
+        "Authorization": authorization_header,
+        "content-type": "application/x-www-form-urlencoded",
+    }
+    if client.aws_session_token:
+        headers["x-amz-security-token"] = client.aws_session_token
+    return SignedRequest(headers=headers, querystring=canonical_querystring)
+
+
+def signatures_per_second(func, number: int = 20000, repeat: int = 5) -> float:
+    best = min(timeit.repeat(func, number=number, repeat=repeat))
+    return number / best
+
+
+async def main():
+    async with SQSClient(
+        aws_access_key_id="access_key_id",
+        aws_secret_access_key="secret_access_key",
+        region_name="us-west-2",
+        host="sqs.us-west-2.amazonaws.com",
+    ) as client:
+        before = signatures_per_second(lambda: legacy_build_signed_request(client=client, params=PARAMS))
+        after = signatures_per_second(lambda: client.build_signed_request(params=PARAMS))
+
+    print(f"before: {before:>10.0f} signatures/sec")
+    print(f"after:  {after:>10.0f} signatures/sec")
+    print(f"speedup: {after / before:.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
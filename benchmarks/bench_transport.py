@@ -0,0 +1,103 @@
+"""
+Throughput and allocations of GET querystring vs POST form body transports for different message sizes.
+
+Run: python -m benchmarks.bench_transport
+"""
+import asyncio
+import socket
+import time
+import tracemalloc
+
+from aiohttp import web
+from yarl import URL
+
+from aiosqs.client import SQSClient
+from aiosqs.tests.fixtures import load_fixture
+
+MESSAGE_SIZES = {
+    "1 KB": 1024,
+    "64 KB": 64 * 1024,
+    "256 KB": 256 * 1024,
+}
+QUEUE_URL = "https://sqs.us-west-2.amazonaws.com/123456789012/orders"
+
+
+async def handle(request: web.Request) -> web.Response:
+    await request.read()
+    return web.Response(body=SEND_MESSAGE_RESPONSE, content_type="text/xml")
+
+
+SEND_MESSAGE_RESPONSE = load_fixture("send_message.xml")
+
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run_server(port: int) -> web.AppRunner:
+    # Large limits let GET requests with huge querystrings through, real SQS endpoints are stricter.
+    app = web.Application(client_max_size=2 * 1024 * 1024, handler_args={"max_line_size": 2 * 1024 * 1024})
+    app.router.add_route("*", "/", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host="127.0.0.1", port=port).start()
+    return runner
+
+
+def prepare_request(client: SQSClient, params: dict):
+    """Client side work before the bytes hit the socket: signing and building the URL or the body."""
+    signed_request = client.build_signed_request(params=params)
+    if signed_request.body is None:
+        return URL(f"{client.endpoint_url}?{signed_request.querystring}")
+    return signed_request.body
+
+
+async def measure(client: SQSClient, message_body: str, number: int):
+    # Warm up the connection pool
+    await client.send_message(queue_url=QUEUE_URL, message_body=message_body)
+
+    started_at = time.perf_counter()
+    for _ in range(number):
+        await client.send_message(queue_url=QUEUE_URL, message_body=message_body)
+    elapsed = time.perf_counter() - started_at
+
+    params = {
+        "Action": "SendMessage",
+        "DelaySeconds": 0,
+        "MessageBody": message_body,
+        "QueueUrl": QUEUE_URL,
+        "Version": "2012-11-05",
+    }
+    tracemalloc.start()
+    prepare_request(client=client, params=params)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return number / elapsed, peak
+
+
+async def main(number: int = 200):
+    port = get_free_port()
+    runner = await run_server(port=port)
+    try:
+        print(f"{'size':>8} {'method':>6} {'requests/sec':>14} {'prepare peak alloc':>20}")
+        for size_name, size in MESSAGE_SIZES.items():
+            message_body = "a b&c" * (size // 5)
+            for http_method in SQSClient.http_methods:
+                async with SQSClient(
+                    aws_access_key_id="access_key_id",
+                    aws_secret_access_key="secret_access_key",
+                    region_name="us-west-2",
+                    host=f"127.0.0.1:{port}",
+                    http_method=http_method,
+                ) as client:
+                    client.endpoint_url = f"http://127.0.0.1:{port}"
+                    rps, peak = await measure(client=client, message_body=message_body, number=number)
+                print(f"{size_name:>8} {http_method:>6} {rps:>14.0f} {peak / 1024:>17.0f} KB")
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -25,4 +25,10 @@ setup(
         "aiohttp[speedups]>=3",
         "lxml>=4",
     ],
+    extras_require={
+        "fast": [
+            "uvloop>=0.17; sys_platform != 'win32'",
+            "orjson>=3",
+        ],
+    },
 )